@@ -0,0 +1,271 @@
+# analise_acessos.py
+# Análise do acessos.log em fluxo, com memória constante: acessos por página, por IP e por hora.
+# Entende os dois formatos que o arquivo já tem: as linhas antigas ("Página Lojas visualizada", gravadas em
+# cp1252) e as atuais de registrar_acesso (método, caminho, status e tempos, em UTF-8).
+# No modo incremental guarda num JSON até onde leu (offset + impressão digital do começo do arquivo); na rodada
+# seguinte termina o arquivo que foi rotacionado (inclusive .gz) e segue no atual, lendo só os bytes novos.
+import glob
+import gzip
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter
+
+LOG_ANALISE_ESTADO = os.getenv("LOG_ANALISE_ESTADO", "acessos.estado.json")
+LOG_ANALISE_MAX_CHAVES = int(os.getenv("LOG_ANALISE_MAX_CHAVES", "100000"))   # por agregado; o excedente vai para OUTROS
+LINHA_MAX_BYTES = 64 * 1024          # linha maior que isso é descartada (não cresce a memória)
+ASSINATURA_BYTES = 1024              # começo do arquivo que identifica o arquivo depois de rotacionado
+
+OUTROS = '(outros)'
+
+# Linhas antigas não tinham a rota, só a descrição da página
+PAGINAS_LEGADO = {
+    'Dashboard visualizado': '/painel',
+    'Painel principal visualizado': '/painel',
+    'Página Lojas visualizada': '/lojas',
+    'Página Vendedores visualizada': '/vendedores',
+}
+
+_CABECALHO = re.compile(r'^(\d{4}-\d{2}-\d{2}) (\d{2}):\d{2}:\d{2},\d{3} - \w+ - ACESSO: (.*?)\s*$')
+_ATUAL = re.compile(r'^([A-Z]+) (\S+) (\d{3}) ([\d.]+)ms \(banco: \d+ chamadas, [\d.]+ms\)\. IP: (\S+)$')
+_LEGADO = re.compile(r'^(.+?)\.? IP(?: do Usuário)?: (\S+)$')
+
+
+# ==============================
+# LINHAS
+# ==============================
+def decodificar(linha):
+    # UTF-8 primeiro; o que não for é do app antigo no Windows (cp1252), com latin-1 como último recurso
+    try:
+        return linha.decode('utf-8'), False
+    except UnicodeDecodeError:
+        try:
+            return linha.decode('cp1252'), True
+        except UnicodeDecodeError:
+            return linha.decode('latin-1'), True
+
+
+def interpretar(texto):
+    # -> {'hora', 'pagina', 'ip', 'status', 'ms'} ou None para linhas que não são de acesso
+    cabecalho = _CABECALHO.match(texto)
+    if not cabecalho:
+        return None
+    dia, hora, mensagem = cabecalho.groups()
+    atual = _ATUAL.match(mensagem)
+    if atual:
+        return {'hora': f"{dia} {hora}", 'pagina': atual.group(2), 'ip': atual.group(5),
+                'status': atual.group(3), 'ms': float(atual.group(4))}
+    legado = _LEGADO.match(mensagem)
+    if legado:
+        descricao = legado.group(1)
+        return {'hora': f"{dia} {hora}", 'pagina': PAGINAS_LEGADO.get(descricao, descricao), 'ip': legado.group(2),
+                'status': None, 'ms': None}
+    return None
+
+
+def _abrir(caminho):
+    return gzip.open(caminho, 'rb') if caminho.endswith('.gz') else open(caminho, 'rb')
+
+
+def ler_linhas(arquivo, ate_o_fim=True):
+    # -> (linha em bytes ou None se descartada, offset logo depois dela). Arquivo ao vivo (ate_o_fim=False):
+    # a última linha sem \n ainda está sendo escrita e fica para a próxima rodada.
+    while True:
+        linha = arquivo.readline(LINHA_MAX_BYTES)
+        if not linha:
+            return
+        if not linha.endswith(b'\n'):
+            if len(linha) < LINHA_MAX_BYTES:
+                if ate_o_fim:
+                    yield linha, arquivo.tell()
+                return
+            # Linha gigante: consome até o fim dela sem guardar
+            while linha and not linha.endswith(b'\n'):
+                linha = arquivo.readline(LINHA_MAX_BYTES)
+            if linha or ate_o_fim:
+                yield None, arquivo.tell()
+            continue
+        yield linha, arquivo.tell()
+
+
+# ==============================
+# AGREGAÇÃO
+# ==============================
+class Agregado:
+    def __init__(self, max_chaves=LOG_ANALISE_MAX_CHAVES):
+        self.max_chaves = max_chaves
+        self.paginas = Counter()
+        self.ips = Counter()
+        self.horas = Counter()
+        self.status = Counter()
+        self.ms_total = Counter()      # soma das durações por página (só linhas atuais)
+        self.ms_contagem = Counter()
+        self.linhas = 0
+        self.acessos = 0
+        self.ignoradas = 0
+        self.cp1252 = 0
+        self.bytes = 0
+
+    def _contar(self, contador, chave, n=1):
+        if chave not in contador and len(contador) >= self.max_chaves:
+            chave = OUTROS
+        contador[chave] += n
+        return chave
+
+    def adicionar_linha(self, linha, tamanho):
+        self.linhas += 1
+        self.bytes += tamanho
+        if linha is None:
+            self.ignoradas += 1
+            return
+        texto, legado = decodificar(linha)
+        self.cp1252 += legado
+        acesso = interpretar(texto)
+        if acesso is None:
+            self.ignoradas += 1
+            return
+        self.acessos += 1
+        pagina = self._contar(self.paginas, acesso['pagina'])
+        self._contar(self.ips, acesso['ip'])
+        self._contar(self.horas, acesso['hora'])
+        if acesso['status']:
+            self.status[acesso['status']] += 1
+        if acesso['ms'] is not None:
+            self.ms_total[pagina] += acesso['ms']
+            self.ms_contagem[pagina] += 1
+
+    def mesclar(self, outro):
+        for nome in ('paginas', 'ips', 'horas', 'ms_total', 'ms_contagem'):
+            destino = getattr(self, nome)
+            for chave, n in getattr(outro, nome).items():
+                self._contar(destino, chave, n)
+        self.status.update(outro.status)
+        for nome in ('linhas', 'acessos', 'ignoradas', 'cp1252', 'bytes'):
+            setattr(self, nome, getattr(self, nome) + getattr(outro, nome))
+        return self
+
+    def ms_medio(self, pagina):
+        n = self.ms_contagem.get(pagina)
+        return round(self.ms_total[pagina] / n, 1) if n else None
+
+    def para_dict(self):
+        return {
+            'linhas': self.linhas, 'acessos': self.acessos, 'ignoradas': self.ignoradas,
+            'cp1252': self.cp1252, 'bytes': self.bytes,
+            'paginas': dict(self.paginas), 'ips': dict(self.ips), 'horas': dict(sorted(self.horas.items())),
+            'status': dict(self.status),
+            'ms_total': {k: round(v, 3) for k, v in self.ms_total.items()}, 'ms_contagem': dict(self.ms_contagem),
+        }
+
+    @classmethod
+    def de_dict(cls, dados):
+        agregado = cls()
+        for nome in ('paginas', 'ips', 'horas', 'status', 'ms_total', 'ms_contagem'):
+            setattr(agregado, nome, Counter(dados.get(nome, {})))
+        for nome in ('linhas', 'acessos', 'ignoradas', 'cp1252', 'bytes'):
+            setattr(agregado, nome, dados.get(nome, 0))
+        return agregado
+
+
+def analisar_arquivo(caminho, agregado, inicio=0, ate_o_fim=True):
+    # -> offset (no conteúdo descomprimido, para .gz) até onde leu
+    offset = inicio
+    with _abrir(caminho) as arquivo:
+        if inicio:
+            arquivo.seek(inicio)
+        for linha, offset_depois in ler_linhas(arquivo, ate_o_fim):
+            agregado.adicionar_linha(linha, offset_depois - offset)
+            offset = offset_depois
+    return offset
+
+
+def analisar(caminhos):
+    agregado = Agregado()
+    for caminho in caminhos:
+        analisar_arquivo(caminho, agregado)
+    return agregado
+
+
+# ==============================
+# MODO INCREMENTAL (offset + rotação)
+# ==============================
+def assinatura(caminho, tamanho):
+    with _abrir(caminho) as arquivo:
+        return hashlib.sha1(arquivo.read(tamanho)).hexdigest()
+
+
+def rotacionados(caminho, ignorar=()):
+    # acessos.log.1, acessos.log.2.gz, acessos.log-20250101.gz ...; do mais antigo para o mais novo
+    candidatos = set(glob.glob(glob.escape(caminho) + '.*') + glob.glob(glob.escape(caminho) + '-*'))
+    candidatos = [c for c in candidatos if os.path.isfile(c) and os.path.abspath(c) not in ignorar]
+    return sorted(candidatos, key=os.path.getmtime)
+
+
+def carregar_estado(caminho_estado):
+    try:
+        with open(caminho_estado, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def salvar_estado(caminho_estado, estado):
+    # Grava em arquivo temporário e renomeia: uma queda no meio não corrompe o estado
+    temporario = caminho_estado + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(estado, f, ensure_ascii=False)
+    os.replace(temporario, caminho_estado)
+
+
+def _planejar(caminho, estado, ignorar):
+    # -> [(arquivo, offset inicial)] na ordem de leitura
+    if not estado or estado.get('arquivo') != os.path.abspath(caminho):
+        return [(caminho, 0)]
+    offset, tamanho, esperado = estado['offset'], estado['assinatura_bytes'], estado['assinatura']
+
+    if os.path.exists(caminho) and os.path.getsize(caminho) >= offset and assinatura(caminho, tamanho) == esperado:
+        return [(caminho, offset)]
+
+    # Rotacionou (renomeado, comprimido ou copiado e truncado): acha o arquivo onde paramos pelo começo dele
+    antigos = rotacionados(caminho, ignorar)
+    for i, antigo in enumerate(antigos):
+        try:
+            if assinatura(antigo, tamanho) == esperado:
+                return [(antigo, offset)] + [(a, 0) for a in antigos[i + 1:]] + [(caminho, 0)]
+        except (OSError, EOFError, gzip.BadGzipFile):
+            continue
+    print(f"Aviso: {caminho} mudou e o arquivo lido na última rodada não foi encontrado; recomeçando do início.",
+          file=sys.stderr)
+    return [(caminho, 0)]
+
+
+def analisar_incremental(caminho, caminho_estado=LOG_ANALISE_ESTADO):
+    # -> (agregado só dos bytes novos, agregado acumulado de todas as rodadas)
+    estado = carregar_estado(caminho_estado)
+    ignorar = {os.path.abspath(caminho_estado), os.path.abspath(caminho_estado + '.tmp')}
+    novos = Agregado()
+    offset = 0
+    for arquivo, inicio in _planejar(caminho, estado, ignorar):
+        atual = arquivo == caminho
+        if atual and not os.path.exists(arquivo):
+            # Rotacionado e ainda não recriado pelo app
+            offset = 0
+            continue
+        offset = analisar_arquivo(arquivo, novos, inicio, ate_o_fim=not atual)
+
+    tamanho = min(ASSINATURA_BYTES, offset)
+    acumulado = Agregado.de_dict(estado['totais']) if estado else Agregado()
+    acumulado.mesclar(novos)
+    salvar_estado(caminho_estado, {
+        'arquivo': os.path.abspath(caminho),
+        'offset': offset,
+        'assinatura_bytes': tamanho,
+        # Sem arquivo atual, offset 0 e assinatura do vazio: a próxima rodada lê o novo desde o começo
+        'assinatura': assinatura(caminho, tamanho) if os.path.exists(caminho) else hashlib.sha1(b'').hexdigest(),
+        'atualizado_em': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'totais': acumulado.para_dict(),
+    })
+    return novos, acumulado
@@ -1,35 +1,110 @@
 # app.py
-from flask import Flask, render_template, request, redirect, url_for, flash, send_file
+from flask import Flask, render_template, request, redirect, url_for, flash, send_file, jsonify
 from flask_wtf import FlaskForm
 from wtforms import StringField, SelectField, SubmitField, TextAreaField
 from wtforms.validators import DataRequired, Email, Length, Optional
-from datetime import date
+from datetime import date, timedelta
 import io
+from io import BytesIO
 import random
 import locale
 from collections import defaultdict
 import sys
 import os
-from flask import render_template, send_file, flash
-from xhtml2pdf import pisa
-from flask import Flask, render_template, send_file
-from io import BytesIO
-from datetime import date
-
-# reportlab
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
-from reportlab.lib.units import cm
-from flask import redirect, url_for, request, flash
+import json
+import time
+import click
+import psycopg2
+# xhtml2pdf e reportlab (≈1s de import) só entram na primeira renderização: fila_pdf.carregar_motores_pdf
 
 
 # local database helper
 import database
+import cache
+import fila_pdf
+import relatorios_lote
+import importacao
+import migracoes
+import eventos
+import metricas
+import perfilador
+import analise_acessos
+import fragmentos
+import fechamento
+import incrementos
+import exportacao
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'uma_chave_secreta_muito_forte_e_dificil'
+# Motor padrão dos relatórios: 'xhtml2pdf' (template HTML) ou 'reportlab' (Platypus nativo)
+app.config['PDF_MOTOR'] = os.getenv('PDF_MOTOR', 'xhtml2pdf')
+# Endereço do /eventos servido pelo processo 'sse' do Procfile (worker gevent); vazio = o próprio worker web,
+# limitado a poucos navegadores por worker (eventos.SSE_MAX_ASSINANTES)
+app.config['SSE_URL'] = os.getenv('SSE_URL', '')
+# Origem do painel quando SSE_URL está em outro host (CORS do /eventos)
+app.config['SSE_CORS_ORIGEM'] = os.getenv('SSE_CORS_ORIGEM', '')
+# Bytecode dos templates em disco: um worker novo carrega o dashboard.html sem recompilar
+fragmentos.configurar_bytecode(app)
+
+# Uma conexão do pool por requisição, devolvida no teardown
+@app.before_request
+def abrir_escopo_banco():
+    database.iniciar_escopo_requisicao()
+
+@app.teardown_request
+def fechar_escopo_banco(exc):
+    database.encerrar_escopo_requisicao(exc)
+
+# Perfil de SQL (PERFILAR_SQL=1): resumo no cabeçalho X-Perfil-SQL e rodapé nas páginas HTML
+if perfilador.ATIVO:
+    @app.before_request
+    def iniciar_perfil_sql():
+        perfilador.iniciar_requisicao(request.method, request.path)
+
+    @app.after_request
+    def anexar_perfil_sql(resposta):
+        resumo = perfilador.finalizar_requisicao()
+        if resumo is None:
+            return resposta
+        resposta.headers['X-Perfil-SQL'] = perfilador.cabecalho(resumo)
+        if resposta.mimetype == 'text/html' and not resposta.is_streamed and not resposta.direct_passthrough:
+            corpo = resposta.get_data(as_text=True)
+            if '</body>' in corpo:
+                rodape = render_template('_perfil_sql.html', perfil=resumo, limite_ms=perfilador.SQL_LENTO_MS)
+                resposta.set_data(corpo.replace('</body>', rodape + '</body>', 1))
+        return resposta
+
+# Métricas: toda chamada a database.* é contada e cronometrada (infraestrutura de conexão fica de fora),
+# inclusive as do repositório quando vêm do backend SQLite
+metricas.instrumentar_modulo(database, ignorar={
+    'get_conn', 'get_pool', 'estatisticas_pool', 'iniciar_escopo_requisicao',
+    'encerrar_escopo_requisicao', 'conexao', 'ensure_tables', 'notificar',
+}, incluir=database.FUNCOES_REPOSITORIO)
+
+def registrar_acesso(status):
+    rota = request.url_rule.rule if request.url_rule else 'sem_rota'
+    medicao = metricas.finalizar_requisicao(rota, request.method, status)
+    if medicao:
+        # Formata aqui, grava em disco na thread do QueueListener
+        metricas.get_logger_acessos().info(
+            "ACESSO: %s %s %s %.1fms (banco: %d chamadas, %.1fms). IP: %s",
+            request.method, request.path, status, medicao['duracao_s'] * 1000,
+            medicao['chamadas_db'], medicao['tempo_db_s'] * 1000, request.remote_addr)
+
+@app.before_request
+def iniciar_metricas():
+    metricas.iniciar_requisicao()
+
+@app.after_request
+def registrar_metricas(resposta):
+    registrar_acesso(resposta.status_code)
+    return resposta
+
+@app.teardown_request
+def registrar_metricas_erro(exc):
+    # Exceção não tratada não passa pelo after_request
+    if exc is not None:
+        registrar_acesso(500)
 
 # locale
 try:
@@ -40,13 +115,6 @@ except locale.Error:
     except locale.Error:
         print("Aviso: Configuração de localidade em Português falhou.")
 
-# ReportLab styles
-PDF_STYLES = getSampleStyleSheet()
-PDF_STYLES.add(ParagraphStyle(name='CustomTitle', fontSize=18, alignment=1, spaceAfter=20, fontName='Helvetica-Bold', textColor=colors.navy))
-PDF_STYLES.add(ParagraphStyle(name='CustomHeading2', fontSize=14, alignment=0, spaceBefore=15, spaceAfter=8, fontName='Helvetica-Bold', textColor=colors.darkblue))
-PDF_STYLES.add(ParagraphStyle(name='CustomNormalSmall', fontSize=10, alignment=0, spaceAfter=5, textColor=colors.black))
-PDF_STYLES.add(ParagraphStyle(name='CustomSummary', fontSize=16, alignment=0, spaceAfter=10, fontName='Helvetica-Bold', textColor=colors.black))
-
 # helpers
 def gerar_disparos_semanais_simulados():
     dias = ['segunda', 'terca', 'quarta', 'quinta', 'sexta', 'sabado', 'domingo']
@@ -88,52 +156,73 @@ class RelatorioForm(FlaskForm):
 
 # Helpers
 def processar_dados_painel():
-    vendedores = database.listar_vendedores()
-for v in vendedores:
-    v['disparos_hoje'] = database.get_disparos_hoje(v['id']) or 0
-    ds = database.get_disparos_semanais(v['id'])
-    v['disparos_semanais'] = ds if ds else {dia: 0 for dia in ['segunda','terca','quarta','quinta','sexta','sabado','domingo']}
-
-    total_disparos = sum(sum(v['disparos_semanais'].values()) for v in vendedores)
-    status_kpis = defaultdict(int)
-    vendedores_por_status = defaultdict(list)
+    kpis = database.get_kpis_painel()
+    status_kpis = kpis['status_kpis']
     bloqueados_hoje = []
-    bases_pendentes_count = 0
-    dia_bloqueio_count = defaultdict(int)
-    for v in vendedores:
-        status_kpis[v.get('status','Desconhecido')] += 1
-        vendedores_por_status[v.get('status','Desconhecido')].append({
-            'nome': v.get('nome'),
-            'loja_nome': None,
-            'ultimo_status_tipo': v.get('ultimo_status_tipo'),
-            'ultimo_status_data': v.get('ultimo_status_data'),
-        })
-        if v.get('status') == 'Bloqueado':
-            try:
-                dia_semana = date.today().strftime('%A')
-                dia_bloqueio_count[dia_semana] += 1
-            except:
-                pass
-        if not v.get('base_tratada', False):
-            bases_pendentes_count += 1
-    dia_mais_bloqueio = max(dia_bloqueio_count, key=dia_bloqueio_count.get, default='N/A')
+    dia_mais_bloqueio = date.today().strftime('%A') if status_kpis.get('Bloqueado') else 'N/A'
 
     return {
-        'total_disparos': total_disparos,
+        'total_disparos': kpis['total_disparos_semana'],
+        'total_disparos_dia': kpis['total_disparos_dia'],
+        'total_disparos_semana': kpis['total_disparos_semana'],
         'status_kpis': status_kpis,
-        'vendedores_por_status': vendedores_por_status,
+        'vendedores_por_status': database.listar_vendedores_por_status(),
         'bloqueados_hoje': bloqueados_hoje,
-        'bases_pendentes_count': bases_pendentes_count,
+        'bases_pendentes_count': kpis['bases_pendentes_count'],
         'dia_mais_bloqueio': dia_mais_bloqueio,
     }
 
+def periodo_filtro_semana(filtro):
+    # Devolve (primeira, última) segunda-feira do período escolhido no filtro do painel
+    semana_atual = date.today() - timedelta(days=date.today().weekday())
+    if filtro == 'semana_anterior':
+        anterior = semana_atual - timedelta(weeks=1)
+        return anterior, anterior
+    if filtro == 'ultimas_4':
+        return semana_atual - timedelta(weeks=3), semana_atual
+    return None
+
 def get_vendedores_by_loja_id(loja_id):
-    vendedores = database.get_vendedores_by_loja(loja_id)
+    vendedores = database.carregar_vendedores_com_disparos(loja_id)
     for v in vendedores:
-        ds = database.get_disparos_semanais(v['id'])
-        v['disparos_semanais'] = ds if ds else gerar_disparos_semanais_simulados()
+        if not v['disparos_semanais']:
+            v['disparos_semanais'] = gerar_disparos_semanais_simulados()
+            v['disparos_simulados'] = True
     return vendedores
 
+def montar_relatorios_todas_lojas(ligacoes_realizadas=None, motor=None):
+    # Uma consulta para todos os vendedores; o documento de cada loja sai daqui, o PDF é feito em paralelo
+    vendedores_por_loja = defaultdict(list)
+    for v in database.carregar_vendedores_com_disparos():
+        if not v['disparos_semanais']:
+            v['disparos_semanais'] = gerar_disparos_semanais_simulados()
+            v['disparos_simulados'] = True
+        vendedores_por_loja[v['loja_id']].append(v)
+    resumos = database.listar_resumo_lojas()
+
+    itens = []
+    for loja in database.listar_lojas():
+        documento = montar_documento_relatorio(loja, vendedores_por_loja.get(loja['id'], []), ligacoes_realizadas, motor,
+                                               resumos.get(loja['id']))
+        nome_arquivo = f"{loja['id']:04d}_{sanitize_filename(nome_arquivo_relatorio(loja))}"
+        itens.append((nome_arquivo, loja['nome'], documento))
+    return itens
+
+def parametros_pagina():
+    apos = request.args.get('apos', type=int)
+    por_pagina = request.args.get('por_pagina', database.PAGINA_TAMANHO, type=int)
+    return apos, max(1, min(por_pagina, database.PAGINA_TAMANHO_MAX))
+
+def filtros_sem_pagina():
+    return {k: v for k, v in request.args.items() if k != 'apos' and v != ''}
+
+def url_proxima_pagina(proximo_id, por_pagina):
+    if proximo_id is None:
+        return None
+    filtros = filtros_sem_pagina()
+    filtros.update(apos=proximo_id, por_pagina=por_pagina)
+    return url_for(request.endpoint, **filtros)
+
 def sanitize_filename(s: str):
     if not s:
         return "file"
@@ -141,35 +230,7 @@ def sanitize_filename(s: str):
     cleaned = "".join(c for c in s if c in allowed)
     return cleaned.replace(" ", "_")
 
-# PDF helpers
-def myPageTemplate(canvas, doc):
-    canvas.saveState()
-    page_width, page_height = A4
-    canvas.setFillColor(colors.black)
-    canvas.rect(0, page_height - 60, page_width, 60, fill=1)
-    canvas.setFont('Helvetica-Bold', 16)
-    canvas.setFillColor(colors.yellow)
-    canvas.drawRightString(page_width - doc.rightMargin - 5, page_height - 35, "SUPER MEGA VENDAS")
-    canvas.setFillColor(colors.yellow)
-    canvas.rect(0, page_height - 65, page_width, 5, fill=1)
-    canvas.setFillColor(colors.lightgrey)
-    canvas.setFont('Helvetica-Bold', 150)
-    canvas.drawCentredString(page_width / 2, page_height / 2 - 50, "SMV")
-    canvas.setFillColor(colors.yellow)
-    canvas.rect(0, 0, page_width, 40, fill=1)
-    address_text = "Manhattan Business Office, Av. Campos Sales, 901. Sala 1008 - Tirol, Natal/RN"
-    canvas.setFont('Helvetica-Bold', 9)
-    canvas.setFillColor(colors.black)
-    canvas.drawString(doc.leftMargin + 20, 15, address_text)
-    canvas.restoreState()
-
-from flask import render_template, send_file, flash
-from xhtml2pdf import pisa
-import io
-import os
-from datetime import date
-
-def gerar_pdf_xhtml2pdf(loja_data, vendedores_loja, ligacoes_realizadas):
+def preparar_dados_relatorio(loja_data, vendedores_loja, ligacoes_realizadas, resumo=None):
     # Garantir que dados existam
     loja_data = loja_data or {'nome':'N/A','responsavel':'N/A'}
     vendedores_loja = vendedores_loja or []
@@ -185,31 +246,52 @@ def gerar_pdf_xhtml2pdf(loja_data, vendedores_loja, ligacoes_realizadas):
         }
         v['status_class'] = status_classes.get(v.get('status','Desconectado'), 'status-disconnected')
 
-    total_convites = sum(sum(v['disparos_semanais'].values()) for v in vendedores_loja)
-    
+    # Total da semana: linha da loja em resumo_lojas, buscada pela rota (mais os simulados, que só existem
+    # no relatório); sem resumo, soma os vendedores recebidos
+    if resumo is None:
+        total_convites = sum(sum(v['disparos_semanais'].values()) for v in vendedores_loja)
+    else:
+        total_convites = resumo['disparos_semana'] + sum(
+            sum(v['disparos_semanais'].values()) for v in vendedores_loja if v.get('disparos_simulados'))
+
+    return {
+        'loja': loja_data,
+        'vendedores_loja': vendedores_loja,
+        'data_hoje': date.today().strftime('%d/%m/%Y'),
+        'total_convites_enviados': total_convites,
+        'ligacoes_realizadas': ligacoes_realizadas,
+    }
+
+def montar_html_relatorio(loja_data, vendedores_loja, ligacoes_realizadas, resumo=None):
     # Renderiza HTML
-    html = render_template(
-        'relatorio_template_html.html',
-        loja=loja_data,
-        vendedores_loja=vendedores_loja,
-        data_hoje=date.today().strftime('%d/%m/%Y'),
-        total_convites_enviados=total_convites,
-        ligacoes_realizadas=ligacoes_realizadas
-    )
+    return render_template('relatorio_template_html.html',
+                           **preparar_dados_relatorio(loja_data, vendedores_loja, ligacoes_realizadas, resumo))
 
-    # Gerar PDF
-    pdf = io.BytesIO()
-    pisa_status = pisa.CreatePDF(io.StringIO(html), dest=pdf)
-    
-    if pisa_status.err:
-        raise Exception("Erro ao gerar PDF")
+def escolher_motor_pdf(motor=None):
+    motor = motor or app.config['PDF_MOTOR']
+    return motor if motor in fila_pdf.MOTORES_PDF else 'xhtml2pdf'
 
-    pdf.seek(0)
+def montar_documento_relatorio(loja_data, vendedores_loja, ligacoes_realizadas, motor=None, resumo=None):
+    # O que vai para o processo de renderização: HTML pronto (xhtml2pdf) ou só os dados (reportlab)
+    motor = escolher_motor_pdf(motor)
+    if motor == 'reportlab':
+        return {'motor': motor, 'dados': preparar_dados_relatorio(loja_data, vendedores_loja, ligacoes_realizadas, resumo)}
+    return {'motor': motor, 'html': montar_html_relatorio(loja_data, vendedores_loja, ligacoes_realizadas, resumo)}
+
+def nome_arquivo_relatorio(loja_data):
+    return f"Relatorio_{(loja_data or {}).get('nome','loja')}_{date.today().strftime('%Y%m%d')}.pdf"
+
+def gerar_pdf_xhtml2pdf(loja_data, vendedores_loja, ligacoes_realizadas, resumo=None):
+    loja_data = loja_data or {'nome':'N/A','responsavel':'N/A'}
+    html = montar_html_relatorio(loja_data, vendedores_loja, ligacoes_realizadas, resumo)
+
+    # Gerar PDF
+    pdf = io.BytesIO(fila_pdf.html_para_pdf(html))
 
     # Criar pasta para salvar PDF
     folder_base = os.path.join('static', 'pdfs', loja_data.get('nome','loja'))
     os.makedirs(folder_base, exist_ok=True)
-    filename = f"Relatorio_{loja_data.get('nome','loja')}_{date.today().strftime('%Y%m%d')}.pdf"
+    filename = nome_arquivo_relatorio(loja_data)
     disk_path = os.path.join(folder_base, filename)
     
     with open(disk_path, 'wb') as f:
@@ -227,12 +309,24 @@ def index():
 
 @app.route('/painel')
 def painel():
-    dados_painel = processar_dados_painel()
+    semana = request.args.get('semana')
+
+    def carregar_cards():
+        dados_painel = processar_dados_painel()
+
+        # 🔵 CORREÇÃO: cálculo TOTAL DE DISPAROS (soma de disparos_dia, já agregada no banco)
+        dados_painel['total_disparos'] = dados_painel['total_disparos_dia']
 
-    # 🔵 CORREÇÃO: cálculo TOTAL DE DISPAROS
-    vendedores_temp = database.listar_vendedores()
-    total_disparos = sum(v.get('disparos_dia') or 0 for v in vendedores_temp)
-    dados_painel['total_disparos'] = total_disparos
+        # Filtro de semana: soma dos resumos semanais do histórico
+        periodo = periodo_filtro_semana(semana)
+        if periodo:
+            dados_painel['total_disparos'] = database.get_total_disparos_periodo(*periodo)
+        dados_painel['eventos'] = []
+        return dados_painel
+
+    # Sem escrita desde a última visita, os cards saem prontos (sem as consultas de KPI)
+    cards_status = fragmentos.renderizar('_cards_status.html',
+                                         (database.get_versao_dados(), semana, date.today()), carregar_cards)
 
     vendedor_form = VendedorForm()
     lojas = database.listar_lojas()
@@ -240,23 +334,10 @@ def painel():
     loja_form = LojaForm()
     loja_edit_form = LojaEditForm()
     relatorio_form = RelatorioForm()
-    vendedores = database.listar_vendedores()
-vendedores = database.listar_vendedores()
-for v in vendedores:
-    v['disparos_hoje'] = database.get_disparos_hoje(v['id']) or 0
-    ds = database.get_disparos_semanais(v['id'])
-    v['disparos_semanais'] = ds if ds else {
-        dia: 0 for dia in ['segunda', 'terca', 'quarta', 'quinta', 'sexta', 'sabado', 'domingo']
-    }
-
-    v['disparos_hoje'] = database.get_disparos_hoje(v['id']) or 0
-    eventos_raw = []
     return render_template('dashboard.html',
                            pagina='painel',
                            today_date=date.today(),
-                           db_vendedores=vendedores,
-                           eventos=eventos_raw,
-                           **dados_painel,
+                           cards_status=cards_status,
                            vendedor_form=vendedor_form,
                            loja_form=loja_form,
                            loja_edit_form=loja_edit_form,
@@ -323,13 +404,31 @@ def vendedores():
         flash(f'Vendedor {novo_vendedor["nome"]} adicionado com sucesso!', 'success')
         return redirect(url_for('vendedores'))
 
-    # Usa a nova função que inclui os disparos semanais
-    vendedores = database.listar_vendedores_com_disparos()
+    # Filtros e paginação por chave feitos no banco
+    loja_id_filtro = request.args.get('loja_id', type=int)
+    status_filtro = request.args.get('status') or None
+    apos, por_pagina = parametros_pagina()
+
+    def carregar_tabela():
+        pagina_atual = database.listar_vendedores_pagina(loja_id_filtro, status_filtro, apos, por_pagina)
+        return {
+            'vendedores': pagina_atual['itens'],
+            'total_registros': database.contar_vendedores(loja_id_filtro, status_filtro),
+            'proxima_pagina_url': url_proxima_pagina(pagina_atual['proximo_id'], por_pagina),
+            'primeira_pagina_url': url_for('vendedores', **filtros_sem_pagina()) if apos is not None else None,
+        }
+
+    # A semana dos disparos muda com o dia, por isso a data entra na chave
+    tabela_vendedores = fragmentos.renderizar(
+        '_tabela_vendedores.html',
+        (database.get_versao_dados(), date.today(), tuple(sorted(request.args.items()))), carregar_tabela)
 
     return render_template(
         'dashboard.html',
         pagina='vendedores',
-        vendedores=vendedores,
+        tabela_vendedores=tabela_vendedores,
+        lojas_raw=lojas,
+        loja_id_filtro_ativo=loja_id_filtro,
         vendedor_form=vendedor_form,
         loja_form=LojaForm(),
         loja_edit_form=LojaEditForm(),
@@ -345,6 +444,69 @@ def mudar_status_vendedor(vendedor_id, novo_status):
         flash("Erro ao alterar status")
     return redirect(url_for('vendedores'))
 
+@app.route('/vendedores/status', methods=['POST'])
+def mudar_status_em_lote():
+    # Corpo JSON: {"alteracoes": [{"vendedor_id": 1, "status": "Bloqueado"}, ...]}
+    #         ou: {"filtro": {"loja_id": 3, "status": "Conectado"}, "novo_status": "Bloqueado"}
+    dados = request.get_json(silent=True) or {}
+    if not isinstance(dados, dict):
+        return jsonify({'erro': 'O corpo precisa ser um objeto JSON.'}), 400
+
+    if 'filtro' in dados:
+        filtro = dados.get('filtro') or {}
+        if not isinstance(filtro, dict):
+            return jsonify({'erro': '"filtro" precisa ser um objeto (loja_id e/ou status).'}), 400
+        novo_status = dados.get('novo_status')
+        if novo_status not in database.STATUS_VENDEDOR:
+            return jsonify({'erro': f'Status inválido: {novo_status}'}), 400
+        loja_id = filtro.get('loja_id')
+        if loja_id is not None:
+            try:
+                loja_id = int(loja_id)
+            except (TypeError, ValueError):
+                return jsonify({'erro': f'loja_id inválido: {loja_id}'}), 400
+        status_atual = filtro.get('status')
+        if status_atual is not None and not isinstance(status_atual, str):
+            return jsonify({'erro': f'status do filtro inválido: {status_atual}'}), 400
+        try:
+            ids = database.atualizar_status_por_filtro(novo_status, loja_id, status_atual)
+        except ValueError as e:
+            return jsonify({'erro': str(e)}), 400
+        return jsonify({
+            'atualizados': len(ids),
+            'resultados': [{'vendedor_id': i, 'status': novo_status, 'resultado': 'atualizado'} for i in ids],
+        })
+
+    alteracoes = dados.get('alteracoes')
+    if not isinstance(alteracoes, list) or not alteracoes:
+        return jsonify({'erro': 'Envie "alteracoes" (lista de vendedor_id/status) ou "filtro" + "novo_status".'}), 400
+
+    resultados = {}
+    validas = {}
+    for item in alteracoes:
+        item = item if isinstance(item, dict) else {}
+        try:
+            vendedor_id = int(item.get('vendedor_id'))
+        except (TypeError, ValueError):
+            return jsonify({'erro': f'vendedor_id inválido: {item.get("vendedor_id")}'}), 400
+        status = item.get('status')
+        if status not in database.STATUS_VENDEDOR:
+            resultados[vendedor_id] = {'vendedor_id': vendedor_id, 'status': status, 'resultado': 'status_invalido'}
+            validas.pop(vendedor_id, None)
+            continue
+        # id repetido: vale o último
+        validas[vendedor_id] = status
+
+    atualizados = database.atualizar_status_em_lote(list(validas.items()))
+    for vendedor_id, status in validas.items():
+        resultados[vendedor_id] = {
+            'vendedor_id': vendedor_id,
+            'status': status,
+            'resultado': 'atualizado' if vendedor_id in atualizados else 'nao_encontrado',
+        }
+
+    return jsonify({'atualizados': len(atualizados), 'resultados': list(resultados.values())})
+
 # Apagar um vendedor
 @app.route('/deletar_vendedor/<int:vendedor_id>', methods=['POST'])
 def deletar_vendedor(vendedor_id):
@@ -369,6 +531,117 @@ def editar_disparos_dia():
 
     return redirect(url_for("vendedores"))
 
+# Para os disparadores automáticos: soma ao disparos_dia em vez de sobrescrever (duas origens não se perdem).
+# Com o buffer ligado responde 202 e grava junto com os demais na próxima descarga; ?sincrono=1 grava na hora.
+@app.route('/api/disparos/incrementar', methods=['POST'])
+def api_incrementar_disparos():
+    try:
+        pares = incrementos.ler_incrementos(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
+
+    try:
+        totais = incrementos.incrementar(pares, direto=request.args.get('sincrono') == '1')
+    except incrementos.BufferCheio as e:
+        return jsonify({'erro': str(e)}), 503, {'Retry-After': '1'}
+    if totais is None:
+        return jsonify({'aceitos': len(pares), 'modo': 'buffer'}), 202
+    return jsonify({
+        'aceitos': len(pares),
+        'modo': 'direto',
+        'disparos_hoje': {str(vendedor_id): total for vendedor_id, total in totais.items()},
+        'nao_encontrados': sorted(set(incrementos.juntar(pares)) - set(totais)),
+    })
+
+@app.route('/importar_disparos', methods=['POST'])
+def importar_disparos():
+    arquivo = request.files.get('arquivo')
+    if not arquivo or not arquivo.filename:
+        return jsonify({'erro': 'Envie o CSV no campo "arquivo".'}), 400
+
+    try:
+        resultado = importacao.importar_disparos_csv(io.TextIOWrapper(arquivo.stream, encoding='utf-8-sig', newline=''))
+    except importacao.ErroImportacao as e:
+        return jsonify({'erro': str(e)}), 400
+    except UnicodeDecodeError:
+        return jsonify({'erro': 'O arquivo precisa estar em UTF-8.'}), 400
+    except psycopg2.OperationalError as e:
+        metricas.get_logger_app().error("Erro de conexão na importação de disparos: %s", e)
+        return jsonify({'erro': 'Banco indisponível; tente de novo.'}), 503, {'Retry-After': '5'}
+    except psycopg2.Error as e:
+        # O lote é uma transação só: nada foi gravado
+        return jsonify({'erro': f"O banco recusou o arquivo; nada foi importado ({e.pgerror or e})."}), 422
+
+    return jsonify(resultado)
+
+@app.cli.command('importar-disparos')
+@click.argument('arquivo', type=click.Path(exists=True, dir_okay=False))
+def importar_disparos_cli(arquivo):
+    """Importa disparos diários/semanais de um CSV (vendedor_id, disparos_dia, segunda ... domingo)."""
+    with open(arquivo, encoding='utf-8-sig', newline='') as f:
+        try:
+            resultado = importacao.importar_disparos_csv(f)
+        except (importacao.ErroImportacao, psycopg2.Error) as e:
+            raise click.ClickException(str(e))
+
+    for erro in resultado['erros']:
+        click.echo(f"  linha {erro['linha']}: {erro['erro']}", err=True)
+    click.echo(f"{resultado['importadas']} de {resultado['linhas']} linhas importadas "
+               f"({resultado['vendedores_atualizados']} vendedores, {resultado['total_erros']} erros) "
+               f"em {resultado['tempo_s']:.3f}s")
+
+# ---------------------- EXPORTAÇÃO ----------------------
+# Planilha completa (vendedores com a semana, ou o histórico diário de disparos) em CSV ou XLSX, enviada
+# enquanto é lida do banco. Filtros na query string: loja_id, status e, para disparos, inicio/fim (AAAA-MM-DD).
+@app.route('/exportar/<tipo>.<formato>')
+def exportar(tipo, formato):
+    if tipo not in exportacao.TIPOS or formato not in exportacao.FORMATOS:
+        return jsonify({'erro': f"Use /exportar/<{'|'.join(exportacao.TIPOS)}>.<{'|'.join(exportacao.FORMATOS)}>."}), 404
+    try:
+        filtros = exportacao.ler_filtros(tipo, request.args)
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
+
+    try:
+        corpo = exportacao.Exportacao(tipo, formato, **filtros)
+    except exportacao.ExportacoesOcupadas as e:
+        return jsonify({'erro': str(e)}), 503, {'Retry-After': '30'}
+
+    # Sem stream_with_context: o gerador roda depois do fim da requisição e pega a própria conexão do pool
+    return app.response_class(
+        corpo,
+        mimetype=exportacao.FORMATOS[formato],
+        headers={
+            'Content-Disposition': f'attachment; filename="{exportacao.nome_arquivo(tipo, formato, **filtros)}"',
+            'Cache-Control': 'no-store',
+            'X-Accel-Buffering': 'no',
+        },
+    )
+
+@app.cli.command('exportar')
+@click.argument('tipo', type=click.Choice(exportacao.TIPOS))
+@click.argument('saida', type=click.Path(dir_okay=False))
+@click.option('--formato', type=click.Choice(list(exportacao.FORMATOS)), default=None,
+              help='Padrão: pela extensão da saída.')
+@click.option('--loja-id', type=int)
+@click.option('--status')
+@click.option('--inicio', help='AAAA-MM-DD (só disparos).')
+@click.option('--fim', help='AAAA-MM-DD (só disparos).')
+def exportar_cli(tipo, saida, formato, loja_id, status, inicio, fim):
+    """Exporta vendedores ou o histórico de disparos para um arquivo CSV ou XLSX."""
+    formato = formato or ('xlsx' if saida.lower().endswith('.xlsx') else 'csv')
+    try:
+        filtros = exportacao.ler_filtros(tipo, {'loja_id': loja_id, 'status': status, 'inicio': inicio, 'fim': fim})
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    inicio_s = time.perf_counter()
+    tamanho = 0
+    with open(saida, 'wb') as f:
+        for pedaco in exportacao.gerar(tipo, formato, **filtros):
+            f.write(pedaco)
+            tamanho += len(pedaco)
+    click.echo(f"{saida}: {tamanho / 1024 / 1024:.1f} MB em {time.perf_counter() - inicio_s:.2f}s")
+
 # ---------------------- ROTAS DE LOJAS ----------------------
 @app.route('/lojas', methods=['GET','POST'])
 def lojas():
@@ -390,14 +663,26 @@ def lojas():
         database.insert_vendedor(novo_vendedor)
         flash(f"Loja '{nova_loja['nome']}' e Gestor cadastrados com sucesso!", 'success')
         return redirect(url_for('lojas'))
-    lojas_com_vendedores = []
-    for loja in database.listar_lojas():
-        loja_copy = loja.copy()
-        loja_copy['vendedores'] = database.get_vendedores_by_loja(loja['id'])
-        lojas_com_vendedores.append(loja_copy)
+    # Filtro por responsável e paginação por chave; a contagem de vendedores vem da própria consulta
+    responsavel_filtro = request.args.get('responsavel') or None
+    apos, por_pagina = parametros_pagina()
+
+    def carregar_tabela():
+        pagina_atual = database.listar_lojas_pagina(responsavel_filtro, apos, por_pagina)
+        return {
+            'lojas': pagina_atual['itens'],
+            'total_registros': database.contar_lojas(responsavel_filtro),
+            'proxima_pagina_url': url_proxima_pagina(pagina_atual['proximo_id'], por_pagina),
+            'primeira_pagina_url': url_for('lojas', **filtros_sem_pagina()) if apos is not None else None,
+        }
+
+    # Responsável e lojas novas mudam a versão 'lojas'; contagem de vendedores e nome mudam a 'dados'
+    versoes = (database.get_versao_dados(), database.get_versao_cache('lojas'))
+    tabela_lojas = fragmentos.renderizar('_tabela_lojas.html',
+                                         versoes + (tuple(sorted(request.args.items())),), carregar_tabela)
     return render_template('dashboard.html',
                            pagina='lojas',
-                           lojas=lojas_com_vendedores,
+                           tabela_lojas=tabela_lojas,
                            vendedor_form=VendedorForm(),
                            loja_form=loja_form,
                            loja_edit_form=loja_edit_form,
@@ -429,17 +714,27 @@ def gerar_relatorio_pdf():
         {'nome': 'Vendedor 2', 'disparos_semanais': {1:8, 2:9}, 'disparos_dia': 4, 'status':'Blocked', 'base_tratada': False},
     ]
 
+    dados = {
+        'loja': loja,
+        'data_hoje': data_hoje,
+        'total_convites_enviados': total_convites_enviados,
+        'ligacoes_realizadas': ligacoes_realizadas,
+        'vendedores_loja': vendedores_loja,
+    }
+
+    if escolher_motor_pdf(request.args.get('motor')) == 'reportlab':
+        with metricas.medir_pdf('reportlab', 'sincrono'):
+            pdf = BytesIO(fila_pdf.renderizar_documento({'motor': 'reportlab', 'dados': dados}))
+        return send_file(pdf, as_attachment=True, download_name="relatorio.pdf", mimetype='application/pdf')
+
     # Renderiza HTML do template
-    html = render_template('relatorio_template_html.html',
-                           loja=loja,
-                           data_hoje=data_hoje,
-                           total_convites_enviados=total_convites_enviados,
-                           ligacoes_realizadas=ligacoes_realizadas,
-                           vendedores_loja=vendedores_loja)
+    html = render_template('relatorio_template_html.html', **dados)
 
     # PDF em memória
+    from xhtml2pdf import pisa
     pdf = BytesIO()
-    pisa_status = pisa.CreatePDF(html, dest=pdf)
+    with metricas.medir_pdf('xhtml2pdf', 'sincrono'):
+        pisa_status = pisa.CreatePDF(html, dest=pdf)
 
     if pisa_status.err:
         return "Erro ao gerar PDF", 500
@@ -447,5 +742,349 @@ def gerar_relatorio_pdf():
     pdf.seek(0)
     return send_file(pdf, as_attachment=True, download_name="relatorio.pdf", mimetype='application/pdf')
 
+# ---------------------- RELATÓRIOS ASSÍNCRONOS ----------------------
+@app.route('/relatorios/jobs', methods=['POST'])
+def enfileirar_relatorio():
+    form = RelatorioForm()
+    if not form.validate_on_submit():
+        return jsonify({'erro': 'Dados inválidos.', 'campos': form.errors}), 400
+
+    loja = database.get_loja_by_id(form.loja_id_relatorio.data)
+    if not loja:
+        return jsonify({'erro': 'Loja não encontrada.'}), 404
+
+    # O HTML/dados saem daqui; a renderização (pesada) roda no pool de processos
+    documento = montar_documento_relatorio(loja, get_vendedores_by_loja_id(loja['id']),
+                                           form.ligacoes_realizadas.data, request.values.get('motor'),
+                                           database.get_resumo_loja(loja['id']))
+    try:
+        job = fila_pdf.get_fila().enfileirar(documento, nome_arquivo_relatorio(loja), loja=loja['nome'])
+    except fila_pdf.FilaCheia as e:
+        return jsonify({'erro': str(e)}), 503, {'Retry-After': '5'}
+
+    return jsonify({
+        'id': job['id'],
+        'status': job['status'],
+        'status_url': url_for('status_relatorio', job_id=job['id']),
+        'download_url': url_for('baixar_relatorio', job_id=job['id']),
+    }), 202
+
+@app.route('/relatorios/jobs/<job_id>')
+def status_relatorio(job_id):
+    job = fila_pdf.get_job(job_id)
+    if not job:
+        return jsonify({'erro': 'Job não encontrado (ou expirado).'}), 404
+    return jsonify(job)
+
+@app.route('/relatorios/jobs/<job_id>/download')
+def baixar_relatorio(job_id):
+    job = fila_pdf.get_job(job_id)
+    if not job:
+        return jsonify({'erro': 'Job não encontrado (ou expirado).'}), 404
+    caminho = fila_pdf.caminho_pdf(job_id)
+    if not caminho:
+        return jsonify({'erro': 'Relatório ainda não está pronto.', 'status': job['status']}), 409
+    return send_file(os.path.abspath(caminho), as_attachment=True,
+                     download_name=job['nome_arquivo'], mimetype='application/pdf')
+
+
+@app.route('/relatorios/lote')
+def relatorios_lote_zip():
+    itens = montar_relatorios_todas_lojas(request.args.get('ligacoes_realizadas'), request.args.get('motor'))
+
+    def registrar_tempos(resumo):
+        metricas.get_logger_app().info("Lote de relatórios: %d lojas em %ss", len(resumo['lojas']), resumo['total_s'])
+
+    nome = f"Relatorios_{date.today().strftime('%Y%m%d')}.zip"
+    return app.response_class(
+        relatorios_lote.zip_em_stream(itens, ao_concluir=registrar_tempos),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename="{nome}"'},
+    )
+
+@app.cli.command('gerar-relatorios')
+@click.option('--saida', default=None, help='Arquivo ZIP de saída (padrão: Relatorios_AAAAMMDD.zip).')
+@click.option('--workers', default=relatorios_lote.PDF_LOTE_WORKERS, show_default=True, help='Processos de renderização.')
+@click.option('--ligacoes', default=None, help='Relato manual incluído em todos os relatórios.')
+@click.option('--motor', type=click.Choice(fila_pdf.MOTORES_PDF), default=None, help='Motor de PDF (padrão: PDF_MOTOR).')
+def gerar_relatorios_cli(saida, workers, ligacoes, motor):
+    """Gera os relatórios de todas as lojas em um ZIP."""
+    saida = saida or f"Relatorios_{date.today().strftime('%Y%m%d')}.zip"
+    with app.test_request_context():
+        itens = montar_relatorios_todas_lojas(ligacoes, motor)
+
+    def mostrar_tempos(resumo):
+        for l in sorted(resumo['lojas'], key=lambda l: l['loja'] or ''):
+            situacao = f"ERRO: {l['erro']}" if l['erro'] else f"{l['tamanho_bytes']} bytes"
+            click.echo(f"  {l['loja']}: {l['render_s']:.3f}s ({situacao})")
+        click.echo(f"Total: {len(resumo['lojas'])} lojas em {resumo['total_s']:.3f}s com {workers} processos -> {saida}")
+
+    with open(saida, 'wb') as f:
+        for parte in relatorios_lote.zip_em_stream(itens, workers=workers, ao_concluir=mostrar_tempos):
+            f.write(parte)
+
+
+# ---------------------- API JSON ----------------------
+# Respostas compactas para atualizar o painel sem re-renderizar o HTML.
+# ETag = versão dos dados (muda a cada escrita); If-None-Match igual devolve 304 sem consultar nada além da versão.
+_cache_api_painel = cache.registrar(cache.CacheTTL('api_painel', maximo=8))
+
+def vendedor_json(v):
+    semana = v['disparos_semanais'] or {}
+    return {
+        'id': v['id'],
+        'nome': v['nome'],
+        'loja_id': v['loja_id'],
+        'loja_nome': v['loja_nome'],
+        'status': v['status'],
+        'base_tratada': bool(v['base_tratada']),
+        'disparos_hoje': v['disparos_hoje'],
+        'disparos_semana': v['disparos_semana'],
+        'semana': [semana.get(dia, 0) for dia in database.DIAS_SEMANA],
+        'ultimo_status_data': v['ultimo_status_data'],
+        'versao': v['versao'],
+    }
+
+def resposta_condicional(etag, montar):
+    # If-None-Match compara na forma fraca (RFC 7232): proxy que comprime a resposta devolve W/"..." ao cliente
+    if request.if_none_match.contains_weak(etag):
+        resposta = app.response_class(status=304)
+    else:
+        resposta = jsonify(montar())
+    resposta.set_etag(etag)
+    resposta.headers['Cache-Control'] = 'no-cache'
+    return resposta
+
+@app.route('/api/painel')
+def api_painel():
+    versao = database.get_versao_dados()
+    semana = request.args.get('semana')
+
+    def montar():
+        def carregar():
+            dados = database.get_kpis_painel()
+            dados['vendedores_por_status'] = database.listar_vendedores_por_status()
+            periodo = periodo_filtro_semana(semana)
+            if periodo:
+                dados['total_disparos_periodo'] = database.get_total_disparos_periodo(*periodo)
+            return dados
+        # Vários gerentes com o painel aberto: a mesma versão é montada uma vez por processo
+        dados = _cache_api_painel.obter((versao, semana, date.today()), carregar)
+        return dict(dados, versao=versao)
+
+    return resposta_condicional(f'painel-{versao}', montar)
+
+@app.route('/api/vendedores')
+def api_vendedores():
+    # ?since=<versao>: só o que mudou depois dessa versão (alterados + ids removidos), sem filtros nem paginação
+    # sem since: uma página filtrada (loja_id, status, apos, por_pagina), igual a /vendedores
+    versao = database.get_versao_dados()
+    since = request.args.get('since', type=int)
+    loja_id = request.args.get('loja_id', type=int)
+    status = request.args.get('status') or None
+    if status is not None and status not in database.STATUS_VENDEDOR:
+        return jsonify({'erro': f'Status inválido: {status}'}), 400
+    apos, por_pagina = parametros_pagina()
+
+    def montar():
+        if since is not None:
+            alterados, removidos = [], []
+            if since < versao:
+                alterados = database.carregar_vendedores_com_disparos(versao_entre=(since, versao))
+                removidos = database.listar_vendedores_removidos(since, versao)
+            return {
+                'versao': versao,
+                'desde': since,
+                'alterados': [vendedor_json(v) for v in alterados],
+                'removidos': removidos,
+            }
+        pagina_atual = database.listar_vendedores_pagina(loja_id, status, apos, por_pagina)
+        return {
+            'versao': versao,
+            'itens': [vendedor_json(v) for v in pagina_atual['itens']],
+            'proximo_id': pagina_atual['proximo_id'],
+            'total': database.contar_vendedores(loja_id, status),
+        }
+
+    return resposta_condicional(f'vendedores-{versao}', montar)
+
+
+# ---------------------- EVENTOS AO VIVO (SSE) ----------------------
+@app.route('/eventos')
+def eventos_sse():
+    # Não usa o banco: todos os navegadores do worker compartilham a conexão LISTEN do ouvinte
+    try:
+        assinatura = eventos.get_ouvinte().assinar()
+    except eventos.LimiteAssinantes as e:
+        return jsonify({'erro': str(e)}), 503, {'Retry-After': '30'}
+    cabecalhos = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    if app.config['SSE_CORS_ORIGEM']:
+        cabecalhos['Access-Control-Allow-Origin'] = app.config['SSE_CORS_ORIGEM']
+    return app.response_class(eventos.fluxo_sse(assinatura), mimetype='text/event-stream', headers=cabecalhos)
+
+
+# ---------------------- MONITORAMENTO ----------------------
+@app.route('/pool_stats')
+def pool_stats():
+    return jsonify(database.estatisticas_pool())
+
+@app.route('/cache_stats')
+def cache_stats():
+    return jsonify(cache.estatisticas())
+
+@app.route('/pdf_stats')
+def pdf_stats():
+    return jsonify(fila_pdf.get_fila().estatisticas())
+
+@app.route('/eventos_stats')
+def eventos_stats():
+    return jsonify(eventos.get_ouvinte().estatisticas())
+
+@app.route('/incrementos_stats')
+def incrementos_stats():
+    return jsonify(incrementos.get_buffer().estatisticas())
+
+# Estado do pool, da fila de PDFs, dos caches, do SSE e do buffer de incrementos lido na hora da coleta
+metricas.registrar(metricas.Medidor(
+    'gestao_db_pool_conexoes', 'Conexões do pool por estado.', ('estado',),
+    lambda: [((k,), v) for k, v in database.estatisticas_pool().items() if k in ('em_uso', 'livres', 'total')]))
+metricas.registrar(metricas.Medidor(
+    'gestao_pdf_fila_pendentes', 'Jobs de PDF pendentes neste worker.', (),
+    lambda: [((), fila_pdf.get_fila().estatisticas()['pendentes'])]))
+metricas.registrar(metricas.Medidor(
+    'gestao_cache_itens', 'Itens em cada cache em processo.', ('cache',),
+    lambda: [((nome,), e['itens']) for nome, e in cache.estatisticas().items()]))
+metricas.registrar(metricas.Medidor(
+    'gestao_sse_assinantes', 'Navegadores conectados em /eventos neste worker.', (),
+    lambda: [((), eventos.get_ouvinte().estatisticas()['assinantes'])]))
+metricas.registrar(metricas.Medidor(
+    'gestao_incrementos_pendentes', 'Incrementos de disparos no buffer deste worker, ainda não gravados.', (),
+    lambda: [((), incrementos.get_buffer().estatisticas()['pendentes_eventos'])]))
+metricas.registrar(metricas.Medidor(
+    'gestao_exportacoes_em_andamento', 'Downloads de /exportar em andamento neste worker.', (),
+    lambda: [((), exportacao.em_andamento())]))
+
+@app.route('/metrics')
+def metrics():
+    return app.response_class(metricas.exportar(), mimetype='text/plain; version=0.0.4')
+
+# ---------------------- LOG DE ACESSOS ----------------------
+@app.cli.command('analisar-acessos')
+@click.argument('arquivos', nargs=-1, type=click.Path(dir_okay=False))
+@click.option('--incremental', is_flag=True, help='Só os bytes novos desde a última rodada (segue rotação e .gz).')
+@click.option('--estado', default=analise_acessos.LOG_ANALISE_ESTADO, show_default=True, help='Arquivo do modo incremental.')
+@click.option('--acumulado', is_flag=True, help='Com --incremental: mostra os totais de todas as rodadas.')
+@click.option('--top', default=20, show_default=True, help='Páginas e IPs listados.')
+@click.option('--json', 'como_json', is_flag=True)
+def analisar_acessos_cli(arquivos, incremental, estado, acumulado, top, como_json):
+    """Acessos por página, por IP e por hora no acessos.log (aceita também arquivos rotacionados e .gz)."""
+    arquivos = arquivos or (metricas.LOG_ARQUIVO,)
+    inicio = time.perf_counter()
+    if incremental:
+        if len(arquivos) != 1:
+            raise click.ClickException("--incremental acompanha um arquivo só (o log atual).")
+        novos, total = analise_acessos.analisar_incremental(arquivos[0], estado)
+        agregado = total if acumulado else novos
+    else:
+        faltando = [a for a in arquivos if not os.path.exists(a)]
+        if faltando:
+            raise click.ClickException(f"Arquivo não encontrado: {', '.join(faltando)}")
+        agregado = analise_acessos.analisar(arquivos)
+    decorrido = time.perf_counter() - inicio
+
+    if como_json:
+        click.echo(json.dumps(agregado.para_dict(), ensure_ascii=False, indent=2))
+        return
+
+    click.echo(f"{agregado.acessos} acessos em {agregado.linhas} linhas ({agregado.bytes / 1e6:.1f} MB, "
+               f"{agregado.ignoradas} ignoradas, {agregado.cp1252} em cp1252) em {decorrido:.2f}s")
+    click.echo("\nPáginas:")
+    for pagina, n in agregado.paginas.most_common(top):
+        medio = agregado.ms_medio(pagina)
+        click.echo(f"  {n:>9}  {pagina}" + (f"  ({medio} ms em média)" if medio is not None else ''))
+    click.echo("\nIPs:")
+    for ip, n in agregado.ips.most_common(top):
+        click.echo(f"  {n:>9}  {ip}")
+    click.echo("\nPor hora:")
+    for hora, n in sorted(agregado.horas.items())[-48:]:
+        click.echo(f"  {hora}h  {n:>9}")
+    if agregado.status:
+        click.echo("\nStatus: " + ', '.join(f"{s}={n}" for s, n in sorted(agregado.status.items())))
+
+# ---------------------- FECHAMENTO DO DIA ----------------------
+@app.cli.command('fechar-dia')
+@click.option('--dia', type=click.DateTime(formats=['%Y-%m-%d']), default=None, help='Dia fechado (padrão: ontem).')
+@click.option('--agendar', is_flag=True, help='Fica rodando e fecha o dia anterior todo dia em FECHAMENTO_HORARIO.')
+def fechar_dia_cli(dia, agendar):
+    """Move o disparos_dia de cada vendedor para a coluna do dia da semana e zera o dia (idempotente)."""
+    if agendar:
+        if dia:
+            raise click.UsageError("--dia e --agendar não combinam.")
+        fechamento.agendar(registrar=click.echo)
+        return
+    fechamento.fechar(dia.date() if dia else None, registrar=click.echo)
+
+# ---------------------- RESUMO POR LOJA ----------------------
+@app.cli.command('verificar-resumo')
+@click.option('--sem-corrigir', is_flag=True, help='Só compara; não reconstrói resumo_lojas.')
+def verificar_resumo_cli(sem_corrigir):
+    """Recalcula o resumo por loja a partir dos vendedores, mostra as divergências e reconstrói a tabela."""
+    try:
+        resultado = database.verificar_resumo_lojas(corrigir=not sem_corrigir)
+    except NotImplementedError as e:
+        raise click.ClickException(str(e))
+    for d in resultado['divergencias']:
+        onde = {database.RESUMO_TOTAL: 'total geral', database.RESUMO_SEM_LOJA: 'sem loja'}.get(d['chave'], f"loja {d['chave']}")
+        click.echo(f"  {onde}: {d['coluna']} armazenado {d['armazenado']}, calculado {d['calculado']}")
+    situacao = 'reconstruído' if resultado['corrigido'] else 'não alterado'
+    click.echo(f"{len(resultado['divergencias'])} divergência(s) em {resultado['linhas']} linhas; "
+               f"resumo {situacao} ({resultado['tempo_s']:.3f}s)")
+    if resultado['divergencias'] and sem_corrigir:
+        sys.exit(1)
+
+# ---------------------- TEMPLATES ----------------------
+@app.cli.command('compilar-templates')
+def compilar_templates_cli():
+    """Compila todos os templates e grava o bytecode (rodar no build, antes de subir os workers)."""
+    if app.jinja_env.bytecode_cache is None:
+        raise click.ClickException("Cache de bytecode desligado (JINJA_CACHE_DIR vazio ou pasta sem escrita).")
+    nomes, tempo_s = fragmentos.precompilar(app)
+    click.echo(f"{len(nomes)} template(s) compilado(s) em {tempo_s:.3f}s -> {fragmentos.JINJA_CACHE_DIR}")
+
+# ---------------------- SCHEMA ----------------------
+@app.cli.command('migrar')
+@click.option('--status', is_flag=True, help='Só lista as migrações pendentes.')
+def migrar_cli(status):
+    """Aplica as migrações de schema pendentes (uma vez por deploy)."""
+    if status:
+        pendentes = migracoes.pendentes()
+        for versao, descricao in pendentes:
+            click.echo(f"  pendente {versao:03d}: {descricao}")
+        click.echo(f"{len(pendentes)} migração(ões) pendente(s).")
+        return
+
+    aplicadas = migracoes.aplicar_migracoes(ao_aplicar=lambda v, d: click.echo(f"  aplicada {v:03d}: {d}"))
+    click.echo(f"Schema atualizado ({len(aplicadas)} migração(ões) aplicada(s)).")
+
+# ---------------------- INICIALIZAÇÃO (gunicorn) ----------------------
+# Importar este módulo não abre conexão nem roda DDL (o schema é do `flask migrar`, na fase release do Procfile).
+# Pool, fila de PDF, ouvinte de eventos e log de acessos nascem no primeiro uso e checam o pid: são do worker.
+PRECARREGAR_PDF = os.getenv("PRECARREGAR_PDF", "1") == "1"
+_app_pronto = False
+
+def criar_app():
+    """Ponto de entrada do gunicorn: gunicorn 'app:criar_app()' --preload."""
+    # Com --preload roda uma vez, no processo pai: os templates compilados e os motores de PDF ficam na
+    # memória que os workers herdam no fork, e um worker novo (ou reiniciado) atende sem pagar esse custo
+    global _app_pronto
+    if not _app_pronto:
+        fragmentos.precompilar(app)
+        metricas.limpar_processos_mortos()
+        if PRECARREGAR_PDF:
+            fila_pdf.carregar_motores_pdf()
+        _app_pronto = True
+    return app
+
 if __name__ == "__main__":
+    database.ensure_tables()
     app.run(debug=True)
\ No newline at end of file
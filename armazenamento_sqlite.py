@@ -0,0 +1,998 @@
+# armazenamento_sqlite.py
+# Backend embutido (DB_BACKEND=sqlite): as mesmas funções de database.py sobre um arquivo SQLite em modo WAL,
+# para a instalação de uma loja só rodar sem servidor Postgres e sem ida à rede a cada consulta.
+# O SQLite serializa as escritas; leitores não bloqueiam (WAL). Sem LISTEN/NOTIFY, os eventos ao vivo vão direto
+# para os navegadores do próprio processo: rode um worker só (gunicorn -w 1 com threads).
+import os
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+import database
+import perfilador
+
+SQLITE_CAMINHO = os.getenv("SQLITE_CAMINHO", "gestao.db")
+SQLITE_TIMEOUT = float(os.getenv("SQLITE_TIMEOUT", "10"))   # segundos esperando o lock de escrita
+
+DIAS_SEMANA = database.DIAS_SEMANA
+
+# Mesmos tipos que o psycopg2 devolve: date para colunas DATE e bool para BOOLEAN
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_converter('DATE', lambda b: date.fromisoformat(b.decode()))
+sqlite3.register_converter('BOOLEAN', lambda b: bool(int(b)))
+
+
+# ==============================
+# SCHEMA (equivalente às migrações 1 a 6 do Postgres)
+# ==============================
+MIGRACOES = [
+    (1, 'schema inicial (migrações 1 a 6 do Postgres)', """
+        CREATE TABLE IF NOT EXISTS lojas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome TEXT NOT NULL,
+            responsavel TEXT
+        );
+
+        -- AUTOINCREMENT: id de vendedor removido nunca é reaproveitado (vendedores_removidos depende disso)
+        CREATE TABLE IF NOT EXISTS vendedores (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome TEXT NOT NULL,
+            email TEXT,
+            loja_id INTEGER REFERENCES lojas(id) ON DELETE SET NULL,
+            status TEXT,
+            base_tratada BOOLEAN DEFAULT 0,
+            disparos_dia INTEGER DEFAULT 0,
+            ultimo_status_tipo TEXT,
+            ultimo_status_data TEXT,
+            versao INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS vendedores_loja_id_id_idx ON vendedores (loja_id, id);
+        CREATE INDEX IF NOT EXISTS vendedores_status_id_idx ON vendedores (status, id);
+        CREATE INDEX IF NOT EXISTS vendedores_versao_idx ON vendedores (versao);
+
+        CREATE TABLE IF NOT EXISTS disparos_semanais (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            vendedor_id INTEGER UNIQUE REFERENCES vendedores(id) ON DELETE CASCADE,
+            segunda INTEGER DEFAULT 0,
+            terca INTEGER DEFAULT 0,
+            quarta INTEGER DEFAULT 0,
+            quinta INTEGER DEFAULT 0,
+            sexta INTEGER DEFAULT 0,
+            sabado INTEGER DEFAULT 0,
+            domingo INTEGER DEFAULT 0
+        );
+
+        CREATE TABLE IF NOT EXISTS eventos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome TEXT,
+            data_evento DATE,
+            loja_id INTEGER REFERENCES lojas(id) ON DELETE SET NULL
+        );
+        CREATE INDEX IF NOT EXISTS eventos_loja_id_idx ON eventos (loja_id);
+
+        CREATE TABLE IF NOT EXISTS cache_versoes (
+            nome TEXT PRIMARY KEY,
+            versao INTEGER NOT NULL DEFAULT 0
+        );
+
+        CREATE TABLE IF NOT EXISTS disparos_historico (
+            vendedor_id INTEGER NOT NULL REFERENCES vendedores(id) ON DELETE CASCADE,
+            data DATE NOT NULL,
+            disparos INTEGER NOT NULL DEFAULT 0,
+            atualizado_em TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (vendedor_id, data)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS disparos_historico_data_idx ON disparos_historico (data);
+
+        CREATE TABLE IF NOT EXISTS disparos_semana_resumo (
+            semana DATE NOT NULL,
+            vendedor_id INTEGER NOT NULL REFERENCES vendedores(id) ON DELETE CASCADE,
+            total INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (semana, vendedor_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS disparos_semana_resumo_vendedor_idx ON disparos_semana_resumo (vendedor_id);
+
+        CREATE TABLE IF NOT EXISTS vendedores_removidos (
+            vendedor_id INTEGER PRIMARY KEY,
+            versao INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS vendedores_removidos_versao_idx ON vendedores_removidos (versao);
+    """),
+
+    (2, 'dias já fechados (migração 7 do Postgres)', """
+        CREATE TABLE IF NOT EXISTS fechamentos_dia (
+            data DATE PRIMARY KEY,
+            vendedores INTEGER NOT NULL DEFAULT 0,
+            executado_em TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        ) WITHOUT ROWID;
+    """),
+]
+
+
+# ==============================
+# CONEXÕES (uma por thread, aberta na primeira consulta e reaproveitada)
+# ==============================
+_local = threading.local()
+_abertas = {}          # ident da thread -> conexão (para as estatísticas)
+_abertas_lock = threading.Lock()
+_criadas = 0
+
+
+def _casefold(texto):
+    return texto.casefold() if isinstance(texto, str) else texto
+
+
+def abrir(caminho=None):
+    fabrica = perfilador.ConexaoSqlitePerfilada if perfilador.ATIVO else sqlite3.Connection
+    try:
+        # isolation_level=None: sem BEGIN implícito; escritas abrem BEGIN IMMEDIATE e leituras rodam em autocommit
+        conn = sqlite3.connect(caminho or SQLITE_CAMINHO, timeout=SQLITE_TIMEOUT, isolation_level=None,
+                               detect_types=sqlite3.PARSE_DECLTYPES, factory=fabrica)
+    except Exception as e:
+        print("Erro ao abrir o banco SQLite:", e, file=sys.stderr)
+        raise
+    conn.row_factory = sqlite3.Row
+    cur = conn.cursor()
+    cur.execute("PRAGMA journal_mode = WAL;")
+    cur.execute("PRAGMA synchronous = NORMAL;")    # seguro em WAL: só o último commit pode se perder numa queda de energia
+    cur.execute("PRAGMA foreign_keys = ON;")
+    cur.execute("PRAGMA busy_timeout = %d;" % int(SQLITE_TIMEOUT * 1000))
+    cur.close()
+    # ILIKE do Postgres: comparação sem caixa também fora do ASCII (o LIKE do SQLite só ignora caixa em A-Z)
+    conn.create_function('casefold', 1, _casefold, deterministic=True)
+    return conn
+
+
+def _conexao_da_thread():
+    global _criadas
+    # Após fork a conexão herdada não pode ser usada: cada worker abre as suas
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.pid != os.getpid():
+        conn = _local.conn = abrir()
+        _local.pid = os.getpid()
+        with _abertas_lock:
+            _abertas[threading.get_ident()] = conn
+            _criadas += 1
+    return conn
+
+
+@contextmanager
+def conexao():
+    conn = _conexao_da_thread()
+    try:
+        yield conn
+    except Exception:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+
+
+def iniciar_escopo_requisicao():
+    # A conexão já é da thread; não há nada a reservar
+    pass
+
+
+def encerrar_escopo_requisicao(exc=None):
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and conn.in_transaction:
+        conn.rollback()
+
+
+def estatisticas_pool():
+    with _abertas_lock:
+        conexoes = list(_abertas.values())
+        criadas = _criadas
+    em_uso = sum(1 for c in conexoes if c.in_transaction)
+    return {
+        'backend': 'sqlite',
+        'caminho': SQLITE_CAMINHO,
+        'em_uso': em_uso,
+        'livres': len(conexoes) - em_uso,
+        'total': len(conexoes),
+        'criadas': criadas,
+        'pid': os.getpid(),
+    }
+
+
+# ==============================
+# CRIAÇÃO DE TABELAS
+# ==============================
+def _garantir_tabela(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migracoes (
+            versao INTEGER PRIMARY KEY,
+            descricao TEXT NOT NULL,
+            aplicada_em TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+
+
+def versoes_aplicadas():
+    with conexao() as conn:
+        cur = conn.cursor()
+        _garantir_tabela(cur)
+        cur.execute("SELECT versao FROM schema_migracoes ORDER BY versao;")
+        versoes = [r[0] for r in cur.fetchall()]
+        cur.close()
+    return versoes
+
+
+def _aplicar_pendentes(cur, ate=None, ao_aplicar=None):
+    _garantir_tabela(cur)
+    cur.execute("SELECT versao FROM schema_migracoes;")
+    aplicadas = {r[0] for r in cur.fetchall()}
+
+    aplicadas_agora = []
+    for versao, descricao, sql in MIGRACOES:
+        if versao in aplicadas or (ate is not None and versao > ate):
+            continue
+        # executescript faria COMMIT no meio; um comando por vez mantém tudo na transação
+        for comando in sql.split(';'):
+            if comando.strip():
+                cur.execute(comando)
+        cur.execute("INSERT INTO schema_migracoes (versao, descricao) VALUES (?, ?);", (versao, descricao))
+        aplicadas_agora.append((versao, descricao))
+        if ao_aplicar:
+            ao_aplicar(versao, descricao)
+    return aplicadas_agora
+
+
+def aplicar_migracoes(ate=None, ao_aplicar=None):
+    # BEGIN IMMEDIATE segura o lock de escrita: dois processos não aplicam a mesma migração
+    with conexao() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute("BEGIN IMMEDIATE;")
+            aplicadas_agora = _aplicar_pendentes(cur, ate, ao_aplicar)
+            conn.commit()
+        finally:
+            cur.close()
+    return aplicadas_agora
+
+
+def ensure_tables():
+    return aplicar_migracoes()
+
+
+# ==============================
+# VERSÕES E EVENTOS
+# ==============================
+def get_versao_cache(nome):
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT versao FROM cache_versoes WHERE nome = ?;", (nome,))
+        row = cur.fetchone()
+        cur.close()
+    return row[0] if row else 0
+
+
+def _incrementar_versao_cache(cur, nome):
+    cur.execute("""
+        INSERT INTO cache_versoes (nome, versao) VALUES (?, 1)
+        ON CONFLICT (nome) DO UPDATE SET versao = cache_versoes.versao + 1
+        RETURNING versao;
+    """, (nome,))
+    return cur.fetchone()[0]
+
+
+def get_versao_dados():
+    return get_versao_cache('dados')
+
+
+def _versao_dados(cur):
+    # Uma versão por transação de escrita. O lock de escrita do SQLite (BEGIN IMMEDIATE) já põe as
+    # versões na ordem dos commits, então o carimbo é gravado direto, sem os triggers do Postgres.
+    return _incrementar_versao_cache(cur, 'dados')
+
+
+def notificar(cur, evento):
+    # Sem NOTIFY: entregue na hora (não espera o commit) para os navegadores deste processo
+    _publicar(evento)
+
+
+def _publicar(evento):
+    if evento is None:
+        return
+    import eventos
+    eventos.get_ouvinte().distribuir(evento)
+
+
+def _evento_vendedores(cur, tipo, ids, versao):
+    # Mesmo formato do NOTIFY do Postgres; chamado antes do commit e publicado depois dele
+    ids = sorted({int(i) for i in ids})
+    if not ids:
+        return None
+    if len(ids) > database.EVENTOS_MAX_VENDEDORES:
+        return {'tipo': 'recarregar', 'motivo': tipo}
+    cur.execute(f"""
+        SELECT v.id, v.status, COALESCE(v.disparos_dia, 0), COALESCE(ds.total, 0)
+        FROM vendedores v
+        LEFT JOIN ({_SQL_TOTAL_SEMANA}) ds ON ds.vendedor_id = v.id
+        WHERE v.id IN ({', '.join('?' * len(ids))})
+        ORDER BY v.id;
+    """, ids)
+    vendedores = [{'id': r[0], 'status': r[1], 'disparos_hoje': r[2], 'disparos_semana': r[3]} for r in cur.fetchall()]
+    if not vendedores:
+        return None
+    return {'tipo': tipo, 'versao': versao, 'vendedores': vendedores}
+
+
+# ==============================
+# FUNÇÕES CRUD
+# ==============================
+def _listar_lojas_banco():
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT * FROM lojas ORDER BY id;")
+        data = cur.fetchall()
+        cur.close()
+    return [dict(r) for r in data]
+
+
+def _get_loja_banco(loja_id):
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT * FROM lojas WHERE id = ?;", (loja_id,))
+        row = cur.fetchone()
+        cur.close()
+    return dict(row) if row else None
+
+
+def listar_lojas():
+    lojas = database._cache_lojas.obter('listar', _listar_lojas_banco)
+    return [dict(l) for l in lojas]
+
+
+def get_loja_by_id(loja_id):
+    loja = database._cache_lojas.obter(('loja', loja_id), lambda: _get_loja_banco(loja_id))
+    return dict(loja) if loja else None
+
+
+def insert_loja(nome, responsavel):
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE;")
+        cur.execute("INSERT INTO lojas (nome, responsavel) VALUES (?, ?) RETURNING *;", (nome, responsavel))
+        row = dict(cur.fetchone())
+        versao = _incrementar_versao_cache(cur, 'lojas')
+        conn.commit()
+        cur.close()
+    database._cache_lojas.invalidar(versao)
+    return row
+
+
+def update_loja(loja_id, nome, responsavel):
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE;")
+        cur.execute("SELECT nome FROM lojas WHERE id = ?;", (loja_id,))
+        antiga = cur.fetchone()
+        cur.execute("UPDATE lojas SET nome=?, responsavel=? WHERE id=?;", (nome, responsavel, loja_id))
+        # Nome novo aparece em loja_nome dos vendedores: eles entram no próximo delta
+        if antiga is not None and antiga[0] != nome:
+            cur.execute("SELECT 1 FROM vendedores WHERE loja_id = ? LIMIT 1;", (loja_id,))
+            if cur.fetchone():
+                cur.execute("UPDATE vendedores SET versao = ? WHERE loja_id = ?;", (_versao_dados(cur), loja_id))
+        versao = _incrementar_versao_cache(cur, 'lojas')
+        conn.commit()
+        cur.close()
+    database._cache_lojas.invalidar(versao)
+
+
+# ---------- VENDEDORES ----------
+
+def listar_vendedores():
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT * FROM vendedores ORDER BY id;")
+        data = cur.fetchall()
+        cur.close()
+    return [dict(r) for r in data]
+
+
+def get_vendedores_by_loja(loja_id):
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT * FROM vendedores WHERE loja_id = ? ORDER BY id;", (loja_id,))
+        data = cur.fetchall()
+        cur.close()
+    return [dict(r) for r in data]
+
+
+def insert_vendedor(v):
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE;")
+        cur.execute("""
+            INSERT INTO vendedores (nome, email, loja_id, status, base_tratada, disparos_dia, ultimo_status_tipo, ultimo_status_data, versao)
+            VALUES (?,?,?,?,?,?,?,?,?) RETURNING *;
+        """, (v.get('nome'), v.get('email'), v.get('loja_id'), v.get('status'),
+              v.get('base_tratada', False), v.get('disparos_dia',0),
+              v.get('ultimo_status_tipo'), v.get('ultimo_status_data'), _versao_dados(cur)))
+        row = dict(cur.fetchone())
+        conn.commit()
+        cur.close()
+    return row
+
+
+def update_status_vendedor(vendedor_id, novo_status):
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE;")
+        versao = _versao_dados(cur)
+        cur.execute("""
+            UPDATE vendedores
+            SET status = ?, ultimo_status_tipo = ?, ultimo_status_data = ?, versao = ?
+            WHERE id = ?;
+        """, (novo_status, novo_status, date.today().strftime('%d/%m/%Y'), versao, vendedor_id))
+        if cur.rowcount == 0:
+            # Nada mudou: desfaz também o incremento da versão
+            conn.rollback()
+            cur.close()
+            return False
+        evento = _evento_vendedores(cur, 'status', [vendedor_id], versao)
+        conn.commit()
+        cur.close()
+    _publicar(evento)
+    return True
+
+
+def atualizar_status_em_lote(alteracoes):
+    if not alteracoes:
+        return set()
+    hoje = date.today().strftime('%d/%m/%Y')
+    atualizados = set()
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE;")
+        versao = _versao_dados(cur)
+        # Em processo, um UPDATE por vendedor custa microssegundos: não há ida ao servidor para economizar
+        for vendedor_id, novo_status in alteracoes:
+            cur.execute("""
+                UPDATE vendedores
+                SET status = ?, ultimo_status_tipo = ?, ultimo_status_data = ?, versao = ?
+                WHERE id = ?;
+            """, (novo_status, novo_status, hoje, versao, int(vendedor_id)))
+            if cur.rowcount:
+                atualizados.add(int(vendedor_id))
+        if not atualizados:
+            conn.rollback()
+            cur.close()
+            return atualizados
+        evento = _evento_vendedores(cur, 'status', atualizados, versao)
+        conn.commit()
+        cur.close()
+    _publicar(evento)
+    return atualizados
+
+
+def atualizar_status_por_filtro(novo_status, loja_id=None, status_atual=None):
+    condicoes, params = [], []
+    if loja_id is not None:
+        condicoes.append("loja_id = ?")
+        params.append(loja_id)
+    if status_atual is not None:
+        condicoes.append("status = ?")
+        params.append(status_atual)
+    if not condicoes:
+        raise ValueError("Informe ao menos um filtro (loja_id ou status atual).")
+
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE;")
+        versao = _versao_dados(cur)
+        cur.execute(f"""
+            UPDATE vendedores
+            SET status = ?, ultimo_status_tipo = ?, ultimo_status_data = ?, versao = ?
+            WHERE {' AND '.join(condicoes)}
+            RETURNING id;
+        """, [novo_status, novo_status, date.today().strftime('%d/%m/%Y'), versao] + params)
+        ids = sorted(r[0] for r in cur.fetchall())
+        if not ids:
+            conn.rollback()
+            cur.close()
+            return ids
+        evento = _evento_vendedores(cur, 'status', ids, versao)
+        conn.commit()
+        cur.close()
+    _publicar(evento)
+    return ids
+
+
+def deletar_vendedor(vendedor_id):
+    with conexao() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute("BEGIN IMMEDIATE;")
+            cur.execute("SELECT 1 FROM vendedores WHERE id = ?;", (vendedor_id,))
+            if cur.fetchone():
+                versao = _versao_dados(cur)
+                cur.execute("DELETE FROM vendedores WHERE id = ?;", (vendedor_id,))
+                cur.execute("""
+                    INSERT INTO vendedores_removidos (vendedor_id, versao) VALUES (?, ?)
+                    ON CONFLICT (vendedor_id) DO UPDATE SET versao = excluded.versao;
+                """, (vendedor_id, versao))
+            conn.commit()
+            return True
+        except Exception as e:
+            conn.rollback()
+            print(f"Erro ao deletar vendedor: {e}")
+            return False
+        finally:
+            cur.close()
+
+
+# --------- DISPAROS ---------
+
+def _semana_atual():
+    hoje = date.today()
+    return hoje, hoje - timedelta(days=hoje.weekday())
+
+
+def _registrar_historico_dia(cur, vendedor_id, valor):
+    cur.execute("""
+        INSERT INTO disparos_historico (vendedor_id, data, disparos) VALUES (?, ?, ?)
+        ON CONFLICT (vendedor_id, data) DO UPDATE SET disparos = excluded.disparos, atualizado_em = CURRENT_TIMESTAMP;
+    """, (vendedor_id, date.today(), valor))
+
+
+def _registrar_historico_semana(cur, vendedor_id, valores):
+    hoje, segunda = _semana_atual()
+    cur.executemany("""
+        INSERT INTO disparos_historico (vendedor_id, data, disparos) VALUES (?, ?, ?)
+        ON CONFLICT (vendedor_id, data) DO UPDATE SET disparos = excluded.disparos, atualizado_em = CURRENT_TIMESTAMP;
+    """, [(vendedor_id, segunda + timedelta(days=i), int(v or 0))
+          for i, v in enumerate(valores) if segunda + timedelta(days=i) <= hoje])
+
+
+def _atualizar_resumo_semana(cur, vendedor_id):
+    _, segunda = _semana_atual()
+    cur.execute("""
+        INSERT INTO disparos_semana_resumo (semana, vendedor_id, total)
+        SELECT ?, ?, COALESCE(SUM(disparos), 0)
+        FROM disparos_historico
+        WHERE vendedor_id = ? AND data >= ? AND data < ?
+        ON CONFLICT (semana, vendedor_id) DO UPDATE SET total = excluded.total;
+    """, (segunda, vendedor_id, vendedor_id, segunda, segunda + timedelta(days=7)))
+
+
+def get_total_disparos_periodo(semana_inicio, semana_fim):
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT COALESCE(SUM(total), 0) FROM disparos_semana_resumo
+            WHERE semana BETWEEN ? AND ?;
+        """, (semana_inicio, semana_fim))
+        total = cur.fetchone()[0]
+        cur.close()
+    return total
+
+
+def listar_historico_disparos(vendedor_id, inicio, fim):
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT data, disparos FROM disparos_historico
+            WHERE vendedor_id = ? AND data BETWEEN ? AND ?
+            ORDER BY data;
+        """, (vendedor_id, inicio, fim))
+        data = cur.fetchall()
+        cur.close()
+    return [dict(r) for r in data]
+
+
+def update_disparos_semanais(vendedor_id, d):
+    valores = tuple(d.get(dia, 0) for dia in DIAS_SEMANA)
+
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE;")
+        cur.execute("""
+            INSERT INTO disparos_semanais (vendedor_id, segunda, terca, quarta, quinta, sexta, sabado, domingo)
+            VALUES (?,?,?,?,?,?,?,?)
+            ON CONFLICT (vendedor_id) DO UPDATE SET
+                segunda=excluded.segunda, terca=excluded.terca, quarta=excluded.quarta, quinta=excluded.quinta,
+                sexta=excluded.sexta, sabado=excluded.sabado, domingo=excluded.domingo;
+        """, (vendedor_id,) + valores)
+        versao = _versao_dados(cur)
+        cur.execute("UPDATE vendedores SET versao = ? WHERE id = ?;", (versao, vendedor_id))
+
+        _registrar_historico_semana(cur, vendedor_id, valores)
+        _atualizar_resumo_semana(cur, vendedor_id)
+        evento = _evento_vendedores(cur, 'disparos', [vendedor_id], versao)
+        conn.commit()
+        cur.close()
+    _publicar(evento)
+
+
+def get_disparos_semanais(vendedor_id):
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT * FROM disparos_semanais WHERE vendedor_id=?;", (vendedor_id,))
+        row = cur.fetchone()
+        cur.close()
+    return dict(row) if row else None
+
+
+def update_disparos_dia(vendedor_id, valor):
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE;")
+        versao = _versao_dados(cur)
+        cur.execute("UPDATE vendedores SET disparos_dia=?, versao=? WHERE id=?;", (valor, versao, vendedor_id))
+        _registrar_historico_dia(cur, vendedor_id, valor)
+        _atualizar_resumo_semana(cur, vendedor_id)
+        evento = _evento_vendedores(cur, 'disparos', [vendedor_id], versao)
+        conn.commit()
+        cur.close()
+    _publicar(evento)
+
+
+def atualizar_disparos_dia(vendedor_id, disparos_hoje):
+    try:
+        update_disparos_dia(vendedor_id, disparos_hoje)
+    except Exception as e:
+        print(f"Erro ao atualizar disparos do dia: {e}")
+        raise e
+
+
+def incrementar_disparos_dia(incrementos):
+    if not incrementos:
+        return {}
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE;")
+        versao = _versao_dados(cur)
+        totais = {}
+        for vendedor_id in sorted(incrementos):
+            cur.execute("UPDATE vendedores SET disparos_dia = COALESCE(disparos_dia, 0) + ?, versao = ? "
+                        "WHERE id = ? RETURNING disparos_dia;", (incrementos[vendedor_id], versao, vendedor_id))
+            row = cur.fetchone()
+            if row is None:
+                continue
+            totais[vendedor_id] = row[0]
+            _registrar_historico_dia(cur, vendedor_id, row[0])
+            _atualizar_resumo_semana(cur, vendedor_id)
+        evento = _evento_vendedores(cur, 'disparos', totais, versao)
+        conn.commit()
+        cur.close()
+    _publicar(evento)
+    return totais
+
+
+def carregar_vendedores_com_disparos(loja_id=None, status=None, apos_id=None, limite=None, versao_entre=None):
+    condicoes, params = [], []
+    if versao_entre is not None:
+        condicoes.append("v.versao > ? AND v.versao <= ?")
+        params.extend(versao_entre)
+    if loja_id is not None:
+        condicoes.append("v.loja_id = ?")
+        params.append(loja_id)
+    if status is not None:
+        condicoes.append("v.status = ?")
+        params.append(status)
+    if apos_id is not None:
+        condicoes.append("v.id > ?")
+        params.append(apos_id)
+    filtro = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+    limitar = ""
+    if limite is not None:
+        limitar = "LIMIT ?"
+        params.append(limite)
+
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute(f"""
+            SELECT v.*, l.nome AS loja_nome, ds.id AS ds_id,
+                   ds.segunda, ds.terca, ds.quarta, ds.quinta, ds.sexta, ds.sabado, ds.domingo
+            FROM vendedores v
+            LEFT JOIN lojas l ON l.id = v.loja_id
+            LEFT JOIN disparos_semanais ds ON ds.vendedor_id = v.id
+            {filtro}
+            ORDER BY v.id
+            {limitar};
+        """, params)
+        data = cur.fetchall()
+        cur.close()
+
+    vendedores = []
+    for r in data:
+        v = dict(r)
+        ds_id = v.pop('ds_id')
+        semana = {dia: v.pop(dia) or 0 for dia in DIAS_SEMANA}
+        v['disparos_semanais'] = semana if ds_id is not None else None
+        v['disparos_hoje'] = v.get('disparos_dia') or 0
+        v['disparos_semana'] = sum(semana.values())
+        vendedores.append(v)
+    return vendedores
+
+
+def listar_vendedores_removidos(desde, ate):
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT vendedor_id FROM vendedores_removidos
+            WHERE versao > ? AND versao <= ?
+            ORDER BY vendedor_id;
+        """, (desde, ate))
+        ids = [r[0] for r in cur.fetchall()]
+        cur.close()
+    return ids
+
+
+# --------- PAGINAÇÃO ---------
+
+def listar_lojas_pagina(responsavel=None, apos_id=None, limite=database.PAGINA_TAMANHO):
+    condicoes, params = [], []
+    if responsavel:
+        condicoes.append("casefold(l.responsavel) LIKE ?")
+        params.append(f"%{responsavel.casefold()}%")
+    if apos_id is not None:
+        condicoes.append("l.id > ?")
+        params.append(apos_id)
+    filtro = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+    params.append(limite + 1)
+
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute(f"""
+            SELECT l.*, (SELECT COUNT(*) FROM vendedores v WHERE v.loja_id = l.id) AS total_vendedores
+            FROM lojas l
+            {filtro}
+            ORDER BY l.id
+            LIMIT ?;
+        """, params)
+        data = cur.fetchall()
+        cur.close()
+    return database._pagina([dict(r) for r in data], limite)
+
+
+def _contar(tabela, condicoes, params):
+    filtro = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute(f"SELECT COUNT(*) FROM {tabela} {filtro};", params)
+        total = cur.fetchone()[0]
+        cur.close()
+    return total
+
+
+def contar_vendedores(loja_id=None, status=None):
+    def contar():
+        condicoes, params = [], []
+        if loja_id is not None:
+            condicoes.append("loja_id = ?")
+            params.append(loja_id)
+        if status is not None:
+            condicoes.append("status = ?")
+            params.append(status)
+        return _contar('vendedores', condicoes, params)
+    return database._cache_contagens.obter(('vendedores', loja_id, status), contar)
+
+
+def contar_lojas(responsavel=None):
+    def contar():
+        if responsavel:
+            return _contar('lojas', ["casefold(responsavel) LIKE ?"], [f"%{responsavel.casefold()}%"])
+        return _contar('lojas', [], [])
+    return database._cache_contagens.obter(('lojas', responsavel or None), contar)
+
+
+# --------- KPIs DO PAINEL ---------
+
+_SQL_TOTAL_SEMANA = database._SQL_TOTAL_SEMANA
+
+
+def get_kpis_painel():
+    resumo = get_resumo_loja(None)
+    return {
+        'status_kpis': resumo['status_kpis'],
+        'bases_pendentes_count': resumo['bases_pendentes'],
+        'total_disparos_dia': resumo['disparos_dia'],
+        'total_disparos_semana': resumo['disparos_semana'],
+    }
+
+
+# --------- RESUMO POR LOJA ---------
+# Sem a tabela resumo_lojas do Postgres: com uma loja só por arquivo, agregar na leitura sai barato.
+# Mesmas colunas da view resumo_lojas_calculado.
+
+_SQL_RESUMO = """
+    SELECT {chave} AS chave,
+           COUNT(v.id) AS vendedores,
+           COUNT(v.id) FILTER (WHERE NOT COALESCE(v.base_tratada, 0)) AS bases_pendentes,
+           COALESCE(SUM(v.disparos_dia), 0) AS disparos_dia,
+           COUNT(v.id) FILTER (WHERE v.status = 'Conectado') AS conectados,
+           COUNT(v.id) FILTER (WHERE v.status = 'Restrito') AS restritos,
+           COUNT(v.id) FILTER (WHERE v.status = 'Bloqueado') AS bloqueados,
+           COUNT(v.id) FILTER (WHERE v.status = 'Desconectado') AS desconectados,
+           COUNT(v.id) FILTER (WHERE v.status IS NULL
+                               OR v.status NOT IN ('Conectado', 'Restrito', 'Bloqueado', 'Desconectado')) AS outros,
+           {dias}
+    FROM vendedores v
+    LEFT JOIN disparos_semanais d ON d.vendedor_id = v.id
+"""
+
+
+def _sql_resumo(chave):
+    return _SQL_RESUMO.format(chave=chave, dias=', '.join(f"COALESCE(SUM(d.{d}), 0) AS {d}" for d in DIAS_SEMANA))
+
+
+def get_resumo_loja(loja_id):
+    with conexao() as conn:
+        cur = conn.cursor()
+        if loja_id is None:
+            cur.execute(_sql_resumo(database.RESUMO_TOTAL) + ";")
+        else:
+            cur.execute(_sql_resumo("COALESCE(v.loja_id, 0)") + " WHERE COALESCE(v.loja_id, 0) = ?;", (loja_id,))
+        row = cur.fetchone()
+        cur.close()
+    return database._montar_resumo(dict(row))
+
+
+def listar_resumo_lojas():
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute(_sql_resumo("v.loja_id") + " WHERE v.loja_id IS NOT NULL GROUP BY v.loja_id;")
+        data = cur.fetchall()
+        cur.close()
+    return {r['chave']: database._montar_resumo(dict(r)) for r in data}
+
+
+def verificar_resumo_lojas(corrigir=True):
+    # Não há resumo armazenado para conferir: get_resumo_loja já agrega as tabelas a cada leitura
+    raise NotImplementedError("verificar-resumo não se aplica ao SQLite: o resumo por loja é calculado na leitura, "
+                              "sem tabela resumo_lojas.")
+
+
+def listar_vendedores_por_status(limite=database.PAINEL_LIMITE_POR_STATUS):
+    # Sem json_agg ordenado (SQLite < 3.44): as linhas já vêm por id e o agrupamento é feito aqui
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT status, nome, loja_nome, ultimo_status_tipo, ultimo_status_data
+            FROM (
+                SELECT v.id, v.nome, l.nome AS loja_nome, v.ultimo_status_tipo, v.ultimo_status_data,
+                       COALESCE(v.status, 'Desconhecido') AS status,
+                       ROW_NUMBER() OVER (PARTITION BY COALESCE(v.status, 'Desconhecido') ORDER BY v.id) AS pos
+                FROM vendedores v
+                LEFT JOIN lojas l ON l.id = v.loja_id
+            ) x
+            WHERE pos <= ?
+            ORDER BY id;
+        """, (limite,))
+        data = cur.fetchall()
+        cur.close()
+    por_status = {}
+    for r in data:
+        item = dict(r)
+        por_status.setdefault(item.pop('status'), []).append(item)
+    return por_status
+
+
+def get_disparos_hoje(vendedor_id):
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT disparos_dia FROM vendedores WHERE id = ?;", (vendedor_id,))
+        row = cur.fetchone()
+        cur.close()
+    return row['disparos_dia'] if row and row['disparos_dia'] is not None else 0
+
+
+# --------- FECHAMENTO DO DIA ---------
+
+def fechar_dia(dia):
+    # Mesma regra do Postgres em uma transação (sem CTE que escreve): a trava é o INSERT OR IGNORE
+    coluna, atribuicoes = database._sql_coluna_fechamento(dia)
+    atribuicoes = atribuicoes.replace('EXCLUDED.', 'excluded.')
+    inicio = time.perf_counter()
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE;")
+        cur.execute("INSERT OR IGNORE INTO fechamentos_dia (data, vendedores) SELECT ?, COUNT(*) FROM vendedores;",
+                    (dia,))
+        if cur.rowcount == 0:
+            conn.rollback()
+            cur.close()
+            return {'dia': dia, 'coluna': coluna, 'fechado': False, 'vendedores': 0, 'zerados': 0,
+                    'tempo_s': round(time.perf_counter() - inicio, 4)}
+        versao = _versao_dados(cur)
+        # WHERE true: sem ele o SQLite confunde o ON CONFLICT com um JOIN do SELECT
+        cur.execute(f"""
+            INSERT INTO disparos_semanais (vendedor_id, {coluna})
+            SELECT id, COALESCE(disparos_dia, 0) FROM vendedores WHERE true
+            ON CONFLICT (vendedor_id) DO UPDATE SET {atribuicoes};
+        """)
+        vendedores = cur.rowcount
+        cur.execute("UPDATE vendedores SET versao = ?;", (versao,))
+        cur.execute("UPDATE vendedores SET disparos_dia = 0 WHERE COALESCE(disparos_dia, 0) <> 0;")
+        zerados = cur.rowcount
+        conn.commit()
+        cur.close()
+    _publicar({'tipo': 'recarregar', 'motivo': 'fechamento'})
+    return {'dia': dia, 'coluna': coluna, 'fechado': True, 'vendedores': vendedores, 'zerados': zerados,
+            'tempo_s': round(time.perf_counter() - inicio, 4)}
+
+
+def ultimo_fechamento():
+    with conexao() as conn:
+        cur = conn.cursor()
+        # MAX() perde o tipo declarado da coluna: volta como texto ISO
+        dia = cur.execute("SELECT MAX(data) FROM fechamentos_dia;").fetchone()[0]
+        cur.close()
+    return date.fromisoformat(dia) if dia else None
+
+
+# --------- EXPORTAÇÃO ---------
+
+def _iterar_consulta(sql, params):
+    # O cursor do SQLite já avança passo a passo: nada é carregado além da linha atual.
+    # Tuplas, como o cursor nomeado do Postgres (a conexão usa sqlite3.Row)
+    with conexao() as conn:
+        cur = conn.cursor()
+        try:
+            yield from map(tuple, cur.execute(sql, params))
+        finally:
+            cur.close()
+
+
+def exportar_vendedores(loja_id=None, status=None, lote=database.EXPORTACAO_LOTE):
+    filtro, params = database._filtro_exportacao(loja_id, status, marcador='?')
+    return _iterar_consulta(database._SQL_EXPORTAR_VENDEDORES.format(filtro=filtro), params)
+
+
+def exportar_disparos(loja_id=None, status=None, inicio=None, fim=None, lote=database.EXPORTACAO_LOTE):
+    filtro, params = database._filtro_exportacao(loja_id, status, inicio, fim, marcador='?')
+    return _iterar_consulta(database._SQL_EXPORTAR_DISPAROS.format(filtro=filtro), params)
+
+
+# ==============================
+# CÓPIA A PARTIR DO POSTGRES
+# ==============================
+# Em ordem de chave estrangeira; os ids são copiados como estão
+TABELAS_COPIA = [
+    ('lojas', ['id', 'nome', 'responsavel']),
+    ('vendedores', ['id', 'nome', 'email', 'loja_id', 'status', 'base_tratada', 'disparos_dia',
+                    'ultimo_status_tipo', 'ultimo_status_data', 'versao']),
+    ('disparos_semanais', ['id', 'vendedor_id'] + DIAS_SEMANA),
+    ('eventos', ['id', 'nome', 'data_evento', 'loja_id']),
+    ('cache_versoes', ['nome', 'versao']),
+    ('disparos_historico', ['vendedor_id', 'data', 'disparos']),
+    ('disparos_semana_resumo', ['semana', 'vendedor_id', 'total']),
+    ('vendedores_removidos', ['vendedor_id', 'versao']),
+    ('fechamentos_dia', ['data', 'vendedores']),
+]
+
+
+def copiar_do_postgres(conn_pg, caminho=None, lote=5000):
+    # Substitui o conteúdo do arquivo SQLite pelo do Postgres (passagem para o backend embutido, ou benchmarks)
+    destino = abrir(caminho)
+    try:
+        cur = destino.cursor()
+        cur.execute("BEGIN IMMEDIATE;")
+        _aplicar_pendentes(cur)
+        for tabela, _ in reversed(TABELAS_COPIA):
+            cur.execute(f"DELETE FROM {tabela};")
+
+        contagens = {}
+        origem = conn_pg.cursor()
+        for tabela, colunas in TABELAS_COPIA:
+            origem.execute(f"SELECT {', '.join(colunas)} FROM {tabela};")
+            contagens[tabela] = 0
+            while True:
+                linhas = origem.fetchmany(lote)
+                if not linhas:
+                    break
+                cur.executemany(f"INSERT INTO {tabela} ({', '.join(colunas)}) VALUES ({', '.join('?' * len(colunas))});",
+                                linhas)
+                contagens[tabela] += len(linhas)
+        origem.close()
+        destino.commit()
+        cur.execute("ANALYZE;")
+        cur.close()
+    finally:
+        destino.close()
+    return contagens
@@ -0,0 +1,82 @@
+# benchmarks/bench_analise_acessos.py
+# Vazão (MB/s) e pico de memória de analise_acessos sobre um acessos.log sintético do tamanho pedido, misturando
+# linhas atuais (UTF-8) e antigas (cp1252). O pico de memória não deve crescer com o tamanho do arquivo.
+#
+#   python benchmarks/bench_analise_acessos.py                # 50 MB
+#   python benchmarks/bench_analise_acessos.py --mb 500 --gz
+import argparse
+import gzip
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+import comum
+import analise_acessos
+
+PAGINAS = ['/painel', '/lojas', '/vendedores', '/lojas/12/disparos', '/metrics', '/eventos']
+
+
+def gerar(caminho, megabytes, comprimir, semente=17):
+    aleatorio = random.Random(semente)
+    limite = megabytes * 1024 * 1024
+    escritos = 0
+    abrir = gzip.open if comprimir else open
+    with abrir(caminho, 'wb') as f:
+        while escritos < limite:
+            hora = f"2026-10-{aleatorio.randint(1, 28):02d} {aleatorio.randint(0, 23):02d}:{aleatorio.randint(0, 59):02d}:00,000"
+            ip = f"10.{aleatorio.randint(0, 3)}.{aleatorio.randint(0, 255)}.{aleatorio.randint(0, 255)}"
+            if aleatorio.random() < 0.2:
+                descricao = aleatorio.choice(list(analise_acessos.PAGINAS_LEGADO))
+                linha = f"{hora} - INFO - ACESSO: {descricao}. IP do Usuário: {ip}\n".encode('cp1252')
+            else:
+                linha = (f"{hora} - INFO - ACESSO: GET {aleatorio.choice(PAGINAS)} 200 {aleatorio.uniform(1, 80):.1f}ms "
+                         f"(banco: {aleatorio.randint(0, 9)} chamadas, {aleatorio.uniform(0, 20):.1f}ms). IP: {ip}\n").encode()
+            f.write(linha)
+            escritos += len(linha)
+    return escritos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede a análise em fluxo do acessos.log.")
+    parser.add_argument('--mb', type=int, default=50)
+    parser.add_argument('--gz', action='store_true', help='Gera e lê o log comprimido (.gz).')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, 'acessos.log' + ('.gz' if args.gz else ''))
+        gerados = gerar(caminho, args.mb, args.gz)
+
+        inicio = time.perf_counter()
+        agregado = analise_acessos.analisar([caminho])
+        decorrido = time.perf_counter() - inicio
+
+        # Segunda passada só para a memória: o tracemalloc deixa a leitura várias vezes mais lenta
+        tracemalloc.start()
+        analise_acessos.analisar([caminho])
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    resultado = {
+        'meta': {'mb': args.mb, 'gz': args.gz, **comum.ambiente()},
+        'itens': {'analisar': {
+            'linhas': agregado.linhas,
+            'acessos': agregado.acessos,
+            'segundos': round(decorrido, 2),
+            'mb_por_s': round(gerados / 1024 / 1024 / decorrido, 1),
+            'pico_memoria_kb': round(pico / 1024),
+        }},
+    }
+    if args.json:
+        print(json.dumps(resultado, indent=2, ensure_ascii=False))
+        return
+    item = resultado['itens']['analisar']
+    print(f"{args.mb} MB{' (.gz)' if args.gz else ''}: {item['linhas']} linhas, {item['acessos']} acessos em "
+          f"{item['segundos']} s ({item['mb_por_s']} MB/s), pico de memória {item['pico_memoria_kb']} KB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+# benchmarks/bench_backends.py
+# Latência por chamada de database.* no Postgres e no SQLite embutido, sobre os mesmos dados: semeia o Postgres
+# (benchmarks/semear.py), copia para um arquivo SQLite e roda benchmarks/bench_database.py uma vez por backend.
+# Com o Postgres local (socket Unix) a diferença é só o custo do protocolo; com o banco remoto por TLS,
+# some-se a ida e volta da rede a cada consulta do lado Postgres.
+#
+#   python benchmarks/bench_backends.py                                   # 1000 vendedores, cache frio
+#   python benchmarks/bench_backends.py --vendedores 10000 --repeticoes 50
+#   python benchmarks/bench_backends.py --sem-semear --sqlite /tmp/gestao.db   # dados já semeados e copiados
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import comum
+
+PASTA = os.path.dirname(os.path.abspath(__file__))
+
+
+def rodar(script, argumentos, env_extra):
+    env = dict(os.environ, LOG_ARQUIVO=os.devnull, **env_extra)
+    processo = subprocess.run([sys.executable, os.path.join(PASTA, script)] + argumentos,
+                              cwd=comum.RAIZ, env=env, capture_output=True, text=True)
+    if processo.returncode != 0:
+        sys.exit(f"{script} falhou ({env_extra}):\n{processo.stderr.strip()}")
+    return processo.stdout
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara a latência de database.* entre Postgres e SQLite.")
+    parser.add_argument('--vendedores', type=int, default=1000)
+    parser.add_argument('--repeticoes', type=int, default=30)
+    parser.add_argument('--cache', choices=['frio', 'quente'], default='frio')
+    parser.add_argument('--filtro', default=None)
+    parser.add_argument('--sqlite', metavar='CAMINHO', help='Arquivo SQLite (padrão: temporário, apagado no fim).')
+    parser.add_argument('--sem-semear', action='store_true', help='Usa os dados que já estão nos dois bancos.')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = args.sqlite or os.path.join(pasta, 'bench.db')
+        if not args.sem_semear:
+            print(rodar('semear.py', ['--vendedores', str(args.vendedores), '--limpar', '--sqlite', caminho],
+                        {'DB_BACKEND': 'postgres'}).strip(), file=sys.stderr)
+
+        bench = ['--json', '--repeticoes', str(args.repeticoes), '--cache', args.cache]
+        if args.filtro:
+            bench += ['--filtro', args.filtro]
+        resultados = {
+            'postgres': json.loads(rodar('bench_database.py', bench, {'DB_BACKEND': 'postgres'})),
+            'sqlite': json.loads(rodar('bench_database.py', bench, {'DB_BACKEND': 'sqlite', 'SQLITE_CAMINHO': caminho})),
+        }
+
+    if args.json:
+        print(json.dumps(resultados, indent=2, ensure_ascii=False))
+        return
+
+    pg, lite = resultados['postgres']['itens'], resultados['sqlite']['itens']
+    print(f"{resultados['postgres']['meta']['vendedores']} vendedores, {args.repeticoes} repetições, cache {args.cache}")
+    print(f"{'caso':<42} {'postgres p50':>13} {'sqlite p50':>11} {'postgres p95':>13} {'sqlite p95':>11} {'razão p50':>10}")
+    for nome in pg:
+        if nome not in lite:
+            continue
+        a, b = pg[nome], lite[nome]
+        razao = a['p50_ms'] / b['p50_ms'] if b['p50_ms'] else float('inf')
+        print(f"{nome:<42} {a['p50_ms']:>10.3f} ms {b['p50_ms']:>8.3f} ms {a['p95_ms']:>10.3f} ms "
+              f"{b['p95_ms']:>8.3f} ms {razao:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+# benchmarks/bench_database.py
+# Microbenchmarks de cada função de database.py contra o banco semeado (benchmarks/semear.py).
+# Mede latência (p50/p95/p99) e quantas consultas SQL cada chamada faz.
+#
+#   python benchmarks/bench_database.py                                # cache frio, 20 repetições
+#   python benchmarks/bench_database.py --cache quente --repeticoes 100
+#   python benchmarks/bench_database.py --salvar-baseline database_1000
+#   python benchmarks/bench_database.py --comparar database_1000       # sai com código 1 se regrediu
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+import comum
+
+# Conexões com o perfilador para contar as consultas; sem limite de lentidão para não rodar EXPLAIN
+os.environ.setdefault('PERFILAR_SQL', '1')
+os.environ.setdefault('SQL_LENTO_MS', '1e12')
+
+import cache
+import database
+import perfilador
+
+
+def amostra():
+    with database.conexao() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT v.id, v.loja_id, v.status, COALESCE(v.disparos_dia, 0), (SELECT COUNT(*) FROM vendedores)
+            FROM vendedores v JOIN disparos_semanais ds ON ds.vendedor_id = v.id
+            WHERE v.loja_id IS NOT NULL
+            ORDER BY v.id LIMIT 1;
+        """)
+        linha = cur.fetchone()
+        cur.close()
+    if not linha:
+        sys.exit("Banco vazio: rode benchmarks/semear.py antes.")
+    return dict(zip(['vendedor_id', 'loja_id', 'status', 'disparos_dia', 'total_vendedores'], linha))
+
+
+def casos(a):
+    semana = date.today() - timedelta(days=date.today().weekday())
+    semanal = database.get_disparos_semanais(a['vendedor_id'])
+    semanal = {d: semanal[d] for d in database.DIAS_SEMANA}
+    # Escritas regravam o valor atual: o banco termina igual ao começo
+    return {
+        'listar_lojas': lambda: database.listar_lojas(),
+        'get_loja_by_id': lambda: database.get_loja_by_id(a['loja_id']),
+        'listar_lojas_pagina': lambda: database.listar_lojas_pagina(),
+        'contar_lojas': lambda: database.contar_lojas(),
+        'listar_vendedores': lambda: database.listar_vendedores(),
+        'get_vendedores_by_loja': lambda: database.get_vendedores_by_loja(a['loja_id']),
+        'carregar_vendedores_com_disparos': lambda: database.carregar_vendedores_com_disparos(),
+        'carregar_vendedores_com_disparos[loja]': lambda: database.carregar_vendedores_com_disparos(a['loja_id']),
+        'listar_vendedores_pagina': lambda: database.listar_vendedores_pagina(),
+        'listar_vendedores_pagina[status]': lambda: database.listar_vendedores_pagina(status='Bloqueado'),
+        'contar_vendedores': lambda: database.contar_vendedores(),
+        'contar_vendedores[loja,status]': lambda: database.contar_vendedores(a['loja_id'], a['status']),
+        'get_kpis_painel': lambda: database.get_kpis_painel(),
+        'listar_vendedores_por_status': lambda: database.listar_vendedores_por_status(),
+        'get_total_disparos_periodo[4 semanas]': lambda: database.get_total_disparos_periodo(semana - timedelta(weeks=3), semana),
+        'listar_historico_disparos': lambda: database.listar_historico_disparos(a['vendedor_id'], semana - timedelta(weeks=4), date.today()),
+        'get_disparos_semanais': lambda: database.get_disparos_semanais(a['vendedor_id']),
+        'get_disparos_hoje': lambda: database.get_disparos_hoje(a['vendedor_id']),
+        'get_versao_dados': lambda: database.get_versao_dados(),
+        'update_status_vendedor': lambda: database.update_status_vendedor(a['vendedor_id'], a['status']),
+        'atualizar_status_em_lote[1]': lambda: database.atualizar_status_em_lote([(a['vendedor_id'], a['status'])]),
+        'update_disparos_dia': lambda: database.update_disparos_dia(a['vendedor_id'], a['disparos_dia']),
+        'update_disparos_semanais': lambda: database.update_disparos_semanais(a['vendedor_id'], semanal),
+    }
+
+
+def limpar_caches():
+    for c in cache._caches.values():
+        c.invalidar()
+
+
+def medir(funcao, repeticoes, frio):
+    funcao()  # aquecimento: conexão do pool, planos, imports
+    tempos = []
+    for _ in range(repeticoes):
+        if frio:
+            limpar_caches()
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+
+    # Contagem em uma passada separada (o registro do perfilador não entra nos tempos)
+    if frio:
+        limpar_caches()
+    perfilador.iniciar_requisicao('BENCH', '')
+    funcao()
+    consultas = perfilador.finalizar_requisicao()['consultas']
+    return dict(comum.resumo_tempos_ms(tempos), consultas=consultas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks das funções de database.py.")
+    parser.add_argument('--repeticoes', type=int, default=20)
+    parser.add_argument('--cache', choices=['frio', 'quente'], default='frio',
+                        help='frio: limpa os caches em processo antes de cada chamada (mede o banco).')
+    parser.add_argument('--filtro', default=None, help='Só os casos que contêm este texto.')
+    parser.add_argument('--json', action='store_true')
+    parser.add_argument('--salvar-baseline', metavar='NOME')
+    parser.add_argument('--comparar', metavar='NOME')
+    args = parser.parse_args()
+
+    a = amostra()
+    resultado = {
+        'meta': dict(comum.ambiente(), vendedores=a['total_vendedores'], repeticoes=args.repeticoes, cache=args.cache),
+        'itens': {},
+    }
+    for nome, funcao in casos(a).items():
+        if args.filtro and args.filtro not in nome:
+            continue
+        r = resultado['itens'][nome] = medir(funcao, args.repeticoes, args.cache == 'frio')
+        if not args.json:
+            print(f"{nome:<42} p50 {r['p50_ms']:>9.3f} ms  p95 {r['p95_ms']:>9.3f} ms  "
+                  f"p99 {r['p99_ms']:>9.3f} ms  {r['consultas']:>3} consultas", flush=True)
+
+    if args.json:
+        print(json.dumps(resultado, indent=2, ensure_ascii=False))
+    if args.salvar_baseline:
+        print(f"Baseline salva em {comum.salvar_baseline(args.salvar_baseline, resultado)}")
+    if args.comparar:
+        baseline = comum.carregar_baseline(args.comparar)
+        if baseline is None:
+            sys.exit(f"Baseline '{args.comparar}' não encontrada em {comum.PASTA_BASELINES}.")
+        regressoes, linhas = comum.comparar(resultado, baseline)
+        print(f"Comparação com '{args.comparar}' ({baseline['meta'].get('vendedores')} vendedores, {baseline['meta'].get('data')}):")
+        print('\n'.join(linhas) or '  sem diferenças acima da tolerância')
+        if regressoes:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
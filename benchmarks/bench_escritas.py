@@ -0,0 +1,109 @@
+# benchmarks/bench_escritas.py
+# Vazão de escritas com vários escritores ao mesmo tempo, cada um mudando o status de vendedores diferentes
+# (lojas diferentes). Toda transação de escrita passa pela versão dos dados (migrações 6 e 9) e pelo resumo por
+# loja (migração 8): mede quanto isso serializa as escritas. Em paralelo amostra o pg_stat_activity e conta
+# quantas conexões do benchmark estavam esperando lock de linha.
+#
+#   python benchmarks/bench_escritas.py                           # 1, 4, 16 e 32 escritores, 5s cada
+#   python benchmarks/bench_escritas.py --escritores 8 32 --duracao 10 --json
+import argparse
+import json
+import os
+import random
+import threading
+import time
+
+import comum
+
+# Uma conexão por escritor (mais a do amostrador): o pool não pode ser o gargalo medido
+os.environ.setdefault('DB_POOL_MAX', '64')
+import database  # noqa: E402
+
+STATUS = ('Conectado', 'Restrito', 'Bloqueado', 'Desconectado')
+
+
+def amostrar_esperas(parar, amostras, intervalo=0.01):
+    with database.conexao() as conn:
+        cur = conn.cursor()
+        while not parar.is_set():
+            cur.execute("""
+                SELECT COUNT(*) FILTER (WHERE state = 'active'),
+                       COUNT(*) FILTER (WHERE state = 'active' AND wait_event_type = 'Lock')
+                FROM pg_stat_activity
+                WHERE datname = current_database() AND pid <> pg_backend_pid() AND backend_type = 'client backend';
+            """)
+            amostras.append(cur.fetchone())
+            conn.commit()
+            time.sleep(intervalo)
+        cur.close()
+
+
+def rodar(ids_por_escritor, duracao):
+    tempos, lock = [], threading.Lock()
+    parar = threading.Event()
+
+    def escritor(semente, ids):
+        aleatorio = random.Random(semente)
+        meus = []
+        while not parar.is_set():
+            t = time.perf_counter()
+            database.update_status_vendedor(aleatorio.choice(ids), aleatorio.choice(STATUS))
+            meus.append(time.perf_counter() - t)
+        with lock:
+            tempos.extend(meus)
+
+    amostras = []
+    amostrador = threading.Thread(target=amostrar_esperas, args=(parar, amostras))
+    pool = [threading.Thread(target=escritor, args=(i, ids)) for i, ids in enumerate(ids_por_escritor)]
+    inicio = time.perf_counter()
+    amostrador.start()
+    for t in pool:
+        t.start()
+    time.sleep(duracao)
+    parar.set()
+    for t in pool:
+        t.join()
+    amostrador.join()
+    decorrido = time.perf_counter() - inicio
+
+    ativas = sum(a for a, _ in amostras)
+    esperando = sum(e for _, e in amostras)
+    return {
+        'escritores': len(ids_por_escritor),
+        'escritas': len(tempos),
+        'escritas_por_s': round(len(tempos) / decorrido, 1),
+        'esperando_lock_pct': round(100 * esperando / ativas, 1) if ativas else 0.0,
+        **comum.resumo_tempos_ms(tempos),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vazão de escritas concorrentes (versão dos dados e resumo por loja).")
+    parser.add_argument('--escritores', type=int, nargs='+', default=[1, 4, 16, 32])
+    parser.add_argument('--duracao', type=float, default=5.0)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    if max(args.escritores) + 1 > database.POOL_MAX:
+        raise SystemExit(f"DB_POOL_MAX={database.POOL_MAX} é menor que os escritores + 1.")
+    lojas = {}
+    for v in database.listar_vendedores():
+        lojas.setdefault(v['loja_id'], []).append(v['id'])
+    grupos = [ids for _, ids in sorted(lojas.items(), key=lambda item: item[0] or 0)]
+    if not grupos:
+        raise SystemExit("Banco sem vendedores: rode benchmarks/semear.py antes.")
+
+    # Escritor i escreve só em vendedores da loja i (módulo o número de lojas): não disputam as mesmas linhas
+    resultados = [rodar([grupos[i % len(grupos)] for i in range(n)], args.duracao) for n in args.escritores]
+    resultado = {'itens': {str(r['escritores']): r for r in resultados},
+                 'meta': {'duracao_s': args.duracao, 'lojas': len(grupos), **comum.ambiente()}}
+    if args.json:
+        print(json.dumps(resultado, indent=2))
+        return
+    for r in resultados:
+        print(f"{r['escritores']:>3} escritores  {r['escritas_por_s']:>8.1f} escritas/s  p50 {r['p50_ms']:>7.2f} ms  "
+              f"p95 {r['p95_ms']:>7.2f} ms  {r['esperando_lock_pct']:>5.1f}% das conexões ativas esperando lock")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+# benchmarks/bench_exportacao.py
+# Exportação em fluxo (exportacao.gerar: cursor nomeado + CSV/XLSX em blocos) contra o jeito de antes: todas as
+# linhas em uma lista de dicts (RealDictCursor + dict(r)) e o arquivo montado em memória. Cada medida roda num
+# interpretador novo e mede a RSS do processo ao longo da exportação, além do tempo até o primeiro bloco.
+# Para um milhão de linhas de histórico: python benchmarks/semear.py --vendedores 30000 --semanas 4 --limpar
+#
+#   python benchmarks/bench_exportacao.py
+#   python benchmarks/bench_exportacao.py --tipos disparos --formatos csv,xlsx,lista --json
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import comum
+
+# Roda dentro do interpretador medido; imprime o resultado em JSON
+_MEDIR = r'''
+import csv, io, json, os, sys, time
+sys.path.insert(0, os.getcwd())
+import psycopg2.extras
+import database, exportacao
+
+PAGINA = os.sysconf('SC_PAGE_SIZE')
+def rss_mb():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * PAGINA / 1024 / 1024
+
+tipo, formato = sys.argv[1], sys.argv[2]
+rss_inicial = pico = rss_mb()
+inicio = time.perf_counter()
+primeiro = None
+tamanho = 0
+
+if formato == 'lista':
+    sql = database._SQL_EXPORTAR_VENDEDORES if tipo == 'vendedores' else database._SQL_EXPORTAR_DISPAROS
+    with database.conexao() as conn:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cur.execute(sql.format(filtro=''))
+        dados = [dict(r) for r in cur.fetchall()]
+        cur.close()
+    pico = max(pico, rss_mb())
+    texto = io.StringIO()
+    escritor = csv.writer(texto, delimiter=';')
+    escritor.writerow(database.COLUNAS_EXPORTACAO[tipo])
+    escritor.writerows(r.values() for r in dados)
+    conteudo = texto.getvalue().encode('utf-8-sig')
+    pico = max(pico, rss_mb())
+    primeiro = time.perf_counter() - inicio
+    tamanho = len(conteudo)
+else:
+    blocos = 0
+    for pedaco in exportacao.gerar(tipo, formato):
+        if primeiro is None:
+            primeiro = time.perf_counter() - inicio
+        tamanho += len(pedaco)
+        blocos += 1
+        if blocos % 50 == 0:
+            pico = max(pico, rss_mb())
+    pico = max(pico, rss_mb())
+
+print(json.dumps({'total_s': time.perf_counter() - inicio, 'primeiro_bloco_s': primeiro, 'mb': tamanho / 1024 / 1024,
+                  'rss_inicial_mb': rss_inicial, 'rss_pico_mb': pico}))
+'''
+
+
+def contar_linhas(tipo):
+    import database
+    tabela = 'vendedores' if tipo == 'vendedores' else 'disparos_historico'
+    with database.conexao() as conn:
+        cur = conn.cursor()
+        cur.execute(f"SELECT COUNT(*) FROM {tabela};")
+        total = cur.fetchone()[0]
+        cur.close()
+    return total
+
+
+def medir(tipo, formato):
+    processo = subprocess.run([sys.executable, '-c', _MEDIR, tipo, formato], cwd=comum.RAIZ,
+                              env=dict(os.environ, LOG_ARQUIVO=os.devnull), capture_output=True, text=True)
+    if processo.returncode != 0:
+        sys.exit(f"Medição falhou ({tipo}/{formato}):\n{processo.stderr.strip()}")
+    r = json.loads(processo.stdout.strip().splitlines()[-1])
+    return {
+        'total_s': round(r['total_s'], 3),
+        'primeiro_bloco_ms': round(r['primeiro_bloco_s'] * 1000, 1),
+        'arquivo_mb': round(r['mb'], 1),
+        'rss_crescimento_mb': round(r['rss_pico_mb'] - r['rss_inicial_mb'], 1),
+        'rss_pico_mb': round(r['rss_pico_mb'], 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memória e tempo das exportações CSV/XLSX.")
+    parser.add_argument('--tipos', default='vendedores,disparos')
+    parser.add_argument('--formatos', default='csv,xlsx,lista', help="'lista' = lista de dicts + CSV em memória.")
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    resultado = {'meta': comum.ambiente(), 'itens': {}}
+    for tipo in args.tipos.split(','):
+        linhas = contar_linhas(tipo)
+        for formato in args.formatos.split(','):
+            r = medir(tipo, formato)
+            r['linhas_por_s'] = round(linhas / r['total_s']) if r['total_s'] else None
+            resultado['itens'][f"{tipo} {formato} ({linhas} linhas)"] = r
+
+    if args.json:
+        print(json.dumps(resultado, indent=2, ensure_ascii=False))
+        return
+    for nome, r in resultado['itens'].items():
+        print(f"{nome:<36} {r['total_s']:>8.2f} s  1º bloco {r['primeiro_bloco_ms']:>8.1f} ms  "
+              f"{r['arquivo_mb']:>7.1f} MB  RSS +{r['rss_crescimento_mb']:>7.1f} MB  {r['linhas_por_s']:>8} linhas/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+# benchmarks/bench_incrementos.py
+# Disparadores automáticos somando ao disparos_dia de poucos vendedores ao mesmo tempo, em três modos:
+#   sobrescrita: lê o valor e grava o absoluto (o que /editar_disparos_dia permite) -> perde somas
+#   direto:      database.incrementar_disparos_dia por evento (uma transação cada)
+#   buffer:      incrementos.BufferIncrementos juntando por vendedor e gravando em lote
+# Mede a latência de cada chamada, a vazão até tudo estar gravado e confere a soma no banco.
+#
+#   python benchmarks/bench_incrementos.py
+#   python benchmarks/bench_incrementos.py --threads 16 --eventos 500 --vendedores 20 --json
+import argparse
+import json
+import random
+import threading
+import time
+
+import comum
+import database
+import incrementos
+
+
+def disparos_dia(ids):
+    with database.conexao() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT COALESCE(SUM(disparos_dia), 0) FROM vendedores WHERE id = ANY(%s);", (ids,))
+        total = cur.fetchone()[0]
+        cur.close()
+    return total
+
+
+def rodar(modo, ids, threads, eventos):
+    buffer = incrementos.BufferIncrementos() if modo == 'buffer' else None
+
+    def enviar(vendedor_id, n):
+        if modo == 'sobrescrita':
+            database.update_disparos_dia(vendedor_id, database.get_disparos_hoje(vendedor_id) + n)
+        elif modo == 'direto':
+            database.incrementar_disparos_dia({vendedor_id: n})
+        else:
+            buffer.adicionar([(vendedor_id, n)])
+
+    tempos = []
+    lock = threading.Lock()
+
+    def trabalhador(semente):
+        aleatorio = random.Random(semente)
+        meus = []
+        for _ in range(eventos):
+            t = time.perf_counter()
+            enviar(aleatorio.choice(ids), 1)
+            meus.append(time.perf_counter() - t)
+        with lock:
+            tempos.extend(meus)
+
+    antes = disparos_dia(ids)
+    inicio = time.perf_counter()
+    pool = [threading.Thread(target=trabalhador, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    if buffer is not None:
+        buffer.encerrar()
+    total_s = time.perf_counter() - inicio
+
+    esperado = threads * eventos
+    gravado = disparos_dia(ids) - antes
+    return {
+        **comum.resumo_tempos_ms(tempos),
+        'eventos_por_s': round(esperado / total_s, 1),
+        'transacoes': buffer.estatisticas()['descargas'] if buffer is not None else esperado,
+        'somas_perdidas': esperado - gravado,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementos concorrentes de disparos_dia.")
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--eventos', type=int, default=200, help='Eventos por thread.')
+    parser.add_argument('--vendedores', type=int, default=10, help='Vendedores disputados pelas threads.')
+    parser.add_argument('--modos', default='sobrescrita,direto,buffer')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    ids = [v['id'] for v in database.listar_vendedores()[:args.vendedores]]
+    if not ids:
+        raise SystemExit("Sem vendedores: rode benchmarks/semear.py antes.")
+
+    resultado = {
+        'meta': {'threads': args.threads, 'eventos': args.eventos, 'vendedores': len(ids), **comum.ambiente()},
+        'itens': {modo: rodar(modo, ids, args.threads, args.eventos) for modo in args.modos.split(',')},
+    }
+
+    if args.json:
+        print(json.dumps(resultado, indent=2, ensure_ascii=False))
+        return
+    print(f"{args.threads} threads x {args.eventos} eventos em {len(ids)} vendedores")
+    for modo, r in resultado['itens'].items():
+        print(f"  {modo:<12} p50 {r['p50_ms']:>8.3f} ms  p99 {r['p99_ms']:>8.3f} ms  {r['eventos_por_s']:>9.1f} ev/s  "
+              f"{r['transacoes']:>6} transações  {r['somas_perdidas']:>5} perdidas")
+
+
+if __name__ == '__main__':
+    main()
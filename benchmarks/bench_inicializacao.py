@@ -0,0 +1,129 @@
+# benchmarks/bench_inicializacao.py
+# Quanto custa subir um worker: import do app, primeira página e primeiro PDF, com e sem o pai pré-carregado
+# (gunicorn --preload + criar_app()), e o perfil de import (python -X importtime) dos módulos mais caros.
+# Cada medida roda num interpretador novo; o "fork" imita o gunicorn: o pai importa e chama criar_app(),
+# os filhos nascem dele e atendem a primeira requisição.
+#
+#   python benchmarks/bench_inicializacao.py
+#   python benchmarks/bench_inicializacao.py --repeticoes 10 --json
+#   python benchmarks/bench_inicializacao.py --raiz /tmp/versao_antiga     # mesma medida em outro checkout
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+import comum
+
+# Roda dentro do interpretador medido; imprime {etapa: segundos} em JSON
+_MEDIR = r'''
+import json, os, sys, time
+inicio = time.perf_counter()
+sys.path.insert(0, os.getcwd())
+import app as aplicacao
+tempos = {'import': time.perf_counter() - inicio}
+criar = getattr(aplicacao, 'criar_app', None)
+
+def primeiras_requisicoes(tempos, inicio):
+    cliente = aplicacao.app.test_client()
+    t = time.perf_counter()
+    assert cliente.get('/painel').status_code == 200
+    tempos['primeira_pagina'] = time.perf_counter() - t
+    t = time.perf_counter()
+    assert cliente.get('/gerar_relatorio_pdf').status_code == 200
+    tempos['primeiro_pdf'] = time.perf_counter() - t
+    tempos['pronto'] = time.perf_counter() - inicio
+
+if sys.argv[1] == 'direto':
+    primeiras_requisicoes(tempos, inicio)
+    print(json.dumps(tempos))
+else:
+    t = time.perf_counter()
+    if criar:
+        criar()
+    tempos['criar_app'] = time.perf_counter() - t
+    filhos = []
+    for _ in range(int(sys.argv[2])):
+        leitura, escrita = os.pipe()
+        inicio_fork = time.perf_counter()
+        pid = os.fork()
+        if pid == 0:
+            os.close(leitura)
+            tempos_filho = {}
+            primeiras_requisicoes(tempos_filho, inicio_fork)
+            os.write(escrita, json.dumps(tempos_filho).encode())
+            os._exit(0)
+        os.close(escrita)
+        with os.fdopen(leitura) as f:
+            filhos.append(json.loads(f.read()))
+        os.waitpid(pid, 0)
+    print(json.dumps({'pai': tempos, 'filhos': filhos}))
+'''
+
+
+def rodar(raiz, argumentos):
+    env = dict(os.environ, LOG_ARQUIVO=os.devnull)
+    processo = subprocess.run([sys.executable, '-c', _MEDIR] + argumentos,
+                              cwd=raiz, env=env, capture_output=True, text=True)
+    if processo.returncode != 0:
+        sys.exit(f"Medição falhou:\n{processo.stderr.strip()}")
+    # O app pode imprimir avisos (locale) antes: o JSON é a última linha
+    return json.loads(processo.stdout.strip().splitlines()[-1])
+
+
+def perfil_import(raiz, top):
+    # -X importtime: "import time: self | cumulativo | módulo"; só o app e o que ele importa diretamente
+    processo = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=raiz,
+                              env=dict(os.environ, LOG_ARQUIVO=os.devnull), capture_output=True, text=True)
+    modulos = []
+    for linha in processo.stderr.splitlines():
+        m = re.match(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)', linha)
+        if m and len(m.group(3)) <= 3:
+            modulos.append((m.group(4).strip(), int(m.group(2)) / 1e6))
+    modulos.sort(key=lambda m: -m[1])
+    return {nome: round(s, 4) for nome, s in modulos[:top]}
+
+
+def resumir(amostras):
+    etapas = {}
+    for amostra in amostras:
+        for etapa, s in amostra.items():
+            etapas.setdefault(etapa, []).append(s)
+    return {etapa: round(comum.percentil(tempos, 50), 4) for etapa, tempos in etapas.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tempo de subida de um worker do app.")
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--top', type=int, default=12, help='Módulos listados no perfil de import.')
+    parser.add_argument('--raiz', default=comum.RAIZ, help='Checkout medido (padrão: este).')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    direto = [rodar(args.raiz, ['direto']) for _ in range(args.repeticoes)]
+    fork = rodar(args.raiz, ['fork', str(args.repeticoes)])
+    resultado = {
+        'meta': {'repeticoes': args.repeticoes, 'raiz': os.path.abspath(args.raiz), **comum.ambiente()},
+        'itens': {
+            'worker sem preload (mediana, s)': resumir(direto),
+            'pai com preload (s)': fork['pai'],
+            'worker nascido do pai (mediana, s)': resumir(fork['filhos']),
+        },
+        'perfil_import_s': perfil_import(args.raiz, args.top),
+    }
+
+    if args.json:
+        print(json.dumps(resultado, indent=2, ensure_ascii=False))
+        return
+    for nome, etapas in resultado['itens'].items():
+        print(f"{nome}:")
+        for etapa, s in etapas.items():
+            print(f"  {etapa:<16} {s * 1000:>9.1f} ms")
+    print("Perfil de import (cumulativo):")
+    for modulo, s in resultado['perfil_import_s'].items():
+        print(f"  {modulo:<32} {s * 1000:>9.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+# benchmarks/bench_pdf.py
+# Compara os motores de PDF (xhtml2pdf x reportlab) no relatório de loja.
+#
+#   python benchmarks/bench_pdf.py                    # 10, 100 e 1000 vendedores
+#   python benchmarks/bench_pdf.py --tamanhos 50 500 --repeticoes 5 --json
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import app as aplicacao
+import fila_pdf
+
+STATUS = ['Conectado', 'Restrito', 'Bloqueado', 'Desconectado']
+DIAS = ['segunda', 'terca', 'quarta', 'quinta', 'sexta', 'sabado', 'domingo']
+
+
+def vendedores_sinteticos(n, semente=42):
+    rnd = random.Random(semente)
+    return [{
+        'id': i,
+        'nome': f'Vendedor {i:05d}',
+        'status': rnd.choice(STATUS),
+        'base_tratada': rnd.random() < 0.7,
+        'disparos_dia': rnd.randint(0, 200),
+        'disparos_semanais': {d: rnd.randint(0, 200) for d in DIAS},
+    } for i in range(1, n + 1)]
+
+
+def renderizar(motor, vendedores):
+    loja = {'id': 1, 'nome': 'Loja Benchmark', 'responsavel': 'Responsável'}
+    documento = aplicacao.montar_documento_relatorio(loja, vendedores, 'Relato de benchmark.', motor)
+    return fila_pdf.renderizar_documento(documento)
+
+
+def medir(motor, n, repeticoes):
+    vendedores = vendedores_sinteticos(n)
+    renderizar(motor, vendedores)  # aquecimento: imports, fontes, templates
+
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        pdf = renderizar(motor, vendedores)
+        tempos.append(time.perf_counter() - inicio)
+
+    # Memória medida em uma passada separada para não distorcer os tempos
+    tracemalloc.start()
+    renderizar(motor, vendedores)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'motor': motor,
+        'vendedores': n,
+        'tempo_mediano_s': round(statistics.median(tempos), 4),
+        'tempo_min_s': round(min(tempos), 4),
+        'pico_memoria_mb': round(pico / 1024 / 1024, 2),
+        'tamanho_kb': round(len(pdf) / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--motores', nargs='+', default=list(fila_pdf.MOTORES_PDF), choices=fila_pdf.MOTORES_PDF)
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--json', action='store_true', help='Saída em JSON')
+    args = parser.parse_args()
+
+    resultados = []
+    with aplicacao.app.test_request_context():
+        for n in args.tamanhos:
+            for motor in args.motores:
+                resultados.append(medir(motor, n, args.repeticoes))
+                if not args.json:
+                    r = resultados[-1]
+                    print(f"{r['motor']:>10} {r['vendedores']:>6} vendedores: "
+                          f"{r['tempo_mediano_s']:>8.3f}s  {r['pico_memoria_mb']:>8.2f} MB  {r['tamanho_kb']:>8.1f} KB",
+                          flush=True)
+
+    if args.json:
+        print(json.dumps(resultados, indent=2))
+
+
+if __name__ == '__main__':
+    main()
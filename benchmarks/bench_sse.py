@@ -0,0 +1,304 @@
+# benchmarks/bench_sse.py
+# Teste de carga do /eventos: centenas de navegadores conectados, uma conexão LISTEN no worker.
+# Sobe o app em um servidor com threads, abre N conexões SSE e mede a latência do commit até cada navegador.
+# Com --processo sse a mesma medida roda contra o processo 'sse' do Procfile (gunicorn com worker gevent), que é
+# quem atende centenas de navegadores em produção.
+# Com --gunicorn sobe o comando web do Procfile (gthread, --threads ${WEB_THREADS:-64}), abre N conexões SSE e
+# mede as páginas atendidas enquanto elas estão abertas: cada assinante prende uma thread do worker.
+#
+#   python benchmarks/bench_sse.py                       # 300 assinantes, 50 eventos
+#   python benchmarks/bench_sse.py --assinantes 800 --eventos 100 --json
+#   python benchmarks/bench_sse.py --processo sse --assinantes 1000
+#   python benchmarks/bench_sse.py --gunicorn --assinantes 100 --requisicoes 200
+import argparse
+import json
+import logging
+import os
+import random
+import re
+import selectors
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from werkzeug.serving import make_server
+
+import app as aplicacao
+import comum
+import database
+import eventos
+
+
+def conexoes_no_banco():
+    with database.conexao() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT COUNT(*), COUNT(*) FILTER (WHERE query ILIKE 'LISTEN%%')
+            FROM pg_stat_activity
+            WHERE datname = current_database() AND pid <> pg_backend_pid();
+        """)
+        total, ouvindo = cur.fetchone()
+        cur.close()
+    return total, ouvindo
+
+
+def abrir_assinantes(porta, n):
+    seletor = selectors.DefaultSelector()
+    for i in range(n):
+        s = socket.create_connection(('127.0.0.1', porta))
+        s.sendall(f"GET /eventos HTTP/1.1\r\nHost: localhost\r\nAccept: text/event-stream\r\n\r\n".encode())
+        s.setblocking(False)
+        seletor.register(s, selectors.EVENT_READ, {'buffer': b'', 'recebidos': []})
+    return seletor
+
+
+def ler_eventos(seletor, esperados, prazo, parar):
+    # Uma thread lê todos os sockets; guarda (instante, status) de cada evento 'status'
+    while not parar.is_set() and time.monotonic() < prazo:
+        for chave, _ in seletor.select(timeout=0.2):
+            dados = chave.data
+            try:
+                parte = chave.fileobj.recv(65536)
+            except BlockingIOError:
+                continue
+            if not parte:
+                seletor.unregister(chave.fileobj)
+                continue
+            agora = time.perf_counter()
+            dados['buffer'] += parte
+            *blocos, dados['buffer'] = dados['buffer'].split(b'\n\n')
+            for bloco in blocos:
+                if b'event: status' in bloco:
+                    carga = json.loads(bloco.split(b'data: ', 1)[1])
+                    dados['recebidos'].append((agora, carga['vendedores'][0]['status']))
+        if all(len(c.data['recebidos']) >= esperados for c in seletor.get_map().values()):
+            return
+
+
+def executar(n_assinantes, n_eventos, intervalo, processo=None):
+    if processo is None:
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        # O servidor do werkzeug abre uma thread por conexão, sem o teto de threads do gthread: aqui o limite
+        # por worker não protege nada e só impediria medir a entrega para centenas de navegadores
+        eventos.SSE_MAX_ASSINANTES = n_assinantes
+        servidor = make_server('127.0.0.1', 0, aplicacao.app, threaded=True)
+        servidor.socket.listen(n_assinantes + 64)
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        porta = servidor.server_port
+        ouvinte = lambda: eventos.get_ouvinte().estatisticas()
+        encerrar = servidor.shutdown
+    else:
+        porta, servidor = subir_gunicorn(processo)
+        ouvinte = lambda: pedir_json(porta, '/eventos_stats')
+        # SIGQUIT: desligamento rápido; o gracioso esperaria os streams SSE até o graceful-timeout
+        encerrar = lambda: (servidor.send_signal(signal.SIGQUIT), servidor.wait(timeout=30))
+
+    with database.conexao() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT id FROM vendedores ORDER BY id LIMIT 1;")
+        linha = cur.fetchone()
+        cur.close()
+    if not linha:
+        raise SystemExit("Cadastre ao menos um vendedor antes de rodar o teste de carga.")
+    vendedor_id = linha[0]
+
+    base_total, _ = conexoes_no_banco()
+    seletor = abrir_assinantes(porta, n_assinantes)
+    inicio_espera = time.monotonic()
+    while ouvinte()['assinantes'] < n_assinantes or not ouvinte()['conectado']:
+        if time.monotonic() - inicio_espera > 30:
+            encerrar()
+            raise SystemExit(f"Só {ouvinte()['assinantes']} assinantes conectaram em 30s.")
+        time.sleep(0.05)
+    pico_total, ouvindo = conexoes_no_banco()
+
+    parar = threading.Event()
+    leitor = threading.Thread(target=ler_eventos, args=(seletor, n_eventos, time.monotonic() + 60 + n_eventos * intervalo, parar))
+    leitor.start()
+
+    # Cada escrita troca o status; o k-ésimo evento recebido corresponde ao k-ésimo commit
+    rnd = random.Random(7)
+    commits = []
+    for _ in range(n_eventos):
+        database.update_status_vendedor(vendedor_id, rnd.choice(database.STATUS_VENDEDOR))
+        commits.append(time.perf_counter())
+        time.sleep(intervalo)
+    leitor.join()
+    parar.set()
+
+    latencias, entregues = [], 0
+    for chave in list(seletor.get_map().values()):
+        recebidos = chave.data['recebidos']
+        entregues += len(recebidos)
+        latencias += [(t - commits[k]) * 1000 for k, (t, _) in enumerate(recebidos[:n_eventos])]
+        chave.fileobj.close()
+    estatisticas = ouvinte()
+    encerrar()
+
+    latencias.sort()
+    return {
+        'assinantes': n_assinantes,
+        'eventos': n_eventos,
+        'entregas_esperadas': n_assinantes * n_eventos,
+        'entregas': entregues,
+        'latencia_p50_ms': round(statistics.median(latencias), 2) if latencias else None,
+        'latencia_p95_ms': round(latencias[int(len(latencias) * 0.95) - 1], 2) if latencias else None,
+        'latencia_max_ms': round(latencias[-1], 2) if latencias else None,
+        'conexoes_banco_antes': base_total,
+        'conexoes_banco_com_assinantes': pico_total,
+        'conexoes_listen': ouvindo,
+        'servidor': comando_procfile(processo, porta) if processo else 'werkzeug (thread por conexão)',
+        'ouvinte': estatisticas,
+    }
+
+
+# ==============================
+# GUNICORN (configuração do Procfile)
+# ==============================
+def comando_procfile(processo, porta):
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Procfile')) as f:
+        comando = re.search(rf'^{processo}:\s*(.+)$', f.read(), re.MULTILINE).group(1)
+    # O 'sse' já escolhe a porta (SSE_PORTA); o 'web' recebe --bind aqui. 'env' aceita o prefixo VAR=valor do Procfile
+    porta_opcao = '' if '--bind' in comando else f" --bind 127.0.0.1:{porta}"
+    return f"export SSE_PORTA={porta}; exec env {comando}{porta_opcao} --workers 1 --backlog 2048"
+
+
+def subir_gunicorn(processo):
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        porta = s.getsockname()[1]
+    servidor = subprocess.Popen(['bash', '-c', comando_procfile(processo, porta)],
+                                cwd=os.path.join(os.path.dirname(__file__), '..'),
+                                env=dict(os.environ, LOG_ARQUIVO=os.devnull), stdout=subprocess.DEVNULL,
+                                stderr=subprocess.DEVNULL)
+    esperar_servidor(porta)
+    return porta, servidor
+
+
+def pedir_json(porta, caminho):
+    with socket.create_connection(('127.0.0.1', porta), timeout=10) as s:
+        s.sendall(f"GET {caminho} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n".encode())
+        resposta = b''
+        while parte := s.recv(65536):
+            resposta += parte
+    return json.loads(resposta.split(b'\r\n\r\n', 1)[1])
+
+
+def esperar_servidor(porta, prazo=60):
+    limite = time.monotonic() + prazo
+    while time.monotonic() < limite:
+        try:
+            with socket.create_connection(('127.0.0.1', porta), timeout=1) as s:
+                s.sendall(b"GET /pool_stats HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n")
+                if s.recv(64).startswith(b'HTTP/1.1 200'):
+                    return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise SystemExit("gunicorn não respondeu em 60s.")
+
+
+def abrir_assinante(porta, timeout):
+    # Devolve (socket, status HTTP); None quando a resposta não chegou no prazo (sem thread livre no worker)
+    s = socket.create_connection(('127.0.0.1', porta))
+    s.settimeout(timeout)
+    s.sendall(b"GET /eventos HTTP/1.1\r\nHost: localhost\r\nAccept: text/event-stream\r\n\r\n")
+    try:
+        return s, int(s.recv(64).split(b' ', 2)[1])
+    except (socket.timeout, IndexError, ValueError):
+        return s, None
+
+
+def pedir_pagina(porta, caminho, timeout):
+    inicio = time.perf_counter()
+    try:
+        with socket.create_connection(('127.0.0.1', porta), timeout=timeout) as s:
+            s.sendall(f"GET {caminho} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n".encode())
+            status = s.recv(64).split(b' ', 2)[1]
+            while s.recv(65536):
+                pass
+        return time.perf_counter() - inicio, int(status)
+    except (OSError, IndexError, ValueError):
+        return None, None
+
+
+def executar_gunicorn(n_assinantes, n_requisicoes, caminho, concorrencia, timeout):
+    porta, servidor = subir_gunicorn('web')
+    try:
+        assinantes = [abrir_assinante(porta, timeout) for _ in range(n_assinantes)]
+        status = [st for _, st in assinantes]
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(concorrencia) as executor:
+            respostas = list(executor.map(lambda _: pedir_pagina(porta, caminho, timeout), range(n_requisicoes)))
+        total_s = time.perf_counter() - inicio
+        for s, _ in assinantes:
+            s.close()
+    finally:
+        servidor.terminate()
+        servidor.wait(timeout=30)
+
+    tempos = [t for t, st in respostas if st == 200]
+    return {
+        'comando': comando_procfile('web', porta),
+        'assinantes': n_assinantes,
+        'sse_aceitos': status.count(200),
+        'sse_recusados_503': status.count(503),
+        'sse_sem_resposta': status.count(None),
+        'requisicoes': n_requisicoes,
+        'paginas_ok': len(tempos),
+        'paginas_sem_resposta': sum(1 for t, _ in respostas if t is None),
+        'paginas_por_s': round(len(tempos) / total_s, 1),
+        **(comum.resumo_tempos_ms(tempos) if tempos else {}),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--assinantes', type=int, default=300)
+    parser.add_argument('--eventos', type=int, default=50)
+    parser.add_argument('--intervalo', type=float, default=0.05, help='Segundos entre escritas.')
+    parser.add_argument('--processo', choices=['sse'], default=None,
+                        help="Mede a entrega no processo 'sse' do Procfile em vez do servidor do werkzeug.")
+    parser.add_argument('--gunicorn', action='store_true', help='Sobe o comando web do Procfile.')
+    parser.add_argument('--requisicoes', type=int, default=200, help='Páginas pedidas com os assinantes abertos (--gunicorn).')
+    parser.add_argument('--caminho', default='/painel')
+    parser.add_argument('--concorrencia', type=int, default=8)
+    parser.add_argument('--timeout', type=float, default=10, help='Segundos até desistir de uma resposta (--gunicorn).')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    if args.gunicorn:
+        r = executar_gunicorn(args.assinantes, args.requisicoes, args.caminho, args.concorrencia, args.timeout)
+        if args.json:
+            print(json.dumps(r, indent=2))
+            return
+        print(r['comando'])
+        print(f"{r['assinantes']} assinantes: {r['sse_aceitos']} aceitos, {r['sse_recusados_503']} recusados (503), "
+              f"{r['sse_sem_resposta']} sem resposta em {args.timeout:g}s")
+        print(f"{args.caminho} com os assinantes abertos: {r['paginas_ok']}/{r['requisicoes']} ok, "
+              f"{r['paginas_sem_resposta']} sem resposta, {r['paginas_por_s']} páginas/s"
+              + (f", p50 {r['p50_ms']} ms, p99 {r['p99_ms']} ms" if r['paginas_ok'] else ''))
+        return
+
+    resultado = executar(args.assinantes, args.eventos, args.intervalo, args.processo)
+    if args.json:
+        print(json.dumps(resultado, indent=2))
+        return
+    print(f"{resultado['assinantes']} assinantes x {resultado['eventos']} eventos: "
+          f"{resultado['entregas']}/{resultado['entregas_esperadas']} entregas")
+    print(f"latência commit -> navegador: p50 {resultado['latencia_p50_ms']} ms, "
+          f"p95 {resultado['latencia_p95_ms']} ms, máx {resultado['latencia_max_ms']} ms")
+    print(f"conexões no banco: {resultado['conexoes_banco_antes']} antes, "
+          f"{resultado['conexoes_banco_com_assinantes']} com assinantes ({resultado['conexoes_listen']} em LISTEN)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+# benchmarks/bench_templates.py
+# Custo do dashboard.html antes e depois do cache de fragmentos e do bytecode do Jinja, contra o banco semeado
+# (benchmarks/semear.py):
+#   - compilação: dashboard.html num Environment novo (como num worker recém-criado), sem e com bytecode em disco;
+#   - páginas: GET /painel, /lojas e /vendedores com CACHE_FRAGMENTOS desligado e com o fragmento já no cache.
+#
+#   python benchmarks/bench_templates.py
+#   python benchmarks/bench_templates.py --repeticoes 100 --json
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import comum
+
+os.environ.setdefault('LOG_ARQUIVO', os.devnull)
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+import app as aplicacao
+import database
+import fragmentos
+
+PAGINAS = ['/painel', '/lojas', '/vendedores', '/vendedores?status=Bloqueado']
+
+
+def medir_compilacao(repeticoes):
+    pasta_templates = os.path.join(aplicacao.app.root_path, aplicacao.app.template_folder)
+    with tempfile.TemporaryDirectory() as pasta_bytecode:
+        def compilar(bytecode):
+            # Environment novo a cada vez: nada do cache de templates em memória
+            env = Environment(loader=FileSystemLoader(pasta_templates), bytecode_cache=bytecode)
+            inicio = time.perf_counter()
+            env.get_template('dashboard.html')
+            for nome in ('_cards_status.html', '_tabela_lojas.html', '_tabela_vendedores.html'):
+                env.get_template(nome)
+            return time.perf_counter() - inicio
+
+        sem = [compilar(None) for _ in range(repeticoes)]
+        bytecode = FileSystemBytecodeCache(pasta_bytecode)
+        compilar(bytecode)  # grava o bytecode
+        com = [compilar(bytecode) for _ in range(repeticoes)]
+    return {'compilar[sem bytecode]': comum.resumo_tempos_ms(sem),
+            'compilar[bytecode]': comum.resumo_tempos_ms(com)}
+
+
+def medir_paginas(repeticoes):
+    cliente = aplicacao.app.test_client()
+    itens = {}
+    for ligado in (False, True):
+        fragmentos.CACHE_FRAGMENTOS = ligado
+        fragmentos.limpar()
+        for url in PAGINAS:
+            cliente.get(url)  # aquecimento: template em memória e, ligado, o fragmento no cache
+            tempos = []
+            for _ in range(repeticoes):
+                inicio = time.perf_counter()
+                resposta = cliente.get(url)
+                tempos.append(time.perf_counter() - inicio)
+                if resposta.status_code != 200:
+                    sys.exit(f"{url} respondeu {resposta.status_code}")
+            itens[f"GET {url}[{'fragmentos' if ligado else 'sem cache'}]"] = comum.resumo_tempos_ms(tempos)
+    return itens
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compilação e renderização do dashboard.html.")
+    parser.add_argument('--repeticoes', type=int, default=30)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    if not database.listar_vendedores_pagina(limite=1)['itens']:
+        sys.exit("Banco vazio: rode benchmarks/semear.py antes.")
+
+    itens = medir_compilacao(args.repeticoes)
+    itens.update(medir_paginas(args.repeticoes))
+    resultado = {'meta': {'repeticoes': args.repeticoes, 'backend': database.BACKEND, **comum.ambiente()},
+                 'itens': itens}
+
+    if args.json:
+        print(json.dumps(resultado, indent=2, ensure_ascii=False))
+        return
+    print(f"{'caso':<48} {'p50':>10} {'p95':>10}")
+    for nome, r in itens.items():
+        print(f"{nome:<48} {r['p50_ms']:>7.3f} ms {r['p95_ms']:>7.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
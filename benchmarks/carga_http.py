@@ -0,0 +1,209 @@
+# benchmarks/carga_http.py
+# Carga HTTP concorrente nas rotas do Flask: latência p50/p95/p99, vazão e consultas SQL por rota.
+# Sobe o app em um subprocesso (gunicorn se instalado, senão o servidor do Flask) contra o banco
+# semeado por benchmarks/semear.py. Numa primeira passada, com PERFILAR_SQL=1, lê as consultas de
+# cada rota no cabeçalho X-Perfil-SQL. Depois mede a carga com o perfilador desligado.
+#
+#   python benchmarks/carga_http.py                                   # 8 conexões, 5s por rota
+#   python benchmarks/carga_http.py --concorrencia 32 --duracao 15 --workers 2 --threads 16
+#   python benchmarks/carga_http.py --rotas /painel /api/painel --salvar-baseline http_1000
+#   python benchmarks/carga_http.py --url http://127.0.0.1:8000       # servidor já rodando
+import argparse
+import http.client
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+
+import comum
+
+ROTAS_PADRAO = [
+    '/painel',
+    '/vendedores',
+    '/lojas',
+    '/api/painel',
+    '/api/vendedores',
+    '/gerar_relatorio_pdf?motor=reportlab',
+    '/gerar_relatorio_pdf?motor=xhtml2pdf',
+]
+
+
+# ==============================
+# SERVIDOR EM SUBPROCESSO
+# ==============================
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def subir_servidor(workers, threads, perfilar):
+    porta = porta_livre()
+    env = dict(os.environ, LOG_ARQUIVO=os.devnull, PERFILAR_SQL='1' if perfilar else '0', SQL_LENTO_MS='1e12')
+    try:
+        import gunicorn  # noqa: F401
+        comando = [sys.executable, '-m', 'gunicorn', 'app:app', '-b', f'127.0.0.1:{porta}',
+                   '-w', str(workers), '-k', 'gthread', '--threads', str(threads), '--log-level', 'warning']
+    except ImportError:
+        comando = [sys.executable, '-m', 'flask', '--app', 'app', 'run', '--port', str(porta), '--with-threads']
+    processo = subprocess.Popen(comando, cwd=comum.RAIZ, env=env,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    prazo = time.monotonic() + 30
+    while time.monotonic() < prazo:
+        if processo.poll() is not None:
+            sys.exit(f"Servidor saiu com código {processo.returncode}: {' '.join(comando)}")
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', porta, timeout=2)
+            conn.request('GET', '/pool_stats')
+            conn.getresponse().read()
+            conn.close()
+            return processo, f'http://127.0.0.1:{porta}'
+        except OSError:
+            time.sleep(0.2)
+    processo.kill()
+    sys.exit("Servidor não respondeu em 30s.")
+
+
+def derrubar(processo):
+    processo.terminate()
+    try:
+        processo.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        processo.kill()
+
+
+# ==============================
+# CLIENTE
+# ==============================
+def contar_consultas(url, rotas):
+    alvo = urllib.parse.urlsplit(url)
+    contagens = {}
+    for rota in rotas:
+        conn = http.client.HTTPConnection(alvo.hostname, alvo.port, timeout=120)
+        conn.request('GET', rota)
+        resposta = conn.getresponse()
+        resposta.read()
+        achado = re.search(r'consultas=(\d+)', resposta.getheader('X-Perfil-SQL') or '')
+        contagens[rota] = int(achado.group(1)) if achado else None
+        conn.close()
+    return contagens
+
+
+def _trabalhador(alvo, rota, prazo, tempos, erros, lock):
+    conn = http.client.HTTPConnection(alvo.hostname, alvo.port, timeout=120)
+    locais, erros_locais = [], 0
+    while time.monotonic() < prazo:
+        inicio = time.perf_counter()
+        try:
+            conn.request('GET', rota)
+            resposta = conn.getresponse()
+            resposta.read()
+            if resposta.status >= 400:
+                erros_locais += 1
+            else:
+                locais.append(time.perf_counter() - inicio)
+        except (OSError, http.client.HTTPException):
+            erros_locais += 1
+            conn.close()
+            conn = http.client.HTTPConnection(alvo.hostname, alvo.port, timeout=120)
+    conn.close()
+    with lock:
+        tempos.extend(locais)
+        erros[0] += erros_locais
+
+
+def carregar_rota(url, rota, concorrencia, duracao, aquecimento):
+    alvo = urllib.parse.urlsplit(url)
+    lock = threading.Lock()
+    # Aquecimento: caches, planos e conexões do pool antes de medir
+    _trabalhador(alvo, rota, time.monotonic() + aquecimento, [], [0], lock)
+
+    tempos, erros = [], [0]
+    inicio = time.monotonic()
+    threads = [threading.Thread(target=_trabalhador, args=(alvo, rota, inicio + duracao, tempos, erros, lock))
+               for _ in range(concorrencia)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    decorrido = time.monotonic() - inicio
+
+    if not tempos:
+        return {'requisicoes': 0, 'erros': erros[0], 'rps': 0.0}
+    resumo = comum.resumo_tempos_ms(tempos)
+    resumo.pop('min_ms')
+    return dict(resumo, requisicoes=len(tempos), erros=erros[0], rps=round(len(tempos) / decorrido, 1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carga HTTP concorrente nas rotas do app.")
+    parser.add_argument('--rotas', nargs='+', default=ROTAS_PADRAO)
+    parser.add_argument('--concorrencia', type=int, default=8, help='Conexões simultâneas por rota.')
+    parser.add_argument('--duracao', type=float, default=5, help='Segundos de carga por rota.')
+    parser.add_argument('--aquecimento', type=float, default=1)
+    parser.add_argument('--workers', type=int, default=2, help='Workers do gunicorn.')
+    parser.add_argument('--threads', type=int, default=8, help='Threads por worker do gunicorn.')
+    parser.add_argument('--url', default=None, help='Usa um servidor já rodando (sem contagem de consultas, '
+                                                    'a menos que ele tenha PERFILAR_SQL=1).')
+    parser.add_argument('--sem-contagem', action='store_true', help='Pula a passada com o perfilador.')
+    parser.add_argument('--json', action='store_true')
+    parser.add_argument('--salvar-baseline', metavar='NOME')
+    parser.add_argument('--comparar', metavar='NOME')
+    args = parser.parse_args()
+
+    consultas = {}
+    if args.url:
+        if not args.sem_contagem:
+            consultas = contar_consultas(args.url, args.rotas)
+        url, processo = args.url, None
+    else:
+        if not args.sem_contagem:
+            processo, url = subir_servidor(1, 1, perfilar=True)
+            try:
+                consultas = contar_consultas(url, args.rotas)
+            finally:
+                derrubar(processo)
+        processo, url = subir_servidor(args.workers, args.threads, perfilar=False)
+
+    resultado = {
+        'meta': dict(comum.ambiente(), concorrencia=args.concorrencia, duracao_s=args.duracao,
+                     workers=args.workers, threads=args.threads, url=args.url or 'subprocesso'),
+        'itens': {},
+    }
+    try:
+        for rota in args.rotas:
+            r = carregar_rota(url, rota, args.concorrencia, args.duracao, args.aquecimento)
+            if consultas.get(rota) is not None:
+                r['consultas'] = consultas[rota]
+            resultado['itens'][rota] = r
+            if not args.json:
+                print(f"{rota:<40} {r['rps']:>8.1f} req/s  p50 {r.get('p50_ms', 0):>9.2f} ms  "
+                      f"p95 {r.get('p95_ms', 0):>9.2f} ms  p99 {r.get('p99_ms', 0):>9.2f} ms  "
+                      f"{r['erros']:>4} erros  {r.get('consultas', '?'):>3} consultas", flush=True)
+    finally:
+        if processo is not None:
+            derrubar(processo)
+
+    if args.json:
+        print(json.dumps(resultado, indent=2, ensure_ascii=False))
+    if args.salvar_baseline:
+        print(f"Baseline salva em {comum.salvar_baseline(args.salvar_baseline, resultado)}")
+    if args.comparar:
+        baseline = comum.carregar_baseline(args.comparar)
+        if baseline is None:
+            sys.exit(f"Baseline '{args.comparar}' não encontrada em {comum.PASTA_BASELINES}.")
+        regressoes, linhas = comum.comparar(resultado, baseline)
+        print(f"Comparação com '{args.comparar}' ({baseline['meta'].get('data')}):")
+        print('\n'.join(linhas) or '  sem diferenças acima da tolerância')
+        if regressoes:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
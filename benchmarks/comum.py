@@ -0,0 +1,111 @@
+# benchmarks/comum.py
+# Utilitários compartilhados pelos benchmarks: percentis e baselines versionadas em benchmarks/baselines/.
+import json
+import math
+import os
+import platform
+import sys
+import time
+
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+PASTA_BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+
+# Quanto uma métrica pode piorar (em %) antes de ser apontada como regressão
+TOLERANCIA_PCT = float(os.getenv("BENCH_TOLERANCIA_PCT", "20"))
+# ...e por quantos ms, no mínimo (abaixo disso é ruído de medição em chamadas de 1 ms)
+PISO_MS = float(os.getenv("BENCH_PISO_MS", "1"))
+
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+
+def percentil(valores, p):
+    # Nearest-rank: o mesmo método em todos os benchmarks para os números serem comparáveis
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    return ordenados[max(0, math.ceil(p / 100 * len(ordenados)) - 1)]
+
+
+def resumo_tempos_ms(tempos_s):
+    ms = [t * 1000 for t in tempos_s]
+    return {
+        'p50_ms': round(percentil(ms, 50), 3),
+        'p95_ms': round(percentil(ms, 95), 3),
+        'p99_ms': round(percentil(ms, 99), 3),
+        'min_ms': round(min(ms), 3),
+    }
+
+
+def ambiente():
+    return {
+        'python': platform.python_version(),
+        'maquina': platform.machine(),
+        'cpus': os.cpu_count(),
+        'data': time.strftime('%Y-%m-%d'),
+    }
+
+
+# ==============================
+# BASELINES
+# ==============================
+def caminho_baseline(nome):
+    return os.path.join(PASTA_BASELINES, f"{nome}.json")
+
+
+def salvar_baseline(nome, resultado):
+    # JSON ordenado e indentado: uma regressão aparece como diff de poucas linhas no git
+    os.makedirs(PASTA_BASELINES, exist_ok=True)
+    with open(caminho_baseline(nome), 'w', encoding='utf-8') as f:
+        json.dump(resultado, f, indent=2, sort_keys=True, ensure_ascii=False)
+        f.write('\n')
+    return caminho_baseline(nome)
+
+
+def carregar_baseline(nome):
+    try:
+        with open(caminho_baseline(nome), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+# Contagens exatas: qualquer aumento é regressão, sem tolerância
+METRICAS_EXATAS = ('consultas', 'erros')
+
+
+def _maior_melhor(metrica):
+    return metrica in ('rps', 'requisicoes')
+
+
+def comparar(atual, baseline, tolerancia_pct=TOLERANCIA_PCT):
+    # atual/baseline: {'itens': {nome: {metrica: valor}}}
+    linhas, regressoes = [], 0
+    for nome, metricas in sorted(atual['itens'].items()):
+        base = baseline['itens'].get(nome)
+        if base is None:
+            linhas.append(f"  {nome}: novo (sem baseline)")
+            continue
+        for metrica, valor in sorted(metricas.items()):
+            anterior = base.get(metrica)
+            if not isinstance(valor, (int, float)) or not isinstance(anterior, (int, float)):
+                continue
+            if metrica in METRICAS_EXATAS:
+                if valor != anterior:
+                    regressoes += valor > anterior
+                    linhas.append(f"  {'REGRESSÃO ' if valor > anterior else ''}{nome}.{metrica}: {anterior} -> {valor}")
+                continue
+            if anterior == 0:
+                continue
+            variacao = (valor - anterior) / anterior * 100
+            piorou = -variacao if _maior_melhor(metrica) else variacao
+            if metrica.endswith('_ms') and abs(valor - anterior) < PISO_MS:
+                continue
+            if piorou > tolerancia_pct:
+                regressoes += 1
+                linhas.append(f"  REGRESSÃO {nome}.{metrica}: {anterior} -> {valor} ({variacao:+.1f}%)")
+            elif piorou < -tolerancia_pct:
+                linhas.append(f"  melhora {nome}.{metrica}: {anterior} -> {valor} ({variacao:+.1f}%)")
+    for nome in sorted(set(baseline['itens']) - set(atual['itens'])):
+        linhas.append(f"  {nome}: presente só na baseline")
+    return regressoes, linhas
@@ -0,0 +1,148 @@
+# benchmarks/semear.py
+# Popula um Postgres local com dados sintéticos (lojas, vendedores, disparos semanais e histórico)
+# na escala pedida, para os benchmarks rodarem em 100, 1.000 ou 10.000 vendedores.
+#
+#   python benchmarks/semear.py --vendedores 1000 --limpar          # apaga os dados e recria
+#   python benchmarks/semear.py --lojas 200 --vendedores 10000 --semanas 8 --limpar
+#   python benchmarks/semear.py --vendedores 1000 --limpar --sqlite /tmp/gestao.db   # e copia para um SQLite
+import argparse
+import io
+import os
+import random
+import re
+import sys
+import time
+
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+import psycopg2.extras
+
+import armazenamento_sqlite
+import database
+import migracoes
+
+STATUS_PESOS = {'Conectado': 60, 'Restrito': 15, 'Bloqueado': 10, 'Desconectado': 15}
+TABELAS = ['fechamentos_dia', 'resumo_lojas', 'disparos_semana_resumo', 'disparos_historico', 'disparos_semanais', 'eventos',
+           'vendedores_removidos', 'vendedores', 'lojas']
+
+
+def banco_local(url):
+    # Só limpa sem --forcar quando o banco é claramente local (socket, localhost ou 127.0.0.1)
+    return bool(re.search(r'@(localhost|127\.0\.0\.1)?[:/]|host=/|host=localhost|host=127\.0\.0\.1', url or ''))
+
+
+def limpar(cur):
+    cur.execute(f"TRUNCATE {', '.join(TABELAS)} RESTART IDENTITY CASCADE;")
+
+
+def semear(n_lojas, n_vendedores, semanas, semente, com_semanal=0.9):
+    rnd = random.Random(semente)
+    status, pesos = zip(*STATUS_PESOS.items())
+    tempos = {}
+
+    with database.conexao() as conn:
+        cur = conn.cursor()
+
+        inicio = time.perf_counter()
+        lojas = psycopg2.extras.execute_values(cur, "INSERT INTO lojas (nome, responsavel) VALUES %s RETURNING id;", [
+            (f"Loja {i:04d}", f"Responsável {rnd.choice('ABCDEFGHIJ')}{i}") for i in range(1, n_lojas + 1)
+        ], page_size=1000, fetch=True)
+        loja_ids = [r[0] for r in lojas]
+        tempos['lojas_s'] = time.perf_counter() - inicio
+
+        # COPY: dezenas de milhares de linhas em uma ida ao banco
+        inicio = time.perf_counter()
+        buffer = io.StringIO()
+        for i in range(1, n_vendedores + 1):
+            st = rnd.choices(status, pesos)[0]
+            buffer.write('\t'.join([
+                f"Vendedor {i:06d}", f"vendedor{i}@exemplo.com", str(rnd.choice(loja_ids)), st,
+                't' if rnd.random() < 0.7 else 'f', str(rnd.randint(0, 200)), st,
+                f"{rnd.randint(1, 28):02d}/{rnd.randint(1, 12):02d}/2025",
+            ]) + '\n')
+        buffer.seek(0)
+        cur.copy_expert("""
+            COPY vendedores (nome, email, loja_id, status, base_tratada, disparos_dia, ultimo_status_tipo, ultimo_status_data)
+            FROM STDIN
+        """, buffer)
+        cur.execute("SELECT id FROM vendedores ORDER BY id;")
+        vendedor_ids = [r[0] for r in cur.fetchall()]
+        tempos['vendedores_s'] = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        buffer = io.StringIO()
+        for vid in vendedor_ids:
+            if rnd.random() < com_semanal:
+                buffer.write('\t'.join([str(vid)] + [str(rnd.randint(0, 150)) for _ in database.DIAS_SEMANA]) + '\n')
+        buffer.seek(0)
+        cur.copy_expert(f"COPY disparos_semanais (vendedor_id, {', '.join(database.DIAS_SEMANA)}) FROM STDIN", buffer)
+        tempos['disparos_semanais_s'] = time.perf_counter() - inicio
+
+        # Histórico gerado no próprio banco; setseed deixa o resultado reprodutível
+        inicio = time.perf_counter()
+        cur.execute("SELECT setseed(%s);", ((semente % 1000) / 1000.0,))
+        cur.execute("""
+            INSERT INTO disparos_historico (vendedor_id, data, disparos)
+            SELECT v.id, d::date, (random() * 150)::int
+            FROM vendedores v
+            CROSS JOIN generate_series(date_trunc('week', CURRENT_DATE) - make_interval(weeks => %s),
+                                       CURRENT_DATE, interval '1 day') AS d
+            ON CONFLICT (vendedor_id, data) DO NOTHING;
+        """, (semanas,))
+        cur.execute("""
+            INSERT INTO disparos_semana_resumo (semana, vendedor_id, total)
+            SELECT date_trunc('week', data)::date, vendedor_id, SUM(disparos)
+            FROM disparos_historico
+            GROUP BY 1, 2
+            ON CONFLICT (semana, vendedor_id) DO UPDATE SET total = EXCLUDED.total;
+        """)
+        tempos['historico_s'] = time.perf_counter() - inicio
+
+        # Caches em processo de quem estiver rodando contra este banco precisam ver os dados novos
+        database._incrementar_versao_cache(cur, 'lojas')
+        cur.execute("ANALYZE lojas, vendedores, disparos_semanais, disparos_historico, disparos_semana_resumo;")
+        conn.commit()
+        cur.close()
+
+    return {k: round(v, 3) for k, v in tempos.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Popula o banco com dados sintéticos para benchmarks.")
+    parser.add_argument('--lojas', type=int, default=None, help='Padrão: 1 loja para cada 50 vendedores.')
+    parser.add_argument('--vendedores', type=int, default=1000)
+    parser.add_argument('--semanas', type=int, default=4, help='Semanas de histórico diário antes da atual.')
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--limpar', action='store_true', help='Apaga lojas, vendedores e disparos antes de semear.')
+    parser.add_argument('--forcar', action='store_true', help='Permite --limpar em banco que não é local.')
+    parser.add_argument('--sqlite', metavar='CAMINHO', help='Copia os dados semeados para este arquivo SQLite (DB_BACKEND=sqlite).')
+    args = parser.parse_args()
+    n_lojas = args.lojas or max(1, args.vendedores // 50)
+
+    migracoes.aplicar_migracoes()
+    if args.limpar:
+        if not banco_local(database.DATABASE_URL) and not args.forcar:
+            sys.exit("DATABASE_URL não parece local; use --forcar para limpar mesmo assim.")
+        with database.conexao() as conn:
+            cur = conn.cursor()
+            limpar(cur)
+            conn.commit()
+            cur.close()
+
+    inicio = time.perf_counter()
+    tempos = semear(n_lojas, args.vendedores, args.semanas, args.semente)
+    print(f"{n_lojas} lojas, {args.vendedores} vendedores, {args.semanas} semanas de histórico "
+          f"em {time.perf_counter() - inicio:.2f}s {tempos}")
+
+    if args.sqlite:
+        inicio = time.perf_counter()
+        with database.conexao() as conn:
+            contagens = armazenamento_sqlite.copiar_do_postgres(conn, args.sqlite)
+            conn.rollback()
+        print(f"Copiado para {args.sqlite} em {time.perf_counter() - inicio:.2f}s {contagens}")
+
+
+if __name__ == '__main__':
+    main()
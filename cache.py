@@ -0,0 +1,123 @@
+# cache.py
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_TTL = float(os.getenv("CACHE_TTL", "300"))                      # segundos
+CACHE_MAX_ITENS = int(os.getenv("CACHE_MAX_ITENS", "256"))
+CACHE_VERSAO_INTERVALO = float(os.getenv("CACHE_VERSAO_INTERVALO", "5"))  # segundos entre checagens da versão no banco
+
+_AUSENTE = object()
+
+
+# ==============================
+# CACHE EM PROCESSO (TTL + LRU)
+# ==============================
+class CacheTTL:
+    def __init__(self, nome, maximo=CACHE_MAX_ITENS, ttl=CACHE_TTL,
+                 buscar_versao=None, intervalo_versao=CACHE_VERSAO_INTERVALO):
+        self.nome = nome
+        self.maximo = max(1, maximo)
+        self.ttl = ttl
+        # buscar_versao() devolve o carimbo de versão compartilhado entre os workers
+        self.buscar_versao = buscar_versao
+        self.intervalo_versao = intervalo_versao
+
+        self._lock = threading.Lock()
+        self._itens = OrderedDict()   # chave -> (valor, expira_em)
+        self._versao = None
+        self._versao_checada_em = 0.0
+        self._geracao = 0             # sobe a cada invalidação; carga iniciada antes dela não é guardada
+        self._stats = {'hits': 0, 'misses': 0, 'expirados': 0, 'despejados': 0, 'invalidacoes': 0,
+                       'descartados': 0}
+
+    def _checar_versao(self):
+        if self.buscar_versao is None:
+            return
+        agora = time.monotonic()
+        if agora - self._versao_checada_em < self.intervalo_versao:
+            return
+        self._versao_checada_em = agora
+        try:
+            versao = self.buscar_versao()
+        except Exception as e:
+            print(f"Aviso: falha ao checar versão do cache '{self.nome}':", e, file=sys.stderr)
+            return
+        with self._lock:
+            if self._versao is not None and versao != self._versao:
+                self._itens.clear()
+                self._geracao += 1
+                self._stats['invalidacoes'] += 1
+            self._versao = versao
+
+    def get(self, chave, padrao=None):
+        self._checar_versao()
+        with self._lock:
+            item = self._itens.get(chave, _AUSENTE)
+            if item is _AUSENTE:
+                self._stats['misses'] += 1
+                return padrao
+            valor, expira_em = item
+            if expira_em < time.monotonic():
+                del self._itens[chave]
+                self._stats['expirados'] += 1
+                self._stats['misses'] += 1
+                return padrao
+            self._itens.move_to_end(chave)
+            self._stats['hits'] += 1
+            return valor
+
+    def set(self, chave, valor, geracao=None):
+        with self._lock:
+            if geracao is not None and geracao != self._geracao:
+                # Invalidado enquanto carregava: o valor pode ser anterior à escrita
+                self._stats['descartados'] += 1
+                return
+            self._itens[chave] = (valor, time.monotonic() + self.ttl)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.maximo:
+                self._itens.popitem(last=False)
+                self._stats['despejados'] += 1
+
+    def obter(self, chave, carregar):
+        valor = self.get(chave, _AUSENTE)
+        if valor is _AUSENTE:
+            with self._lock:
+                geracao = self._geracao
+            valor = carregar()
+            self.set(chave, valor, geracao)
+        return valor
+
+    def invalidar(self, versao=None):
+        with self._lock:
+            self._itens.clear()
+            self._geracao += 1
+            self._stats['invalidacoes'] += 1
+            if versao is not None:
+                self._versao = versao
+                self._versao_checada_em = time.monotonic()
+
+    def estatisticas(self):
+        with self._lock:
+            dados = dict(self._stats)
+            dados.update({
+                'itens': len(self._itens),
+                'maximo': self.maximo,
+                'ttl': self.ttl,
+                'versao': self._versao,
+            })
+        return dados
+
+
+_caches = {}
+
+
+def registrar(cache):
+    _caches[cache.nome] = cache
+    return cache
+
+
+def estatisticas():
+    return {nome: c.estatisticas() for nome, c in _caches.items()}
@@ -1,273 +1,1157 @@
 # database.py
+import json
 import os
 import psycopg2
 import psycopg2.extras
 from dotenv import load_dotenv
 import sys
+import threading
+import time
+from contextlib import contextmanager
 from datetime import date
 
+import cache
+import perfilador
+
 load_dotenv()
 
 # ==============================
 # CONFIGURAÇÃO DO DATABASE + SSL
 # ==============================
+# 'postgres' (padrão) ou 'sqlite': arquivo local em modo WAL para uma loja só (armazenamento_sqlite.py)
+BACKEND = os.getenv("DB_BACKEND", "postgres").lower()
+if BACKEND not in ('postgres', 'sqlite'):
+    raise ValueError(f"DB_BACKEND inválido: '{BACKEND}' (use postgres ou sqlite).")
+
 raw_url = os.getenv("DATABASE_URL")
 
 if not raw_url:
-    print("ERRO: DATABASE_URL não configurado nas variáveis de ambiente.", file=sys.stderr)
+    if BACKEND == 'postgres':
+        print("ERRO: DATABASE_URL não configurado nas variáveis de ambiente.", file=sys.stderr)
 else:
     if "sslmode" not in raw_url:
         raw_url += "?sslmode=require"
 
 DATABASE_URL = raw_url
 
+# Pool de conexões (valores por worker do gunicorn)
+POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))             # segundos esperando uma conexão livre
+POOL_MAX_IDADE = float(os.getenv("DB_POOL_MAX_IDADE", "1800"))       # recicla conexões mais velhas que isso
+POOL_CHECAGEM_OCIOSA = float(os.getenv("DB_POOL_CHECAGEM_OCIOSA", "30"))  # SELECT 1 se ficou ociosa mais que isso
+
+# Paginação de /vendedores e /lojas
+PAGINA_TAMANHO = int(os.getenv("PAGINA_TAMANHO", "50"))
+PAGINA_TAMANHO_MAX = int(os.getenv("PAGINA_TAMANHO_MAX", "500"))
+CONTAGEM_TTL = float(os.getenv("CONTAGEM_TTL", "30"))   # segundos que um total filtrado fica em cache
+
+# Eventos ao vivo (NOTIFY -> SSE)
+EVENTOS_CANAL = os.getenv("EVENTOS_CANAL", "gestao_eventos")
+EVENTOS_MAX_VENDEDORES = int(os.getenv("EVENTOS_MAX_VENDEDORES", "40"))  # acima disso manda só 'recarregar' (payload do NOTIFY < 8000 bytes)
+
+# Quantos nomes por status o painel lista (a contagem completa vem de get_kpis_painel)
+PAINEL_LIMITE_POR_STATUS = int(os.getenv("PAINEL_LIMITE_POR_STATUS", "50"))
+
+# Linhas buscadas por ida ao banco nas exportações (cursor do lado do servidor)
+EXPORTACAO_LOTE = int(os.getenv("EXPORTACAO_LOTE", "5000"))
+
 
 # ==============================
 # FUNÇÃO DE CONEXÃO
 # ==============================
 def get_conn():
     try:
+        if perfilador.ATIVO:
+            return psycopg2.connect(DATABASE_URL, connection_factory=perfilador.ConexaoPerfilada)
         return psycopg2.connect(DATABASE_URL)
     except Exception as e:
         print("Erro ao conectar ao banco:", e, file=sys.stderr)
         raise
 
 
+# ==============================
+# POOL DE CONEXÕES
+# ==============================
+class PoolEsgotado(Exception):
+    pass
+
+
+class PoolConexoes:
+    def __init__(self, minimo=POOL_MIN, maximo=POOL_MAX, timeout=POOL_TIMEOUT,
+                 max_idade=POOL_MAX_IDADE, checagem_ociosa=POOL_CHECAGEM_OCIOSA, fabrica=get_conn):
+        self.minimo = max(0, minimo)
+        self.maximo = max(1, maximo, self.minimo)
+        self.timeout = timeout
+        self.max_idade = max_idade
+        self.checagem_ociosa = checagem_ociosa
+        self.fabrica = fabrica
+        self.pid = os.getpid()
+
+        self._cond = threading.Condition()
+        self._livres = []        # [(conn, criada_em, devolvida_em)]
+        self._criadas_em = {}    # id(conn) -> timestamp de criação
+        self._em_uso = 0
+        self._total = 0
+        self._stats = {
+            'checkouts': 0,
+            'esperas': 0,
+            'tempo_espera_total': 0.0,
+            'timeouts': 0,
+            'criadas': 0,
+            'recicladas': 0,
+            'falhas_checagem': 0,
+        }
+
+        for _ in range(self.minimo):
+            try:
+                conn = self._nova_conexao()
+            except Exception:
+                break
+            self._livres.append((conn, self._criadas_em[id(conn)], time.monotonic()))
+            self._total += 1
+
+    def _nova_conexao(self):
+        conn = self.fabrica()
+        self._criadas_em[id(conn)] = time.monotonic()
+        self._stats['criadas'] += 1
+        return conn
+
+    def _descartar(self, conn):
+        self._criadas_em.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _saudavel(self, conn, criada_em, devolvida_em):
+        if conn.closed:
+            return False
+        agora = time.monotonic()
+        if self.max_idade and agora - criada_em > self.max_idade:
+            return False
+        if self.checagem_ociosa is not None and agora - devolvida_em > self.checagem_ociosa:
+            try:
+                cur = conn.cursor()
+                cur.execute("SELECT 1;")
+                cur.close()
+                conn.rollback()
+            except Exception:
+                self._stats['falhas_checagem'] += 1
+                return False
+        return True
+
+    def checkout(self):
+        inicio = time.monotonic()
+        esperou = False
+        with self._cond:
+            while True:
+                while self._livres:
+                    conn, criada_em, devolvida_em = self._livres.pop()
+                    if self._saudavel(conn, criada_em, devolvida_em):
+                        self._em_uso += 1
+                        self._stats['checkouts'] += 1
+                        return conn
+                    self._descartar(conn)
+                    self._total -= 1
+                    self._stats['recicladas'] += 1
+
+                if self._total < self.maximo:
+                    # reserva a vaga antes de conectar, fora do lock
+                    self._total += 1
+                    break
+
+                if not esperou:
+                    esperou = True
+                    self._stats['esperas'] += 1
+                restante = self.timeout - (time.monotonic() - inicio)
+                if restante <= 0 or not self._cond.wait(restante):
+                    if not self._livres and self._total >= self.maximo:
+                        self._stats['timeouts'] += 1
+                        self._stats['tempo_espera_total'] += time.monotonic() - inicio
+                        raise PoolEsgotado(f"Nenhuma conexão livre após {self.timeout}s (máximo {self.maximo}).")
+            if esperou:
+                self._stats['tempo_espera_total'] += time.monotonic() - inicio
+
+        try:
+            conn = self._nova_conexao()
+        except Exception:
+            with self._cond:
+                self._total -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._em_uso += 1
+            self._stats['checkouts'] += 1
+        return conn
+
+    def checkin(self, conn, descartar=False):
+        # Nunca devolve ao pool uma conexão com transação aberta ou abortada
+        if not descartar and not conn.closed:
+            try:
+                if conn.status != psycopg2.extensions.STATUS_READY:
+                    conn.rollback()
+            except Exception:
+                descartar = True
+        with self._cond:
+            self._em_uso -= 1
+            if descartar or conn.closed:
+                self._descartar(conn)
+                self._total -= 1
+                self._stats['recicladas'] += 1
+            else:
+                self._livres.append((conn, self._criadas_em.get(id(conn), time.monotonic()), time.monotonic()))
+            self._cond.notify()
+
+    def fechar(self):
+        with self._cond:
+            for conn, _, _ in self._livres:
+                self._descartar(conn)
+                self._total -= 1
+            self._livres = []
+
+    def estatisticas(self):
+        with self._cond:
+            dados = dict(self._stats)
+            dados.update({
+                'minimo': self.minimo,
+                'maximo': self.maximo,
+                'em_uso': self._em_uso,
+                'livres': len(self._livres),
+                'total': self._total,
+                'pid': self.pid,
+            })
+        return dados
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_local = threading.local()
+
+
+def get_pool():
+    global _pool
+    # Recria o pool após fork: conexões não podem ser compartilhadas entre processos
+    if _pool is None or _pool.pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool.pid != os.getpid():
+                _pool = PoolConexoes()
+    return _pool
+
+
+def estatisticas_pool():
+    return get_pool().estatisticas()
+
+
+def iniciar_escopo_requisicao():
+    # A conexão só é retirada do pool na primeira consulta da requisição
+    _local.escopo = True
+    _local.conn = None
+
+
+def encerrar_escopo_requisicao(exc=None):
+    conn = getattr(_local, 'conn', None)
+    _local.escopo = False
+    _local.conn = None
+    if conn is None:
+        return
+    if exc is not None and not conn.closed:
+        try:
+            conn.rollback()
+        except Exception:
+            get_pool().checkin(conn, descartar=True)
+            return
+    get_pool().checkin(conn)
+
+
+@contextmanager
+def conexao():
+    if getattr(_local, 'escopo', False):
+        conn = _local.conn
+        if conn is None or conn.closed:
+            if conn is not None:
+                get_pool().checkin(conn, descartar=True)
+            conn = _local.conn = get_pool().checkout()
+        try:
+            yield conn
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        return
+
+    conn = get_pool().checkout()
+    try:
+        yield conn
+    except Exception:
+        get_pool().checkin(conn, descartar=conn.closed)
+        raise
+    else:
+        get_pool().checkin(conn)
+
+
 # ==============================
 # CRIAÇÃO DE TABELAS
 # ==============================
 def ensure_tables():
-    sql = """
-    CREATE TABLE IF NOT EXISTS lojas (
-        id SERIAL PRIMARY KEY,
-        nome TEXT NOT NULL,
-        responsavel TEXT
-    );
-
-    CREATE TABLE IF NOT EXISTS vendedores (
-        id SERIAL PRIMARY KEY,
-        nome TEXT NOT NULL,
-        email TEXT,
-        loja_id INTEGER REFERENCES lojas(id) ON DELETE SET NULL,
-        status TEXT,
-        base_tratada BOOLEAN DEFAULT FALSE,
-        disparos_dia INTEGER DEFAULT 0,
-        ultimo_status_tipo TEXT,
-        ultimo_status_data TEXT
-    );
-
-    CREATE TABLE IF NOT EXISTS disparos_semanais (
-        id SERIAL PRIMARY KEY,
-        vendedor_id INTEGER REFERENCES vendedores(id) ON DELETE CASCADE,
-        segunda INTEGER DEFAULT 0,
-        terca INTEGER DEFAULT 0,
-        quarta INTEGER DEFAULT 0,
-        quinta INTEGER DEFAULT 0,
-        sexta INTEGER DEFAULT 0,
-        sabado INTEGER DEFAULT 0,
-        domingo INTEGER DEFAULT 0
-    );
-
-    CREATE TABLE IF NOT EXISTS eventos (
-        id SERIAL PRIMARY KEY,
-        nome TEXT,
-        data_evento DATE,
-        loja_id INTEGER REFERENCES lojas(id) ON DELETE SET NULL
-    );
-    """
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(sql)
-    conn.commit()
-    cur.close()
-    conn.close()
-
-# Garante as tabelas
-try:
-    ensure_tables()
-except Exception as e:
-    print("Aviso: ensure_tables erro (pode ser ignorado):", e)
+    # O schema é versionado em migracoes.py e aplicado uma vez por deploy (flask --app app migrar)
+    import migracoes
+    return migracoes.aplicar_migracoes()
+
+
+# ==============================
+# VERSÃO DO CACHE (compartilhada entre workers)
+# ==============================
+def get_versao_cache(nome):
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT versao FROM cache_versoes WHERE nome = %s;", (nome,))
+        row = cur.fetchone()
+        cur.close()
+    return row[0] if row else 0
+
+
+def _incrementar_versao_cache(cur, nome):
+    # Roda dentro da transação da escrita: a versão só muda se a escrita for confirmada
+    cur.execute("""
+        INSERT INTO cache_versoes (nome, versao) VALUES (%s, 1)
+        ON CONFLICT (nome) DO UPDATE SET versao = cache_versoes.versao + 1
+        RETURNING versao;
+    """, (nome,))
+    row = cur.fetchone()
+    # insert_loja passa um RealDictCursor
+    return row['versao'] if isinstance(row, dict) else row[0]
+
+
+def get_versao_dados():
+    # Muda a cada transação que escreve em vendedores, disparos_semanais ou no nome de uma loja (triggers da migração 6).
+    # Desde a migração 9 é a maior versão sem nenhuma transação mais antiga em andamento (versao_dados_confirmada)
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT versao_dados_confirmada();")
+        versao = cur.fetchone()[0]
+        cur.close()
+    return versao
+
+
+# ==============================
+# EVENTOS (NOTIFY, entregue só no commit)
+# ==============================
+def notificar(cur, evento):
+    cur.execute("SELECT pg_notify(%s, %s);", (EVENTOS_CANAL, json.dumps(evento)))
+
+
+def _notificar_vendedores(cur, tipo, ids):
+    # Estado atual dos vendedores alterados em um único NOTIFY; muitos ids viram um aviso para recarregar
+    ids = sorted({int(i) for i in ids})
+    if not ids:
+        return
+    if len(ids) > EVENTOS_MAX_VENDEDORES:
+        notificar(cur, {'tipo': 'recarregar', 'motivo': tipo})
+        return
+    cur.execute(f"""
+        SELECT pg_notify(%s, json_build_object(
+            'tipo', %s,
+            'versao', NULLIF(current_setting('gestao.versao_dados', true), '')::BIGINT,
+            'vendedores', json_agg(json_build_object(
+                'id', v.id,
+                'status', v.status,
+                'disparos_hoje', COALESCE(v.disparos_dia, 0),
+                'disparos_semana', COALESCE(ds.total, 0)
+            ) ORDER BY v.id)
+        )::text)
+        FROM vendedores v
+        LEFT JOIN ({_SQL_TOTAL_SEMANA}) ds ON ds.vendedor_id = v.id
+        WHERE v.id = ANY(%s)
+        HAVING COUNT(*) > 0;
+    """, (EVENTOS_CANAL, tipo, ids))
+
+
+_cache_lojas = cache.registrar(cache.CacheTTL('lojas', buscar_versao=lambda: get_versao_cache('lojas')))
+_cache_contagens = cache.registrar(cache.CacheTTL('contagens', ttl=CONTAGEM_TTL))
 
 
 # ==============================
 # FUNÇÕES CRUD
 # ==============================
 
-def listar_lojas():
-    conn = get_conn()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    cur.execute("SELECT * FROM lojas ORDER BY id;")
-    data = cur.fetchall()
-    cur.close(); conn.close()
+def _listar_lojas_banco():
+    with conexao() as conn:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cur.execute("SELECT * FROM lojas ORDER BY id;")
+        data = cur.fetchall()
+        cur.close()
     return [dict(r) for r in data]
 
 
-def get_loja_by_id(loja_id):
-    conn = get_conn()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    cur.execute("SELECT * FROM lojas WHERE id = %s;", (loja_id,))
-    row = cur.fetchone()
-    cur.close(); conn.close()
+def _get_loja_banco(loja_id):
+    with conexao() as conn:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cur.execute("SELECT * FROM lojas WHERE id = %s;", (loja_id,))
+        row = cur.fetchone()
+        cur.close()
     return dict(row) if row else None
 
 
+def listar_lojas():
+    lojas = _cache_lojas.obter('listar', _listar_lojas_banco)
+    # Cópias: quem chama pode alterar os dicts sem sujar o cache
+    return [dict(l) for l in lojas]
+
+
+def get_loja_by_id(loja_id):
+    loja = _cache_lojas.obter(('loja', loja_id), lambda: _get_loja_banco(loja_id))
+    return dict(loja) if loja else None
+
+
 def insert_loja(nome, responsavel):
-    conn = get_conn()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    cur.execute("INSERT INTO lojas (nome, responsavel) VALUES (%s, %s) RETURNING *;", (nome, responsavel))
-    row = cur.fetchone()
-    conn.commit()
-    cur.close(); conn.close()
+    with conexao() as conn:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cur.execute("INSERT INTO lojas (nome, responsavel) VALUES (%s, %s) RETURNING *;", (nome, responsavel))
+        row = cur.fetchone()
+        versao = _incrementar_versao_cache(cur, 'lojas')
+        conn.commit()
+        cur.close()
+    _cache_lojas.invalidar(versao)
     return dict(row)
 
 
 def update_loja(loja_id, nome, responsavel):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("UPDATE lojas SET nome=%s, responsavel=%s WHERE id=%s;", (nome, responsavel, loja_id))
-    conn.commit()
-    cur.close(); conn.close()
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute("UPDATE lojas SET nome=%s, responsavel=%s WHERE id=%s;", (nome, responsavel, loja_id))
+        versao = _incrementar_versao_cache(cur, 'lojas')
+        conn.commit()
+        cur.close()
+    _cache_lojas.invalidar(versao)
 
 
 # ---------- VENDEDORES ----------
 
 def listar_vendedores():
-    conn = get_conn()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    cur.execute("SELECT * FROM vendedores ORDER BY id;")
-    data = cur.fetchall()
-    cur.close(); conn.close()
+    with conexao() as conn:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cur.execute("SELECT * FROM vendedores ORDER BY id;")
+        data = cur.fetchall()
+        cur.close()
     return [dict(r) for r in data]
 
 
 def get_vendedores_by_loja(loja_id):
-    conn = get_conn()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    cur.execute("SELECT * FROM vendedores WHERE loja_id = %s ORDER BY id;", (loja_id,))
-    data = cur.fetchall()
-    cur.close(); conn.close()
+    with conexao() as conn:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cur.execute("SELECT * FROM vendedores WHERE loja_id = %s ORDER BY id;", (loja_id,))
+        data = cur.fetchall()
+        cur.close()
     return [dict(r) for r in data]
 
 
 def insert_vendedor(v):
-    conn = get_conn()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    cur.execute("""
-        INSERT INTO vendedores (nome, email, loja_id, status, base_tratada, disparos_dia, ultimo_status_tipo, ultimo_status_data)
-        VALUES (%s,%s,%s,%s,%s,%s,%s,%s) RETURNING *;
-    """, (v.get('nome'), v.get('email'), v.get('loja_id'), v.get('status'),
-          v.get('base_tratada', False), v.get('disparos_dia',0),
-          v.get('ultimo_status_tipo'), v.get('ultimo_status_data')))
-    row = cur.fetchone()
-    conn.commit()
-    cur.close(); conn.close()
+    with conexao() as conn:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cur.execute("""
+            INSERT INTO vendedores (nome, email, loja_id, status, base_tratada, disparos_dia, ultimo_status_tipo, ultimo_status_data)
+            VALUES (%s,%s,%s,%s,%s,%s,%s,%s) RETURNING *;
+        """, (v.get('nome'), v.get('email'), v.get('loja_id'), v.get('status'),
+              v.get('base_tratada', False), v.get('disparos_dia',0),
+              v.get('ultimo_status_tipo'), v.get('ultimo_status_data')))
+        row = cur.fetchone()
+        conn.commit()
+        cur.close()
     return dict(row)
 
 
+STATUS_VENDEDOR = ('Conectado', 'Restrito', 'Bloqueado', 'Desconectado')
+
+
 def update_status_vendedor(vendedor_id, novo_status):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("""
-        UPDATE vendedores
-        SET status = %s,
-            ultimo_status_tipo = %s,
-            ultimo_status_data = TO_CHAR(CURRENT_DATE, 'DD/MM/YYYY')
-        WHERE id = %s;
-    """, (novo_status, novo_status, vendedor_id))
-    conn.commit()
-    cur.close(); conn.close()
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            UPDATE vendedores
+            SET status = %s,
+                ultimo_status_tipo = %s,
+                ultimo_status_data = TO_CHAR(CURRENT_DATE, 'DD/MM/YYYY')
+            WHERE id = %s;
+        """, (novo_status, novo_status, vendedor_id))
+        atualizado = cur.rowcount > 0
+        if atualizado:
+            _notificar_vendedores(cur, 'status', [vendedor_id])
+        conn.commit()
+        cur.close()
+    return atualizado
 
 
-def deletar_vendedor(vendedor_id):
-    conn = get_conn()
-    cur = conn.cursor()
-    try:
-        cur.execute("DELETE FROM vendedores WHERE id = %s", (vendedor_id,))
+def atualizar_status_em_lote(alteracoes):
+    # alteracoes: [(vendedor_id, novo_status)] -> ids efetivamente atualizados, em um único UPDATE ... FROM (VALUES ...)
+    if not alteracoes:
+        return set()
+    with conexao() as conn:
+        cur = conn.cursor()
+        atualizados = psycopg2.extras.execute_values(cur, """
+            UPDATE vendedores v
+            SET status = x.status,
+                ultimo_status_tipo = x.status,
+                ultimo_status_data = TO_CHAR(CURRENT_DATE, 'DD/MM/YYYY')
+            FROM (VALUES %s) AS x(id, status)
+            WHERE v.id = x.id
+            RETURNING v.id;
+        """, alteracoes, template="(%s::int, %s::text)", page_size=len(alteracoes), fetch=True)
+        _notificar_vendedores(cur, 'status', [r[0] for r in atualizados])
         conn.commit()
-        return True
-    except Exception as e:
-        conn.rollback()
-        print(f"Erro ao deletar vendedor: {e}")
-        return False
-    finally:
         cur.close()
-        conn.close()
+    return {r[0] for r in atualizados}
+
+
+def atualizar_status_por_filtro(novo_status, loja_id=None, status_atual=None):
+    condicoes, params = [], [novo_status, novo_status]
+    if loja_id is not None:
+        condicoes.append("loja_id = %s")
+        params.append(loja_id)
+    if status_atual is not None:
+        condicoes.append("status = %s")
+        params.append(status_atual)
+    if not condicoes:
+        raise ValueError("Informe ao menos um filtro (loja_id ou status atual).")
+
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute(f"""
+            UPDATE vendedores
+            SET status = %s,
+                ultimo_status_tipo = %s,
+                ultimo_status_data = TO_CHAR(CURRENT_DATE, 'DD/MM/YYYY')
+            WHERE {' AND '.join(condicoes)}
+            RETURNING id;
+        """, params)
+        ids = sorted(r[0] for r in cur.fetchall())
+        _notificar_vendedores(cur, 'status', ids)
+        conn.commit()
+        cur.close()
+    return ids
+
+
+def deletar_vendedor(vendedor_id):
+    with conexao() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute("DELETE FROM vendedores WHERE id = %s", (vendedor_id,))
+            conn.commit()
+            return True
+        except Exception as e:
+            conn.rollback()
+            print(f"Erro ao deletar vendedor: {e}")
+            return False
+        finally:
+            cur.close()
 
 
 # --------- DISPAROS ---------
 
-def update_disparos_semanais(vendedor_id, d):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT id FROM disparos_semanais WHERE vendedor_id=%s;", (vendedor_id,))
-    exists = cur.fetchone()
+DIAS_SEMANA = ['segunda', 'terca', 'quarta', 'quinta', 'sexta', 'sabado', 'domingo']
+
+
+def _registrar_historico_dia(cur, vendedor_id, valor):
+    cur.execute("""
+        INSERT INTO disparos_historico (vendedor_id, data, disparos) VALUES (%s, CURRENT_DATE, %s)
+        ON CONFLICT (vendedor_id, data) DO UPDATE SET disparos = EXCLUDED.disparos, atualizado_em = now();
+    """, (vendedor_id, valor))
 
+
+def _registrar_historico_semana(cur, vendedor_id, valores):
+    # valores na ordem de DIAS_SEMANA; só grava os dias da semana atual que já chegaram
+    cur.execute("""
+        INSERT INTO disparos_historico (vendedor_id, data, disparos)
+        SELECT %s, date_trunc('week', CURRENT_DATE)::date + d.i, d.v
+        FROM (VALUES (0,%s),(1,%s),(2,%s),(3,%s),(4,%s),(5,%s),(6,%s)) AS d(i, v)
+        WHERE date_trunc('week', CURRENT_DATE)::date + d.i <= CURRENT_DATE
+        ON CONFLICT (vendedor_id, data) DO UPDATE SET disparos = EXCLUDED.disparos, atualizado_em = now();
+    """, (vendedor_id,) + tuple(int(v or 0) for v in valores))
+
+
+def _atualizar_resumo_semana(cur, vendedor_id):
+    cur.execute("""
+        INSERT INTO disparos_semana_resumo (semana, vendedor_id, total)
+        SELECT date_trunc('week', CURRENT_DATE)::date, %s, COALESCE(SUM(disparos), 0)
+        FROM disparos_historico
+        WHERE vendedor_id = %s
+          AND data >= date_trunc('week', CURRENT_DATE)::date
+          AND data < date_trunc('week', CURRENT_DATE)::date + 7
+        ON CONFLICT (semana, vendedor_id) DO UPDATE SET total = EXCLUDED.total;
+    """, (vendedor_id, vendedor_id))
+
+
+def get_total_disparos_periodo(semana_inicio, semana_fim):
+    # Soma os resumos semanais entre duas segundas-feiras (inclusive)
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT COALESCE(SUM(total), 0) FROM disparos_semana_resumo
+            WHERE semana BETWEEN %s AND %s;
+        """, (semana_inicio, semana_fim))
+        total = cur.fetchone()[0]
+        cur.close()
+    return total
+
+
+def listar_historico_disparos(vendedor_id, inicio, fim):
+    with conexao() as conn:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cur.execute("""
+            SELECT data, disparos FROM disparos_historico
+            WHERE vendedor_id = %s AND data BETWEEN %s AND %s
+            ORDER BY data;
+        """, (vendedor_id, inicio, fim))
+        data = cur.fetchall()
+        cur.close()
+    return [dict(r) for r in data]
+
+def update_disparos_semanais(vendedor_id, d):
     valores = (
         d.get('segunda',0), d.get('terca',0), d.get('quarta',0),
         d.get('quinta',0), d.get('sexta',0), d.get('sabado',0),
         d.get('domingo',0)
     )
 
-    if exists:
-        cur.execute("""
-            UPDATE disparos_semanais SET segunda=%s, terca=%s, quarta=%s, quinta=%s,
-            sexta=%s, sabado=%s, domingo=%s WHERE vendedor_id=%s;
-        """, valores + (vendedor_id,))
-    else:
+    with conexao() as conn:
+        cur = conn.cursor()
         cur.execute("""
             INSERT INTO disparos_semanais (vendedor_id, segunda, terca, quarta, quinta, sexta, sabado, domingo)
-            VALUES (%s,%s,%s,%s,%s,%s,%s,%s);
+            VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
+            ON CONFLICT (vendedor_id) DO UPDATE SET
+                segunda=EXCLUDED.segunda, terca=EXCLUDED.terca, quarta=EXCLUDED.quarta, quinta=EXCLUDED.quinta,
+                sexta=EXCLUDED.sexta, sabado=EXCLUDED.sabado, domingo=EXCLUDED.domingo;
         """, (vendedor_id,) + valores)
 
-    conn.commit()
-    cur.close(); conn.close()
+        _registrar_historico_semana(cur, vendedor_id, valores)
+        _atualizar_resumo_semana(cur, vendedor_id)
+        _notificar_vendedores(cur, 'disparos', [vendedor_id])
+        conn.commit()
+        cur.close()
 
 
 def get_disparos_semanais(vendedor_id):
-    conn = get_conn()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    cur.execute("SELECT * FROM disparos_semanais WHERE vendedor_id=%s;", (vendedor_id,))
-    row = cur.fetchone()
-    cur.close(); conn.close()
+    with conexao() as conn:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cur.execute("SELECT * FROM disparos_semanais WHERE vendedor_id=%s;", (vendedor_id,))
+        row = cur.fetchone()
+        cur.close()
     return dict(row) if row else None
 
 
 def update_disparos_dia(vendedor_id, valor):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("UPDATE vendedores SET disparos_dia=%s WHERE id=%s;", (valor, vendedor_id))
-    conn.commit()
-    cur.close(); conn.close()
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute("UPDATE vendedores SET disparos_dia=%s WHERE id=%s;", (valor, vendedor_id))
+        _registrar_historico_dia(cur, vendedor_id, valor)
+        _atualizar_resumo_semana(cur, vendedor_id)
+        _notificar_vendedores(cur, 'disparos', [vendedor_id])
+        conn.commit()
+        cur.close()
     
-def listar_vendedores_com_disparos():
-    vendedores = listar_vendedores()
+def carregar_vendedores_com_disparos(loja_id=None, status=None, apos_id=None, limite=None, versao_entre=None):
+    # Vendedores + loja + disparos semanais em uma única consulta (evita 1 + 2N idas ao banco).
+    # 'disparos_semanais' vem como None quando o vendedor ainda não tem linha semanal.
+    # apos_id/limite fazem paginação por chave (seek): WHERE v.id > apos_id ... LIMIT, sem OFFSET.
+    # versao_entre=(desde, ate): só os vendedores alterados depois de 'desde' até 'ate' (inclusive).
+    condicoes, params = [], []
+    if versao_entre is not None:
+        condicoes.append("v.versao > %s AND v.versao <= %s")
+        params.extend(versao_entre)
+    if loja_id is not None:
+        condicoes.append("v.loja_id = %s")
+        params.append(loja_id)
+    if status is not None:
+        condicoes.append("v.status = %s")
+        params.append(status)
+    if apos_id is not None:
+        condicoes.append("v.id > %s")
+        params.append(apos_id)
+    filtro = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+    limitar = ""
+    if limite is not None:
+        limitar = "LIMIT %s"
+        params.append(limite)
+
+    with conexao() as conn:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cur.execute(f"""
+            SELECT v.*, l.nome AS loja_nome, ds.id AS ds_id,
+                   ds.segunda, ds.terca, ds.quarta, ds.quinta, ds.sexta, ds.sabado, ds.domingo
+            FROM vendedores v
+            LEFT JOIN lojas l ON l.id = v.loja_id
+            LEFT JOIN disparos_semanais ds ON ds.vendedor_id = v.id
+            {filtro}
+            ORDER BY v.id
+            {limitar};
+        """, params)
+        data = cur.fetchall()
+        cur.close()
+
+    vendedores = []
+    for r in data:
+        v = dict(r)
+        ds_id = v.pop('ds_id')
+        semana = {dia: v.pop(dia) or 0 for dia in DIAS_SEMANA}
+        v['disparos_semanais'] = semana if ds_id is not None else None
+        v['disparos_hoje'] = v.get('disparos_dia') or 0
+        v['disparos_semana'] = sum(semana.values())
+        vendedores.append(v)
+    return vendedores
+
+
+def listar_vendedores_com_disparos(loja_id=None, status=None, apos_id=None, limite=None):
+    vendedores = carregar_vendedores_com_disparos(loja_id, status, apos_id, limite)
     for v in vendedores:
-        disparos = get_disparos_semanais(v['id'])
-        v['disparos_semanais'] = disparos if disparos else {
-            'segunda': 0, 'terca': 0, 'quarta': 0, 'quinta': 0,
-            'sexta': 0, 'sabado': 0, 'domingo': 0
-        }
+        if not v['disparos_semanais']:
+            v['disparos_semanais'] = {dia: 0 for dia in DIAS_SEMANA}
     return vendedores
 
+
+def listar_vendedores_removidos(desde, ate):
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT vendedor_id FROM vendedores_removidos
+            WHERE versao > %s AND versao <= %s
+            ORDER BY vendedor_id;
+        """, (desde, ate))
+        ids = [r[0] for r in cur.fetchall()]
+        cur.close()
+    return ids
+
+
+# --------- PAGINAÇÃO ---------
+
+def _pagina(itens, limite):
+    # Busca-se limite + 1 linhas: a sobra só indica que existe próxima página
+    proximo = itens[limite - 1]['id'] if len(itens) > limite else None
+    return {'itens': itens[:limite], 'proximo_id': proximo}
+
+
+def listar_vendedores_pagina(loja_id=None, status=None, apos_id=None, limite=PAGINA_TAMANHO):
+    return _pagina(listar_vendedores_com_disparos(loja_id, status, apos_id, limite + 1), limite)
+
+
+def listar_lojas_pagina(responsavel=None, apos_id=None, limite=PAGINA_TAMANHO):
+    condicoes, params = [], []
+    if responsavel:
+        condicoes.append("l.responsavel ILIKE %s")
+        params.append(f"%{responsavel}%")
+    if apos_id is not None:
+        condicoes.append("l.id > %s")
+        params.append(apos_id)
+    filtro = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+    params.append(limite + 1)
+
+    with conexao() as conn:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cur.execute(f"""
+            SELECT l.*, n.total AS total_vendedores
+            FROM lojas l
+            CROSS JOIN LATERAL (SELECT COUNT(*) AS total FROM vendedores v WHERE v.loja_id = l.id) n
+            {filtro}
+            ORDER BY l.id
+            LIMIT %s;
+        """, params)
+        data = cur.fetchall()
+        cur.close()
+    return _pagina([dict(r) for r in data], limite)
+
+
+def _contar(tabela, condicoes, params):
+    filtro = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute(f"SELECT COUNT(*) FROM {tabela} {filtro};", params)
+        total = cur.fetchone()[0]
+        cur.close()
+    return total
+
+
+def contar_vendedores(loja_id=None, status=None):
+    # Contagem exata, mas cacheada por CONTAGEM_TTL segundos: o total não precisa ser recalculado a cada página
+    def contar():
+        condicoes, params = [], []
+        if loja_id is not None:
+            condicoes.append("loja_id = %s")
+            params.append(loja_id)
+        if status is not None:
+            condicoes.append("status = %s")
+            params.append(status)
+        return _contar('vendedores', condicoes, params)
+    return _cache_contagens.obter(('vendedores', loja_id, status), contar)
+
+
+def contar_lojas(responsavel=None):
+    def contar():
+        if responsavel:
+            return _contar('lojas', ["responsavel ILIKE %s"], [f"%{responsavel}%"])
+        return _contar('lojas', [], [])
+    return _cache_contagens.obter(('lojas', responsavel or None), contar)
+
+
+# --------- KPIs DO PAINEL ---------
+
+# Total da semana de cada vendedor (disparos_semanais tem uma linha por vendedor)
+_SQL_TOTAL_SEMANA = """
+    SELECT vendedor_id,
+           COALESCE(segunda,0) + COALESCE(terca,0) + COALESCE(quarta,0) + COALESCE(quinta,0)
+           + COALESCE(sexta,0) + COALESCE(sabado,0) + COALESCE(domingo,0) AS total
+    FROM disparos_semanais
+"""
+
+
+def get_kpis_painel():
+    # Total geral de resumo_lojas (linhas mantidas pelos triggers das migrações 8 e 9)
+    resumo = get_resumo_loja(None)
+    return {
+        'status_kpis': resumo['status_kpis'],
+        'bases_pendentes_count': resumo['bases_pendentes'],
+        'total_disparos_dia': resumo['disparos_dia'],
+        'total_disparos_semana': resumo['disparos_semana'],
+    }
+
+
+# --------- RESUMO POR LOJA ---------
+
+# Coluna de resumo_lojas -> status como aparece em status_kpis (fora da lista conta como 'Desconhecido')
+COLUNAS_STATUS_RESUMO = (('conectados', 'Conectado'), ('restritos', 'Restrito'), ('bloqueados', 'Bloqueado'),
+                         ('desconectados', 'Desconectado'), ('outros', 'Desconhecido'))
+COLUNAS_RESUMO = (['vendedores', 'bases_pendentes', 'disparos_dia'] + [c for c, _ in COLUNAS_STATUS_RESUMO]
+                  + DIAS_SEMANA)
+RESUMO_TOTAL = -1      # chave do total geral (somado das lojas na leitura desde a migração 9)
+RESUMO_SEM_LOJA = 0    # chave dos vendedores sem loja
+
+
+def _montar_resumo(row):
+    row = row or {}
+    resumo = {c: row.get(c, 0) for c in COLUNAS_RESUMO}
+    resumo['disparos_semanais'] = {d: resumo[d] for d in DIAS_SEMANA}
+    resumo['disparos_semana'] = sum(resumo['disparos_semanais'].values())
+    resumo['status_kpis'] = {status: resumo[c] for c, status in COLUNAS_STATUS_RESUMO if resumo[c]}
+    return resumo
+
+
+def get_resumo_loja(loja_id):
+    # loja_id None = total geral, somado das linhas das lojas (uma por loja, sem percorrer vendedores)
+    with conexao() as conn:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        if loja_id is None:
+            cur.execute(f"SELECT {', '.join(f'COALESCE(SUM({c}), 0)::BIGINT AS {c}' for c in COLUNAS_RESUMO)} "
+                        f"FROM resumo_lojas;")
+        else:
+            cur.execute("SELECT * FROM resumo_lojas WHERE chave = %s;", (loja_id,))
+        row = cur.fetchone()
+        cur.close()
+    return _montar_resumo(row)
+
+
+def listar_resumo_lojas():
+    # {loja_id: resumo}; lojas sem vendedores podem não ter linha (resumo zerado)
+    with conexao() as conn:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cur.execute("SELECT * FROM resumo_lojas WHERE chave > 0;")
+        data = cur.fetchall()
+        cur.close()
+    return {r['chave']: _montar_resumo(r) for r in data}
+
+
+def verificar_resumo_lojas(corrigir=True):
+    # Compara resumo_lojas com o recalculado das tabelas (view resumo_lojas_calculado) e, com corrigir, reconstrói.
+    # O LOCK segura os triggers das escritas concorrentes: o que elas mudarem entra depois, sobre o resumo novo.
+    inicio = time.perf_counter()
+    with conexao() as conn:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        try:
+            cur.execute("LOCK TABLE resumo_lojas IN EXCLUSIVE MODE;")
+            cur.execute("SELECT * FROM resumo_lojas;")
+            armazenado = {r['chave']: r for r in cur.fetchall()}
+            cur.execute("SELECT * FROM resumo_lojas_calculado;")
+            calculado = {r['chave']: r for r in cur.fetchall()}
+
+            divergencias = []
+            for chave in sorted(armazenado.keys() | calculado.keys()):
+                a, c = armazenado.get(chave, {}), calculado.get(chave, {})
+                for coluna in COLUNAS_RESUMO:
+                    if a.get(coluna, 0) != c.get(coluna, 0):
+                        divergencias.append({'chave': chave, 'coluna': coluna,
+                                             'armazenado': a.get(coluna, 0), 'calculado': c.get(coluna, 0)})
+            if corrigir:
+                cur.execute("DELETE FROM resumo_lojas;")
+                cur.execute("INSERT INTO resumo_lojas SELECT * FROM resumo_lojas_calculado;")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+    return {'linhas': len(calculado), 'divergencias': divergencias, 'corrigido': corrigir,
+            'tempo_s': round(time.perf_counter() - inicio, 4)}
+
+
+def listar_vendedores_por_status(limite=PAINEL_LIMITE_POR_STATUS):
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT status,
+                   json_agg(json_build_object(
+                       'nome', nome,
+                       'loja_nome', loja_nome,
+                       'ultimo_status_tipo', ultimo_status_tipo,
+                       'ultimo_status_data', ultimo_status_data
+                   ) ORDER BY id)
+            FROM (
+                SELECT v.id, v.nome, l.nome AS loja_nome, v.ultimo_status_tipo, v.ultimo_status_data,
+                       COALESCE(v.status, 'Desconhecido') AS status,
+                       ROW_NUMBER() OVER (PARTITION BY COALESCE(v.status, 'Desconhecido') ORDER BY v.id) AS pos
+                FROM vendedores v
+                LEFT JOIN lojas l ON l.id = v.loja_id
+            ) x
+            WHERE pos <= %s
+            GROUP BY status
+            ORDER BY MIN(id);
+        """, (limite,))
+        data = cur.fetchall()
+        cur.close()
+    return {status: lista for status, lista in data}
+
+
 def get_disparos_hoje(vendedor_id):
-    conn = get_conn()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    cur.execute("SELECT disparos_dia FROM vendedores WHERE id = %s;", (vendedor_id,))
-    row = cur.fetchone()
-    cur.close(); conn.close()
+    with conexao() as conn:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cur.execute("SELECT disparos_dia FROM vendedores WHERE id = %s;", (vendedor_id,))
+        row = cur.fetchone()
+        cur.close()
     return row['disparos_dia'] if row and row['disparos_dia'] is not None else 0
 
 
 def atualizar_disparos_dia(vendedor_id, disparos_hoje):
-    conn = get_conn()
-    cur = conn.cursor()
-    try:
-        cur.execute("UPDATE vendedores SET disparos_dia=%s WHERE id=%s;", (disparos_hoje, vendedor_id))
+    with conexao() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute("UPDATE vendedores SET disparos_dia=%s WHERE id=%s;", (disparos_hoje, vendedor_id))
+            _registrar_historico_dia(cur, vendedor_id, disparos_hoje)
+            _atualizar_resumo_semana(cur, vendedor_id)
+            _notificar_vendedores(cur, 'disparos', [vendedor_id])
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            print(f"Erro ao atualizar disparos do dia: {e}")
+            raise e
+        finally:
+            cur.close()
+
+
+def incrementar_disparos_dia(incrementos):
+    # incrementos: {vendedor_id: n}. Soma n ao disparos_dia (disparos_dia = disparos_dia + n) de todos em um
+    # comando, sem ler antes: duas origens somando ao mesmo vendedor nunca perdem uma à outra.
+    # Devolve {vendedor_id: disparos_dia depois da soma}; ids que não existem ficam de fora.
+    if not incrementos:
+        return {}
+    ids = sorted(incrementos)
+    with conexao() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute("""
+                WITH x AS (
+                    SELECT * FROM unnest(%s::int[], %s::int[]) AS x(id, n)
+                ), alvo AS (
+                    -- Trava na ordem dos ids: lotes de vários workers ao mesmo tempo não entram em deadlock
+                    SELECT v.id, x.n FROM vendedores v JOIN x ON x.id = v.id
+                    ORDER BY v.id
+                    FOR UPDATE OF v
+                )
+                UPDATE vendedores v SET disparos_dia = COALESCE(v.disparos_dia, 0) + alvo.n
+                FROM alvo
+                WHERE v.id = alvo.id
+                RETURNING v.id, v.disparos_dia;
+            """, (ids, [incrementos[i] for i in ids]))
+            totais = dict(cur.fetchall())
+            if totais:
+                atualizados = sorted(totais)
+                cur.execute("""
+                    INSERT INTO disparos_historico (vendedor_id, data, disparos)
+                    SELECT h.id, CURRENT_DATE, h.disparos FROM unnest(%s::int[], %s::int[]) AS h(id, disparos)
+                    ON CONFLICT (vendedor_id, data) DO UPDATE SET disparos = EXCLUDED.disparos, atualizado_em = now();
+                """, (atualizados, [totais[i] for i in atualizados]))
+                cur.execute("""
+                    INSERT INTO disparos_semana_resumo (semana, vendedor_id, total)
+                    SELECT date_trunc('week', CURRENT_DATE)::date, h.vendedor_id, SUM(h.disparos)
+                    FROM disparos_historico h
+                    WHERE h.vendedor_id = ANY(%s)
+                      AND h.data >= date_trunc('week', CURRENT_DATE)::date
+                      AND h.data < date_trunc('week', CURRENT_DATE)::date + 7
+                    GROUP BY h.vendedor_id
+                    ON CONFLICT (semana, vendedor_id) DO UPDATE SET total = EXCLUDED.total;
+                """, (atualizados,))
+                _notificar_vendedores(cur, 'disparos', atualizados)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+    return totais
+
+
+# --------- FECHAMENTO DO DIA ---------
+
+def _sql_coluna_fechamento(dia):
+    # A coluna do dia recebe o disparos_dia; as dos dias seguintes da semana são zeradas
+    # (no fechamento de segunda, o que sobrou da semana anterior sai da linha)
+    indice = dia.weekday()
+    coluna = DIAS_SEMANA[indice]
+    atribuicoes = [f"{coluna} = EXCLUDED.{coluna}"] + [f"{d} = 0" for d in DIAS_SEMANA[indice + 1:]]
+    return coluna, ', '.join(atribuicoes)
+
+
+def fechar_dia(dia):
+    # Copia o disparos_dia de todos os vendedores para a coluna do dia da semana e zera o dia, em um só comando.
+    # Idempotente: o INSERT em fechamentos_dia é a trava; com o dia já fechado (ou sendo fechado por outro
+    # processo, que espera o commit do primeiro) nada é alterado.
+    coluna, atribuicoes = _sql_coluna_fechamento(dia)
+    inicio = time.perf_counter()
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute(f"""
+            WITH fechamento AS (
+                INSERT INTO fechamentos_dia (data, vendedores)
+                SELECT %s, COUNT(*) FROM vendedores
+                ON CONFLICT (data) DO NOTHING
+                RETURNING data
+            ), anteriores AS (
+                SELECT v.id, COALESCE(v.disparos_dia, 0) AS disparos
+                FROM vendedores v, fechamento
+                FOR UPDATE OF v
+            ), zerados AS (
+                UPDATE vendedores v SET disparos_dia = 0
+                FROM anteriores a
+                WHERE v.id = a.id AND a.disparos <> 0
+                RETURNING v.id
+            ), semanais AS (
+                INSERT INTO disparos_semanais (vendedor_id, {coluna})
+                SELECT id, disparos FROM anteriores
+                ON CONFLICT (vendedor_id) DO UPDATE SET {atribuicoes}
+                RETURNING vendedor_id
+            )
+            SELECT (SELECT COUNT(*) FROM fechamento), (SELECT COUNT(*) FROM semanais), (SELECT COUNT(*) FROM zerados);
+        """, (dia,))
+        fechado, vendedores, zerados = cur.fetchone()
+        if fechado:
+            # Todos os vendedores mudam: um aviso para recarregar em vez do estado de cada um
+            notificar(cur, {'tipo': 'recarregar', 'motivo': 'fechamento'})
         conn.commit()
-    except Exception as e:
-        conn.rollback()
-        print(f"Erro ao atualizar disparos do dia: {e}")
-        raise e
-    finally:
         cur.close()
-        conn.close()
+    return {'dia': dia, 'coluna': coluna, 'fechado': bool(fechado), 'vendedores': vendedores,
+            'zerados': zerados, 'tempo_s': round(time.perf_counter() - inicio, 4)}
+
+
+def ultimo_fechamento():
+    # Dia mais recente em fechamentos_dia (None se nenhum dia foi fechado)
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT MAX(data) FROM fechamentos_dia;")
+        dia = cur.fetchone()[0]
+        cur.close()
+    return dia
+
+
+# --------- EXPORTAÇÃO ---------
+
+COLUNAS_EXPORTACAO = {
+    'vendedores': ['vendedor_id', 'nome', 'email', 'loja', 'status', 'base_tratada', 'disparos_dia']
+                  + DIAS_SEMANA + ['disparos_semana', 'ultimo_status_tipo', 'ultimo_status_data'],
+    'disparos': ['data', 'vendedor_id', 'nome', 'loja', 'status', 'disparos'],
+}
+
+_SQL_EXPORTAR_VENDEDORES = """
+    SELECT v.id, v.nome, v.email, l.nome, v.status,
+           CASE WHEN v.base_tratada THEN 'sim' ELSE 'não' END, COALESCE(v.disparos_dia, 0),
+           COALESCE(ds.segunda, 0), COALESCE(ds.terca, 0), COALESCE(ds.quarta, 0), COALESCE(ds.quinta, 0),
+           COALESCE(ds.sexta, 0), COALESCE(ds.sabado, 0), COALESCE(ds.domingo, 0),
+           COALESCE(ds.segunda, 0) + COALESCE(ds.terca, 0) + COALESCE(ds.quarta, 0) + COALESCE(ds.quinta, 0)
+           + COALESCE(ds.sexta, 0) + COALESCE(ds.sabado, 0) + COALESCE(ds.domingo, 0),
+           v.ultimo_status_tipo, v.ultimo_status_data
+    FROM vendedores v
+    LEFT JOIN lojas l ON l.id = v.loja_id
+    LEFT JOIN disparos_semanais ds ON ds.vendedor_id = v.id
+    {filtro}
+    ORDER BY v.id
+"""
+
+_SQL_EXPORTAR_DISPAROS = """
+    SELECT h.data, v.id, v.nome, l.nome, v.status, h.disparos
+    FROM disparos_historico h
+    JOIN vendedores v ON v.id = h.vendedor_id
+    LEFT JOIN lojas l ON l.id = v.loja_id
+    {filtro}
+    ORDER BY h.vendedor_id, h.data
+"""
+
+
+def _filtro_exportacao(loja_id=None, status=None, inicio=None, fim=None, marcador='%s'):
+    condicoes, params = [], []
+    for condicao, valor in (("v.loja_id = {}", loja_id), ("v.status = {}", status),
+                            ("h.data >= {}", inicio), ("h.data <= {}", fim)):
+        if valor is not None:
+            condicoes.append(condicao.format(marcador))
+            params.append(valor)
+    return (f"WHERE {' AND '.join(condicoes)}" if condicoes else ""), params
+
+
+def _iterar_cursor_nomeado(sql, params, lote):
+    # Cursor do lado do servidor: cada ida ao banco traz 'lote' linhas, e a memória do worker não cresce com
+    # a tabela. A conexão fica com o gerador até a última linha (fora do escopo da requisição, que já acabou
+    # quando a resposta começa a ser enviada).
+    with conexao() as conn:
+        cur = conn.cursor(name=f"exportacao_{threading.get_ident()}_{time.monotonic_ns()}")
+        cur.itersize = lote
+        try:
+            cur.execute(sql, params)
+            for row in cur:
+                yield row
+        except GeneratorExit:
+            # Download interrompido: sai do with normalmente para a conexão voltar ao pool
+            pass
+        finally:
+            cur.close()
+        conn.rollback()
+
+
+def exportar_vendedores(loja_id=None, status=None, lote=EXPORTACAO_LOTE):
+    # Gerador de tuplas na ordem de COLUNAS_EXPORTACAO['vendedores']
+    filtro, params = _filtro_exportacao(loja_id, status)
+    return _iterar_cursor_nomeado(_SQL_EXPORTAR_VENDEDORES.format(filtro=filtro), params, lote)
+
+
+def exportar_disparos(loja_id=None, status=None, inicio=None, fim=None, lote=EXPORTACAO_LOTE):
+    # Histórico diário (uma linha por vendedor/dia) na ordem de COLUNAS_EXPORTACAO['disparos']
+    filtro, params = _filtro_exportacao(loja_id, status, inicio, fim)
+    return _iterar_cursor_nomeado(_SQL_EXPORTAR_DISPAROS.format(filtro=filtro), params, lote)
+
+
+# ==============================
+# BACKEND EMBUTIDO (DB_BACKEND=sqlite)
+# ==============================
+# O repositório: funções que falam com o banco. armazenamento_sqlite implementa todas com a mesma assinatura
+# e o mesmo formato de retorno; as demais (listar_vendedores_com_disparos, listar_vendedores_pagina) são
+# montadas em cima delas e servem aos dois backends.
+FUNCOES_REPOSITORIO = (
+    'conexao', 'iniciar_escopo_requisicao', 'encerrar_escopo_requisicao', 'estatisticas_pool', 'ensure_tables',
+    'get_versao_cache', 'get_versao_dados', 'notificar',
+    'listar_lojas', 'get_loja_by_id', 'insert_loja', 'update_loja', 'listar_lojas_pagina', 'contar_lojas',
+    'listar_vendedores', 'get_vendedores_by_loja', 'insert_vendedor', 'update_status_vendedor',
+    'atualizar_status_em_lote', 'atualizar_status_por_filtro', 'deletar_vendedor',
+    'carregar_vendedores_com_disparos', 'listar_vendedores_removidos', 'contar_vendedores',
+    'get_total_disparos_periodo', 'listar_historico_disparos', 'update_disparos_semanais', 'get_disparos_semanais',
+    'update_disparos_dia', 'get_disparos_hoje', 'atualizar_disparos_dia', 'incrementar_disparos_dia',
+    'get_kpis_painel', 'listar_vendedores_por_status', 'fechar_dia', 'ultimo_fechamento',
+    'get_resumo_loja', 'listar_resumo_lojas', 'verificar_resumo_lojas',
+    'exportar_vendedores', 'exportar_disparos',
+)
+
+if BACKEND == 'sqlite':
+    import armazenamento_sqlite
+    for _nome in FUNCOES_REPOSITORIO:
+        globals()[_nome] = getattr(armazenamento_sqlite, _nome)
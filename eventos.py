@@ -0,0 +1,211 @@
+# eventos.py
+import itertools
+import json
+import os
+import queue
+import select
+import sys
+import threading
+import time
+
+import psycopg2.extensions
+
+import database
+
+SSE_FILA_MAX = int(os.getenv("SSE_FILA_MAX", "100"))                # eventos pendentes por navegador
+SSE_KEEPALIVE = float(os.getenv("SSE_KEEPALIVE", "15"))             # segundos entre comentários de keep-alive
+WEB_THREADS = int(os.getenv("WEB_THREADS", "64"))
+
+
+def _worker_cooperativo():
+    # Processo 'sse' do Procfile (worker gevent, módulos já trocados pelos cooperativos): cada navegador é um
+    # greenlet esperando a fila, não uma thread do pool do gthread
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('threading')
+
+
+COOPERATIVO = _worker_cooperativo()
+if COOPERATIVO:
+    # Limite pela memória (fila de até SSE_FILA_MAX mensagens por navegador), não por threads
+    SSE_MAX_ASSINANTES = int(os.getenv("SSE_MAX_ASSINANTES", "5000"))
+else:
+    # No worker gthread do processo 'web' cada navegador prende uma das --threads ${WEB_THREADS:-64} enquanto estiver
+    # conectado: ali o limite fica bem abaixo das threads (16 por worker no padrão) para sobrar atendimento às
+    # páginas e à API. Centenas de navegadores só com o processo 'sse' (SSE_URL apontando para ele).
+    SSE_MAX_ASSINANTES = int(os.getenv("SSE_MAX_ASSINANTES", str(max(1, WEB_THREADS // 4))))
+    if SSE_MAX_ASSINANTES > WEB_THREADS // 2:
+        print(f"Aviso: SSE_MAX_ASSINANTES={SSE_MAX_ASSINANTES} prenderia mais da metade das {WEB_THREADS} threads "
+              f"do worker; usando {max(1, WEB_THREADS // 2)}.", file=sys.stderr)
+        SSE_MAX_ASSINANTES = max(1, WEB_THREADS // 2)
+EVENTOS_RECONEXAO = float(os.getenv("EVENTOS_RECONEXAO", "2"))      # espera antes de reconectar o LISTEN
+
+
+class LimiteAssinantes(Exception):
+    pass
+
+
+def formatar_sse(evento):
+    return f"id: {evento['id']}\nevent: {evento.get('tipo', 'mensagem')}\ndata: {json.dumps(evento, ensure_ascii=False)}\n\n"
+
+
+# ==============================
+# ASSINATURA (uma por navegador conectado)
+# ==============================
+class Assinatura:
+    def __init__(self, ouvinte):
+        self._ouvinte = ouvinte
+        self._fila = queue.Queue(maxsize=SSE_FILA_MAX)
+
+    def entregar(self, mensagem, recarregar):
+        try:
+            self._fila.put_nowait(mensagem)
+            return True
+        except queue.Full:
+            # Navegador lento: joga fora o atrasado e manda recarregar, em vez de crescer a fila sem limite
+            while True:
+                try:
+                    self._fila.get_nowait()
+                except queue.Empty:
+                    break
+            self._fila.put_nowait(recarregar)
+            return False
+
+    def proximo(self, timeout=SSE_KEEPALIVE):
+        try:
+            return self._fila.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def cancelar(self):
+        self._ouvinte.cancelar(self)
+
+
+# ==============================
+# OUVINTE (uma conexão LISTEN por worker, para todos os navegadores)
+# ==============================
+class OuvinteEventos:
+    def __init__(self, canal=database.EVENTOS_CANAL, fabrica=database.get_conn):
+        self.canal = canal
+        self.fabrica = fabrica
+        self.pid = os.getpid()
+
+        self._lock = threading.Lock()
+        self._assinantes = set()
+        self._thread = None
+        self._parar = threading.Event()
+        self._seq = itertools.count(1)
+        self._stats = {'recebidos': 0, 'entregues': 0, 'atrasados': 0, 'reconexoes': 0, 'conectado': False}
+
+    def assinar(self):
+        with self._lock:
+            if len(self._assinantes) >= SSE_MAX_ASSINANTES:
+                raise LimiteAssinantes(f"Limite de {SSE_MAX_ASSINANTES} conexões de eventos atingido neste worker.")
+            assinatura = Assinatura(self)
+            self._assinantes.add(assinatura)
+            # No SQLite não há LISTEN: as escritas deste processo chamam distribuir() direto
+            if database.BACKEND == 'postgres' and (self._thread is None or not self._thread.is_alive()):
+                self._parar.clear()
+                self._thread = threading.Thread(target=self._executar, name='ouvinte-eventos', daemon=True)
+                self._thread.start()
+        return assinatura
+
+    def cancelar(self, assinatura):
+        with self._lock:
+            self._assinantes.discard(assinatura)
+
+    def parar(self):
+        self._parar.set()
+
+    def _conectar(self):
+        conn = self.fabrica()
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        cur = conn.cursor()
+        cur.execute(f"LISTEN {psycopg2.extensions.quote_ident(self.canal, cur)};")
+        cur.close()
+        return conn
+
+    def _executar(self):
+        reconectando = False
+        while not self._parar.is_set():
+            conn = None
+            try:
+                conn = self._conectar()
+                self._stats['conectado'] = True
+                if reconectando:
+                    # Eventos enviados enquanto estávamos fora se perderam: os navegadores buscam o estado de novo
+                    self.distribuir({'tipo': 'recarregar', 'motivo': 'reconexao'})
+                while not self._parar.is_set():
+                    if select.select([conn], [], [], 5.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notificacao = conn.notifies.pop(0)
+                        self._stats['recebidos'] += 1
+                        try:
+                            evento = json.loads(notificacao.payload)
+                        except ValueError:
+                            evento = {'tipo': 'mensagem', 'dados': notificacao.payload}
+                        self.distribuir(evento)
+            except Exception as e:
+                print("Aviso: ouvinte de eventos desconectado:", e, file=sys.stderr)
+                self._stats['reconexoes'] += 1
+                reconectando = True
+                self._parar.wait(EVENTOS_RECONEXAO)
+            finally:
+                self._stats['conectado'] = False
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+    def distribuir(self, evento):
+        # Serializa uma vez; cada navegador recebe a mesma string
+        evento = dict(evento, id=next(self._seq))
+        mensagem = formatar_sse(evento)
+        recarregar = formatar_sse({'id': evento['id'], 'tipo': 'recarregar', 'motivo': 'atraso'})
+        with self._lock:
+            assinantes = list(self._assinantes)
+        for assinatura in assinantes:
+            if assinatura.entregar(mensagem, recarregar):
+                self._stats['entregues'] += 1
+            else:
+                self._stats['atrasados'] += 1
+
+    def estatisticas(self):
+        with self._lock:
+            dados = dict(self._stats)
+            dados.update({
+                'assinantes': len(self._assinantes),
+                'canal': self.canal,
+                'pid': self.pid,
+            })
+        return dados
+
+
+_ouvinte = None
+_ouvinte_lock = threading.Lock()
+
+
+def get_ouvinte():
+    global _ouvinte
+    # Após fork a thread do ouvinte não existe no filho: cada worker cria o seu
+    if _ouvinte is None or _ouvinte.pid != os.getpid():
+        with _ouvinte_lock:
+            if _ouvinte is None or _ouvinte.pid != os.getpid():
+                _ouvinte = OuvinteEventos()
+    return _ouvinte
+
+
+def fluxo_sse(assinatura, keepalive=SSE_KEEPALIVE):
+    # O keep-alive também é o que detecta navegador desconectado (a escrita falha e o gerador é fechado)
+    try:
+        yield f"retry: {int(EVENTOS_RECONEXAO * 1000)}\n\n"
+        while True:
+            mensagem = assinatura.proximo(keepalive)
+            yield mensagem if mensagem is not None else f": keepalive {int(time.time())}\n\n"
+    finally:
+        assinatura.cancelar()
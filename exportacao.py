@@ -0,0 +1,286 @@
+# exportacao.py
+# Exportação de vendedores e do histórico de disparos em CSV ou XLSX, em fluxo: as linhas saem do cursor do
+# banco (database.exportar_*, em lotes) direto para a resposta em blocos de EXPORTACAO_BLOCO bytes. Nenhuma
+# etapa guarda o arquivo inteiro, então a memória do worker é a mesma para mil ou um milhão de linhas.
+# O XLSX é montado aqui (zip + XML da planilha escritos em sequência) porque as bibliotecas de planilha
+# guardam o arquivo em disco ou memória até o fim antes de entregar o primeiro byte.
+# Cada download em andamento prende uma conexão do pool (com a transação do cursor aberta) até o último byte;
+# EXPORTACAO_MAX_SIMULTANEAS limita quantas correm ao mesmo tempo no worker para o pool seguir atendendo as páginas.
+import csv
+import io
+import itertools
+import numbers
+import os
+import re
+import threading
+import zipfile
+from datetime import date
+from xml.sax.saxutils import escape
+
+import database
+
+EXPORTACAO_BLOCO = int(os.getenv("EXPORTACAO_BLOCO", str(64 * 1024)))   # bytes por pedaço da resposta
+EXPORTACAO_CSV_SEPARADOR = os.getenv("EXPORTACAO_CSV_SEPARADOR", ";")   # ';' abre direto no Excel em pt-BR
+# Por worker; o padrão deixa três quartos do pool (DB_POOL_MAX) para as requisições comuns
+EXPORTACAO_MAX_SIMULTANEAS = int(os.getenv("EXPORTACAO_MAX_SIMULTANEAS", str(max(1, database.POOL_MAX // 4))))
+
+TIPOS = ('vendedores', 'disparos')
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+XLSX_MAX_LINHAS = 1048576   # limite do Excel por planilha (com o cabeçalho); acima disso abre outra aba
+
+
+def ler_filtros(tipo, args):
+    # args: request.args ou opções do CLI; levanta ValueError com a mensagem para o cliente
+    filtros = {'loja_id': None, 'status': (args.get('status') or '').strip() or None, 'inicio': None, 'fim': None}
+    if args.get('loja_id'):
+        try:
+            filtros['loja_id'] = int(args['loja_id'])
+        except (TypeError, ValueError):
+            raise ValueError('loja_id precisa ser um número inteiro.')
+    for campo in ('inicio', 'fim'):
+        if args.get(campo):
+            if tipo != 'disparos':
+                raise ValueError('inicio e fim valem só para a exportação de disparos.')
+            try:
+                filtros[campo] = date.fromisoformat(str(args[campo]))
+            except ValueError:
+                raise ValueError(f'{campo} precisa estar no formato AAAA-MM-DD.')
+    if filtros['inicio'] and filtros['fim'] and filtros['inicio'] > filtros['fim']:
+        raise ValueError('inicio depois de fim.')
+    return filtros
+
+
+def linhas(tipo, loja_id=None, status=None, inicio=None, fim=None):
+    if tipo == 'vendedores':
+        return database.exportar_vendedores(loja_id=loja_id, status=status)
+    return database.exportar_disparos(loja_id=loja_id, status=status, inicio=inicio, fim=fim)
+
+
+def nome_arquivo(tipo, formato, loja_id=None, status=None, inicio=None, fim=None):
+    partes = [tipo]
+    if loja_id is not None:
+        partes.append(f"loja{loja_id}")
+    if status:
+        partes.append(re.sub(r'[^0-9A-Za-z]+', '_', status).strip('_').lower())
+    if inicio or fim:
+        partes.append(f"{inicio or ''}_a_{fim or ''}".strip('_'))
+    return f"{'_'.join(partes)}_{date.today():%Y%m%d}.{formato}"
+
+
+# ==============================
+# LIMITE DE EXPORTAÇÕES SIMULTÂNEAS
+# ==============================
+class ExportacoesOcupadas(Exception):
+    pass
+
+
+_lock = threading.Lock()
+_em_andamento = 0
+
+
+def em_andamento():
+    return _em_andamento
+
+
+class Exportacao:
+    # Corpo da resposta: reserva a vaga ao ser criado (a rota ainda pode responder 503) e devolve em close(),
+    # que o servidor WSGI chama ao terminar o envio, inclusive quando o cliente desiste antes do primeiro byte
+    def __init__(self, tipo, formato, **filtros):
+        global _em_andamento
+        with _lock:
+            if _em_andamento >= EXPORTACAO_MAX_SIMULTANEAS:
+                raise ExportacoesOcupadas(
+                    f"Já há {EXPORTACAO_MAX_SIMULTANEAS} exportações em andamento neste worker; tente de novo em instantes.")
+            _em_andamento += 1
+        self._reservada = True
+        self._pedacos = gerar(tipo, formato, **filtros)
+
+    def __iter__(self):
+        try:
+            yield from self._pedacos
+        finally:
+            self.close()
+
+    def close(self):
+        global _em_andamento
+        self._pedacos.close()
+        with _lock:
+            if self._reservada:
+                self._reservada = False
+                _em_andamento -= 1
+
+
+def gerar(tipo, formato, **filtros):
+    # Gerador de bytes para Response; a consulta só começa no primeiro pedaço pedido
+    colunas = database.COLUNAS_EXPORTACAO[tipo]
+    fonte = linhas(tipo, **filtros)
+    try:
+        if formato == 'xlsx':
+            yield from gerar_xlsx(colunas, fonte, tipo)
+        else:
+            yield from gerar_csv(colunas, fonte)
+    finally:
+        # Download interrompido: fecha o cursor e devolve a conexão já, sem esperar o coletor
+        fonte.close()
+
+
+# ==============================
+# CSV
+# ==============================
+def _valor_csv(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, date):
+        return f"{valor:%d/%m/%Y}"
+    # Texto que começa com = + - @ vira fórmula no Excel
+    if isinstance(valor, str) and valor[:1] in ('=', '+', '-', '@'):
+        return "'" + valor
+    return valor
+
+
+def gerar_csv(colunas, linhas, separador=EXPORTACAO_CSV_SEPARADOR, bloco=EXPORTACAO_BLOCO):
+    texto = io.StringIO()
+    escritor = csv.writer(texto, delimiter=separador, lineterminator='\r\n')
+    escritor.writerow(colunas)
+    primeiro = True
+    for linha in linhas:
+        escritor.writerow([_valor_csv(v) for v in linha])
+        if texto.tell() >= bloco:
+            yield texto.getvalue().encode('utf-8-sig' if primeiro else 'utf-8')
+            primeiro = False
+            texto.seek(0)
+            texto.truncate()
+    yield texto.getvalue().encode('utf-8-sig' if primeiro else 'utf-8')
+
+
+# ==============================
+# XLSX
+# ==============================
+_CONTROLE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+_EPOCA_EXCEL = date(1899, 12, 30)
+
+_XML = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+_NS_PLANILHA = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+_NS_REL = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+_NS_PACOTE = 'http://schemas.openxmlformats.org/package/2006/relationships'
+
+_RELS = (_XML + f'<Relationships xmlns="{_NS_PACOTE}">'
+         f'<Relationship Id="rId1" Type="{_NS_REL}/officeDocument" Target="xl/workbook.xml"/>'
+         '</Relationships>')
+
+# Estilo 1 = data (formato 14, dd/mm/aaaa no Excel em pt-BR); estilo 2 = cabeçalho em negrito
+_ESTILOS = (_XML + f'<styleSheet xmlns="{_NS_PLANILHA}">'
+            '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+            '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+            '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+            '<fill><patternFill patternType="gray125"/></fill></fills>'
+            '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+            '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+            '<cellXfs count="3"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+            '<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+            '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+            '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+            '</styleSheet>')
+
+
+def _celula_xlsx(valor):
+    if valor is None:
+        return '<c/>'
+    if isinstance(valor, bool):
+        return f'<c t="b"><v>{int(valor)}</v></c>'
+    if isinstance(valor, numbers.Number):
+        return f'<c><v>{valor}</v></c>'
+    if isinstance(valor, date):
+        return f'<c s="1"><v>{(valor - _EPOCA_EXCEL).days}</v></c>'
+    # Texto inline: sem tabela de strings compartilhadas, que exigiria conhecer todas antes de escrever
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(_CONTROLE.sub("", str(valor)))}</t></is></c>'
+
+
+class _Saida:
+    # Destino do zip: acumula o que foi escrito até o gerador entregar. Sem seek/tell, o zipfile grava os
+    # tamanhos depois de cada arquivo (data descriptor) em vez de voltar ao cabeçalho.
+    def __init__(self):
+        self._partes = []
+        self.tamanho = 0
+
+    def write(self, dados):
+        self._partes.append(bytes(dados))
+        self.tamanho += len(dados)
+        return len(dados)
+
+    def flush(self):
+        pass
+
+    def tomar(self):
+        dados = b''.join(self._partes)
+        self._partes.clear()
+        self.tamanho = 0
+        return dados
+
+
+def gerar_xlsx(colunas, linhas, nome_planilha='dados', bloco=EXPORTACAO_BLOCO):
+    saida = _Saida()
+    zf = zipfile.ZipFile(saida, 'w', compression=zipfile.ZIP_DEFLATED)
+    cabecalho = '<row>' + ''.join(f'<c t="inlineStr" s="2"><is><t>{escape(c)}</t></is></c>' for c in colunas) + '</row>'
+    linhas = iter(linhas)
+    planilhas = 0
+    pendente = []   # linha já lida que abre a próxima aba
+
+    while True:
+        planilhas += 1
+        # force_zip64: o tamanho da planilha não é conhecido antes e pode passar de 2 GB descompactado
+        with zf.open(f'xl/worksheets/sheet{planilhas}.xml', 'w', force_zip64=True) as f:
+            f.write(f'{_XML}<worksheet xmlns="{_NS_PLANILHA}"><sheetViews><sheetView workbookViewId="0">'
+                    '<pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/></sheetView>'
+                    f'</sheetViews><sheetData>{cabecalho}'.encode())
+            escritas = 1
+            texto, tamanho = [], 0
+            for linha in itertools.chain(pendente, linhas):
+                xml = '<row>' + ''.join(_celula_xlsx(v) for v in linha) + '</row>'
+                texto.append(xml)
+                tamanho += len(xml)
+                escritas += 1
+                if tamanho >= bloco:
+                    f.write(''.join(texto).encode())
+                    texto, tamanho = [], 0
+                    if saida.tamanho:
+                        yield saida.tomar()
+                if escritas >= XLSX_MAX_LINHAS:
+                    break
+            f.write((''.join(texto) + '</sheetData></worksheet>').encode())
+        if saida.tamanho >= bloco:
+            yield saida.tomar()
+        # Aba cheia: só abre outra se ainda houver linhas
+        proxima = next(linhas, None) if escritas >= XLSX_MAX_LINHAS else None
+        if proxima is None:
+            break
+        pendente = [proxima]
+
+    nomes = [nome_planilha if i == 1 else f'{nome_planilha} ({i})' for i in range(1, planilhas + 1)]
+    zf.writestr('[Content_Types].xml', _XML + '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                '<Default Extension="xml" ContentType="application/xml"/>'
+                '<Override PartName="/xl/workbook.xml" '
+                'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+                '<Override PartName="/xl/styles.xml" '
+                'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+                + ''.join(f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+                          'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+                          for i in range(1, planilhas + 1))
+                + '</Types>')
+    zf.writestr('_rels/.rels', _RELS)
+    zf.writestr('xl/workbook.xml', _XML + f'<workbook xmlns="{_NS_PLANILHA}" xmlns:r="{_NS_REL}"><sheets>'
+                + ''.join(f'<sheet name="{escape(nome[:31])}" sheetId="{i}" r:id="rId{i}"/>'
+                          for i, nome in enumerate(nomes, start=1))
+                + '</sheets></workbook>')
+    zf.writestr('xl/_rels/workbook.xml.rels', _XML + f'<Relationships xmlns="{_NS_PACOTE}">'
+                + ''.join(f'<Relationship Id="rId{i}" Type="{_NS_REL}/worksheet" Target="worksheets/sheet{i}.xml"/>'
+                          for i in range(1, planilhas + 1))
+                + f'<Relationship Id="rId{planilhas + 1}" Type="{_NS_REL}/styles" Target="styles.xml"/>'
+                + '</Relationships>')
+    zf.writestr('xl/styles.xml', _ESTILOS)
+    zf.close()
+    yield saida.tomar()
@@ -0,0 +1,94 @@
+# fechamento.py
+# Fechamento diário: o disparos_dia de cada vendedor vai para a coluna do dia da semana em disparos_semanais
+# e é zerado (database.fechar_dia, um comando SQL para todos). Roda pelo cron (`flask fechar-dia`, logo depois
+# da meia-noite) ou pelo agendador embutido (`flask fechar-dia --agendar`, processo 'clock' do Procfile).
+# Rodar de novo para o mesmo dia não altera nada.
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import database
+
+# Hora local em que o dia anterior é fechado (HH:MM)
+FECHAMENTO_HORARIO = os.getenv("FECHAMENTO_HORARIO", "00:05")
+FECHAMENTO_TENTATIVAS = int(os.getenv("FECHAMENTO_TENTATIVAS", "5"))      # banco fora do ar na hora marcada
+FECHAMENTO_ESPERA = float(os.getenv("FECHAMENTO_ESPERA", "60"))           # segundos entre tentativas
+
+
+def dia_anterior(agora=None):
+    return (agora or datetime.now()).date() - timedelta(days=1)
+
+
+def proxima_execucao(agora=None, horario=FECHAMENTO_HORARIO):
+    agora = agora or datetime.now()
+    hora, minuto = (int(p) for p in horario.split(':'))
+    alvo = agora.replace(hour=hora, minute=minuto, second=0, microsecond=0)
+    return alvo if alvo > agora else alvo + timedelta(days=1)
+
+
+def descrever(resultado):
+    if not resultado['fechado']:
+        return f"Dia {resultado['dia']:%d/%m/%Y} já estava fechado; nada alterado ({resultado['tempo_s']:.3f}s)."
+    return (f"Dia {resultado['dia']:%d/%m/%Y} fechado em '{resultado['coluna']}': {resultado['vendedores']} vendedores, "
+            f"{resultado['zerados']} com disparos_dia zerado, em {resultado['tempo_s']:.3f}s.")
+
+
+def fechar(dia=None, registrar=print):
+    resultado = database.fechar_dia(dia or dia_anterior())
+    registrar(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] {descrever(resultado)}")
+    return resultado
+
+
+def dia_pendente(agora=None, registrar=print):
+    # Dia anterior ainda sem fechamento: o horário passou com o agendador parado (deploy, queda, máquina
+    # suspensa). Num banco em que nenhum dia foi fechado não há o que recuperar; o primeiro é o do horário.
+    # Só o dia anterior é recuperado: com o agendador parado vários dias, os do meio não entram em
+    # fechamentos_dia e o disparos_dia acumulado neles todo vai para a coluna de ontem. Fechá-los depois com
+    # --dia não conserta (o fechamento zera as colunas seguintes da semana); o aviso diz o que corrigir à mão.
+    dia = dia_anterior(agora)
+    ultimo = database.ultimo_fechamento()
+    if ultimo is None or ultimo >= dia:
+        return None
+    perdidos = (dia - ultimo).days - 1
+    if perdidos:
+        registrar(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] Aviso: {perdidos} dia(s) sem fechamento, de "
+                  f"{ultimo + timedelta(days=1):%d/%m/%Y} a {dia - timedelta(days=1):%d/%m/%Y}. Só {dia:%d/%m/%Y} "
+                  f"será fechado e recebe os disparos_dia de todo o período; corrija disparos_semanais à mão se preciso.")
+    return dia
+
+
+# ==============================
+# AGENDADOR EMBUTIDO
+# ==============================
+def _com_tentativas(acao):
+    # Banco fora do ar: tenta de novo algumas vezes; as ações são idempotentes
+    for tentativa in range(1, FECHAMENTO_TENTATIVAS + 1):
+        try:
+            return acao()
+        except Exception as e:
+            print(f"Erro no fechamento do dia (tentativa {tentativa}/{FECHAMENTO_TENTATIVAS}):", e, file=sys.stderr)
+            if tentativa < FECHAMENTO_TENTATIVAS:
+                time.sleep(FECHAMENTO_ESPERA)
+    return None
+
+
+def agendar(registrar=print, horario=FECHAMENTO_HORARIO):
+    # Um processo só (o 'clock'): dentro dos workers web cada um fecharia o dia (inofensivo, mas inútil).
+    while True:
+        # Ao iniciar e a cada despertar: um dia que ficou sem fechamento é fechado já. O disparos_dia acumulado
+        # desde a meia-noite vai junto para ele, em vez de o dia inteiro ir parar na coluna do dia seguinte.
+        pendente = _com_tentativas(lambda: dia_pendente(registrar=registrar))
+        if pendente is not None:
+            registrar(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] Dia {pendente:%d/%m/%Y} sem fechamento "
+                      f"(agendador parado no horário); fechando agora.")
+            _com_tentativas(lambda: fechar(pendente, registrar))
+
+        alvo = proxima_execucao(horario=horario)
+        registrar(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] Próximo fechamento: {alvo:%d/%m/%Y %H:%M} "
+                  f"(dia {dia_anterior(alvo):%d/%m/%Y}).")
+        # Dorme em trechos curtos: acompanha ajustes do relógio do sistema
+        while datetime.now() < alvo:
+            time.sleep(min(60.0, max(0.5, (alvo - datetime.now()).total_seconds())))
+        # Pelo relógio de agora, não pelo alvo: depois de uma suspensão longa o alvo já é de dias atrás
+        _com_tentativas(lambda: fechar(dia_anterior(), registrar))
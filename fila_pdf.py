@@ -0,0 +1,305 @@
+# fila_pdf.py
+import io
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+import metricas
+
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+PDF_FILA_MAX = int(os.getenv("PDF_FILA_MAX", "20"))       # jobs pendentes por worker web antes de recusar
+MOTORES_PDF = ('xhtml2pdf', 'reportlab')
+PDF_JOBS_DIR = os.getenv("PDF_JOBS_DIR", os.path.join(tempfile.gettempdir(), 'gestao_disparos_pdfs'))
+# Retenção: o JSON e o PDF de um job somem PDF_JOBS_RETENCAO segundos depois da última mudança de status
+# (campo 'expira_em' do job); depois disso status e download respondem 404. A limpeza roda ao enfileirar,
+# no máximo a cada PDF_JOBS_LIMPEZA_INTERVALO segundos por worker.
+PDF_JOBS_RETENCAO = float(os.getenv("PDF_JOBS_RETENCAO", str(24 * 3600)))
+PDF_JOBS_LIMPEZA_INTERVALO = float(os.getenv("PDF_JOBS_LIMPEZA_INTERVALO", "300"))
+
+_ID_VALIDO = re.compile(r'^[0-9a-f]{32}$')
+_ARQUIVO_JOB = re.compile(r'^[0-9a-f]{32}\.(json|pdf|json\.tmp)$')
+
+
+class FilaCheia(Exception):
+    pass
+
+
+# ==============================
+# ESTADO DOS JOBS (em disco, visível para todos os workers)
+# ==============================
+def _caminho_status(job_id, pasta=PDF_JOBS_DIR):
+    return os.path.join(pasta, f"{job_id}.json")
+
+
+def _caminho_pdf(job_id, pasta=PDF_JOBS_DIR):
+    return os.path.join(pasta, f"{job_id}.pdf")
+
+
+def _gravar_status(job, pasta=PDF_JOBS_DIR):
+    # Escrita atômica: quem consulta nunca lê um JSON pela metade
+    tmp = _caminho_status(job['id'], pasta) + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(job, f)
+    os.replace(tmp, _caminho_status(job['id'], pasta))
+
+
+def get_job(job_id, pasta=PDF_JOBS_DIR):
+    if not job_id or not _ID_VALIDO.match(job_id):
+        return None
+    try:
+        with open(_caminho_status(job_id, pasta), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def caminho_pdf(job_id, pasta=PDF_JOBS_DIR):
+    job = get_job(job_id, pasta)
+    if not job or job['status'] != 'concluido':
+        return None
+    return _caminho_pdf(job_id, pasta)
+
+
+def limpar_jobs(pasta=PDF_JOBS_DIR, retencao=PDF_JOBS_RETENCAO, agora=None):
+    # Remove status e PDFs sem mudança há mais de 'retencao' segundos (inclui jobs órfãos de um worker que
+    # morreu no meio). Vários workers podem limpar ao mesmo tempo: arquivo que já sumiu não é erro.
+    limite = (agora or time.time()) - retencao
+    removidos = 0
+    try:
+        entradas = list(os.scandir(pasta))
+    except FileNotFoundError:
+        return 0
+    for entrada in entradas:
+        if not _ARQUIVO_JOB.match(entrada.name):
+            continue
+        try:
+            if entrada.stat().st_mtime < limite:
+                os.remove(entrada.path)
+                removidos += 1
+        except FileNotFoundError:
+            pass
+    return removidos
+
+
+# ==============================
+# RENDERIZAÇÃO (roda no processo filho)
+# ==============================
+def html_para_pdf(html):
+    from xhtml2pdf import pisa
+
+    pdf = io.BytesIO()
+    pisa_status = pisa.CreatePDF(io.StringIO(html), dest=pdf)
+    if pisa_status.err:
+        raise Exception("Erro ao gerar PDF")
+    return pdf.getvalue()
+
+
+def carregar_motores_pdf():
+    # Os imports ficam nas funções acima para o app subir sem eles; isto antecipa o custo (ex.: no pai do
+    # gunicorn --preload, para os workers nascerem com os motores já carregados)
+    from xhtml2pdf import pisa  # noqa: F401
+    import pdf_reportlab  # noqa: F401
+
+
+def renderizar_documento(documento):
+    # documento: {'motor': 'xhtml2pdf', 'html': ...} ou {'motor': 'reportlab', 'dados': ...}
+    if documento['motor'] == 'reportlab':
+        import pdf_reportlab
+        return pdf_reportlab.gerar_pdf_reportlab(documento['dados'])
+    return html_para_pdf(documento['html'])
+
+
+def _executar_job(job, documento, pasta):
+    job['status'] = 'processando'
+    job['iniciado_em'] = time.time()
+    job['espera_s'] = round(job['iniciado_em'] - job['criado_em'], 4)
+    _gravar_status(job, pasta)
+
+    inicio = time.perf_counter()
+    try:
+        conteudo = renderizar_documento(documento)
+        with open(_caminho_pdf(job['id'], pasta), 'wb') as f:
+            f.write(conteudo)
+        job['status'] = 'concluido'
+        job['tamanho_bytes'] = len(conteudo)
+    except Exception as e:
+        job['status'] = 'erro'
+        job['erro'] = str(e)
+    job['render_s'] = round(time.perf_counter() - inicio, 4)
+    job['concluido_em'] = time.time()
+    job['expira_em'] = job['concluido_em'] + job['retencao_s']
+    job['total_s'] = round(job['concluido_em'] - job['criado_em'], 4)
+    _gravar_status(job, pasta)
+    return job
+
+
+def _marcar_erro(job, erro, pasta):
+    # Gravado pelo pai quando o filho não chega a devolver o job (morreu no meio, pool quebrado): sem isto o
+    # JSON ficaria em 'processando' até expirar
+    job['status'] = 'erro'
+    job['erro'] = erro
+    job['concluido_em'] = time.time()
+    job['expira_em'] = job['concluido_em'] + job['retencao_s']
+    job['total_s'] = round(job['concluido_em'] - job['criado_em'], 4)
+    try:
+        _gravar_status(job, pasta)
+    except OSError as e:
+        print("Erro ao gravar o status do job de PDF:", e, file=sys.stderr)
+    return job
+
+
+# ==============================
+# FILA (um pool de processos por worker web)
+# ==============================
+class FilaPDF:
+    def __init__(self, workers=PDF_WORKERS, maximo=PDF_FILA_MAX, pasta=PDF_JOBS_DIR,
+                 retencao=PDF_JOBS_RETENCAO, intervalo_limpeza=PDF_JOBS_LIMPEZA_INTERVALO):
+        self.workers = max(1, workers)
+        self.maximo = max(1, maximo)
+        self.pasta = pasta
+        self.retencao = retencao
+        self.intervalo_limpeza = intervalo_limpeza
+        self.pid = os.getpid()
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pendentes = 0
+        self._proxima_limpeza = 0.0
+        self._stats = {
+            'enfileirados': 0,
+            'recusados': 0,
+            'concluidos': 0,
+            'erros': 0,
+            'expirados_removidos': 0,
+            'pools_recriados': 0,
+            'espera_total_s': 0.0,
+            'render_total_s': 0.0,
+        }
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                os.makedirs(self.pasta, exist_ok=True)
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def _descartar_executor(self, executor):
+        # Um filho que morre (OOM, segfault no motor de PDF) quebra o ProcessPoolExecutor para sempre: todo
+        # submit seguinte levantaria BrokenProcessPool. Solta o pool quebrado; o próximo job cria outro.
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+            self._stats['pools_recriados'] += 1
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _limpar_se_preciso(self):
+        agora = time.monotonic()
+        with self._lock:
+            if agora < self._proxima_limpeza:
+                return
+            self._proxima_limpeza = agora + self.intervalo_limpeza
+        try:
+            removidos = limpar_jobs(self.pasta, self.retencao)
+        except OSError as e:
+            print("Erro na limpeza dos jobs de PDF:", e, file=sys.stderr)
+            return
+        with self._lock:
+            self._stats['expirados_removidos'] += removidos
+
+    def enfileirar(self, documento, nome_arquivo='relatorio.pdf', loja=None):
+        self._limpar_se_preciso()
+        with self._lock:
+            if self._pendentes >= self.maximo:
+                self._stats['recusados'] += 1
+                raise FilaCheia(f"Fila de PDFs cheia ({self.maximo} pendentes).")
+            self._pendentes += 1
+            self._stats['enfileirados'] += 1
+
+        job = {
+            'id': uuid.uuid4().hex,
+            'status': 'na_fila',
+            'loja': loja,
+            'motor': documento['motor'],
+            'nome_arquivo': nome_arquivo,
+            'criado_em': time.time(),
+            'retencao_s': self.retencao,
+        }
+        try:
+            executor = self._get_executor()
+            _gravar_status(job, self.pasta)
+            try:
+                futuro = executor.submit(_executar_job, job, documento, self.pasta)
+            except BrokenProcessPool:
+                # O pool quebrou num job anterior: uma nova tentativa num pool novo
+                self._descartar_executor(executor)
+                executor = self._get_executor()
+                futuro = executor.submit(_executar_job, job, documento, self.pasta)
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool):
+                self._descartar_executor(executor)
+                _marcar_erro(job, str(e) or "Pool de processos de PDF quebrado.", self.pasta)
+            with self._lock:
+                self._pendentes -= 1
+            raise
+        futuro.add_done_callback(partial(self._finalizar, job, executor))
+        return job
+
+    def _finalizar(self, enviado, executor, futuro):
+        try:
+            job = futuro.result()
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool):
+                self._descartar_executor(executor)
+            print("Erro no job de PDF:", e, file=sys.stderr)
+            job = _marcar_erro(enviado, str(e) or type(e).__name__, self.pasta)
+        with self._lock:
+            self._pendentes -= 1
+            if job['status'] == 'concluido':
+                self._stats['concluidos'] += 1
+            else:
+                self._stats['erros'] += 1
+            self._stats['espera_total_s'] += job.get('espera_s', 0)
+            self._stats['render_total_s'] += job.get('render_s', 0)
+        if 'render_s' in job:
+            metricas.pdf_render.observar(job['render_s'], job['motor'], 'fila')
+
+    def estatisticas(self):
+        with self._lock:
+            dados = dict(self._stats)
+            finalizados = dados['concluidos'] + dados['erros']
+            dados.update({
+                'pendentes': self._pendentes,
+                'maximo': self.maximo,
+                'workers': self.workers,
+                'retencao_s': self.retencao,
+                'espera_media_s': round(dados['espera_total_s'] / finalizados, 4) if finalizados else 0,
+                'render_medio_s': round(dados['render_total_s'] / finalizados, 4) if finalizados else 0,
+            })
+        return dados
+
+    def encerrar(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+_fila = None
+_fila_lock = threading.Lock()
+
+
+def get_fila():
+    global _fila
+    # Pool de processos não sobrevive ao fork do gunicorn: recria no worker
+    if _fila is None or _fila.pid != os.getpid():
+        with _fila_lock:
+            if _fila is None or _fila.pid != os.getpid():
+                _fila = FilaPDF()
+    return _fila
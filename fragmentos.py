@@ -0,0 +1,63 @@
+# fragmentos.py
+# Cache de pedaços do dashboard.html já renderizados (cards de status, tabela de lojas, tabela de vendedores).
+# A chave leva a versão dos dados: qualquer escrita muda a versão, e a página seguinte monta o pedaço de novo;
+# sem escrita, o pedaço sai pronto do cache sem consulta nem renderização.
+# Também liga o cache de bytecode do Jinja em disco, para workers novos do gunicorn não recompilarem os templates.
+import os
+import sys
+import time
+
+from flask import render_template
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
+
+import cache
+
+CACHE_FRAGMENTOS = os.getenv("CACHE_FRAGMENTOS", "1") == "1"
+FRAGMENTOS_MAX_ITENS = int(os.getenv("FRAGMENTOS_MAX_ITENS", "256"))
+# Pasta do bytecode dos templates (relativa à raiz do app); vazio desliga
+JINJA_CACHE_DIR = os.getenv("JINJA_CACHE_DIR", ".jinja_cache")
+
+_cache_fragmentos = cache.registrar(cache.CacheTTL('fragmentos', maximo=FRAGMENTOS_MAX_ITENS))
+
+
+# ==============================
+# FRAGMENTOS
+# ==============================
+def renderizar(template, chave, carregar):
+    # carregar() -> contexto do template; só roda (com as consultas dele) quando a chave não está no cache.
+    # A chave precisa conter tudo de que o pedaço depende: versões, filtros da URL, data.
+    def montar():
+        return Markup(render_template(template, **carregar()))
+    if not CACHE_FRAGMENTOS:
+        return montar()
+    return _cache_fragmentos.obter((template,) + tuple(chave), montar)
+
+
+def limpar():
+    _cache_fragmentos.invalidar()
+
+
+# ==============================
+# BYTECODE DOS TEMPLATES
+# ==============================
+def configurar_bytecode(app):
+    if not JINJA_CACHE_DIR:
+        return None
+    pasta = os.path.join(app.root_path, JINJA_CACHE_DIR)
+    try:
+        os.makedirs(pasta, exist_ok=True)
+    except OSError as e:
+        print(f"Aviso: cache de bytecode do Jinja desligado ({pasta}):", e, file=sys.stderr)
+        return None
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(pasta)
+    return pasta
+
+
+def precompilar(app):
+    # Compila todos os templates (e grava o bytecode); rodar no build/deploy antes de subir os workers
+    inicio = time.perf_counter()
+    nomes = app.jinja_env.list_templates()
+    for nome in nomes:
+        app.jinja_env.get_template(nome)
+    return nomes, time.perf_counter() - inicio
@@ -0,0 +1,200 @@
+# importacao.py
+import csv
+import os
+import tempfile
+import time
+
+import database
+
+IMPORTACAO_MAX_ERROS = int(os.getenv("IMPORTACAO_MAX_ERROS", "1000"))   # erros detalhados no relatório
+# Maior valor das colunas INTEGER: acima disso o COPY falharia e derrubaria o lote inteiro
+INT4_MAX = 2147483647
+
+DIAS_SEMANA = database.DIAS_SEMANA
+COLUNAS_STAGING = ['linha', 'vendedor_id', 'disparos_dia'] + DIAS_SEMANA
+# Aceita o nome usado nos formulários também
+ALIASES = {'disparos_hoje': 'disparos_dia', 'id': 'vendedor_id'}
+
+
+class ErroImportacao(Exception):
+    pass
+
+
+# ==============================
+# LEITURA E VALIDAÇÃO DO CSV
+# ==============================
+def _inteiro(valor, campo):
+    valor = (valor or '').strip()
+    if valor == '':
+        return None
+    try:
+        numero = int(valor)
+    except ValueError:
+        raise ValueError(f"{campo}: '{valor}' não é um número inteiro")
+    if numero < 0:
+        raise ValueError(f"{campo}: valor negativo ({numero})")
+    if numero > INT4_MAX:
+        raise ValueError(f"{campo}: valor acima do máximo ({numero} > {INT4_MAX})")
+    return numero
+
+
+def _ler_linhas(arquivo_texto):
+    cabecalho = arquivo_texto.readline()
+    if not cabecalho.strip():
+        raise ErroImportacao("Arquivo vazio.")
+    delimitador = ';' if cabecalho.count(';') > cabecalho.count(',') else ','
+    colunas = [ALIASES.get(c.strip().lower(), c.strip().lower()) for c in next(csv.reader([cabecalho], delimiter=delimitador))]
+
+    if 'vendedor_id' not in colunas:
+        raise ErroImportacao("Coluna obrigatória ausente: vendedor_id.")
+    if not any(c in colunas for c in ['disparos_dia'] + DIAS_SEMANA):
+        raise ErroImportacao("Informe disparos_dia e/ou ao menos um dia da semana (segunda ... domingo).")
+
+    for numero, valores in enumerate(csv.reader(arquivo_texto, delimiter=delimitador), start=2):
+        if not any(v.strip() for v in valores):
+            continue
+        yield numero, dict(zip(colunas, valores))
+
+
+def _validar(numero, linha):
+    vendedor_id = _inteiro(linha.get('vendedor_id'), 'vendedor_id')
+    if vendedor_id is None:
+        raise ValueError("vendedor_id vazio")
+    valores = [_inteiro(linha.get(c), c) for c in ['disparos_dia'] + DIAS_SEMANA]
+    # O total da semana vai para disparos_semana_resumo.total (INTEGER)
+    if sum(v or 0 for v in valores[1:]) > INT4_MAX:
+        raise ValueError(f"soma da semana acima do máximo ({INT4_MAX})")
+    return [numero, vendedor_id] + valores
+
+
+# ==============================
+# MERGE NO BANCO
+# ==============================
+_SQL_STAGING = """
+    CREATE TEMP TABLE importacao_disparos (
+        linha INTEGER,
+        vendedor_id INTEGER,
+        disparos_dia INTEGER,
+        segunda INTEGER, terca INTEGER, quarta INTEGER, quinta INTEGER,
+        sexta INTEGER, sabado INTEGER, domingo INTEGER
+    ) ON COMMIT DROP;
+"""
+
+_SQL_MERGE = """
+    -- Vendedor repetido no arquivo: vale a última linha
+    CREATE TEMP TABLE importacao_final ON COMMIT DROP AS
+    SELECT DISTINCT ON (vendedor_id) *
+    FROM importacao_disparos
+    ORDER BY vendedor_id, linha DESC;
+
+    UPDATE vendedores v
+    SET disparos_dia = s.disparos_dia
+    FROM importacao_final s
+    WHERE v.id = s.vendedor_id AND s.disparos_dia IS NOT NULL;
+
+    -- Colunas vazias no CSV preservam o valor atual
+    UPDATE disparos_semanais d
+    SET segunda = COALESCE(s.segunda, d.segunda), terca = COALESCE(s.terca, d.terca),
+        quarta = COALESCE(s.quarta, d.quarta), quinta = COALESCE(s.quinta, d.quinta),
+        sexta = COALESCE(s.sexta, d.sexta), sabado = COALESCE(s.sabado, d.sabado),
+        domingo = COALESCE(s.domingo, d.domingo)
+    FROM importacao_final s
+    WHERE d.vendedor_id = s.vendedor_id
+      AND num_nonnulls(s.segunda, s.terca, s.quarta, s.quinta, s.sexta, s.sabado, s.domingo) > 0;
+
+    INSERT INTO disparos_semanais (vendedor_id, segunda, terca, quarta, quinta, sexta, sabado, domingo)
+    SELECT s.vendedor_id, COALESCE(s.segunda, 0), COALESCE(s.terca, 0), COALESCE(s.quarta, 0), COALESCE(s.quinta, 0),
+           COALESCE(s.sexta, 0), COALESCE(s.sabado, 0), COALESCE(s.domingo, 0)
+    FROM importacao_final s
+    WHERE num_nonnulls(s.segunda, s.terca, s.quarta, s.quinta, s.sexta, s.sabado, s.domingo) > 0
+      AND NOT EXISTS (SELECT 1 FROM disparos_semanais d WHERE d.vendedor_id = s.vendedor_id);
+
+    -- Histórico: dias da semana atual até hoje, e o disparos_dia em CURRENT_DATE
+    INSERT INTO disparos_historico (vendedor_id, data, disparos)
+    SELECT DISTINCT ON (vendedor_id, data) vendedor_id, data, disparos FROM (
+        SELECT s.vendedor_id, date_trunc('week', CURRENT_DATE)::date + d.i AS data, d.v AS disparos, 0 AS prioridade
+        FROM importacao_final s
+        CROSS JOIN LATERAL (VALUES (0, s.segunda), (1, s.terca), (2, s.quarta), (3, s.quinta),
+                                   (4, s.sexta), (5, s.sabado), (6, s.domingo)) AS d(i, v)
+        WHERE d.v IS NOT NULL AND date_trunc('week', CURRENT_DATE)::date + d.i <= CURRENT_DATE
+        UNION ALL
+        SELECT s.vendedor_id, CURRENT_DATE, s.disparos_dia, 1
+        FROM importacao_final s
+        WHERE s.disparos_dia IS NOT NULL
+    ) h
+    -- disparos_dia tem prioridade sobre a coluna do dia de hoje
+    ORDER BY vendedor_id, data, prioridade DESC
+    ON CONFLICT (vendedor_id, data) DO UPDATE SET disparos = EXCLUDED.disparos, atualizado_em = now();
+
+    INSERT INTO disparos_semana_resumo (semana, vendedor_id, total)
+    SELECT date_trunc('week', CURRENT_DATE)::date, h.vendedor_id, SUM(h.disparos)
+    FROM disparos_historico h
+    JOIN importacao_final s ON s.vendedor_id = h.vendedor_id
+    WHERE h.data >= date_trunc('week', CURRENT_DATE)::date
+      AND h.data < date_trunc('week', CURRENT_DATE)::date + 7
+    GROUP BY h.vendedor_id
+    ON CONFLICT (semana, vendedor_id) DO UPDATE SET total = EXCLUDED.total;
+
+    SELECT COUNT(*) FROM importacao_final;
+"""
+
+
+def importar_disparos_csv(arquivo_texto):
+    # arquivo_texto: qualquer objeto de texto iterável (upload, arquivo aberto, StringIO)
+    if database.BACKEND != 'postgres':
+        raise ErroImportacao("A importação em lote usa COPY e tabelas temporárias do Postgres; indisponível com DB_BACKEND=sqlite.")
+    inicio = time.perf_counter()
+    erros = []
+    total_erros = 0
+    linhas_lidas = 0
+
+    # Linhas válidas vão para um buffer que só vai ao disco se ficar grande
+    with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024, mode='w+', newline='') as buffer:
+        escritor = csv.writer(buffer)
+        for numero, linha in _ler_linhas(arquivo_texto):
+            linhas_lidas += 1
+            try:
+                escritor.writerow(['' if v is None else v for v in _validar(numero, linha)])
+            except ValueError as e:
+                total_erros += 1
+                if len(erros) < IMPORTACAO_MAX_ERROS:
+                    erros.append({'linha': numero, 'erro': str(e)})
+        buffer.seek(0)
+
+        with database.conexao() as conn:
+            cur = conn.cursor()
+            try:
+                cur.execute(_SQL_STAGING)
+                cur.copy_expert(
+                    f"COPY importacao_disparos ({', '.join(COLUNAS_STAGING)}) FROM STDIN WITH (FORMAT csv)",
+                    buffer,
+                )
+
+                # Vendedores inexistentes viram erro de linha, não derrubam o lote
+                cur.execute("""
+                    DELETE FROM importacao_disparos s
+                    WHERE NOT EXISTS (SELECT 1 FROM vendedores v WHERE v.id = s.vendedor_id)
+                    RETURNING linha, vendedor_id;
+                """)
+                for numero, vendedor_id in sorted(cur.fetchall()):
+                    total_erros += 1
+                    if len(erros) < IMPORTACAO_MAX_ERROS:
+                        erros.append({'linha': numero, 'erro': f"vendedor_id {vendedor_id} não existe"})
+
+                cur.execute(_SQL_MERGE)
+                vendedores_atualizados = cur.fetchone()[0]
+                if vendedores_atualizados:
+                    database.notificar(cur, {'tipo': 'recarregar', 'motivo': 'importacao'})
+                conn.commit()
+            finally:
+                cur.close()
+
+    erros.sort(key=lambda e: e['linha'])
+    return {
+        'linhas': linhas_lidas,
+        'importadas': linhas_lidas - total_erros,
+        'vendedores_atualizados': vendedores_atualizados,
+        'total_erros': total_erros,
+        'erros': erros,
+        'tempo_s': round(time.perf_counter() - inicio, 4),
+    }
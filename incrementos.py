@@ -0,0 +1,197 @@
+# incrementos.py
+# Incrementos de disparos_dia vindos dos disparadores automáticos (POST /api/disparos/incrementar a cada lote
+# enviado). Cada evento só soma num dicionário do processo e a requisição volta na hora; uma thread grava o
+# acumulado em um comando (database.incrementar_disparos_dia) a cada INCREMENTOS_INTERVALO segundos ou assim
+# que juntar INCREMENTOS_MAX_EVENTOS eventos. Somas se juntam sem perda: 30 eventos de +1 viram um +30.
+# No encerramento normal do worker o que sobrou é gravado (atexit); um kill -9 perde o que estava no buffer.
+import atexit
+import os
+import threading
+import time
+
+import database
+import metricas
+
+INCREMENTOS_BUFFER = os.getenv("INCREMENTOS_BUFFER", "1") == "1"                 # 0: cada requisição grava direto
+INCREMENTOS_INTERVALO = float(os.getenv("INCREMENTOS_INTERVALO", "0.25"))        # segundos entre descargas
+INCREMENTOS_MAX_EVENTOS = int(os.getenv("INCREMENTOS_MAX_EVENTOS", "1000"))      # descarrega antes ao juntar isso
+INCREMENTOS_MAX_PENDENTES = int(os.getenv("INCREMENTOS_MAX_PENDENTES", "100000"))  # banco fora: acima disso recusa
+INCREMENTOS_MAX_POR_REQUISICAO = int(os.getenv("INCREMENTOS_MAX_POR_REQUISICAO", "1000"))
+INCREMENTO_MAXIMO = int(os.getenv("INCREMENTO_MAXIMO", "100000"))                # maior quantidade de um evento
+
+
+class BufferCheio(Exception):
+    pass
+
+
+def ler_incrementos(dados):
+    # {"vendedor_id": 1, "quantidade": 30} ou {"incrementos": [{...}, ...]}; quantidade omitida vale 1.
+    # Devolve [(vendedor_id, quantidade)] ou levanta ValueError com a mensagem para o cliente.
+    if not isinstance(dados, dict):
+        raise ValueError('Envie um objeto JSON com vendedor_id e quantidade.')
+    itens = dados['incrementos'] if 'incrementos' in dados else [dados]
+    if not isinstance(itens, list) or not itens:
+        raise ValueError('"incrementos" precisa ser uma lista não vazia.')
+    if len(itens) > INCREMENTOS_MAX_POR_REQUISICAO:
+        raise ValueError(f'No máximo {INCREMENTOS_MAX_POR_REQUISICAO} incrementos por requisição.')
+    pares = []
+    for i, item in enumerate(itens):
+        try:
+            vendedor_id = int(item['vendedor_id'])
+            quantidade = int(item.get('quantidade', 1))
+        except (TypeError, KeyError, ValueError, AttributeError):
+            raise ValueError(f'Item {i}: vendedor_id e quantidade precisam ser inteiros.')
+        if vendedor_id <= 0 or not 0 < quantidade <= INCREMENTO_MAXIMO:
+            raise ValueError(f'Item {i}: vendedor_id positivo e quantidade entre 1 e {INCREMENTO_MAXIMO}.')
+        pares.append((vendedor_id, quantidade))
+    return pares
+
+
+def juntar(pares):
+    somas = {}
+    for vendedor_id, quantidade in pares:
+        somas[vendedor_id] = somas.get(vendedor_id, 0) + quantidade
+    return somas
+
+
+# ==============================
+# BUFFER (um por worker web)
+# ==============================
+class BufferIncrementos:
+    def __init__(self, gravar=None, intervalo=INCREMENTOS_INTERVALO, max_eventos=INCREMENTOS_MAX_EVENTOS,
+                 max_pendentes=INCREMENTOS_MAX_PENDENTES):
+        # database.incrementar_disparos_dia resolvido na hora da chamada (instrumentado / backend sqlite)
+        self.gravar = gravar or (lambda somas: database.incrementar_disparos_dia(somas))
+        self.intervalo = max(0.01, intervalo)
+        self.max_eventos = max(1, max_eventos)
+        self.max_pendentes = max(self.max_eventos, max_pendentes)
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._lock_descarga = threading.Lock()   # uma descarga por vez (thread e encerramento)
+        self._pendentes = {}                     # vendedor_id -> soma ainda não gravada
+        self._eventos_pendentes = 0
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+        self._thread = None
+        self._stats = {
+            'eventos': 0,
+            'recusados': 0,
+            'descargas': 0,
+            'erros': 0,
+            'eventos_gravados': 0,
+            'vendedores_gravados': 0,
+            'vendedores_ignorados': 0,
+            'descarga_total_s': 0.0,
+            'ultima_descarga_s': None,
+        }
+
+    def adicionar(self, pares):
+        # Todos os pares entram ou nenhum (BufferCheio quando o banco não acompanha)
+        with self._lock:
+            if self._eventos_pendentes + len(pares) > self.max_pendentes:
+                self._stats['recusados'] += len(pares)
+                raise BufferCheio(f"Buffer de incrementos cheio ({self._eventos_pendentes} eventos pendentes).")
+            for vendedor_id, quantidade in pares:
+                self._pendentes[vendedor_id] = self._pendentes.get(vendedor_id, 0) + quantidade
+            self._eventos_pendentes += len(pares)
+            self._stats['eventos'] += len(pares)
+            cheio = self._eventos_pendentes >= self.max_eventos
+            if self._thread is None or not self._thread.is_alive():
+                self._parar.clear()
+                self._thread = threading.Thread(target=self._executar, name='incrementos', daemon=True)
+                self._thread.start()
+        metricas.incrementos_eventos.inc(quantidade=len(pares))
+        if cheio:
+            self._acordar.set()
+
+    def _executar(self):
+        while not self._parar.is_set():
+            acordado = self._acordar.wait(self.intervalo)
+            self._acordar.clear()
+            if self._parar.is_set():
+                break
+            self.descarregar('tamanho' if acordado else 'intervalo')
+
+    def descarregar(self, motivo='manual'):
+        with self._lock_descarga:
+            with self._lock:
+                if not self._pendentes:
+                    return 0
+                somas, eventos = self._pendentes, self._eventos_pendentes
+                self._pendentes, self._eventos_pendentes = {}, 0
+
+            inicio = time.perf_counter()
+            try:
+                totais = self.gravar(somas)
+            except Exception as e:
+                # Nada foi gravado (uma transação só): as somas voltam para a próxima descarga
+                with self._lock:
+                    for vendedor_id, quantidade in somas.items():
+                        self._pendentes[vendedor_id] = self._pendentes.get(vendedor_id, 0) + quantidade
+                    self._eventos_pendentes += eventos
+                    self._stats['erros'] += 1
+                metricas.incrementos_descargas.inc(motivo, 'erro')
+                metricas.get_logger_app().error("Erro ao gravar incrementos de disparos: %s", e)
+                return 0
+            duracao = time.perf_counter() - inicio
+
+            with self._lock:
+                self._stats['descargas'] += 1
+                self._stats['eventos_gravados'] += eventos
+                self._stats['vendedores_gravados'] += len(totais)
+                self._stats['vendedores_ignorados'] += len(somas) - len(totais)
+                self._stats['descarga_total_s'] += duracao
+                self._stats['ultima_descarga_s'] = round(duracao, 4)
+            metricas.incrementos_descargas.inc(motivo, 'ok')
+            metricas.incrementos_lote.observar(len(somas))
+            metricas.incrementos_descarga_duracao.observar(duracao)
+            return len(totais)
+
+    def encerrar(self):
+        self._parar.set()
+        self._acordar.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        return self.descarregar('encerramento')
+
+    def estatisticas(self):
+        with self._lock:
+            dados = dict(self._stats)
+            dados.update({
+                'pendentes_vendedores': len(self._pendentes),
+                'pendentes_eventos': self._eventos_pendentes,
+                'intervalo_s': self.intervalo,
+                'max_eventos': self.max_eventos,
+                'max_pendentes': self.max_pendentes,
+                'descarga_media_s': round(dados['descarga_total_s'] / dados['descargas'], 4) if dados['descargas'] else 0,
+            })
+        return dados
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    global _buffer
+    # A thread de descarga não sobrevive ao fork do gunicorn: recria no worker
+    if _buffer is None or _buffer.pid != os.getpid():
+        with _buffer_lock:
+            if _buffer is None or _buffer.pid != os.getpid():
+                _buffer = BufferIncrementos()
+    return _buffer
+
+
+def incrementar(pares, direto=False):
+    # Com o buffer: devolve None (gravado na próxima descarga). Direto: grava agora e devolve os totais.
+    if INCREMENTOS_BUFFER and not direto:
+        get_buffer().adicionar(pares)
+        return None
+    return database.incrementar_disparos_dia(juntar(pares))
+
+
+@atexit.register
+def _descarregar_ao_sair():
+    # Um buffer herdado pelo fork é do pai: só o processo que o criou grava
+    if _buffer is not None and _buffer.pid == os.getpid():
+        _buffer.encerrar()
@@ -0,0 +1,463 @@
+# metricas.py
+import atexit
+import functools
+import inspect
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Buckets em segundos (latência de rota, tempo de banco, renderização de PDF)
+BUCKETS_LATENCIA = tuple(float(b) for b in os.getenv(
+    "METRICAS_BUCKETS", "0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10").split(','))
+BUCKETS_CONSULTAS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+BUCKETS_PDF = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BUCKETS_LOTE = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+# Vários workers (gunicorn --workers/WEB_CONCURRENCY): cada processo grava contadores e histogramas em
+# METRICAS_DIR/<pid>.json a cada METRICAS_INTERVALO segundos e o /metrics soma os arquivos de todos. Vazio:
+# cada worker expõe só as suas (os valores parecem zerar conforme o balanceador troca de worker).
+METRICAS_DIR = os.getenv("METRICAS_DIR", "")
+METRICAS_INTERVALO = float(os.getenv("METRICAS_INTERVALO", "5"))
+
+LOG_ARQUIVO = os.getenv("LOG_ARQUIVO", "acessos.log")
+APP_LOG = os.getenv("APP_LOG", "app.log")                # erros e avisos do app fora do acessos.log
+LOG_FILA_MAX = int(os.getenv("LOG_FILA_MAX", "10000"))   # registros pendentes antes de descartar
+
+
+# ==============================
+# TIPOS DE MÉTRICA (texto no formato do Prometheus, sem dependência externa)
+# ==============================
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _rotulos(nomes, valores, extra=None):
+    pares = list(zip(nomes, valores)) + (extra or [])
+    if not pares:
+        return ''
+    return '{' + ','.join(f'{n}="{_escapar(v)}"' for n, v in pares) + '}'
+
+
+def _numero(valor):
+    if valor == float('inf'):
+        return '+Inf'
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Contador:
+    tipo = 'counter'
+
+    def __init__(self, nome, ajuda, rotulos=()):
+        self.nome, self.ajuda, self.rotulos = nome, ajuda, tuple(rotulos)
+        self._lock = threading.Lock()
+        self._valores = {}
+
+    def inc(self, *valores, quantidade=1):
+        with self._lock:
+            self._valores[valores] = self._valores.get(valores, 0) + quantidade
+
+    def estado(self):
+        with self._lock:
+            return dict(self._valores)
+
+    def zerar(self):
+        self._lock = threading.Lock()
+        self._valores = {}
+
+    @staticmethod
+    def somar(total, estado):
+        for chave, valor in estado.items():
+            total[chave] = total.get(chave, 0) + valor
+
+    def amostras(self, estado=None):
+        itens = sorted((self.estado() if estado is None else estado).items())
+        return [f"{self.nome}{_rotulos(self.rotulos, chave)} {_numero(v)}" for chave, v in itens]
+
+
+class Histograma:
+    tipo = 'histogram'
+
+    def __init__(self, nome, ajuda, rotulos=(), buckets=BUCKETS_LATENCIA):
+        self.nome, self.ajuda, self.rotulos = nome, ajuda, tuple(rotulos)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._lock = threading.Lock()
+        self._series = {}   # rótulos -> [contagens por bucket, soma, total]
+
+    def observar(self, valor, *valores):
+        with self._lock:
+            serie = self._series.get(valores)
+            if serie is None:
+                serie = self._series[valores] = [[0] * len(self.buckets), 0.0, 0]
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie[0][i] += 1
+                    break
+            serie[1] += valor
+            serie[2] += 1
+
+    def zerar(self):
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def estado(self):
+        with self._lock:
+            return {chave: [list(s[0]), s[1], s[2]] for chave, s in self._series.items()}
+
+    @staticmethod
+    def somar(total, estado):
+        for chave, (contagens, soma, n) in estado.items():
+            serie = total.get(chave)
+            if serie is None:
+                total[chave] = [list(contagens), soma, n]
+                continue
+            serie[0] = [a + b for a, b in zip(serie[0], contagens)]
+            serie[1] += soma
+            serie[2] += n
+
+    def amostras(self, estado=None):
+        itens = sorted((self.estado() if estado is None else estado).items())
+        linhas = []
+        for chave, (contagens, soma, total) in itens:
+            acumulado = 0
+            for limite, n in zip(self.buckets, contagens):
+                acumulado += n
+                linhas.append(f"{self.nome}_bucket{_rotulos(self.rotulos, chave, [('le', _numero(float(limite)))])} {acumulado}")
+            linhas.append(f"{self.nome}_sum{_rotulos(self.rotulos, chave)} {_numero(soma)}")
+            linhas.append(f"{self.nome}_count{_rotulos(self.rotulos, chave)} {total}")
+        return linhas
+
+
+class Medidor:
+    # Valor lido na hora da coleta (pool, fila, caches)
+    tipo = 'gauge'
+
+    def __init__(self, nome, ajuda, rotulos, ler):
+        self.nome, self.ajuda, self.rotulos, self.ler = nome, ajuda, tuple(rotulos), ler
+
+    def amostras(self):
+        return [f"{self.nome}{_rotulos(self.rotulos, chave)} {_numero(v)}" for chave, v in self.ler()]
+
+
+_metricas = []
+
+
+def registrar(metrica):
+    _metricas.append(metrica)
+    return metrica
+
+
+def exportar():
+    somados = _somar_processos() if METRICAS_DIR else {}
+    linhas = []
+    for m in _metricas:
+        try:
+            amostras = m.amostras(somados[m.nome]) if m.nome in somados else m.amostras()
+        except Exception as e:
+            linhas.append(f"# erro ao coletar {m.nome}: {e}")
+            continue
+        linhas += [f"# HELP {m.nome} {m.ajuda}", f"# TYPE {m.nome} {m.tipo}"] + amostras
+    return '\n'.join(linhas) + '\n'
+
+
+# ==============================
+# VÁRIOS PROCESSOS (METRICAS_DIR)
+# ==============================
+# Contadores e histogramas somam entre processos; os medidores (pool, filas, caches) continuam sendo os do
+# worker que atendeu o /metrics. O arquivo de um worker que morreu fica até o app subir de novo, para os
+# contadores não voltarem atrás quando o gunicorn o substitui.
+_gravador = {'pid': None}
+_gravador_lock = threading.Lock()
+
+
+def _caminho_processo(pid):
+    return os.path.join(METRICAS_DIR, f"{pid}.json")
+
+
+def _gravar_processo():
+    dados = {m.nome: [[list(chave), valor] for chave, valor in m.estado().items()]
+             for m in _metricas if hasattr(m, 'estado')}
+    tmp = _caminho_processo(os.getpid()) + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(dados, f)
+    os.replace(tmp, _caminho_processo(os.getpid()))
+
+
+def _loop_gravacao():
+    while True:
+        time.sleep(METRICAS_INTERVALO)
+        if not METRICAS_DIR:
+            continue
+        try:
+            _gravar_processo()
+        except OSError as e:
+            print("Erro ao gravar as métricas do processo:", e, file=sys.stderr)
+
+
+def garantir_gravacao():
+    # A thread não atravessa o fork: cada worker inicia a sua no primeiro uso
+    if not METRICAS_DIR or _gravador['pid'] == os.getpid():
+        return
+    with _gravador_lock:
+        if _gravador['pid'] == os.getpid():
+            return
+        os.makedirs(METRICAS_DIR, exist_ok=True)
+        threading.Thread(target=_loop_gravacao, name='metricas-gravacao', daemon=True).start()
+        _gravador['pid'] = os.getpid()
+
+
+def _processo_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def limpar_processos_mortos():
+    # Chamado quando o app sobe (no pai, com --preload): arquivos de uma execução anterior não entram na soma
+    if not METRICAS_DIR:
+        return 0
+    removidos = 0
+    try:
+        entradas = list(os.scandir(METRICAS_DIR))
+    except FileNotFoundError:
+        return 0
+    for entrada in entradas:
+        pid = entrada.name.split('.', 1)[0]
+        if not pid.isdigit() or _processo_vivo(int(pid)):
+            continue
+        try:
+            os.remove(entrada.path)
+            removidos += 1
+        except FileNotFoundError:
+            pass
+    return removidos
+
+
+def _somar_processos():
+    # O próprio processo grava antes de ler: o que ele acabou de contar já sai nesta coleta
+    garantir_gravacao()
+    try:
+        _gravar_processo()
+        entradas = [e.path for e in os.scandir(METRICAS_DIR) if e.name.endswith('.json')]
+    except OSError as e:
+        print("Erro ao ler as métricas dos processos:", e, file=sys.stderr)
+        return {}
+    por_nome = {m.nome: m for m in _metricas if hasattr(m, 'estado')}
+    somados = {nome: {} for nome in por_nome}
+    for caminho in entradas:
+        try:
+            with open(caminho, encoding='utf-8') as f:
+                dados = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for nome, series in dados.items():
+            if nome in por_nome:
+                por_nome[nome].somar(somados[nome], {tuple(chave): valor for chave, valor in series})
+    return somados
+
+
+def _zerar_no_filho():
+    # O worker herda do fork o que o pai contou (ex.: chamadas a database durante o --preload); sem zerar,
+    # isso entraria na soma uma vez por worker
+    if METRICAS_DIR:
+        for m in _metricas:
+            if hasattr(m, 'zerar'):
+                m.zerar()
+
+
+os.register_at_fork(after_in_child=_zerar_no_filho)
+
+
+@atexit.register
+def _gravar_ao_sair():
+    if METRICAS_DIR and _gravador['pid'] == os.getpid():
+        try:
+            _gravar_processo()
+        except OSError:
+            pass
+
+
+# ==============================
+# MÉTRICAS DO APP (por processo; somadas entre workers com METRICAS_DIR)
+# ==============================
+http_requisicoes = registrar(Contador(
+    'gestao_http_requisicoes_total', 'Requisições HTTP por rota, método e status.', ('rota', 'metodo', 'status')))
+http_duracao = registrar(Histograma(
+    'gestao_http_duracao_segundos', 'Latência das requisições por rota.', ('rota', 'metodo')))
+db_consultas_requisicao = registrar(Histograma(
+    'gestao_db_chamadas_por_requisicao', 'Chamadas a database.* por requisição.', ('rota',), BUCKETS_CONSULTAS))
+db_tempo_requisicao = registrar(Histograma(
+    'gestao_db_tempo_por_requisicao_segundos', 'Tempo em database.* por requisição.', ('rota',)))
+db_chamadas = registrar(Contador(
+    'gestao_db_chamadas_total', 'Chamadas a cada função de database.', ('funcao',)))
+db_erros = registrar(Contador(
+    'gestao_db_erros_total', 'Chamadas a database.* que terminaram em exceção.', ('funcao',)))
+db_duracao = registrar(Histograma(
+    'gestao_db_duracao_segundos', 'Duração de cada função de database.', ('funcao',)))
+pdf_render = registrar(Histograma(
+    'gestao_pdf_render_segundos', 'Tempo de renderização dos PDFs.', ('motor', 'origem'), BUCKETS_PDF))
+incrementos_eventos = registrar(Contador(
+    'gestao_incrementos_eventos_total', 'Incrementos de disparos recebidos (antes de juntar por vendedor).'))
+incrementos_descargas = registrar(Contador(
+    'gestao_incrementos_descargas_total', 'Descargas do buffer de incrementos por motivo e resultado.',
+    ('motivo', 'resultado')))
+incrementos_lote = registrar(Histograma(
+    'gestao_incrementos_lote_vendedores', 'Vendedores gravados em cada descarga do buffer.', (), BUCKETS_LOTE))
+incrementos_descarga_duracao = registrar(Histograma(
+    'gestao_incrementos_descarga_segundos', 'Tempo de cada descarga do buffer de incrementos.'))
+log_descartados = registrar(Contador(
+    'gestao_log_descartados_total', 'Registros de log descartados com a fila cheia.'))
+
+
+# ==============================
+# POR REQUISIÇÃO
+# ==============================
+_local = threading.local()
+
+
+def iniciar_requisicao():
+    garantir_gravacao()
+    _local.inicio = time.perf_counter()
+    _local.chamadas = 0
+    _local.tempo_db = 0.0
+    _local.profundidade = 0
+
+
+def finalizar_requisicao(rota, metodo, status):
+    inicio = getattr(_local, 'inicio', None)
+    if inicio is None:
+        return None
+    _local.inicio = None
+    duracao = time.perf_counter() - inicio
+    http_requisicoes.inc(rota, metodo, status)
+    http_duracao.observar(duracao, rota, metodo)
+    db_consultas_requisicao.observar(_local.chamadas, rota)
+    db_tempo_requisicao.observar(_local.tempo_db, rota)
+    return {'duracao_s': duracao, 'chamadas_db': _local.chamadas, 'tempo_db_s': _local.tempo_db}
+
+
+def _medir_chamada(nome, funcao):
+    @functools.wraps(funcao)
+    def medida(*args, **kwargs):
+        # Só a chamada mais externa conta para a requisição (funções de database chamam umas às outras)
+        profundidade = getattr(_local, 'profundidade', 0)
+        _local.profundidade = profundidade + 1
+        inicio = time.perf_counter()
+        try:
+            return funcao(*args, **kwargs)
+        except Exception:
+            db_erros.inc(nome)
+            raise
+        finally:
+            duracao = time.perf_counter() - inicio
+            _local.profundidade = profundidade
+            db_chamadas.inc(nome)
+            db_duracao.observar(duracao, nome)
+            if profundidade == 0 and getattr(_local, 'inicio', None) is not None:
+                _local.chamadas += 1
+                _local.tempo_db += duracao
+    medida.__wrapped_metricas__ = True
+    return medida
+
+
+def _medir_gerador(nome, funcao):
+    # Funções geradoras (exportar_*) só trabalham enquanto são consumidas: o tempo vai até o gerador acabar
+    # (ou ser fechado), normalmente já depois da requisição, então não entra nos totais por requisição
+    @functools.wraps(funcao)
+    def medida(*args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            yield from funcao(*args, **kwargs)
+        except Exception:
+            db_erros.inc(nome)
+            raise
+        finally:
+            db_chamadas.inc(nome)
+            db_duracao.observar(time.perf_counter() - inicio, nome)
+    medida.__wrapped_metricas__ = True
+    return medida
+
+
+def instrumentar_modulo(modulo, ignorar=(), incluir=()):
+    # Troca as funções públicas do módulo por versões medidas; quem chama modulo.funcao() passa pelo wrapper.
+    # Nomes importados de outro módulo ficam de fora, menos os de 'incluir' (ex.: as funções do repositório
+    # que database.py aponta para armazenamento_sqlite com DB_BACKEND=sqlite)
+    incluir = set(incluir)
+    for nome, valor in list(vars(modulo).items()):
+        if (nome.startswith('_') or nome in ignorar or not callable(valor) or isinstance(valor, type)
+                or (getattr(valor, '__module__', None) != modulo.__name__ and nome not in incluir)
+                or getattr(valor, '__wrapped_metricas__', False)):
+            continue
+        medir = _medir_gerador if inspect.isgeneratorfunction(valor) else _medir_chamada
+        setattr(modulo, nome, medir(nome, valor))
+
+
+@contextmanager
+def medir_pdf(motor, origem):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        pdf_render.observar(time.perf_counter() - inicio, motor, origem)
+
+
+# ==============================
+# LOG SEM BLOQUEIO (QueueHandler -> thread que escreve em disco)
+# ==============================
+class _HandlerFila(logging.handlers.QueueHandler):
+    # Fila cheia: descarta e conta, nunca segura a requisição
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            log_descartados.inc()
+
+
+_log_lock = threading.Lock()
+_log_ouvintes = {}   # nome do logger -> (pid, QueueListener)
+
+
+def get_logger_em_fila(nome, caminho):
+    logger = logging.getLogger(nome)
+    estado = _log_ouvintes.get(nome)
+    # A thread do QueueListener não atravessa o fork: cada worker inicia a sua
+    if estado is None or estado[0] != os.getpid():
+        with _log_lock:
+            estado = _log_ouvintes.get(nome)
+            if estado is None or estado[0] != os.getpid():
+                fila = queue.Queue(maxsize=LOG_FILA_MAX)
+                arquivo = logging.FileHandler(caminho, encoding='utf-8', delay=True)
+                arquivo.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+                ouvinte = logging.handlers.QueueListener(fila, arquivo, respect_handler_level=True)
+                ouvinte.start()
+                for h in list(logger.handlers):
+                    logger.removeHandler(h)
+                logger.addHandler(_HandlerFila(fila))
+                logger.setLevel(logging.INFO)
+                logger.propagate = False
+                _log_ouvintes[nome] = (os.getpid(), ouvinte)
+    return logger
+
+
+def get_logger_acessos():
+    return get_logger_em_fila('gestao.acessos', LOG_ARQUIVO)
+
+
+def get_logger_app():
+    return get_logger_em_fila('gestao.app', APP_LOG)
+
+
+@atexit.register
+def _parar_logs():
+    for pid, ouvinte in list(_log_ouvintes.values()):
+        if pid == os.getpid():
+            ouvinte.stop()
@@ -0,0 +1,595 @@
+# migracoes.py
+import database
+
+# Chave do advisory lock: vários processos podem chamar aplicar_migracoes() ao mesmo tempo
+LOCK_MIGRACOES = 727_401
+
+# Versão dos dados (migração 9). Quem escreve pega um número da sequência com LOCK_VERSOES compartilhado e fica
+# com o lock VERSAO_CHAVE_BASE + número até o commit; quem lê (versao_dados_confirmada) pega LOCK_VERSOES exclusivo
+# por um instante, então nenhum número está "sorteado mas ainda sem lock" enquanto olha o pg_locks.
+LOCK_VERSOES = 727_402
+VERSAO_CHAVE_BASE = 1 << 40    # acima de qualquer outra chave de advisory lock do app
+
+# ==============================
+# TRIGGERS DO RESUMO POR LOJA (migração 8)
+# ==============================
+# Até este tamanho a consulta de um trigger por comando usa o plano guardado pela sessão; acima, EXECUTE planeja
+# de novo com o tamanho real das tabelas de transição (o plano feito para 1 vendedor não serve para o
+# fechamento do dia, com todos, e planejar a cada escrita pequena custaria mais que a própria escrita).
+RESUMO_LIMITE_PLANO = 1000
+
+
+def _trigger_resumo(nome, transicao, deltas, deltas_grande=None):
+    # deltas: consulta sobre as tabelas de transição com uma linha resumo_lojas por contribuição;
+    # deltas_grande: a mesma soma só com as linhas que mudaram (junção por id, que só compensa em lote)
+    return f"""
+        CREATE OR REPLACE FUNCTION {nome}() RETURNS TRIGGER AS $$
+        BEGIN
+            IF (SELECT COUNT(*) FROM {transicao}) <= {RESUMO_LIMITE_PLANO} THEN
+                PERFORM resumo_lojas_somar(ARRAY({deltas}            ));
+            ELSE
+                EXECUTE $sql$ SELECT resumo_lojas_somar(ARRAY({deltas_grande or deltas}            )) $sql$;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+"""
+
+
+# ==============================
+# MIGRAÇÕES (em ordem; nunca altere uma que já foi aplicada, crie outra)
+# ==============================
+MIGRACOES = [
+    (1, 'tabelas iniciais', """
+        CREATE TABLE IF NOT EXISTS lojas (
+            id SERIAL PRIMARY KEY,
+            nome TEXT NOT NULL,
+            responsavel TEXT
+        );
+
+        CREATE TABLE IF NOT EXISTS vendedores (
+            id SERIAL PRIMARY KEY,
+            nome TEXT NOT NULL,
+            email TEXT,
+            loja_id INTEGER REFERENCES lojas(id) ON DELETE SET NULL,
+            status TEXT,
+            base_tratada BOOLEAN DEFAULT FALSE,
+            disparos_dia INTEGER DEFAULT 0,
+            ultimo_status_tipo TEXT,
+            ultimo_status_data TEXT
+        );
+
+        CREATE TABLE IF NOT EXISTS disparos_semanais (
+            id SERIAL PRIMARY KEY,
+            vendedor_id INTEGER REFERENCES vendedores(id) ON DELETE CASCADE,
+            segunda INTEGER DEFAULT 0,
+            terca INTEGER DEFAULT 0,
+            quarta INTEGER DEFAULT 0,
+            quinta INTEGER DEFAULT 0,
+            sexta INTEGER DEFAULT 0,
+            sabado INTEGER DEFAULT 0,
+            domingo INTEGER DEFAULT 0
+        );
+
+        CREATE TABLE IF NOT EXISTS eventos (
+            id SERIAL PRIMARY KEY,
+            nome TEXT,
+            data_evento DATE,
+            loja_id INTEGER REFERENCES lojas(id) ON DELETE SET NULL
+        );
+    """),
+
+    (2, 'versão do cache compartilhada entre workers', """
+        CREATE TABLE IF NOT EXISTS cache_versoes (
+            nome TEXT PRIMARY KEY,
+            versao BIGINT NOT NULL DEFAULT 0
+        );
+    """),
+
+    (3, 'histórico diário de disparos e resumo semanal', """
+        -- Histórico diário (uma linha por vendedor/dia); BRIN em data porque as linhas chegam em ordem cronológica
+        CREATE TABLE IF NOT EXISTS disparos_historico (
+            vendedor_id INTEGER NOT NULL REFERENCES vendedores(id) ON DELETE CASCADE,
+            data DATE NOT NULL,
+            disparos INTEGER NOT NULL DEFAULT 0,
+            atualizado_em TIMESTAMPTZ NOT NULL DEFAULT now(),
+            PRIMARY KEY (vendedor_id, data)
+        );
+        CREATE INDEX IF NOT EXISTS disparos_historico_data_brin ON disparos_historico USING BRIN (data);
+
+        -- Totais semanais pré-calculados (semana = segunda-feira)
+        CREATE TABLE IF NOT EXISTS disparos_semana_resumo (
+            semana DATE NOT NULL,
+            vendedor_id INTEGER NOT NULL REFERENCES vendedores(id) ON DELETE CASCADE,
+            total INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (semana, vendedor_id)
+        );
+    """),
+
+    (4, 'índices de loja e vendedor; uma linha semanal por vendedor', """
+        -- Mantém a linha mais antiga de cada vendedor (a mesma que as leituras já usavam)
+        DELETE FROM disparos_semanais d
+        USING disparos_semanais mais_antiga
+        WHERE d.vendedor_id = mais_antiga.vendedor_id AND d.id > mais_antiga.id;
+
+        CREATE UNIQUE INDEX IF NOT EXISTS disparos_semanais_vendedor_id_key ON disparos_semanais (vendedor_id);
+        CREATE INDEX IF NOT EXISTS vendedores_loja_id_idx ON vendedores (loja_id);
+        CREATE INDEX IF NOT EXISTS eventos_loja_id_idx ON eventos (loja_id);
+    """),
+
+    (5, 'índices para filtros e paginação por chave', """
+        -- (loja_id, id) e (status, id) atendem WHERE filtro AND id > ultimo ORDER BY id LIMIT n
+        CREATE INDEX IF NOT EXISTS vendedores_loja_id_id_idx ON vendedores (loja_id, id);
+        CREATE INDEX IF NOT EXISTS vendedores_status_id_idx ON vendedores (status, id);
+        DROP INDEX IF EXISTS vendedores_loja_id_idx;
+    """),
+
+    (6, 'versão dos dados para ETag e consultas incrementais', """
+        -- Um número por transação de escrita, guardado em cache_versoes('dados').
+        -- O UPDATE segura a linha até o commit, então as versões ficam na ordem dos commits:
+        -- quem lê a versão N já enxerga todas as linhas com versao <= N.
+        CREATE OR REPLACE FUNCTION versao_dados_transacao() RETURNS BIGINT AS $$
+        DECLARE
+            v BIGINT := NULLIF(current_setting('gestao.versao_dados', true), '')::BIGINT;
+        BEGIN
+            IF v IS NULL THEN
+                INSERT INTO cache_versoes (nome, versao) VALUES ('dados', 1)
+                ON CONFLICT (nome) DO UPDATE SET versao = cache_versoes.versao + 1
+                RETURNING versao INTO v;
+                PERFORM set_config('gestao.versao_dados', v::TEXT, true);
+            END IF;
+            RETURN v;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        ALTER TABLE vendedores ADD COLUMN IF NOT EXISTS versao BIGINT NOT NULL DEFAULT 0;
+        CREATE INDEX IF NOT EXISTS vendedores_versao_idx ON vendedores (versao);
+
+        CREATE TABLE IF NOT EXISTS vendedores_removidos (
+            vendedor_id INTEGER PRIMARY KEY,
+            versao BIGINT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS vendedores_removidos_versao_idx ON vendedores_removidos (versao);
+
+        CREATE OR REPLACE FUNCTION vendedores_marcar_versao() RETURNS TRIGGER AS $$
+        BEGIN
+            NEW.versao := versao_dados_transacao();
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        CREATE OR REPLACE FUNCTION vendedores_registrar_remocao() RETURNS TRIGGER AS $$
+        BEGIN
+            INSERT INTO vendedores_removidos (vendedor_id, versao)
+            SELECT id, versao_dados_transacao() FROM removidos
+            ON CONFLICT (vendedor_id) DO UPDATE SET versao = EXCLUDED.versao;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        -- Mudanças em disparos_semanais e no nome da loja aparecem no vendedor (set-based, uma vez por comando)
+        CREATE OR REPLACE FUNCTION disparos_semanais_marcar_vendedor() RETURNS TRIGGER AS $$
+        BEGIN
+            UPDATE vendedores SET versao = versao_dados_transacao()
+            WHERE id IN (SELECT vendedor_id FROM alterados);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        CREATE OR REPLACE FUNCTION lojas_marcar_vendedores() RETURNS TRIGGER AS $$
+        BEGIN
+            UPDATE vendedores v SET versao = versao_dados_transacao()
+            FROM novas n JOIN antigas a ON a.id = n.id
+            WHERE v.loja_id = n.id AND n.nome IS DISTINCT FROM a.nome;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS vendedores_versao ON vendedores;
+        CREATE TRIGGER vendedores_versao BEFORE INSERT OR UPDATE ON vendedores
+            FOR EACH ROW EXECUTE FUNCTION vendedores_marcar_versao();
+
+        DROP TRIGGER IF EXISTS vendedores_remocao ON vendedores;
+        CREATE TRIGGER vendedores_remocao AFTER DELETE ON vendedores
+            REFERENCING OLD TABLE AS removidos
+            FOR EACH STATEMENT EXECUTE FUNCTION vendedores_registrar_remocao();
+
+        DROP TRIGGER IF EXISTS disparos_semanais_versao_ins ON disparos_semanais;
+        CREATE TRIGGER disparos_semanais_versao_ins AFTER INSERT ON disparos_semanais
+            REFERENCING NEW TABLE AS alterados
+            FOR EACH STATEMENT EXECUTE FUNCTION disparos_semanais_marcar_vendedor();
+
+        DROP TRIGGER IF EXISTS disparos_semanais_versao_upd ON disparos_semanais;
+        CREATE TRIGGER disparos_semanais_versao_upd AFTER UPDATE ON disparos_semanais
+            REFERENCING NEW TABLE AS alterados
+            FOR EACH STATEMENT EXECUTE FUNCTION disparos_semanais_marcar_vendedor();
+
+        DROP TRIGGER IF EXISTS disparos_semanais_versao_del ON disparos_semanais;
+        CREATE TRIGGER disparos_semanais_versao_del AFTER DELETE ON disparos_semanais
+            REFERENCING OLD TABLE AS alterados
+            FOR EACH STATEMENT EXECUTE FUNCTION disparos_semanais_marcar_vendedor();
+
+        DROP TRIGGER IF EXISTS lojas_versao ON lojas;
+        CREATE TRIGGER lojas_versao AFTER UPDATE ON lojas
+            REFERENCING OLD TABLE AS antigas NEW TABLE AS novas
+            FOR EACH STATEMENT EXECUTE FUNCTION lojas_marcar_vendedores();
+    """),
+
+    (7, 'dias já fechados (disparos_dia -> coluna do dia da semana)', """
+        -- Uma linha por dia fechado: é o que torna o fechamento idempotente (database.fechar_dia)
+        CREATE TABLE IF NOT EXISTS fechamentos_dia (
+            data DATE PRIMARY KEY,
+            vendedores INTEGER NOT NULL DEFAULT 0,
+            executado_em TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+    """),
+
+    (8, 'resumo por loja e geral mantido por triggers', """
+        -- Escritas em andamento terminam antes; as seguintes esperam o commit (já com os triggers)
+        LOCK TABLE vendedores, disparos_semanais IN SHARE MODE;
+
+        -- Uma linha por loja (chave = loja_id; 0 = vendedores sem loja) e a do total geral (chave = -1).
+        -- Os triggers somam a diferença de cada comando; flask verificar-resumo recalcula do zero.
+        CREATE TABLE IF NOT EXISTS resumo_lojas (
+            chave INTEGER PRIMARY KEY,
+            vendedores BIGINT NOT NULL DEFAULT 0,
+            bases_pendentes BIGINT NOT NULL DEFAULT 0,
+            disparos_dia BIGINT NOT NULL DEFAULT 0,
+            conectados BIGINT NOT NULL DEFAULT 0,
+            restritos BIGINT NOT NULL DEFAULT 0,
+            bloqueados BIGINT NOT NULL DEFAULT 0,
+            desconectados BIGINT NOT NULL DEFAULT 0,
+            outros BIGINT NOT NULL DEFAULT 0,
+            segunda BIGINT NOT NULL DEFAULT 0,
+            terca BIGINT NOT NULL DEFAULT 0,
+            quarta BIGINT NOT NULL DEFAULT 0,
+            quinta BIGINT NOT NULL DEFAULT 0,
+            sexta BIGINT NOT NULL DEFAULT 0,
+            sabado BIGINT NOT NULL DEFAULT 0,
+            domingo BIGINT NOT NULL DEFAULT 0
+        );
+
+        -- O mesmo resumo calculado das tabelas, sem atalhos: carga inicial e conferência
+        CREATE OR REPLACE VIEW resumo_lojas_calculado AS
+        SELECT CASE WHEN GROUPING(x.loja) = 1 THEN -1 ELSE x.loja END AS chave,
+               COUNT(x.id)::BIGINT AS vendedores,
+               COUNT(x.id) FILTER (WHERE NOT COALESCE(x.base_tratada, FALSE))::BIGINT AS bases_pendentes,
+               COALESCE(SUM(x.disparos_dia), 0)::BIGINT AS disparos_dia,
+               COUNT(x.id) FILTER (WHERE x.status = 'Conectado')::BIGINT AS conectados,
+               COUNT(x.id) FILTER (WHERE x.status = 'Restrito')::BIGINT AS restritos,
+               COUNT(x.id) FILTER (WHERE x.status = 'Bloqueado')::BIGINT AS bloqueados,
+               COUNT(x.id) FILTER (WHERE x.status = 'Desconectado')::BIGINT AS desconectados,
+               COUNT(x.id) FILTER (WHERE x.status IS NULL
+                                   OR x.status NOT IN ('Conectado', 'Restrito', 'Bloqueado', 'Desconectado'))::BIGINT AS outros,
+               COALESCE(SUM(x.segunda), 0)::BIGINT AS segunda,
+               COALESCE(SUM(x.terca), 0)::BIGINT AS terca,
+               COALESCE(SUM(x.quarta), 0)::BIGINT AS quarta,
+               COALESCE(SUM(x.quinta), 0)::BIGINT AS quinta,
+               COALESCE(SUM(x.sexta), 0)::BIGINT AS sexta,
+               COALESCE(SUM(x.sabado), 0)::BIGINT AS sabado,
+               COALESCE(SUM(x.domingo), 0)::BIGINT AS domingo
+        FROM (
+            SELECT COALESCE(v.loja_id, 0) AS loja, v.id, v.base_tratada, v.disparos_dia, v.status,
+                   d.segunda, d.terca, d.quarta, d.quinta, d.sexta, d.sabado, d.domingo
+            FROM vendedores v
+            LEFT JOIN disparos_semanais d ON d.vendedor_id = v.id
+        ) x
+        GROUP BY GROUPING SETS ((x.loja), ());
+
+        INSERT INTO resumo_lojas SELECT * FROM resumo_lojas_calculado
+        ON CONFLICT (chave) DO NOTHING;
+
+        -- Contribuição de uma linha (sinal = 1 entra, -1 sai)
+        CREATE OR REPLACE FUNCTION resumo_do_vendedor(v vendedores, sinal INTEGER) RETURNS resumo_lojas AS $$
+            SELECT ROW(COALESCE(v.loja_id, 0), sinal,
+                       sinal * (NOT COALESCE(v.base_tratada, FALSE))::INT,
+                       sinal * COALESCE(v.disparos_dia, 0),
+                       sinal * (v.status IS NOT DISTINCT FROM 'Conectado')::INT,
+                       sinal * (v.status IS NOT DISTINCT FROM 'Restrito')::INT,
+                       sinal * (v.status IS NOT DISTINCT FROM 'Bloqueado')::INT,
+                       sinal * (v.status IS NOT DISTINCT FROM 'Desconectado')::INT,
+                       sinal * (v.status IS NULL
+                                OR v.status NOT IN ('Conectado', 'Restrito', 'Bloqueado', 'Desconectado'))::INT,
+                       0, 0, 0, 0, 0, 0, 0)::resumo_lojas;
+        $$ LANGUAGE sql IMMUTABLE;
+
+        CREATE OR REPLACE FUNCTION resumo_da_semana(loja_id INTEGER, d disparos_semanais, sinal INTEGER)
+        RETURNS resumo_lojas AS $$
+            SELECT ROW(COALESCE(loja_id, 0), 0, 0, 0, 0, 0, 0, 0, 0,
+                       sinal * COALESCE(d.segunda, 0), sinal * COALESCE(d.terca, 0), sinal * COALESCE(d.quarta, 0),
+                       sinal * COALESCE(d.quinta, 0), sinal * COALESCE(d.sexta, 0), sinal * COALESCE(d.sabado, 0),
+                       sinal * COALESCE(d.domingo, 0))::resumo_lojas;
+        $$ LANGUAGE sql IMMUTABLE;
+
+        -- Soma as diferenças na linha de cada loja e na do total geral.
+        -- Em ordem de chave (o total, -1, primeiro): transações concorrentes se enfileiram sem deadlock.
+        CREATE OR REPLACE FUNCTION resumo_lojas_somar(deltas resumo_lojas[]) RETURNS VOID AS $$
+        BEGIN
+            IF cardinality(deltas) = 0 THEN
+                RETURN;
+            END IF;
+            INSERT INTO resumo_lojas AS r
+            SELECT c.chave, SUM(d.vendedores), SUM(d.bases_pendentes), SUM(d.disparos_dia),
+                   SUM(d.conectados), SUM(d.restritos), SUM(d.bloqueados), SUM(d.desconectados), SUM(d.outros),
+                   SUM(d.segunda), SUM(d.terca), SUM(d.quarta), SUM(d.quinta), SUM(d.sexta), SUM(d.sabado), SUM(d.domingo)
+            FROM unnest(deltas) d
+            CROSS JOIN LATERAL (VALUES (d.chave), (-1)) c(chave)
+            GROUP BY c.chave
+            ORDER BY c.chave
+            ON CONFLICT (chave) DO UPDATE SET
+                vendedores = r.vendedores + EXCLUDED.vendedores,
+                bases_pendentes = r.bases_pendentes + EXCLUDED.bases_pendentes,
+                disparos_dia = r.disparos_dia + EXCLUDED.disparos_dia,
+                conectados = r.conectados + EXCLUDED.conectados,
+                restritos = r.restritos + EXCLUDED.restritos,
+                bloqueados = r.bloqueados + EXCLUDED.bloqueados,
+                desconectados = r.desconectados + EXCLUDED.desconectados,
+                outros = r.outros + EXCLUDED.outros,
+                segunda = r.segunda + EXCLUDED.segunda,
+                terca = r.terca + EXCLUDED.terca,
+                quarta = r.quarta + EXCLUDED.quarta,
+                quinta = r.quinta + EXCLUDED.quinta,
+                sexta = r.sexta + EXCLUDED.sexta,
+                sabado = r.sabado + EXCLUDED.sabado,
+                domingo = r.domingo + EXCLUDED.domingo;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        -- Por linha e antes de apagar: a linha semanal ainda existe (o CASCADE vem depois, e o trigger de
+        -- disparos_semanais ignora linhas cujo vendedor já não existe)
+        CREATE OR REPLACE FUNCTION vendedores_resumo_del() RETURNS TRIGGER AS $$
+        BEGIN
+            PERFORM resumo_lojas_somar(ARRAY[resumo_do_vendedor(OLD, -1)] || ARRAY(
+                SELECT resumo_da_semana(OLD.loja_id, d, -1) FROM disparos_semanais d WHERE d.vendedor_id = OLD.id
+            ));
+            RETURN OLD;
+        END;
+        $$ LANGUAGE plpgsql;
+""" + _trigger_resumo('vendedores_resumo_ins', 'novos', """
+                -- A linha semanal de um vendedor novo chega depois, pelo trigger de disparos_semanais
+                SELECT resumo_do_vendedor(n, 1) FROM novos n
+""") + _trigger_resumo('vendedores_resumo_upd', 'novos', """
+                -- Linha nova entra, antiga sai (o que não mudou se anula); quem troca de loja leva a semana junto
+                SELECT resumo_do_vendedor(n, 1) FROM novos n
+                UNION ALL
+                SELECT resumo_do_vendedor(a, -1) FROM antigos a
+                UNION ALL
+                SELECT resumo_da_semana(n.loja_id, d, 1) FROM novos n JOIN disparos_semanais d ON d.vendedor_id = n.id
+                UNION ALL
+                SELECT resumo_da_semana(a.loja_id, d, -1) FROM antigos a JOIN disparos_semanais d ON d.vendedor_id = a.id
+""", """
+                SELECT x.r
+                FROM novos n
+                JOIN antigos a ON a.id = n.id
+                CROSS JOIN LATERAL (VALUES (resumo_do_vendedor(n, 1)), (resumo_do_vendedor(a, -1))) x(r)
+                WHERE (n.loja_id, n.status, n.base_tratada, n.disparos_dia)
+                      IS DISTINCT FROM (a.loja_id, a.status, a.base_tratada, a.disparos_dia)
+                UNION ALL
+                SELECT x.r
+                FROM novos n
+                JOIN antigos a ON a.id = n.id
+                JOIN disparos_semanais d ON d.vendedor_id = n.id
+                CROSS JOIN LATERAL (VALUES (resumo_da_semana(n.loja_id, d, 1)), (resumo_da_semana(a.loja_id, d, -1))) x(r)
+                WHERE n.loja_id IS DISTINCT FROM a.loja_id
+""") + _trigger_resumo('disparos_semanais_resumo_ins', 'novos', """
+                SELECT resumo_da_semana(v.loja_id, n, 1) FROM novos n JOIN vendedores v ON v.id = n.vendedor_id
+""") + _trigger_resumo('disparos_semanais_resumo_upd', 'novos', """
+                SELECT resumo_da_semana(v.loja_id, n, 1) FROM novos n JOIN vendedores v ON v.id = n.vendedor_id
+                UNION ALL
+                SELECT resumo_da_semana(v.loja_id, a, -1) FROM antigos a JOIN vendedores v ON v.id = a.vendedor_id
+""", """
+                SELECT x.r
+                FROM novos n
+                JOIN antigos a ON a.id = n.id
+                JOIN vendedores v ON v.id = n.vendedor_id
+                CROSS JOIN LATERAL (VALUES (resumo_da_semana(v.loja_id, n, 1)), (resumo_da_semana(v.loja_id, a, -1))) x(r)
+                WHERE (n.segunda, n.terca, n.quarta, n.quinta, n.sexta, n.sabado, n.domingo)
+                      IS DISTINCT FROM (a.segunda, a.terca, a.quarta, a.quinta, a.sexta, a.sabado, a.domingo)
+""") + _trigger_resumo('disparos_semanais_resumo_del', 'antigos', """
+                SELECT resumo_da_semana(v.loja_id, a, -1) FROM antigos a JOIN vendedores v ON v.id = a.vendedor_id
+""") + """
+        DROP TRIGGER IF EXISTS vendedores_resumo_ins ON vendedores;
+        CREATE TRIGGER vendedores_resumo_ins AFTER INSERT ON vendedores
+            REFERENCING NEW TABLE AS novos
+            FOR EACH STATEMENT EXECUTE FUNCTION vendedores_resumo_ins();
+
+        DROP TRIGGER IF EXISTS vendedores_resumo_upd ON vendedores;
+        CREATE TRIGGER vendedores_resumo_upd AFTER UPDATE ON vendedores
+            REFERENCING OLD TABLE AS antigos NEW TABLE AS novos
+            FOR EACH STATEMENT EXECUTE FUNCTION vendedores_resumo_upd();
+
+        DROP TRIGGER IF EXISTS vendedores_resumo_del ON vendedores;
+        CREATE TRIGGER vendedores_resumo_del BEFORE DELETE ON vendedores
+            FOR EACH ROW EXECUTE FUNCTION vendedores_resumo_del();
+
+        DROP TRIGGER IF EXISTS disparos_semanais_resumo_ins ON disparos_semanais;
+        CREATE TRIGGER disparos_semanais_resumo_ins AFTER INSERT ON disparos_semanais
+            REFERENCING NEW TABLE AS novos
+            FOR EACH STATEMENT EXECUTE FUNCTION disparos_semanais_resumo_ins();
+
+        DROP TRIGGER IF EXISTS disparos_semanais_resumo_upd ON disparos_semanais;
+        CREATE TRIGGER disparos_semanais_resumo_upd AFTER UPDATE ON disparos_semanais
+            REFERENCING OLD TABLE AS antigos NEW TABLE AS novos
+            FOR EACH STATEMENT EXECUTE FUNCTION disparos_semanais_resumo_upd();
+
+        DROP TRIGGER IF EXISTS disparos_semanais_resumo_del ON disparos_semanais;
+        CREATE TRIGGER disparos_semanais_resumo_del AFTER DELETE ON disparos_semanais
+            REFERENCING OLD TABLE AS antigos
+            FOR EACH STATEMENT EXECUTE FUNCTION disparos_semanais_resumo_del();
+    """),
+
+    # As migrações 6 e 8 serializavam todas as escritas: cada transação atualizava a linha cache_versoes('dados')
+    # e a do total geral de resumo_lojas (chave -1) e segurava as duas até o commit. Com 4 escritores em lojas
+    # diferentes, ~84% das conexões ativas ficavam esperando esse lock (benchmarks/bench_escritas.py). A versão
+    # passa a sair de uma sequência, sem lock de linha. O total geral vira a soma das linhas das lojas (~uma por
+    # loja, somada na leitura). Sobram as linhas de cada loja, disputadas só por escritas da mesma loja.
+    # Troca: uma escrita longa (ex.: fechar_dia) segura a versão confirmada até terminar. Enquanto isso o ETag
+    # e ?since= não avançam, e o que outros commits mudaram só aparece quando ela termina.
+    # O NOTIFY das escritas (database.notificar) também serializa os commits (lock do próprio Postgres) e fica
+    # como está: é o que entrega os eventos ao vivo.
+    (9, 'versão dos dados por sequência; total geral somado das lojas', f"""
+        LOCK TABLE vendedores, disparos_semanais, lojas IN SHARE MODE;
+
+        -- Continua de onde cache_versoes('dados') parou: os ?since= que os navegadores guardaram seguem válidos
+        CREATE SEQUENCE IF NOT EXISTS versao_dados_seq;
+        SELECT setval('versao_dados_seq', COALESCE((SELECT versao FROM cache_versoes WHERE nome = 'dados'), 0) + 1, false);
+        DELETE FROM cache_versoes WHERE nome = 'dados';
+
+        -- Números saem fora da ordem de commit; o lock até o commit diz a quem lê quais ainda estão em andamento
+        CREATE OR REPLACE FUNCTION versao_dados_transacao() RETURNS BIGINT AS $$
+        DECLARE
+            v BIGINT := NULLIF(current_setting('gestao.versao_dados', true), '')::BIGINT;
+        BEGIN
+            IF v IS NULL THEN
+                PERFORM pg_advisory_lock_shared({LOCK_VERSOES});
+                v := nextval('versao_dados_seq');
+                PERFORM pg_advisory_xact_lock({VERSAO_CHAVE_BASE} + v);
+                PERFORM pg_advisory_unlock_shared({LOCK_VERSOES});
+                PERFORM set_config('gestao.versao_dados', v::TEXT, true);
+            END IF;
+            RETURN v;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        -- Maior versão N tal que nenhuma transação <= N está em andamento: quem lê N enxerga todas as linhas com
+        -- versao <= N (a mesma garantia de antes, sem fila no commit). Lock de sessão, solto antes de voltar:
+        -- a leitura pode estar numa transação que dura a requisição inteira.
+        CREATE OR REPLACE FUNCTION versao_dados_confirmada() RETURNS BIGINT AS $$
+        DECLARE
+            ultima BIGINT;
+            pendente BIGINT;
+        BEGIN
+            PERFORM pg_advisory_lock({LOCK_VERSOES});
+            SELECT CASE WHEN is_called THEN last_value ELSE last_value - 1 END INTO ultima FROM versao_dados_seq;
+            SELECT MIN(((l.classid::BIGINT << 32) | l.objid::BIGINT) - {VERSAO_CHAVE_BASE}) INTO pendente
+            FROM pg_locks l
+            JOIN pg_database d ON d.oid = l.database AND d.datname = current_database()
+            WHERE l.locktype = 'advisory' AND l.objsubid = 1 AND l.granted
+              AND l.classid::BIGINT >= {VERSAO_CHAVE_BASE >> 32};
+            PERFORM pg_advisory_unlock({LOCK_VERSOES});
+            RETURN LEAST(ultima, COALESCE(pendente - 1, ultima));
+        END;
+        $$ LANGUAGE plpgsql;
+
+        -- Sem a linha -1: cada escrita só trava a linha da sua loja
+        CREATE OR REPLACE FUNCTION resumo_lojas_somar(deltas resumo_lojas[]) RETURNS VOID AS $$
+        BEGIN
+            IF cardinality(deltas) = 0 THEN
+                RETURN;
+            END IF;
+            INSERT INTO resumo_lojas AS r
+            SELECT d.chave, SUM(d.vendedores), SUM(d.bases_pendentes), SUM(d.disparos_dia),
+                   SUM(d.conectados), SUM(d.restritos), SUM(d.bloqueados), SUM(d.desconectados), SUM(d.outros),
+                   SUM(d.segunda), SUM(d.terca), SUM(d.quarta), SUM(d.quinta), SUM(d.sexta), SUM(d.sabado), SUM(d.domingo)
+            FROM unnest(deltas) d
+            GROUP BY d.chave
+            ORDER BY d.chave
+            ON CONFLICT (chave) DO UPDATE SET
+                vendedores = r.vendedores + EXCLUDED.vendedores,
+                bases_pendentes = r.bases_pendentes + EXCLUDED.bases_pendentes,
+                disparos_dia = r.disparos_dia + EXCLUDED.disparos_dia,
+                conectados = r.conectados + EXCLUDED.conectados,
+                restritos = r.restritos + EXCLUDED.restritos,
+                bloqueados = r.bloqueados + EXCLUDED.bloqueados,
+                desconectados = r.desconectados + EXCLUDED.desconectados,
+                outros = r.outros + EXCLUDED.outros,
+                segunda = r.segunda + EXCLUDED.segunda,
+                terca = r.terca + EXCLUDED.terca,
+                quarta = r.quarta + EXCLUDED.quarta,
+                quinta = r.quinta + EXCLUDED.quinta,
+                sexta = r.sexta + EXCLUDED.sexta,
+                sabado = r.sabado + EXCLUDED.sabado,
+                domingo = r.domingo + EXCLUDED.domingo;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DELETE FROM resumo_lojas WHERE chave = -1;
+
+        CREATE OR REPLACE VIEW resumo_lojas_calculado AS
+        SELECT x.loja AS chave,
+               COUNT(x.id)::BIGINT AS vendedores,
+               COUNT(x.id) FILTER (WHERE NOT COALESCE(x.base_tratada, FALSE))::BIGINT AS bases_pendentes,
+               COALESCE(SUM(x.disparos_dia), 0)::BIGINT AS disparos_dia,
+               COUNT(x.id) FILTER (WHERE x.status = 'Conectado')::BIGINT AS conectados,
+               COUNT(x.id) FILTER (WHERE x.status = 'Restrito')::BIGINT AS restritos,
+               COUNT(x.id) FILTER (WHERE x.status = 'Bloqueado')::BIGINT AS bloqueados,
+               COUNT(x.id) FILTER (WHERE x.status = 'Desconectado')::BIGINT AS desconectados,
+               COUNT(x.id) FILTER (WHERE x.status IS NULL
+                                   OR x.status NOT IN ('Conectado', 'Restrito', 'Bloqueado', 'Desconectado'))::BIGINT AS outros,
+               COALESCE(SUM(x.segunda), 0)::BIGINT AS segunda,
+               COALESCE(SUM(x.terca), 0)::BIGINT AS terca,
+               COALESCE(SUM(x.quarta), 0)::BIGINT AS quarta,
+               COALESCE(SUM(x.quinta), 0)::BIGINT AS quinta,
+               COALESCE(SUM(x.sexta), 0)::BIGINT AS sexta,
+               COALESCE(SUM(x.sabado), 0)::BIGINT AS sabado,
+               COALESCE(SUM(x.domingo), 0)::BIGINT AS domingo
+        FROM (
+            SELECT COALESCE(v.loja_id, 0) AS loja, v.id, v.base_tratada, v.disparos_dia, v.status,
+                   d.segunda, d.terca, d.quarta, d.quinta, d.sexta, d.sabado, d.domingo
+            FROM vendedores v
+            LEFT JOIN disparos_semanais d ON d.vendedor_id = v.id
+        ) x
+        GROUP BY x.loja;
+    """),
+]
+
+
+def _garantir_tabela(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migracoes (
+            versao INTEGER PRIMARY KEY,
+            descricao TEXT NOT NULL,
+            aplicada_em TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+    """)
+
+
+def versoes_aplicadas():
+    if database.BACKEND == 'sqlite':
+        import armazenamento_sqlite
+        return armazenamento_sqlite.versoes_aplicadas()
+    with database.conexao() as conn:
+        cur = conn.cursor()
+        _garantir_tabela(cur)
+        cur.execute("SELECT versao FROM schema_migracoes ORDER BY versao;")
+        versoes = [r[0] for r in cur.fetchall()]
+        conn.commit()
+        cur.close()
+    return versoes
+
+
+def pendentes():
+    aplicadas = set(versoes_aplicadas())
+    migracoes = MIGRACOES
+    if database.BACKEND == 'sqlite':
+        import armazenamento_sqlite
+        migracoes = armazenamento_sqlite.MIGRACOES
+    return [(versao, descricao) for versao, descricao, _ in migracoes if versao not in aplicadas]
+
+
+def aplicar_migracoes(ate=None, ao_aplicar=None):
+    # Tudo em uma transação: ou o schema chega na versão final ou nada muda
+    if database.BACKEND == 'sqlite':
+        import armazenamento_sqlite
+        return armazenamento_sqlite.aplicar_migracoes(ate, ao_aplicar)
+    aplicadas_agora = []
+    with database.conexao() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute("SELECT pg_advisory_xact_lock(%s);", (LOCK_MIGRACOES,))
+            _garantir_tabela(cur)
+            cur.execute("SELECT versao FROM schema_migracoes;")
+            aplicadas = {r[0] for r in cur.fetchall()}
+
+            for versao, descricao, sql in MIGRACOES:
+                if versao in aplicadas or (ate is not None and versao > ate):
+                    continue
+                cur.execute(sql)
+                cur.execute("INSERT INTO schema_migracoes (versao, descricao) VALUES (%s, %s);", (versao, descricao))
+                aplicadas_agora.append((versao, descricao))
+                if ao_aplicar:
+                    ao_aplicar(versao, descricao)
+            conn.commit()
+        finally:
+            cur.close()
+    return aplicadas_agora
@@ -0,0 +1,122 @@
+# pdf_reportlab.py
+import io
+from xml.sax.saxutils import escape
+
+from reportlab.lib.pagesizes import A4
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib import colors
+from reportlab.lib.units import cm
+
+# ReportLab styles
+PDF_STYLES = getSampleStyleSheet()
+PDF_STYLES.add(ParagraphStyle(name='CustomTitle', fontSize=18, alignment=1, spaceAfter=20, fontName='Helvetica-Bold', textColor=colors.navy))
+PDF_STYLES.add(ParagraphStyle(name='CustomHeading2', fontSize=14, alignment=0, spaceBefore=15, spaceAfter=8, fontName='Helvetica-Bold', textColor=colors.darkblue))
+PDF_STYLES.add(ParagraphStyle(name='CustomNormalSmall', fontSize=10, alignment=0, spaceAfter=5, textColor=colors.black))
+PDF_STYLES.add(ParagraphStyle(name='CustomSummary', fontSize=16, alignment=0, spaceAfter=10, fontName='Helvetica-Bold', textColor=colors.black))
+
+# Mesmas cores das classes status-* de relatorio_template_html.html
+STATUS_CORES = {
+    'Conectado': colors.HexColor('#10b981'),
+    'Bloqueado': colors.HexColor('#ef4444'),
+    'Restrito': colors.HexColor('#f59e0b'),
+    'Desconectado': colors.HexColor('#9ca3af'),
+}
+
+
+# PDF helpers
+def myPageTemplate(canvas, doc):
+    canvas.saveState()
+    page_width, page_height = A4
+    canvas.setFillColor(colors.black)
+    canvas.rect(0, page_height - 60, page_width, 60, fill=1)
+    canvas.setFont('Helvetica-Bold', 16)
+    canvas.setFillColor(colors.yellow)
+    canvas.drawRightString(page_width - doc.rightMargin - 5, page_height - 35, "SUPER MEGA VENDAS")
+    canvas.setFillColor(colors.yellow)
+    canvas.rect(0, page_height - 65, page_width, 5, fill=1)
+    canvas.setFillColor(colors.lightgrey)
+    canvas.setFont('Helvetica-Bold', 150)
+    canvas.drawCentredString(page_width / 2, page_height / 2 - 50, "SMV")
+    canvas.setFillColor(colors.yellow)
+    canvas.rect(0, 0, page_width, 40, fill=1)
+    address_text = "Manhattan Business Office, Av. Campos Sales, 901. Sala 1008 - Tirol, Natal/RN"
+    canvas.setFont('Helvetica-Bold', 9)
+    canvas.setFillColor(colors.black)
+    canvas.drawString(doc.leftMargin + 20, 15, address_text)
+    canvas.restoreState()
+
+
+def _texto(valor):
+    return escape(str(valor)) if valor is not None else ''
+
+
+def gerar_pdf_reportlab(dados):
+    # dados: o mesmo dicionário que alimenta relatorio_template_html.html
+    loja = dados.get('loja') or {}
+    vendedores = dados.get('vendedores_loja') or []
+    ligacoes = dados.get('ligacoes_realizadas')
+
+    pdf = io.BytesIO()
+    doc = SimpleDocTemplate(pdf, pagesize=A4, leftMargin=1.5 * cm, rightMargin=1.5 * cm,
+                            topMargin=3 * cm, bottomMargin=2 * cm,
+                            title='Relatório Gerencial de Disparos')
+
+    elementos = [
+        Paragraph('Relatório Gerencial de Desempenho de Disparos', PDF_STYLES['CustomTitle']),
+
+        Paragraph('Informações da Loja e Período', PDF_STYLES['CustomHeading2']),
+        Paragraph(f"<b>Loja:</b> {_texto(loja.get('nome') or 'N/A')}", PDF_STYLES['CustomNormalSmall']),
+        Paragraph(f"<b>Responsável:</b> {_texto(loja.get('responsavel') or 'N/A')}", PDF_STYLES['CustomNormalSmall']),
+        Paragraph(f"<b>Data de Geração:</b> {_texto(dados.get('data_hoje'))}", PDF_STYLES['CustomNormalSmall']),
+
+        Paragraph('KPIs de Desempenho da Semana', PDF_STYLES['CustomHeading2']),
+        Paragraph('<b>Total de Convites Enviados (Estimado na Semana):</b>', PDF_STYLES['CustomNormalSmall']),
+        Paragraph(_texto(dados.get('total_convites_enviados') or 0), PDF_STYLES['CustomSummary']),
+        Paragraph('Este total é a soma dos disparos semanais registrados por todos os vendedores ativos desta loja.',
+                  PDF_STYLES['CustomNormalSmall']),
+
+        Paragraph('Relato Manual (Ações de Follow-up)', PDF_STYLES['CustomHeading2']),
+    ]
+    if ligacoes:
+        elementos.append(Paragraph(_texto(ligacoes).replace('\n', '<br/>'), PDF_STYLES['CustomNormalSmall']))
+    else:
+        elementos.append(Paragraph('<font color="#666666">Nenhum relato manual fornecido no momento da geração do relatório.</font>',
+                                   PDF_STYLES['CustomNormalSmall']))
+
+    elementos.append(Paragraph('Desempenho Individual dos Vendedores', PDF_STYLES['CustomHeading2']))
+    linhas = [['Vendedor', 'Disparos (Semana)', 'Disparos (Hoje)', 'Status Atual', 'Base Tratada?']]
+    estilo = [
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f4f7f9')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.HexColor('#4b5563')),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 9),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#eeeeee')),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ]
+    for i, v in enumerate(vendedores, start=1):
+        status = v.get('status') or ''
+        linhas.append([
+            v.get('nome') or '',
+            sum((v.get('disparos_semanais') or {}).values()),
+            v.get('disparos_dia') if v.get('disparos_dia') is not None else '',
+            status,
+            'Sim' if v.get('base_tratada') else 'Não',
+        ])
+        if status in STATUS_CORES:
+            estilo += [('BACKGROUND', (3, i), (3, i), STATUS_CORES[status]), ('TEXTCOLOR', (3, i), (3, i), colors.white)]
+    if not vendedores:
+        linhas.append(['Nenhum vendedor encontrado para esta loja.', '', '', '', ''])
+        estilo += [('SPAN', (0, 1), (-1, 1)), ('ALIGN', (0, 1), (-1, 1), 'CENTER')]
+
+    tabela = Table(linhas, repeatRows=1, colWidths=[6 * cm, 3 * cm, 3 * cm, 3 * cm, 3 * cm])
+    tabela.setStyle(TableStyle(estilo))
+    elementos += [
+        tabela,
+        Spacer(1, 30),
+        Paragraph('<i>Documento gerado automaticamente pelo sistema de Gestão de Disparos.</i>',
+                  ParagraphStyle('Rodape', parent=PDF_STYLES['CustomNormalSmall'], alignment=2)),
+    ]
+
+    doc.build(elementos, onFirstPage=myPageTemplate, onLaterPages=myPageTemplate)
+    return pdf.getvalue()
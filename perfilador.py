@@ -0,0 +1,214 @@
+# perfilador.py
+# Perfil de SQL por requisição (só com PERFILAR_SQL=1): cada comando com tempo e local da chamada,
+# comandos idênticos repetidos, rajadas de consultas vindas de laço (N+1) e log de lentas com EXPLAIN.
+import os
+import re
+import sqlite3
+import threading
+import time
+import traceback
+from collections import Counter, defaultdict
+
+import psycopg2.extensions
+
+import metricas
+
+ATIVO = os.getenv("PERFILAR_SQL", "0").lower() in ("1", "true", "sim")
+SQL_LENTO_MS = float(os.getenv("SQL_LENTO_MS", "100"))
+SQL_LENTO_LOG = os.getenv("SQL_LENTO_LOG", "sql_lento.log")
+RAJADA_MINIMA = int(os.getenv("PERFIL_RAJADA_MINIMA", "5"))   # mesmo SQL, mesmo local, parâmetros diferentes
+
+_DIR_APP = os.path.dirname(os.path.abspath(__file__))
+_IGNORAR_FRAMES = {'perfilador.py', 'metricas.py'}
+_ESPACOS = re.compile(r'\s+')
+_EXPLICAVEL = re.compile(r'^\s*(SELECT|WITH|INSERT|UPDATE|DELETE)\b', re.IGNORECASE)
+
+_local = threading.local()
+
+
+# ==============================
+# CAPTURA (cursor que mede cada execute)
+# ==============================
+def _texto_sql(sql):
+    if isinstance(sql, bytes):
+        sql = sql.decode('utf-8', 'replace')
+    elif not isinstance(sql, str):
+        sql = str(sql)
+    return _ESPACOS.sub(' ', sql).strip()
+
+
+def _local_chamada():
+    # Frames do próprio app (sem os wrappers de medição): de onde a rota chamou database.* até a linha do execute
+    frames = [f for f in traceback.extract_stack()
+              if f.filename.startswith(_DIR_APP) and os.path.basename(f.filename) not in _IGNORAR_FRAMES]
+    return ' > '.join(f"{os.path.basename(f.filename)}:{f.lineno} ({f.name})" for f in frames[-3:])
+
+
+def _explain(conn, sql, params):
+    # EXPLAIN sem ANALYZE (não executa de novo) em savepoint, para não abortar a transação do chamador
+    if not _EXPLICAVEL.match(sql) or ';' in sql.rstrip().rstrip(';'):
+        return None
+    cur = psycopg2.extensions.cursor(conn)
+    try:
+        cur.execute("SAVEPOINT perfilador_explain;")
+        try:
+            cur.execute("EXPLAIN " + sql, params)
+            plano = '\n'.join(r[0] for r in cur.fetchall())
+            cur.execute("RELEASE SAVEPOINT perfilador_explain;")
+            return plano
+        except Exception as e:
+            cur.execute("ROLLBACK TO SAVEPOINT perfilador_explain;")
+            return f"(EXPLAIN falhou: {e})"
+    except Exception:
+        return None
+    finally:
+        cur.close()
+
+
+def _registrar(cursor, sql, params, inicio, erro):
+    perfil = getattr(_local, 'perfil', None)
+    if perfil is None or getattr(_local, 'explicando', False):
+        return
+    tempo_ms = (time.perf_counter() - inicio) * 1000
+    texto = _texto_sql(sql)
+    registro = {
+        'sql': texto,
+        'params': repr(params) if params is not None else '',
+        'tempo_ms': round(tempo_ms, 3),
+        'linhas': cursor.rowcount,
+        'local': _local_chamada(),
+        'erro': erro,
+    }
+    perfil['consultas'].append(registro)
+
+    if tempo_ms >= SQL_LENTO_MS and not erro:
+        plano = None
+        # Só no Postgres (cursor sem nome, dentro de transação); no SQLite fica só o registro
+        if (getattr(cursor, 'name', None) is None
+                and getattr(cursor.connection, 'status', None) == psycopg2.extensions.STATUS_IN_TRANSACTION):
+            _local.explicando = True
+            try:
+                plano = _explain(cursor.connection, sql if isinstance(sql, str) else texto, params)
+            finally:
+                _local.explicando = False
+        metricas.get_logger_em_fila('gestao.sql_lento', SQL_LENTO_LOG).warning(
+            "SQL LENTO %.1fms em %s %s\n  local: %s\n  sql: %s\n  params: %s\n%s",
+            tempo_ms, perfil['metodo'], perfil['caminho'], registro['local'], texto[:2000],
+            registro['params'][:500], _indentar(plano or '(sem EXPLAIN)'))
+
+
+def _indentar(texto):
+    return '\n'.join('    ' + linha for linha in texto.splitlines())
+
+
+class _CursorPerfilado:
+    def execute(self, sql, params=None):
+        inicio = time.perf_counter()
+        erro = None
+        try:
+            # sqlite3 não aceita params=None
+            return super().execute(sql) if params is None else super().execute(sql, params)
+        except Exception as e:
+            erro = str(e)
+            raise
+        finally:
+            _registrar(self, sql, params, inicio, erro)
+
+    def executemany(self, sql, seq_params):
+        inicio = time.perf_counter()
+        erro = None
+        try:
+            return super().executemany(sql, seq_params)
+        except Exception as e:
+            erro = str(e)
+            raise
+        finally:
+            _registrar(self, sql, None, inicio, erro)
+
+    def copy_expert(self, sql, arquivo, *args, **kwargs):
+        inicio = time.perf_counter()
+        erro = None
+        try:
+            return super().copy_expert(sql, arquivo, *args, **kwargs)
+        except Exception as e:
+            erro = str(e)
+            raise
+        finally:
+            _registrar(self, sql, None, inicio, erro)
+
+
+_classes_perfiladas = {}
+
+
+def _classe_perfilada(classe):
+    if issubclass(classe, _CursorPerfilado):
+        return classe
+    if classe not in _classes_perfiladas:
+        _classes_perfiladas[classe] = type(f"Perfilado{classe.__name__}", (_CursorPerfilado, classe), {})
+    return _classes_perfiladas[classe]
+
+
+class ConexaoPerfilada(psycopg2.extensions.connection):
+    # Usada como connection_factory em database.get_conn(); vale também para RealDictCursor e execute_values
+    def cursor(self, *args, **kwargs):
+        fabrica = kwargs.get('cursor_factory') or self.cursor_factory or psycopg2.extensions.cursor
+        kwargs['cursor_factory'] = _classe_perfilada(fabrica)
+        return super().cursor(*args, **kwargs)
+
+
+class ConexaoSqlitePerfilada(sqlite3.Connection):
+    # Usada como factory em armazenamento_sqlite.abrir() (DB_BACKEND=sqlite)
+    def cursor(self, factory=sqlite3.Cursor):
+        return super().cursor(_classe_perfilada(factory))
+
+
+# ==============================
+# POR REQUISIÇÃO
+# ==============================
+def iniciar_requisicao(metodo, caminho):
+    _local.perfil = {'metodo': metodo, 'caminho': caminho, 'inicio': time.perf_counter(), 'consultas': []}
+
+
+def finalizar_requisicao():
+    perfil = getattr(_local, 'perfil', None)
+    _local.perfil = None
+    if perfil is None:
+        return None
+    consultas = perfil['consultas']
+
+    # Mesmo SQL com os mesmos parâmetros mais de uma vez: resultado que poderia ser reaproveitado
+    identicas = Counter((c['sql'], c['params']) for c in consultas)
+    repetidas = [{'sql': sql, 'params': params, 'vezes': n} for (sql, params), n in identicas.items() if n > 1]
+
+    # Mesmo SQL, do mesmo local, muitas vezes com parâmetros diferentes: consulta dentro de laço (N+1)
+    por_local = defaultdict(set)
+    for c in consultas:
+        por_local[(c['sql'], c['local'])].add(c['params'])
+    rajadas = [{'sql': sql, 'local': local, 'vezes': sum(1 for c in consultas if c['sql'] == sql and c['local'] == local)}
+               for (sql, local), params in por_local.items() if len(params) >= RAJADA_MINIMA]
+
+    resumo = {
+        'metodo': perfil['metodo'],
+        'caminho': perfil['caminho'],
+        'consultas': len(consultas),
+        'tempo_sql_ms': round(sum(c['tempo_ms'] for c in consultas), 3),
+        'tempo_total_ms': round((time.perf_counter() - perfil['inicio']) * 1000, 3),
+        'lentas': sum(1 for c in consultas if c['tempo_ms'] >= SQL_LENTO_MS),
+        'repetidas': repetidas,
+        'rajadas': rajadas,
+        'detalhes': consultas,
+    }
+    if repetidas or rajadas:
+        logger = metricas.get_logger_em_fila('gestao.sql_lento', SQL_LENTO_LOG)
+        for r in rajadas:
+            logger.warning("N+1 em %s %s: %d consultas de %s\n  sql: %s",
+                           resumo['metodo'], resumo['caminho'], r['vezes'], r['local'], r['sql'][:500])
+        for r in repetidas:
+            logger.warning("SQL REPETIDO em %s %s: %d vezes\n  sql: %s\n  params: %s",
+                           resumo['metodo'], resumo['caminho'], r['vezes'], r['sql'][:500], r['params'][:200])
+    return resumo
+
+
+def cabecalho(resumo):
+    return (f"consultas={resumo['consultas']}; sql_ms={resumo['tempo_sql_ms']}; total_ms={resumo['tempo_total_ms']}; "
+            f"lentas={resumo['lentas']}; repetidas={len(resumo['repetidas'])}; rajadas={len(resumo['rajadas'])}")
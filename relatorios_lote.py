@@ -0,0 +1,124 @@
+# relatorios_lote.py
+import io
+import json
+import os
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import fila_pdf
+import metricas
+
+# Processos de renderização do pool compartilhado pelos lotes de um worker web (e padrão do CLI)
+PDF_LOTE_WORKERS = int(os.getenv("PDF_LOTE_WORKERS", str(os.cpu_count() or 2)))
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    # Um pool por worker web para todos os /relatorios/lote: pedidos simultâneos dividem os mesmos
+    # PDF_LOTE_WORKERS processos em vez de cada um abrir os seus. Não sobrevive ao fork: recria no worker.
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor is None or _executor_pid != os.getpid():
+                _executor = ProcessPoolExecutor(max_workers=max(1, PDF_LOTE_WORKERS))
+                _executor_pid = os.getpid()
+    return _executor
+
+
+# ==============================
+# RENDERIZAÇÃO EM PARALELO
+# ==============================
+def _renderizar(nome_arquivo, documento):
+    inicio = time.perf_counter()
+    try:
+        conteudo, erro = fila_pdf.renderizar_documento(documento), None
+    except Exception as e:
+        conteudo, erro = None, str(e)
+    return nome_arquivo, conteudo, erro, time.perf_counter() - inicio
+
+
+def renderizar_lote(itens, workers=None):
+    # itens: [(nome_arquivo, loja_nome, documento)]. Devolve cada PDF assim que termina, fora de ordem.
+    # workers=None usa o pool compartilhado (get_executor); com um número, abre um pool só para este lote (CLI).
+    lojas = {nome_arquivo: loja_nome for nome_arquivo, loja_nome, _ in itens}
+    motores = {nome_arquivo: documento['motor'] for nome_arquivo, _, documento in itens}
+    proprio = workers is not None
+    executor = ProcessPoolExecutor(max_workers=max(1, min(workers, len(itens) or 1))) if proprio else get_executor()
+    futuros = []
+    try:
+        futuros = [executor.submit(_renderizar, nome_arquivo, documento) for nome_arquivo, _, documento in itens]
+        for futuro in as_completed(futuros):
+            nome_arquivo, conteudo, erro, render_s = futuro.result()
+            metricas.pdf_render.observar(render_s, motores[nome_arquivo], 'lote')
+            yield {
+                'arquivo': nome_arquivo,
+                'loja': lojas[nome_arquivo],
+                'pdf': conteudo,
+                'erro': erro,
+                'render_s': round(render_s, 4),
+            }
+    finally:
+        # Download interrompido (GeneratorExit) ou erro: os PDFs que ainda não começaram saem da fila do pool;
+        # só os que já estão renderizando terminam
+        for futuro in futuros:
+            futuro.cancel()
+        if proprio:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+# ==============================
+# ZIP EM STREAMING
+# ==============================
+class _SaidaStream(io.RawIOBase):
+    # Destino não-seekable para o ZipFile: acumula só o que ainda não foi enviado
+    def __init__(self):
+        self._partes = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._partes.append(bytes(b))
+        return len(b)
+
+    def drenar(self):
+        dados = b''.join(self._partes)
+        self._partes = []
+        return dados
+
+
+def zip_em_stream(itens, workers=None, ao_concluir=None):
+    # Gera os bytes do ZIP conforme cada PDF fica pronto; no fim inclui tempos.json com o resumo
+    inicio = time.perf_counter()
+    saida = _SaidaStream()
+    resumo = {'lojas': [], 'total_s': 0.0, 'workers': workers or PDF_LOTE_WORKERS}
+    lote = renderizar_lote(itens, workers)
+
+    try:
+        with zipfile.ZipFile(saida, mode='w', compression=zipfile.ZIP_STORED) as zf:
+            for resultado in lote:
+                if resultado['pdf'] is not None:
+                    zf.writestr(resultado['arquivo'], resultado['pdf'])
+                resumo['lojas'].append({
+                    'loja': resultado['loja'],
+                    'arquivo': resultado['arquivo'],
+                    'render_s': resultado['render_s'],
+                    'tamanho_bytes': len(resultado['pdf'] or b''),
+                    'erro': resultado['erro'],
+                })
+                yield saida.drenar()
+
+            resumo['total_s'] = round(time.perf_counter() - inicio, 4)
+            zf.writestr('tempos.json', json.dumps(resumo, ensure_ascii=False, indent=2))
+        yield saida.drenar()
+    finally:
+        # Cliente desistiu: fecha o lote já (cancela os PDFs pendentes) em vez de esperar o coletor
+        lote.close()
+
+    if ao_concluir:
+        ao_concluir(resumo)
@@ -0,0 +1,49 @@
+# tests/conftest.py
+# Os módulos do app leem a configuração no import: o ambiente de teste (SQLite temporário, perfil de SQL ligado,
+# sem cache de fragmentos nem de totais) precisa estar pronto antes do primeiro `import database`.
+import os
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+_DIR = tempfile.mkdtemp(prefix='gestao_testes_')
+os.environ.update({
+    'DB_BACKEND': 'sqlite',
+    'SQLITE_CAMINHO': os.path.join(_DIR, 'gestao.db'),
+    'PERFILAR_SQL': '1',
+    'SQL_LENTO_LOG': os.devnull,
+    'LOG_ARQUIVO': os.devnull,
+    'APP_LOG': os.devnull,
+    'CACHE_FRAGMENTOS': '0',
+    'CACHE_VERSAO_INTERVALO': '0',
+    'CONTAGEM_TTL': '0',
+    'INCREMENTOS_BUFFER': '0',
+})
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def cliente():
+    import database
+    database.ensure_tables()
+    import app as aplicacao
+    aplicacao.app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    return aplicacao.app.test_client()
+
+
+@pytest.fixture
+def nova_loja(cliente):
+    # Loja nova com `quantidade` vendedores; os testes dividem o mesmo banco, então cada um usa só as suas lojas
+    import database
+
+    def criar(quantidade, status='Conectado', disparos_dia=0):
+        loja = database.insert_loja(f"Loja de teste {len(database.listar_lojas()) + 1}", "Responsável")
+        ids = [database.insert_vendedor({'nome': f"Vendedor {loja['id']}.{i}", 'email': f"v{loja['id']}.{i}@exemplo.com",
+                                         'loja_id': loja['id'], 'status': status, 'disparos_dia': disparos_dia})['id']
+               for i in range(quantidade)]
+        return loja['id'], ids
+
+    return criar
@@ -0,0 +1,82 @@
+# analise_acessos no modo incremental: cada rodada lê só os bytes novos (a linha ainda sendo escrita fica para a
+# seguinte) e, depois de uma rotação, termina o arquivo antigo (inclusive .gz) antes de seguir no atual.
+import gzip
+import os
+import shutil
+
+import analise_acessos
+
+
+def _linha(n, pagina='/painel'):
+    return (f"2025-01-02 10:{n % 60:02d}:00,000 - INFO - ACESSO: GET {pagina} 200 {n}.0ms "
+            f"(banco: 2 chamadas, 1.0ms). IP: 10.0.0.{n}\n").encode()
+
+
+def _escrever(caminho, *partes, modo='ab'):
+    with open(caminho, modo) as f:
+        for parte in partes:
+            f.write(parte)
+
+
+def _envelhecer(caminho, segundos):
+    antigo = os.path.getmtime(caminho) - segundos
+    os.utime(caminho, (antigo, antigo))
+
+
+def test_incremental_com_rotacao(tmp_path):
+    log, estado = str(tmp_path / 'acessos.log'), str(tmp_path / 'acessos.estado.json')
+
+    # Primeira rodada: a última linha ainda não terminou (sem \n) e fica para depois
+    meia = _linha(3)
+    legado = '2025-01-02 09:00:00,000 - INFO - ACESSO: Página Lojas visualizada. IP: 10.0.0.2\n'.encode('cp1252')
+    _escrever(log, _linha(1), legado, meia[:20])
+    novos, total = analise_acessos.analisar_incremental(log, estado)
+    assert novos.acessos == 2 and novos.cp1252 == 1
+    assert novos.paginas == {'/painel': 1, '/lojas': 1}
+    salvo = analise_acessos.carregar_estado(estado)
+    assert salvo['offset'] == os.path.getsize(log) - 20
+
+    # Sem nada novo: nada lido, total igual
+    novos, total = analise_acessos.analisar_incremental(log, estado)
+    assert (novos.linhas, total.acessos) == (0, 2)
+
+    _escrever(log, meia[20:], _linha(4, '/vendedores'))
+    novos, total = analise_acessos.analisar_incremental(log, estado)
+    assert (novos.acessos, total.acessos) == (2, 4)
+    assert novos.ips == {'10.0.0.3': 1, '10.0.0.4': 1}
+
+    # Rotação por renomeação: uma linha chegou no arquivo antigo antes de renomear, outra já no novo
+    _escrever(log, _linha(5))
+    os.rename(log, log + '.1')
+    _envelhecer(log + '.1', 60)
+    _escrever(log, _linha(6, '/lojas'))
+    novos, total = analise_acessos.analisar_incremental(log, estado)
+    assert (novos.acessos, total.acessos) == (2, 6)
+    assert novos.ips == {'10.0.0.5': 1, '10.0.0.6': 1}
+
+    # Rotação com compressão e o app ainda sem recriar o arquivo atual
+    _escrever(log, _linha(7))
+    with open(log, 'rb') as origem, gzip.open(log + '.2.gz', 'wb') as destino:
+        shutil.copyfileobj(origem, destino)
+    os.remove(log)
+    novos, total = analise_acessos.analisar_incremental(log, estado)
+    assert (novos.acessos, total.acessos) == (1, 7)
+    assert novos.ips == {'10.0.0.7': 1}
+
+    _escrever(log, _linha(8))
+    novos, total = analise_acessos.analisar_incremental(log, estado)
+    assert (novos.acessos, total.acessos) == (1, 8)
+    assert total.paginas == {'/painel': 5, '/lojas': 2, '/vendedores': 1}
+    assert total.ms_medio('/vendedores') == 4.0
+
+
+def test_arquivo_truncado_sem_rotacionado_recomeca(tmp_path, capsys):
+    log, estado = str(tmp_path / 'acessos.log'), str(tmp_path / 'acessos.estado.json')
+    _escrever(log, _linha(1), _linha(2))
+    analise_acessos.analisar_incremental(log, estado)
+
+    # copytruncate sem guardar a cópia: o começo mudou e não há onde terminar a leitura
+    _escrever(log, _linha(9), modo='wb')
+    novos, total = analise_acessos.analisar_incremental(log, estado)
+    assert (novos.acessos, total.acessos) == (1, 3)
+    assert 'recomeçando do início' in capsys.readouterr().err
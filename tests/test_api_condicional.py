@@ -0,0 +1,33 @@
+# /api/painel e /api/vendedores: ETag da versão dos dados e 304 com If-None-Match, inclusive na forma fraca
+# (W/"...") que proxies com compressão devolvem ao navegador.
+import pytest
+
+ROTAS = ('/api/painel', '/api/vendedores')
+
+
+@pytest.mark.parametrize('rota', ROTAS)
+def test_etag_e_304(cliente, nova_loja, rota):
+    nova_loja(1)
+    primeira = cliente.get(rota)
+    assert primeira.status_code == 200
+    etag = primeira.headers['ETag']
+    assert etag.startswith('"') and str(primeira.get_json()['versao']) in etag
+    assert primeira.headers['Cache-Control'] == 'no-cache'
+
+    for if_none_match in (etag, f'W/{etag}', f'"outra", {etag}', '*'):
+        resposta = cliente.get(rota, headers={'If-None-Match': if_none_match})
+        assert resposta.status_code == 304, if_none_match
+        assert resposta.data == b''
+        assert resposta.headers['ETag'] == etag
+
+    assert cliente.get(rota, headers={'If-None-Match': '"painel-0"'}).status_code == 200
+
+
+@pytest.mark.parametrize('rota', ROTAS)
+def test_escrita_troca_a_etag(cliente, nova_loja, rota):
+    _, (vendedor_id,) = nova_loja(1)
+    etag = cliente.get(rota).headers['ETag']
+    cliente.post('/vendedores/status', json={'alteracoes': [{'vendedor_id': vendedor_id, 'status': 'Bloqueado'}]})
+    resposta = cliente.get(rota, headers={'If-None-Match': etag})
+    assert resposta.status_code == 200
+    assert resposta.headers['ETag'] != etag
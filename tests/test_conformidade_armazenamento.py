@@ -0,0 +1,319 @@
+# tests/test_conformidade_armazenamento.py
+# Conformidade dos backends de armazenamento: o mesmo roteiro de chamadas a database.* roda em um banco vazio
+# de cada backend (DB_BACKEND=postgres e DB_BACKEND=sqlite), cada um num subprocesso (o backend é escolhido no
+# import). Cada resposta é conferida com o esperado, e as respostas dos backends são comparadas entre si (menos os
+# números de versão, que dependem do histórico do banco).
+# O Postgres só entra com TESTE_DATABASE_URL apontando para um banco local: a suíte APAGA os dados dele (como
+# benchmarks/semear.py --limpar). Sem a variável, os casos de Postgres são pulados.
+#
+#   python -m pytest -q tests/test_conformidade_armazenamento.py
+#   TESTE_DATABASE_URL="postgresql://postgres@/postgres?host=/tmp" python -m pytest -q tests/test_conformidade_armazenamento.py
+import json
+import os
+import subprocess
+import sys
+from datetime import date, timedelta
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TESTE_DATABASE_URL = os.getenv("TESTE_DATABASE_URL", "")
+
+
+# ==============================
+# ROTEIRO (roda no processo filho, com o backend já escolhido pelo ambiente)
+# ==============================
+def preparar_banco():
+    import database
+    import migracoes
+    if database.BACKEND == 'postgres':
+        sys.path.insert(0, os.path.join(RAIZ, 'benchmarks'))
+        import semear
+        if not semear.banco_local(database.DATABASE_URL):
+            sys.exit("DATABASE_URL não parece local; a suíte apaga os dados e só roda em banco local.")
+        migracoes.aplicar_migracoes()
+        with database.conexao() as conn:
+            cur = conn.cursor()
+            semear.limpar(cur)
+            conn.commit()
+            cur.close()
+    else:
+        migracoes.aplicar_migracoes()
+
+
+def limpar_caches():
+    import cache
+    for c in cache._caches.values():
+        c.invalidar()
+
+
+def _sem_versao(valor):
+    # Versões dependem de quantas escritas o banco já viu: ficam fora da comparação entre backends
+    if isinstance(valor, dict):
+        return {k: _sem_versao(v) for k, v in valor.items() if k != 'versao'}
+    if isinstance(valor, (list, tuple)):
+        return [_sem_versao(v) for v in valor]
+    if isinstance(valor, set):
+        return sorted(valor)
+    if isinstance(valor, date):
+        return valor.isoformat()
+    return valor
+
+
+def roteiro():
+    import database
+    falhas, fotografia = [], {}
+
+    def conferir(nome, obtido, esperado):
+        fotografia[nome] = _sem_versao(obtido)
+        if obtido != esperado:
+            falhas.append(f"{nome}: obtido {obtido!r}, esperado {esperado!r}")
+
+    hoje = date.today()
+    segunda = hoje - timedelta(days=hoje.weekday())
+    hoje_txt = hoje.strftime('%d/%m/%Y')
+
+    # ---------- LOJAS ----------
+    a = database.insert_loja('Centro', 'Ana Júlia')
+    b = database.insert_loja('Bairro', 'Bruno')
+    conferir('insert_loja', a, {'id': a['id'], 'nome': 'Centro', 'responsavel': 'Ana Júlia'})
+    conferir('listar_lojas', database.listar_lojas(), [a, b])
+    conferir('get_loja_by_id', database.get_loja_by_id(b['id']), b)
+    conferir('get_loja_by_id[inexistente]', database.get_loja_by_id(999999), None)
+    database.update_loja(b['id'], 'Bairro Novo', 'Bruno')
+    conferir('update_loja', database.get_loja_by_id(b['id'])['nome'], 'Bairro Novo')
+
+    # ---------- VENDEDORES ----------
+    novos = [
+        {'nome': 'Vendedor 1', 'email': 'v1@exemplo.com', 'loja_id': a['id'], 'status': 'Conectado', 'base_tratada': True},
+        {'nome': 'Vendedor 2', 'email': 'v2@exemplo.com', 'loja_id': a['id'], 'status': 'Conectado'},
+        {'nome': 'Vendedor 3', 'email': 'v3@exemplo.com', 'loja_id': b['id'], 'status': 'Bloqueado', 'disparos_dia': 3},
+        {'nome': 'Vendedor 4', 'email': 'v4@exemplo.com', 'loja_id': b['id'], 'status': 'Restrito', 'base_tratada': True},
+        {'nome': 'Vendedor 5', 'email': None, 'loja_id': None, 'status': 'Desconectado'},
+    ]
+    vs = [database.insert_vendedor(v) for v in novos]
+    ids = [v['id'] for v in vs]
+    v1, v2, v3, v4, v5 = ids
+    conferir('insert_vendedor[colunas]', sorted(vs[0]), sorted([
+        'id', 'nome', 'email', 'loja_id', 'status', 'base_tratada', 'disparos_dia',
+        'ultimo_status_tipo', 'ultimo_status_data', 'versao']))
+    conferir('insert_vendedor[tipos]', [(v['base_tratada'], v['disparos_dia']) for v in vs],
+             [(True, 0), (False, 0), (False, 3), (True, 0), (False, 0)])
+    conferir('listar_vendedores', [v['id'] for v in database.listar_vendedores()], ids)
+    conferir('get_vendedores_by_loja', [v['id'] for v in database.get_vendedores_by_loja(b['id'])], [v3, v4])
+
+    # ---------- STATUS ----------
+    versao = database.get_versao_dados()
+    conferir('update_status_vendedor', database.update_status_vendedor(v1, 'Bloqueado'), True)
+    conferir('update_status_vendedor[versao sobe]', database.get_versao_dados() > versao, True)
+    versao = database.get_versao_dados()
+    conferir('update_status_vendedor[inexistente]', database.update_status_vendedor(999999, 'Bloqueado'), False)
+    conferir('update_status_vendedor[inexistente,versao igual]', database.get_versao_dados() == versao, True)
+    v1_atual = database.listar_vendedores()[0]
+    conferir('update_status_vendedor[colunas]',
+             (v1_atual['status'], v1_atual['ultimo_status_tipo'], v1_atual['ultimo_status_data']),
+             ('Bloqueado', 'Bloqueado', hoje_txt))
+    conferir('atualizar_status_em_lote', database.atualizar_status_em_lote([(v2, 'Restrito'), (999999, 'Restrito')]), {v2})
+    conferir('atualizar_status_em_lote[vazio]', database.atualizar_status_em_lote([]), set())
+    try:
+        database.atualizar_status_por_filtro('Conectado')
+        falhas.append("atualizar_status_por_filtro sem filtro: esperado ValueError")
+    except ValueError:
+        pass
+    conferir('atualizar_status_por_filtro', database.atualizar_status_por_filtro('Conectado', loja_id=b['id']), [v3, v4])
+    conferir('atualizar_status_por_filtro[status]',
+             database.atualizar_status_por_filtro('Desconectado', status_atual='Restrito'), [v2])
+
+    # ---------- DISPAROS ----------
+    semana = {'segunda': 10, 'terca': 20, 'quarta': 30, 'quinta': 40, 'sexta': 50, 'sabado': 60, 'domingo': 70}
+    database.update_disparos_semanais(v1, semana)
+    conferir('get_disparos_semanais', {d: database.get_disparos_semanais(v1)[d] for d in database.DIAS_SEMANA}, semana)
+    conferir('get_disparos_semanais[sem linha]', database.get_disparos_semanais(v3), None)
+    database.update_disparos_semanais(v1, dict(semana, segunda=11))
+    conferir('update_disparos_semanais[regrava]', database.get_disparos_semanais(v1)['segunda'], 11)
+    database.update_disparos_dia(v1, 9)
+    database.atualizar_disparos_dia(v2, 4)
+    conferir('get_disparos_hoje', [database.get_disparos_hoje(v) for v in (v1, v2, v3, 999999)], [9, 4, 3, 0])
+
+    historico = database.listar_historico_disparos(v1, segunda, hoje)
+    esperado = [{'data': segunda + timedelta(days=i), 'disparos': dict(semana, segunda=11)[d]}
+                for i, d in enumerate(database.DIAS_SEMANA) if segunda + timedelta(days=i) <= hoje]
+    esperado[-1]['disparos'] = 9   # disparos do dia sobrescreve a coluna de hoje
+    conferir('listar_historico_disparos', historico, esperado)
+    conferir('get_total_disparos_periodo', database.get_total_disparos_periodo(segunda, segunda),
+             sum(h['disparos'] for h in esperado) + 4)
+    conferir('get_total_disparos_periodo[vazio]',
+             database.get_total_disparos_periodo(segunda - timedelta(weeks=8), segunda - timedelta(weeks=7)), 0)
+
+    completos = database.carregar_vendedores_com_disparos()
+    por_id = {v['id']: v for v in completos}
+    conferir('carregar_vendedores_com_disparos', [v['id'] for v in completos], ids)
+    conferir('carregar_vendedores_com_disparos[v1]',
+             (por_id[v1]['loja_nome'], por_id[v1]['disparos_semana'], por_id[v1]['disparos_hoje']),
+             ('Centro', sum(semana.values()) + 1, 9))
+    conferir('carregar_vendedores_com_disparos[sem semanal]', por_id[v3]['disparos_semanais'], None)
+    conferir('carregar_vendedores_com_disparos[filtros]',
+             [v['id'] for v in database.carregar_vendedores_com_disparos(loja_id=a['id'], status='Bloqueado')], [v1])
+    conferir('listar_vendedores_com_disparos[sem semanal]',
+             database.listar_vendedores_com_disparos(loja_id=b['id'])[0]['disparos_semanais'],
+             {d: 0 for d in database.DIAS_SEMANA})
+
+    # ---------- PAGINAÇÃO E CONTAGENS ----------
+    p1 = database.listar_vendedores_pagina(limite=2)
+    p2 = database.listar_vendedores_pagina(apos_id=p1['proximo_id'], limite=2)
+    p3 = database.listar_vendedores_pagina(apos_id=p2['proximo_id'], limite=2)
+    conferir('listar_vendedores_pagina', [([v['id'] for v in p['itens']], p['proximo_id']) for p in (p1, p2, p3)],
+             [([v1, v2], v2), ([v3, v4], v4), ([v5], None)])
+    conferir('listar_lojas_pagina[sem caixa]', database.listar_lojas_pagina('ANA JÚLIA'),
+             {'itens': [dict(a, total_vendedores=2)], 'proximo_id': None})
+    conferir('listar_lojas_pagina', database.listar_lojas_pagina(limite=1)['proximo_id'], a['id'])
+    limpar_caches()
+    conferir('contar_lojas', (database.contar_lojas(), database.contar_lojas('júlia'), database.contar_lojas('x')), (2, 1, 0))
+    conferir('contar_vendedores',
+             (database.contar_vendedores(), database.contar_vendedores(b['id']), database.contar_vendedores(b['id'], 'Conectado')),
+             (5, 2, 2))
+
+    # ---------- PAINEL ----------
+    conferir('get_kpis_painel', database.get_kpis_painel(), {
+        'status_kpis': {'Bloqueado': 1, 'Desconectado': 2, 'Conectado': 2},
+        'bases_pendentes_count': 3,
+        'total_disparos_dia': 9 + 4 + 3,
+        'total_disparos_semana': sum(semana.values()) + 1,
+    })
+    def resumo(loja_id):
+        r = database.get_resumo_loja(loja_id)
+        return {k: r[k] for k in ('vendedores', 'bases_pendentes', 'disparos_dia', 'disparos_semana', 'status_kpis')}
+    conferir('get_resumo_loja', (resumo(a['id']), resumo(b['id'])), (
+        {'vendedores': 2, 'bases_pendentes': 1, 'disparos_dia': 9 + 4, 'disparos_semana': sum(semana.values()) + 1,
+         'status_kpis': {'Bloqueado': 1, 'Desconectado': 1}},
+        {'vendedores': 2, 'bases_pendentes': 1, 'disparos_dia': 3, 'disparos_semana': 0,
+         'status_kpis': {'Conectado': 2}},
+    ))
+    conferir('get_resumo_loja[total]', resumo(None)['vendedores'], 5)
+    conferir('listar_resumo_lojas', {k: r['vendedores'] for k, r in database.listar_resumo_lojas().items()},
+             {a['id']: 2, b['id']: 2})
+    if database.BACKEND == 'postgres':
+        # No SQLite o resumo é calculado na leitura: não há tabela para conferir
+        conferir('verificar_resumo_lojas', database.verificar_resumo_lojas(corrigir=False)['divergencias'], [])
+    por_status = database.listar_vendedores_por_status(limite=1)
+    conferir('listar_vendedores_por_status', por_status, {
+        'Bloqueado': [{'nome': 'Vendedor 1', 'loja_nome': 'Centro', 'ultimo_status_tipo': 'Bloqueado', 'ultimo_status_data': hoje_txt}],
+        'Desconectado': [{'nome': 'Vendedor 2', 'loja_nome': 'Centro', 'ultimo_status_tipo': 'Desconectado', 'ultimo_status_data': hoje_txt}],
+        'Conectado': [{'nome': 'Vendedor 3', 'loja_nome': 'Bairro Novo', 'ultimo_status_tipo': 'Conectado', 'ultimo_status_data': hoje_txt}],
+    })
+
+    # ---------- DELTAS E REMOÇÃO ----------
+    desde = database.get_versao_dados()
+    database.update_disparos_dia(v4, 1)
+    ate = database.get_versao_dados()
+    conferir('versao_entre', [v['id'] for v in database.carregar_vendedores_com_disparos(versao_entre=(desde, ate))], [v4])
+    database.update_loja(a['id'], 'Centro Velho', 'Ana Júlia')
+    conferir('versao_entre[nome da loja]',
+             [v['id'] for v in database.carregar_vendedores_com_disparos(versao_entre=(ate, database.get_versao_dados()))], [v1, v2])
+    desde = database.get_versao_dados()
+    conferir('deletar_vendedor', database.deletar_vendedor(v1), True)
+    conferir('listar_vendedores_removidos', database.listar_vendedores_removidos(desde, database.get_versao_dados()), [v1])
+    conferir('deletar_vendedor[cascata]',
+             (database.get_disparos_semanais(v1), database.listar_historico_disparos(v1, segunda, hoje)), (None, []))
+    conferir('deletar_vendedor[listar]', [v['id'] for v in database.listar_vendedores()], [v2, v3, v4, v5])
+    conferir('deletar_vendedor[resumo]', (resumo(a['id'])['vendedores'], resumo(a['id'])['disparos_semana']), (1, 0))
+
+    # ---------- INCREMENTOS ----------
+    desde = database.get_versao_dados()
+    conferir('incrementar_disparos_dia', database.incrementar_disparos_dia({v3: 2, v2: 5, 999999: 1}), {v2: 9, v3: 5})
+    conferir('incrementar_disparos_dia[vazio]', database.incrementar_disparos_dia({}), {})
+    conferir('incrementar_disparos_dia[hoje]', [database.get_disparos_hoje(v) for v in (v2, v3)], [9, 5])
+    conferir('incrementar_disparos_dia[historico]', database.listar_historico_disparos(v2, hoje, hoje),
+             [{'data': hoje, 'disparos': 9}])
+    conferir('incrementar_disparos_dia[versao_entre]',
+             [v['id'] for v in database.carregar_vendedores_com_disparos(versao_entre=(desde, database.get_versao_dados()))],
+             [v2, v3])
+    conferir('incrementar_disparos_dia[resumo]', resumo(b['id'])['disparos_dia'], 5 + 1)
+
+    # ---------- EXPORTAÇÃO ----------
+    exportados = list(database.exportar_vendedores())
+    conferir('exportar_vendedores', [r[0] for r in exportados], [v2, v3, v4, v5])
+    conferir('exportar_vendedores[colunas]', {len(r) for r in exportados}, {len(database.COLUNAS_EXPORTACAO['vendedores'])})
+    conferir('exportar_vendedores[filtros]',
+             [(r[0], r[3], r[4], r[5], r[6], r[14]) for r in database.exportar_vendedores(loja_id=b['id'], status='Conectado')],
+             [(v3, 'Bairro Novo', 'Conectado', 'não', 5, 0), (v4, 'Bairro Novo', 'Conectado', 'sim', 1, 0)])
+    conferir('exportar_disparos', list(database.exportar_disparos(inicio=hoje, fim=hoje)), [
+        (hoje, v2, 'Vendedor 2', 'Centro Velho', 'Desconectado', 9),
+        (hoje, v3, 'Vendedor 3', 'Bairro Novo', 'Conectado', 5),
+        (hoje, v4, 'Vendedor 4', 'Bairro Novo', 'Conectado', 1),
+    ])
+    conferir('exportar_disparos[filtros]',
+             [r[1] for r in database.exportar_disparos(loja_id=b['id'], status='Conectado', fim=hoje)], [v3, v4])
+    conferir('exportar_disparos[vazio]', list(database.exportar_disparos(fim=segunda - timedelta(weeks=8))), [])
+
+    # ---------- FECHAMENTO ----------
+    ontem = hoje - timedelta(days=1)
+    conferir('ultimo_fechamento[nunca]', database.ultimo_fechamento(), None)
+    com_disparos = sum(1 for v in database.listar_vendedores() if v['disparos_dia'])
+    r = database.fechar_dia(ontem)
+    conferir('fechar_dia', (r['dia'], r['fechado'], r['vendedores'], r['zerados']), (ontem, True, 4, com_disparos))
+    conferir('fechar_dia[hoje zerado]', [database.get_disparos_hoje(v) for v in (v2, v3, v4)], [0, 0, 0])
+    conferir('fechar_dia[de novo]', database.fechar_dia(ontem)['fechado'], False)
+    database.fechar_dia(ontem - timedelta(days=3))
+    conferir('ultimo_fechamento', database.ultimo_fechamento(), ontem)
+
+    return {'backend': database.BACKEND, 'falhas': falhas, 'fotografia': fotografia}
+
+
+# ==============================
+# TESTES (um subprocesso por backend)
+# ==============================
+BACKENDS = [
+    'sqlite',
+    pytest.param('postgres', marks=pytest.mark.skipif(not TESTE_DATABASE_URL, reason="TESTE_DATABASE_URL não definida")),
+]
+
+
+def executar_backend(backend, pasta):
+    env = dict(os.environ, DB_BACKEND=backend, PERFILAR_SQL='0', LOG_ARQUIVO=os.devnull)
+    if backend == 'sqlite':
+        env['SQLITE_CAMINHO'] = os.path.join(pasta, 'conformidade.db')
+    else:
+        env['DATABASE_URL'] = TESTE_DATABASE_URL
+    processo = subprocess.run([sys.executable, os.path.abspath(__file__)],
+                              cwd=RAIZ, env=env, capture_output=True, text=True)
+    assert processo.returncode == 0, f"processo saiu com código {processo.returncode}:\n{processo.stderr.strip()}"
+    return json.loads(processo.stdout)
+
+
+@pytest.fixture(scope='module')
+def resultados(tmp_path_factory):
+    cache = {}
+
+    def resultado(backend):
+        if backend not in cache:
+            cache[backend] = executar_backend(backend, str(tmp_path_factory.mktemp(backend)))
+        return cache[backend]
+    return resultado
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_roteiro(resultados, backend):
+    r = resultados(backend)
+    assert r['backend'] == backend
+    assert r['fotografia']
+    assert not r['falhas'], '\n'.join(r['falhas'])
+
+
+@pytest.mark.skipif(not TESTE_DATABASE_URL, reason="TESTE_DATABASE_URL não definida")
+def test_backends_respondem_igual(resultados):
+    # Mesma chamada, respostas diferentes entre backends (mesmo quando as duas passam nas verificações)
+    base, outro = resultados('postgres'), resultados('sqlite')
+    divergentes = [
+        f"{nome}: postgres={base['fotografia'][nome]!r} sqlite={outro['fotografia'][nome]!r}"
+        for nome in sorted(set(base['fotografia']) & set(outro['fotografia']))
+        if json.dumps(base['fotografia'][nome], sort_keys=True) != json.dumps(outro['fotografia'][nome], sort_keys=True)
+    ]
+    assert not divergentes, '\n'.join(divergentes)
+
+
+if __name__ == '__main__':
+    # Subprocesso de executar_backend: o ambiente já escolheu o backend
+    sys.path.insert(0, RAIZ)
+    preparar_banco()
+    print(json.dumps(roteiro(), default=str))
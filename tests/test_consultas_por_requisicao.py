@@ -0,0 +1,50 @@
+# tests/test_consultas_por_requisicao.py
+# Regressão do N+1 do painel e da lista de vendedores: o número de comandos SQL por requisição (contado pelo
+# perfilador, cabeçalho X-Perfil-SQL) não pode crescer com a quantidade de vendedores.
+#
+#   python -m pytest -q tests
+import re
+
+import pytest
+
+import database
+
+N = 10
+DIAS = ('segunda', 'terca', 'quarta', 'quinta', 'sexta', 'sabado', 'domingo')
+ROTAS = ('/painel', f'/vendedores?por_pagina={database.PAGINA_TAMANHO_MAX}')
+
+
+def semear(ate):
+    # Completa o banco até `ate` vendedores, espalhados em lojas de 5, com disparos na semana
+    atuais = len(database.listar_vendedores())
+    lojas = [l['id'] for l in database.listar_lojas()]
+    for i in range(atuais, ate):
+        if i % 5 == 0:
+            lojas.append(database.insert_loja(f"Loja {i // 5:03d}", f"Responsável {i // 5}")['id'])
+        v = database.insert_vendedor({'nome': f"Vendedor {i:04d}", 'email': f"vendedor{i}@exemplo.com",
+                                      'loja_id': lojas[-1], 'status': 'Conectado', 'disparos_dia': i % 50})
+        database.update_disparos_semanais(v['id'], {dia: (i + j) % 30 for j, dia in enumerate(DIAS)})
+
+
+def consultas(cliente, rota):
+    resposta = cliente.get(rota)
+    assert resposta.status_code == 200, rota
+    return int(re.search(r'consultas=(\d+)', resposta.headers['X-Perfil-SQL']).group(1))
+
+
+@pytest.fixture(scope='module')
+def medidas(cliente):
+    # Cada rota medida com N e com 10·N vendedores; entre as duas houve escrita, então a versão dos dados mudou
+    # e os caches voltam ao banco nas duas medidas. O banco é o mesmo dos outros testes: conta a partir do que já há.
+    base = len(database.listar_vendedores())
+    semear(base + N)
+    poucos = {rota: consultas(cliente, rota) for rota in ROTAS}
+    semear(base + 10 * N)
+    assert len(database.listar_vendedores()) == base + 10 * N
+    return {rota: (poucos[rota], consultas(cliente, rota)) for rota in ROTAS}
+
+
+@pytest.mark.parametrize('rota', ROTAS)
+def test_consultas_nao_crescem_com_vendedores(medidas, rota):
+    poucos, muitos = medidas[rota]
+    assert muitos == poucos, f"{rota}: {poucos} consultas com {N} vendedores, {muitos} com {10 * N}"
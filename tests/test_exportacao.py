@@ -0,0 +1,94 @@
+# Exportação em fluxo: limite de downloads simultâneos por worker (503 acima dele, vaga devolvida ao terminar)
+# e estrutura do XLSX montado à mão (partes do pacote, cabeçalho, tipos das células, abas extras).
+import io
+import zipfile
+from datetime import date
+from xml.etree import ElementTree
+
+import database
+import exportacao
+
+NS = {'s': exportacao._NS_PLANILHA}
+
+
+def _abrir_xlsx(pedacos):
+    return zipfile.ZipFile(io.BytesIO(b''.join(pedacos)))
+
+
+def _linhas(zf, parte):
+    planilha = ElementTree.fromstring(zf.read(parte))
+    return planilha.findall('s:sheetData/s:row', NS)
+
+
+def _valor(celula):
+    texto = celula.find('s:is/s:t', NS)
+    if texto is not None:
+        return texto.text
+    valor = celula.find('s:v', NS)
+    return valor.text if valor is not None else None
+
+
+def test_limite_de_exportacoes_simultaneas(cliente, nova_loja, monkeypatch):
+    loja_id, _ = nova_loja(2)
+    monkeypatch.setattr(exportacao, 'EXPORTACAO_MAX_SIMULTANEAS', 1)
+    presa = exportacao.Exportacao('vendedores', 'csv', loja_id=loja_id)
+    try:
+        assert exportacao.em_andamento() == 1
+        resposta = cliente.get(f'/exportar/vendedores.csv?loja_id={loja_id}')
+        assert resposta.status_code == 503
+        assert resposta.headers['Retry-After'] == '30'
+    finally:
+        presa.close()
+    assert exportacao.em_andamento() == 0
+
+    resposta = cliente.get(f'/exportar/vendedores.csv?loja_id={loja_id}')
+    assert resposta.status_code == 200
+    assert len(resposta.data.decode('utf-8-sig').splitlines()) == 3
+    resposta.close()
+    assert exportacao.em_andamento() == 0
+
+
+def test_download_interrompido_devolve_a_vaga(nova_loja):
+    loja_id, _ = nova_loja(1)
+    corpo = exportacao.Exportacao('vendedores', 'xlsx', loja_id=loja_id)
+    assert exportacao.em_andamento() == 1
+    corpo.close()
+    corpo.close()
+    assert exportacao.em_andamento() == 0
+
+
+def test_xlsx_da_rota(cliente, nova_loja):
+    loja_id, ids = nova_loja(3)
+    resposta = cliente.get(f'/exportar/vendedores.xlsx?loja_id={loja_id}')
+    assert resposta.status_code == 200
+    assert resposta.mimetype == exportacao.FORMATOS['xlsx']
+    assert resposta.headers['Content-Disposition'].endswith('.xlsx"')
+
+    zf = _abrir_xlsx([resposta.data])
+    assert zf.testzip() is None
+    assert set(zf.namelist()) == {'[Content_Types].xml', '_rels/.rels', 'xl/workbook.xml',
+                                  'xl/_rels/workbook.xml.rels', 'xl/styles.xml', 'xl/worksheets/sheet1.xml'}
+    cabecalho, *linhas = _linhas(zf, 'xl/worksheets/sheet1.xml')
+    assert [_valor(c) for c in cabecalho] == database.COLUNAS_EXPORTACAO['vendedores']
+    assert all(c.get('s') == '2' for c in cabecalho)
+    assert [int(_valor(linha[0])) for linha in linhas] == ids
+
+
+def test_xlsx_tipos_blocos_e_abas(monkeypatch):
+    monkeypatch.setattr(exportacao, 'XLSX_MAX_LINHAS', 3)    # cabeçalho + 2 linhas por aba
+    linhas = [(i, f'nome <{i}>\x01', date(2024, 1, i), None, i % 2 == 0) for i in range(1, 6)]
+    pedacos = list(exportacao.gerar_xlsx(['id', 'nome', 'data', 'vazio', 'par'], iter(linhas), 'dados', bloco=64))
+    assert len(pedacos) > 1
+
+    zf = _abrir_xlsx(pedacos)
+    livro = ElementTree.fromstring(zf.read('xl/workbook.xml'))
+    assert [s.get('name') for s in livro.findall('s:sheets/s:sheet', NS)] == ['dados', 'dados (2)', 'dados (3)']
+    abas = [_linhas(zf, f'xl/worksheets/sheet{i}.xml') for i in (1, 2, 3)]
+    assert [len(aba) for aba in abas] == [3, 3, 2]
+
+    primeira = abas[0][1]
+    assert _valor(primeira[0]) == '1'
+    assert _valor(primeira[1]) == 'nome <1>'                     # escapado e sem caractere de controle
+    assert primeira[2].get('s') == '1' and _valor(primeira[2]) == str((date(2024, 1, 1) - date(1899, 12, 30)).days)
+    assert _valor(primeira[3]) is None
+    assert primeira[4].get('t') == 'b' and _valor(primeira[4]) == '0'
@@ -0,0 +1,81 @@
+# Fechamento diário: rodar de novo para o mesmo dia não altera nada, e o agendador fecha ao subir o dia que
+# ficou sem fechamento enquanto estava parado.
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import database
+import fechamento
+
+HOJE = date.today()
+
+
+def _disparos(loja_id):
+    return {v['id']: v['disparos_dia'] for v in database.get_vendedores_by_loja(loja_id)}
+
+
+def test_fechar_o_mesmo_dia_de_novo_nao_altera_nada(nova_loja):
+    loja_id, ids = nova_loja(2, disparos_dia=7)
+    dia = HOJE - timedelta(days=3)
+    coluna = database.DIAS_SEMANA[dia.weekday()]
+
+    resultado = fechamento.fechar(dia, registrar=lambda _: None)
+    assert resultado['fechado'] and resultado['coluna'] == coluna
+    assert resultado['zerados'] >= 2
+    assert _disparos(loja_id) == {i: 0 for i in ids}
+    assert all(database.get_disparos_semanais(i)[coluna] == 7 for i in ids)
+
+    # Disparos do dia seguinte já entrando: o segundo fechamento do mesmo dia não os leva nem zera
+    database.update_disparos_dia(ids[0], 3)
+    resultado = fechamento.fechar(dia, registrar=lambda _: None)
+    assert not resultado['fechado']
+    assert (resultado['vendedores'], resultado['zerados']) == (0, 0)
+    assert _disparos(loja_id) == {ids[0]: 3, ids[1]: 0}
+    assert all(database.get_disparos_semanais(i)[coluna] == 7 for i in ids)
+    assert database.ultimo_fechamento() == dia
+
+
+def test_dia_pendente():
+    ultimo = database.ultimo_fechamento()
+    assert ultimo is not None
+
+    def pendente(dias_depois):
+        mensagens = []
+        agora = datetime.combine(ultimo + timedelta(days=dias_depois), datetime.min.time())
+        return fechamento.dia_pendente(agora, registrar=mensagens.append), mensagens
+
+    # Dia seguinte ao último fechado: nada pendente; dois dias depois, o de ontem
+    assert pendente(1) == (None, [])
+    assert pendente(2) == (ultimo + timedelta(days=1), [])
+    # Agendador parado mais tempo: só ontem é recuperado e o buraco entre os dois é avisado
+    dia, mensagens = pendente(5)
+    assert dia == ultimo + timedelta(days=4)
+    assert len(mensagens) == 1
+    assert f"3 dia(s) sem fechamento, de {ultimo + timedelta(days=1):%d/%m/%Y} a {ultimo + timedelta(days=3):%d/%m/%Y}" \
+        in mensagens[0]
+
+
+class _Parar(Exception):
+    pass
+
+
+def test_agendador_fecha_o_dia_que_ficou_para_tras(nova_loja, monkeypatch):
+    loja_id, ids = nova_loja(1, disparos_dia=5)
+    ontem = HOJE - timedelta(days=1)
+    assert database.ultimo_fechamento() < ontem
+
+    def parar(*args, **kwargs):
+        raise _Parar
+    # Sai do laço antes de dormir até o próximo horário
+    monkeypatch.setattr(fechamento, 'proxima_execucao', parar)
+    mensagens = []
+    with pytest.raises(_Parar):
+        fechamento.agendar(registrar=mensagens.append)
+
+    assert database.ultimo_fechamento() == ontem
+    assert database.get_disparos_semanais(ids[0])[database.DIAS_SEMANA[ontem.weekday()]] == 5
+    assert _disparos(loja_id) == {ids[0]: 0}
+    assert any(f"{ontem:%d/%m/%Y} sem fechamento" in m for m in mensagens)
+    # Último fechado há três dias: o dia entre ele e ontem fica de fora e é avisado
+    assert any(f"1 dia(s) sem fechamento, de {ontem - timedelta(days=1):%d/%m/%Y}" in m for m in mensagens)
+    assert fechamento.dia_pendente() is None
@@ -0,0 +1,59 @@
+# Pool de renderização quebrado: um filho que morre não pode derrubar os jobs seguintes nem deixar o status
+# em 'processando' para sempre.
+import os
+import time
+
+import fila_pdf
+
+
+def _morrer(documento):
+    os._exit(1)
+
+
+def _renderizar(documento):
+    return b'%PDF-1.4 teste'
+
+
+def _esperar(fila, job_id, prazo=30):
+    limite = time.monotonic() + prazo
+    while time.monotonic() < limite:
+        job = fila_pdf.get_job(job_id, fila.pasta)
+        if job and job['status'] in ('concluido', 'erro') and fila.estatisticas()['pendentes'] == 0:
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} não terminou em {prazo}s")
+
+
+def test_filho_morto_marca_erro_e_recria_o_pool(tmp_path, monkeypatch):
+    fila = fila_pdf.FilaPDF(workers=1, pasta=str(tmp_path))
+    try:
+        # Os filhos nascem por fork do processo do teste e herdam o renderizador trocado
+        monkeypatch.setattr(fila_pdf, 'renderizar_documento', _morrer)
+        job = _esperar(fila, fila.enfileirar({'motor': 'xhtml2pdf', 'html': ''})['id'])
+        assert job['status'] == 'erro'
+        assert 'expira_em' in job
+
+        monkeypatch.setattr(fila_pdf, 'renderizar_documento', _renderizar)
+        job = _esperar(fila, fila.enfileirar({'motor': 'xhtml2pdf', 'html': ''})['id'])
+        assert job['status'] == 'concluido'
+        assert fila_pdf.caminho_pdf(job['id'], fila.pasta)
+
+        estatisticas = fila.estatisticas()
+        assert estatisticas['pools_recriados'] == 1
+        assert (estatisticas['concluidos'], estatisticas['erros']) == (1, 1)
+    finally:
+        fila.encerrar()
+
+
+def test_submit_em_pool_quebrado_tenta_num_pool_novo(tmp_path, monkeypatch):
+    fila = fila_pdf.FilaPDF(workers=1, pasta=str(tmp_path))
+    try:
+        monkeypatch.setattr(fila_pdf, 'renderizar_documento', _renderizar)
+        quebrado = fila._get_executor()
+        # Pool marcado como quebrado (como fica depois que um filho morre) antes do submit
+        quebrado._broken = "filho morreu"
+        job = _esperar(fila, fila.enfileirar({'motor': 'xhtml2pdf', 'html': ''})['id'])
+        assert job['status'] == 'concluido'
+        assert fila._executor is not quebrado
+    finally:
+        fila.encerrar()
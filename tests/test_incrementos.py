@@ -0,0 +1,118 @@
+# Buffer de incrementos de disparos: eventos do mesmo vendedor viram uma soma, uma descarga que falha devolve
+# as somas ao buffer, e com o buffer cheio a rota responde 503.
+import threading
+
+import pytest
+
+import database
+import incrementos
+
+
+class _Gravador:
+    def __init__(self, falhar=0):
+        self.falhar = falhar
+        self.chamadas = []
+
+    def __call__(self, somas):
+        if self.falhar:
+            self.falhar -= 1
+            raise RuntimeError("banco fora do ar")
+        self.chamadas.append(dict(somas))
+        return dict(somas)
+
+
+def _disparos(loja_id):
+    return {v['id']: v['disparos_dia'] for v in database.get_vendedores_by_loja(loja_id)}
+
+
+def _buffer(gravar, **opcoes):
+    # Intervalo longo: as descargas do teste são as chamadas explícitas
+    return incrementos.BufferIncrementos(gravar=gravar, intervalo=60, **opcoes)
+
+
+def test_eventos_do_mesmo_vendedor_viram_uma_soma():
+    gravar = _Gravador()
+    buffer = _buffer(gravar)
+    try:
+        for _ in range(30):
+            buffer.adicionar([(1, 1)])
+        buffer.adicionar([(2, 5), (1, 2), (2, 5)])
+        assert buffer.estatisticas()['pendentes_eventos'] == 33
+        assert buffer.descarregar() == 2
+        assert gravar.chamadas == [{1: 32, 2: 10}]
+        assert buffer.descarregar() == 0
+        estatisticas = buffer.estatisticas()
+        assert (estatisticas['eventos_gravados'], estatisticas['pendentes_eventos']) == (33, 0)
+    finally:
+        buffer.encerrar()
+
+
+def test_descarga_com_erro_devolve_as_somas():
+    gravar = _Gravador(falhar=1)
+    buffer = _buffer(gravar)
+    try:
+        buffer.adicionar([(1, 3), (2, 1)])
+        assert buffer.descarregar() == 0
+        # Chegou mais enquanto o banco estava fora: soma com o que voltou
+        buffer.adicionar([(1, 4)])
+        estatisticas = buffer.estatisticas()
+        assert (estatisticas['erros'], estatisticas['pendentes_eventos']) == (1, 3)
+        assert buffer.descarregar() == 2
+        assert gravar.chamadas == [{1: 7, 2: 1}]
+    finally:
+        buffer.encerrar()
+
+
+def test_thread_descarrega_ao_juntar_max_eventos():
+    gravou = threading.Event()
+    buffer = _buffer(lambda somas: gravou.set() or somas, max_eventos=3)
+    try:
+        buffer.adicionar([(1, 1), (2, 1)])
+        assert not gravou.wait(0.2)
+        buffer.adicionar([(3, 1)])
+        assert gravou.wait(5)
+    finally:
+        buffer.encerrar()
+
+
+def test_buffer_cheio_recusa_o_lote_inteiro():
+    buffer = _buffer(_Gravador(falhar=1), max_eventos=2, max_pendentes=4)
+    try:
+        buffer.adicionar([(1, 1), (2, 1), (3, 1)])
+        with pytest.raises(incrementos.BufferCheio):
+            buffer.adicionar([(1, 1), (4, 1)])
+        estatisticas = buffer.estatisticas()
+        assert (estatisticas['pendentes_eventos'], estatisticas['recusados']) == (3, 2)
+        buffer.adicionar([(4, 1)])
+    finally:
+        buffer.encerrar()
+
+
+def test_rota_com_buffer(cliente, nova_loja, monkeypatch):
+    loja_id, (a, b) = nova_loja(2)
+    buffer = _buffer(None, max_eventos=10, max_pendentes=10)
+    monkeypatch.setattr(incrementos, 'INCREMENTOS_BUFFER', True)
+    monkeypatch.setattr(incrementos, 'get_buffer', lambda: buffer)
+    try:
+        resposta = cliente.post('/api/disparos/incrementar', json={'incrementos': [
+            {'vendedor_id': a, 'quantidade': 2}, {'vendedor_id': b}, {'vendedor_id': a, 'quantidade': 3}]})
+        assert resposta.status_code == 202
+        assert resposta.get_json() == {'aceitos': 3, 'modo': 'buffer'}
+
+        resposta = cliente.post('/api/disparos/incrementar', json={'incrementos': [{'vendedor_id': a}] * 8})
+        assert resposta.status_code == 503
+        assert resposta.headers['Retry-After'] == '1'
+
+        assert buffer.descarregar() == 2
+        assert _disparos(loja_id) == {a: 5, b: 1}
+
+        # ?sincrono=1 grava na hora mesmo com o buffer ligado
+        resposta = cliente.post('/api/disparos/incrementar?sincrono=1', json={'vendedor_id': b, 'quantidade': 4})
+        assert resposta.get_json()['disparos_hoje'] == {str(b): 5}
+    finally:
+        buffer.encerrar()
+
+
+def test_rota_rejeita_corpo_invalido(cliente):
+    for corpo in ({'vendedor_id': 'x'}, {'incrementos': []}, {'vendedor_id': 1, 'quantidade': 0}, [1]):
+        assert cliente.post('/api/disparos/incrementar', json=corpo).status_code == 400
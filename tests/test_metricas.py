@@ -0,0 +1,52 @@
+# /metrics com vários workers (METRICAS_DIR) e funções geradoras instrumentadas.
+import os
+import time
+import types
+
+import metricas
+
+
+def test_soma_contadores_e_histogramas_de_outros_processos(tmp_path, monkeypatch):
+    monkeypatch.setattr(metricas, 'METRICAS_DIR', str(tmp_path))
+    antes = metricas.db_chamadas.estado().get(('teste_soma',), 0)
+    metricas.db_chamadas.inc('teste_soma', quantidade=2)
+
+    pid = os.fork()
+    if pid == 0:
+        # Outro worker (nasce zerado): conta 3 e grava o seu arquivo
+        try:
+            metricas.db_chamadas.inc('teste_soma', quantidade=3)
+            metricas.db_duracao.observar(0.02, 'teste_soma')
+            metricas._gravar_processo()
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+
+    texto = metricas.exportar()
+    assert f'gestao_db_chamadas_total{{funcao="teste_soma"}} {antes + 5}' in texto
+    assert 'gestao_db_duracao_segundos_count{funcao="teste_soma"} 1' in texto
+
+    # O worker morto continua na soma até o app subir de novo
+    assert (tmp_path / f"{pid}.json").exists()
+    assert metricas.limpar_processos_mortos() == 1
+    assert not (tmp_path / f"{pid}.json").exists()
+    assert (tmp_path / f"{os.getpid()}.json").exists()
+
+
+def test_funcao_geradora_medida_ate_acabar():
+    def exportar_teste():
+        for i in range(3):
+            time.sleep(0.02)
+            yield i
+
+    modulo = types.ModuleType('modulo_teste')
+    exportar_teste.__module__ = 'modulo_teste'
+    modulo.exportar_teste = exportar_teste
+    metricas.instrumentar_modulo(modulo)
+
+    gerador = modulo.exportar_teste()
+    assert metricas.db_chamadas.estado().get(('exportar_teste',), 0) == 0
+    assert list(gerador) == [0, 1, 2]
+    assert metricas.db_chamadas.estado()[('exportar_teste',)] == 1
+    _, soma, total = metricas.db_duracao.estado()[('exportar_teste',)]
+    assert total == 1 and soma >= 0.05
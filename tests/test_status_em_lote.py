@@ -0,0 +1,72 @@
+# POST /vendedores/status: validação do corpo (400 antes de gravar qualquer coisa) e o resultado por item.
+import pytest
+
+import database
+
+
+def _status(loja_id):
+    return {v['id']: v['status'] for v in database.get_vendedores_by_loja(loja_id)}
+
+
+@pytest.mark.parametrize('corpo', [
+    [1, 2],                                                                      # não é objeto
+    {},                                                                          # nem alteracoes nem filtro
+    {'alteracoes': []},
+    {'alteracoes': {'vendedor_id': 1, 'status': 'Bloqueado'}},
+    {'alteracoes': [{'vendedor_id': 'abc', 'status': 'Bloqueado'}]},
+    {'alteracoes': [{'status': 'Bloqueado'}]},
+    {'filtro': [3], 'novo_status': 'Bloqueado'},
+    {'filtro': {'loja_id': 3}, 'novo_status': 'Inexistente'},
+    {'filtro': {'loja_id': 'tres'}, 'novo_status': 'Bloqueado'},
+    {'filtro': {'status': 5}, 'novo_status': 'Bloqueado'},
+    {'filtro': {}, 'novo_status': 'Bloqueado'},                                  # filtro vazio mudaria todos
+])
+def test_corpo_invalido_devolve_400_sem_gravar(cliente, nova_loja, corpo):
+    loja_id, _ = nova_loja(2)
+    antes = _status(loja_id)
+    resposta = cliente.post('/vendedores/status', json=corpo)
+    assert resposta.status_code == 400
+    assert 'erro' in resposta.get_json()
+    assert _status(loja_id) == antes
+
+
+def test_resultado_por_item(cliente, nova_loja):
+    loja_id, (a, b) = nova_loja(2)
+    resposta = cliente.post('/vendedores/status', json={'alteracoes': [
+        {'vendedor_id': a, 'status': 'Bloqueado'},
+        {'vendedor_id': b, 'status': 'Suspenso'},
+        {'vendedor_id': 10 ** 9, 'status': 'Restrito'},
+        {'vendedor_id': str(a), 'status': 'Restrito'},          # id repetido: vale o último
+    ]})
+    assert resposta.status_code == 200
+    dados = resposta.get_json()
+    assert dados['atualizados'] == 1
+    assert {r['vendedor_id']: (r['status'], r['resultado']) for r in dados['resultados']} == {
+        a: ('Restrito', 'atualizado'),
+        b: ('Suspenso', 'status_invalido'),
+        10 ** 9: ('Restrito', 'nao_encontrado'),
+    }
+    assert _status(loja_id) == {a: 'Restrito', b: 'Conectado'}
+
+
+def test_status_invalido_depois_anula_o_valido_do_mesmo_id(cliente, nova_loja):
+    loja_id, (a,) = nova_loja(1)
+    resposta = cliente.post('/vendedores/status', json={'alteracoes': [
+        {'vendedor_id': a, 'status': 'Bloqueado'},
+        {'vendedor_id': a, 'status': None},
+    ]})
+    assert resposta.get_json() == {'atualizados': 0, 'resultados': [
+        {'vendedor_id': a, 'status': None, 'resultado': 'status_invalido'}]}
+    assert _status(loja_id) == {a: 'Conectado'}
+
+
+def test_por_filtro(cliente, nova_loja):
+    loja_id, (a, b, c) = nova_loja(3)
+    cliente.post('/vendedores/status', json={'alteracoes': [{'vendedor_id': c, 'status': 'Restrito'}]})
+    resposta = cliente.post('/vendedores/status', json={'filtro': {'loja_id': str(loja_id), 'status': 'Conectado'},
+                                                        'novo_status': 'Bloqueado'})
+    assert resposta.status_code == 200
+    dados = resposta.get_json()
+    assert dados['atualizados'] == 2
+    assert sorted(r['vendedor_id'] for r in dados['resultados']) == [a, b]
+    assert _status(loja_id) == {a: 'Bloqueado', b: 'Bloqueado', c: 'Restrito'}